@@ -1,6 +1,13 @@
 from django.contrib import admin
-from .models import DeviceToken
+from .models import DeviceToken, UserSession
 
 # Register your models here.
 
 admin.site.register(DeviceToken)
+
+
+@admin.register(UserSession)
+class UserSessionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'session', 'created_at')
+    search_fields = ('user__username',)
+    raw_id_fields = ('user', 'session')
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
 import secrets
 import hashlib
 
@@ -36,3 +37,23 @@ class DeviceToken(models.Model):
         verbose_name = "Device Token"
         verbose_name_plural = "Device Tokens"
 
+
+
+class UserSession(models.Model):
+    """
+    Índice usuario → sesión de autenticación.
+
+    django_session solo guarda los datos codificados, así que buscar las
+    sesiones de un usuario obligaba a decodificar la tabla completa. Se llena
+    al hacer login (accounts.signals) y se borra en cascada con la sesión.
+    """
+    session = models.OneToOneField(Session, on_delete=models.CASCADE, primary_key=True, related_name='user_index')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='indexed_sessions')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.session_id[:8]}"
+
+    class Meta:
+        verbose_name = "User Session"
+        verbose_name_plural = "User Sessions"
@@ -0,0 +1,42 @@
+# sessions.py
+"""
+Borrado de sesiones de autenticación por usuario usando UserSession.
+
+Un DELETE con índice en vez de decodificar cada fila de django_session.
+Las sesiones creadas antes de existir el índice se agregan con
+``python manage.py index_user_sessions``.
+"""
+import logging
+
+from django.contrib.sessions.models import Session
+
+from .models import UserSession
+
+logger = logging.getLogger(__name__)
+
+
+def _session_count(result):
+    # delete() cuenta también las filas en cascada (UserSession)
+    _, per_model = result
+    return per_model.get(Session._meta.label, 0)
+
+
+def delete_user_sessions(*users):
+    """Delete every auth session of the given users (User instances or ids)."""
+    user_ids = [getattr(user, 'pk', user) for user in users]
+    if not user_ids:
+        return 0
+
+    deleted = _session_count(
+        Session.objects.filter(user_index__user_id__in=user_ids).delete()
+    )
+    logger.debug(f"🗑️ {deleted} auth sessions deleted for users {user_ids}")
+    return deleted
+
+
+def index_session(session_key, user):
+    """Register a session of ``user``; ignored if the session row does not exist."""
+    if not session_key or not Session.objects.filter(session_key=session_key).exists():
+        return None
+    index, _ = UserSession.objects.update_or_create(session_id=session_key, defaults={'user': user})
+    return index
@@ -1,11 +1,14 @@
 # signals.py
 from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
+from django.contrib.auth.signals import user_logged_in
 from django.utils import timezone
 from core.models import Employee, BulkInvitation
 from django.contrib.auth.models import User
 import uuid
 
+from .sessions import index_session
+
 @receiver(pre_save, sender=Employee)
 def generate_employee_code(sender, instance, **kwargs):
     """
@@ -26,4 +29,12 @@ def activate_new_user(sender, instance, created, **kwargs):
     if not created and not instance.is_active:
         # User just set password for first time (optional logic)
         instance.is_active = True
-        instance.save()
\ No newline at end of file
+        instance.save()
+
+
+@receiver(user_logged_in)
+def index_user_session(sender, request, user, **kwargs):
+    # login() ya rotó la clave de la sesión; se indexa la nueva
+    session = getattr(request, 'session', None)
+    if session is not None:
+        index_session(session.session_key, user)
@@ -1,3 +1,55 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.management.commands.index_user_sessions import index_user_sessions
+from .sessions import delete_user_sessions
+
+
+class DeleteUserSessionsTests(TestCase):
+    """Logging a user out goes through the UserSession index, not a table scan."""
+
+    def add_sessions(self, users, count):
+        encode = SessionStore().encode
+        expire_date = timezone.now() + timedelta(days=1)
+        start = self.created = getattr(self, 'created', 0)
+        self.created += count
+        Session.objects.bulk_create([
+            Session(
+                session_key=f'test{start + i:036d}',
+                session_data=encode({'_auth_user_id': str(users[i % len(users)].id)}),
+                expire_date=expire_date,
+            )
+            for i in range(count)
+        ])
+        index_user_sessions()
+
+    def deleted_with_queries(self, user):
+        with CaptureQueriesContext(connection) as queries:
+            deleted = delete_user_sessions(user)
+        return deleted, len(queries)
+
+    def add_users(self, count):
+        start = User.objects.count()
+        User.objects.bulk_create([User(username=f'user{start + i}') for i in range(count)])
+        return list(User.objects.order_by('-id')[:count])
+
+    def test_query_count_does_not_grow_with_the_session_table(self):
+        # Cinco sesiones por usuario; la tabla pasa de 20 a 2020 filas
+        few = self.add_users(4)
+        self.add_sessions(few, 20)
+        small, small_queries = self.deleted_with_queries(few[0])
+
+        many = self.add_users(400)
+        self.add_sessions(many, 2000)
+        large, large_queries = self.deleted_with_queries(many[0])
 
-# Create your tests here.
+        self.assertEqual((small, large), (5, 5))
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(Session.objects.count(), 20 + 2000 - 10)
@@ -1,7 +1,6 @@
 from django_q.tasks import async_task
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.views.decorators.cache import cache_page
 from allauth.account.views import PasswordChangeView
 from django.contrib.messages.views import SuccessMessageMixin
 from django.contrib.auth.models import User
@@ -32,9 +31,14 @@ from datetime import timedelta
 
 
 from core.models import Employee, BulkInvitation
+from core.utils.cache_layer import get_or_set
+from attendance.models import WorkDay
 from django.utils import timezone
 
-from attendance.views import get_or_create_active_work_day,calculate_daily_totals_manual
+from attendance.views import get_or_create_active_work_day
+
+MOBILE_STATUS_CACHE_TIMEOUT = 60 * 5
+
 
 def test_view(request):
     return render(request,'emails/invitation.html')
@@ -299,46 +303,57 @@ def bulk_employee_invitation(request):
     
 
 
-@cache_page(30)
+def mobile_status_state(employee, today):
+    """(work_day, sesiones) de hoy, sin totales en vivo: se guardan en la caché compartida."""
+    work_day = WorkDay.objects.filter(employee=employee, date=today).last()
+    sessions = list(work_day.sessions.order_by('start_time')) if work_day else []
+    return work_day, sessions
+
+
 @login_required
 def mobile_status_view(request):
     """
     Vista móvil limitada - Solo lectura
     Muestra el estado actual del empleado (break/lunch timer)
+
+    El día y sus sesiones se leen de la caché compartida (se invalida al
+    guardar el WorkDay/ActivitySession del empleado) y los totales se
+    calculan en memoria con la hora actual en cada request.
     """
-    from attendance.models import Employee, WorkDay
-    
     try:
-        employee = Employee.objects.get(user=request.user)
+        employee = Employee.objects.select_related(
+            'user', 'position', 'current_campaign'
+        ).get(user=request.user)
     except Employee.DoesNotExist:
         return render(request, 'attendance/mobile_status.html', {
             'error': 'Employee profile not found'
         })
     
-    # Obtener trabajo activo
-    work_day = WorkDay.objects.filter(
-        employee=employee,
-        date=timezone.now().date()
-    ).last()
-    
-    # Obtener sesión activa
-    current_session = work_day.get_active_session()
+    now = timezone.now()
+    today = now.date()
+    work_day, sessions = get_or_set(
+        f'mobile_status:{employee.id}:{today}',
+        lambda: mobile_status_state(employee, today),
+        MOBILE_STATUS_CACHE_TIMEOUT,
+        depends=[('employee', employee.id)],
+    )
     
-    # Calcular totales
-    calculate_daily_totals_manual(work_day)
-    work_day.refresh_from_db()
+    # Obtener sesión activa y calcular totales (sin guardar)
+    current_session = next((s for s in sessions if s.end_time is None), None)
+    if work_day:
+        work_day.apply_live_totals(sessions, now)
     
     # Preparar contexto
     context = {
         'employee': employee,
         'work_day': work_day,
         'current_session': current_session,
-        'now': timezone.now(),
+        'now': now,
     }
     
     # Si hay sesión activa, calcular tiempo transcurrido y restante
     if current_session:
-        elapsed_time = timezone.now() - current_session.start_time
+        elapsed_time = now - current_session.start_time
         
         # Obtener duración esperada según campaña
         campaign = employee.current_campaign
@@ -348,7 +363,7 @@ def mobile_status_view(request):
             if current_session.session_type == 'break':
                 expected_duration = timedelta(minutes=campaign.break_duraction or 15)
             elif current_session.session_type == 'lunch':
-                expected_duration = timedelta(minutes=campaign.lunch_duration or 60)
+                expected_duration = timedelta(minutes=campaign.lunch or 60)
         
         context['elapsed_time'] = elapsed_time
         context['expected_duration'] = expected_duration
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import WorkDay,ActivitySession, Occurrence
+from .models import WorkDay,ActivitySession, Occurrence, WeeklyHoursSummary, DailyAttendanceFact, WorkDayApprovalBatch
 from attendance.models import Employee
 from django.db.models import Q
 
@@ -37,3 +37,27 @@ class ActivitySessionAdmin(admin.ModelAdmin):
     list_filter = ('session_type',)
 
     
+
+
+@admin.register(WeeklyHoursSummary)
+class WeeklyHoursSummaryAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'iso_year', 'iso_week', 'week_start', 'productive_hours', 'total_work_time')
+    list_filter = ('iso_year', 'iso_week')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(DailyAttendanceFact)
+class DailyAttendanceFactAdmin(admin.ModelAdmin):
+    list_display = ('date', 'campaign', 'department', 'shift', 'employee_is_active',
+                    'workday_count', 'present_count', 'scheduled_count', 'productive_hours')
+    list_filter = ('campaign', 'department', 'employee_is_active')
+    date_hierarchy = 'date'
+    readonly_fields = ('computed_at',)
+
+
+@admin.register(WorkDayApprovalBatch)
+class WorkDayApprovalBatchAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'action', 'scope', 'period', 'campaign', 'supervisor', 'workday_count', 'created_by')
+    list_filter = ('action', 'scope')
+    date_hierarchy = 'created_at'
+    readonly_fields = [field.name for field in WorkDayApprovalBatch._meta.fields]
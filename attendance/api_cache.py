@@ -0,0 +1,155 @@
+# api_cache.py
+"""
+Caché y GET condicional para los formatos summary/stats de la API de análisis.
+
+La herramienta de BI consulta /api/workdays/ y /api/occurrences/ cada pocos
+minutos con los mismos parámetros, y cada llamada corría varios GROUP BY.
+Ahora cada respuesta lleva un ETag y un Last-Modified calculados con:
+
+- Los parámetros normalizados (orden y valores vacíos no importan)
+- La marca de agua de las filas filtradas: cantidad y máximo de
+  ``updated_at`` (WorkDay) o ``created_at`` (Occurrence), en una consulta
+- La versión de las ventanas de fechas consultadas (por mes), que las
+  señales de WorkDay/Occurrence cambian al guardar o borrar; así los
+  borrados y las ediciones sin ``updated_at`` (Occurrence) también cuentan.
+  Son entidades de core/utils/cache_layer.py: ('workday_month', 'YYYY-MM')
+  y ('occurrence_month', 'YYYY-MM'), más 'all' para la tabla completa
+
+Si el cliente manda If-None-Match/If-Modified-Since y nada cambió se
+responde 304; si no, el cuerpo se busca en caché por ETag y solo se calcula
+cuando no está. Una escritura solo cambia la versión de su mes (y la de la
+tabla completa, que usan las consultas sin rango de fechas).
+"""
+import hashlib
+import json
+import time
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from core.utils.cache_layer import entity_versions, shared_cache
+
+
+ANALYTICS_CACHE_TIMEOUT = 60 * 10
+MAX_WINDOW_MONTHS = 24  # rangos más largos usan la versión de la tabla completa
+
+
+# =============================================================================
+# VERSIONES POR VENTANA
+# =============================================================================
+
+ALL_MONTHS = 'all'
+
+
+def window_kind(table):
+    """Tipo de entidad de cache_layer de las ventanas de ``table`` ('workday', 'occurrence')."""
+    return f'{table}_month'
+
+
+def month_of(day):
+    return f'{day.year}-{day.month:02d}'
+
+
+def _months_between(start, end):
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield f'{year}-{month:02d}'
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def window_months(start, end):
+    """['YYYY-MM', ...] de start a end, o None si el rango es abierto o muy largo."""
+    if not start or not end or start > end:
+        return None
+    months = (end.year - start.year) * 12 + end.month - start.month + 1
+    if months > MAX_WINDOW_MONTHS:
+        return None
+    return list(_months_between(start, end))
+
+
+def changed_windows(table, *days):
+    """Entidades a pasar a ``cache_layer.bump`` al escribir filas de esos días."""
+    kind = window_kind(table)
+    return [(kind, ALL_MONTHS)] + [(kind, month_of(day)) for day in {day for day in days if day}]
+
+
+def changed_range(table, start, end):
+    """Como changed_windows, para filas escritas en cualquier día de start a end (todos los meses)."""
+    kind = window_kind(table)
+    return [(kind, ALL_MONTHS)] + [(kind, month) for month in _months_between(start, end)]
+
+
+def window_entities(table, start=None, end=None):
+    """Entidades que cubren la consulta: las de sus meses, o la de la tabla."""
+    kind = window_kind(table)
+    months = window_months(start, end)
+    return [(kind, month) for month in months] if months else [(kind, ALL_MONTHS)]
+
+
+# =============================================================================
+# RESPUESTA CONDICIONAL
+# =============================================================================
+
+def normalized_params(params):
+    """Parámetros como lista ordenada, sin valores vacíos."""
+    return sorted(
+        (key, sorted(value for value in values if value))
+        for key, values in params.lists()
+        if any(values)
+    )
+
+
+def watermark(qs, timestamp_field):
+    """(filas, último cambio) del queryset filtrado, en una consulta."""
+    row = qs.order_by().aggregate(rows=Count('id'), last=Max(timestamp_field))
+    return row['rows'], row['last']
+
+
+def cached_analytics_response(request, table, qs, timestamp_field, build,
+                              start=None, end=None, extra=()):
+    """
+    Response de ``build()`` con ETag/Last-Modified, 304 si no cambió nada y
+    el cuerpo en caché por ETag.
+
+    ``extra`` son valores adicionales que también invalidan (por ejemplo la
+    fecha del último cálculo de DailyAttendanceFact para format=stats).
+    """
+    rows, last_modified = watermark(qs, timestamp_field)
+    versions = entity_versions(window_entities(table, start, end))
+    fingerprint = json.dumps([
+        table,
+        normalized_params(request.query_params),
+        rows,
+        last_modified,
+        versions,
+        list(extra),
+    ], default=str)
+    etag = quote_etag(hashlib.sha1(fingerprint.encode()).hexdigest())
+
+    # Last-Modified: el cambio más reciente entre las filas y las versiones
+    # (un borrado o una edición sin updated_at solo mueve la versión).
+    # Las fechas no tienen zona (USE_TZ=False): se toman en la hora local.
+    changed = [version / 1e9 for version in versions if version]
+    if last_modified:
+        changed.append(time.mktime(last_modified.timetuple()))
+    last_modified_ts = int(max(changed)) if changed else None
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    cache_key = f'analytics_api:body:{etag}'
+    cache = shared_cache()
+    data = cache.get(cache_key)
+    if data is None:
+        data = build()
+        cache.set(cache_key, data, ANALYTICS_CACHE_TIMEOUT)
+
+    response = Response(data)
+    response['ETag'] = etag
+    if last_modified_ts is not None:
+        response['Last-Modified'] = http_date(last_modified_ts)
+    return response
@@ -1,13 +1,20 @@
-from datetime import datetime, timedelta
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime, timedelta
 
-from django.db.models import Count, Sum, Avg, Q
-from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Sum, Avg, F, Q
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework import status
 
+from .api_cache import cached_analytics_response
+from .daily_facts import fact_coverage, facts_computed_at, facts_totals
 from .models import Occurrence, WorkDay
 from .serializers import OccurrenceSerializer, WorkDaySerializer
 
@@ -33,6 +40,119 @@ def td_to_seconds(value):
     return int(value.total_seconds()) if value else 0
 
 
+def employee_name(row):
+    """
+    Employee.full_name desde una fila de values() (full_name es una propiedad, no una columna).
+    """
+    if row['employee__user__first_name'] is None and row['employee__user__last_name'] is None:
+        return "Employee without user"
+    return f"{row['employee__user__first_name']} {row['employee__user__last_name']}".strip()
+
+
+# =====================================================
+# Keyset pagination / NDJSON
+# =====================================================
+
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+NDJSON_CHUNK_SIZE = 2000
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+def parse_page_size(value):
+    """
+    page_size entre 1 y MAX_PAGE_SIZE (PAGE_SIZE si no viene).
+    """
+    if not value:
+        return PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValueError('page_size debe ser un número entero')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(value, pk):
+    """
+    Token opaco con la posición (valor del campo de orden, id) de la última fila.
+    """
+    raw = json.dumps([value.isoformat() if value is not None else None, pk])
+    return urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token, parse):
+    """
+    (valor, id) desde un token de encode_cursor; ``parse`` convierte el valor ISO.
+    """
+    try:
+        value, pk = json.loads(urlsafe_b64decode(token.encode()))
+        return (parse(value) if value is not None else None), int(pk)
+    except (ValueError, TypeError):
+        raise ValueError('cursor inválido')
+
+
+def keyset_page(qs, field, cursor=None, size=PAGE_SIZE):
+    """
+    Una página en orden (field DESC NULLS LAST, id DESC) después de ``cursor``.
+
+    Devuelve (filas, siguiente cursor o None). El filtro usa el índice
+    (field, id): el costo no crece con la página como con OFFSET.
+    """
+    qs = qs.order_by(F(field).desc(nulls_last=True), '-id')
+
+    if cursor:
+        value, pk = cursor
+        if value is None:
+            qs = qs.filter(**{f'{field}__isnull': True, 'id__lt': pk})
+        else:
+            qs = qs.filter(
+                Q(**{f'{field}__lt': value})
+                | Q(**{field: value, 'id__lt': pk})
+                | Q(**{f'{field}__isnull': True})
+            )
+
+    rows = list(qs[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, (getattr(rows[-1], field), rows[-1].pk)
+
+
+def ndjson_response(qs, field, serializer_class, chunk_size=NDJSON_CHUNK_SIZE):
+    """
+    Todas las filas de ``qs`` como NDJSON (una por línea), leídas por páginas
+    keyset: memoria constante y sin un cursor abierto durante toda la descarga.
+    """
+    def rows():
+        cursor = None
+        while True:
+            page, cursor = keyset_page(qs, field, cursor, chunk_size)
+            for item in serializer_class(page, many=True).data:
+                yield json.dumps(item, cls=DjangoJSONEncoder) + '\n'
+            if cursor is None:
+                return
+
+    return StreamingHttpResponse(rows(), content_type=NDJSON_CONTENT_TYPE)
+
+
+def cursor_data(qs, field, serializer_class, params, parse):
+    """
+    Página JSON para ?cursor= / ?page_size=: data y el token ``next`` (sin count()).
+    """
+    size = parse_page_size(params.get('page_size'))
+    cursor = decode_cursor(params['cursor'], parse) if params.get('cursor') else None
+    page, next_cursor = keyset_page(qs, field, cursor, size)
+    return {
+        'page_size': size,
+        'next': encode_cursor(*next_cursor) if next_cursor else None,
+        'data': serializer_class(page, many=True).data,
+    }
+
+
+def is_cursor_request(params):
+    return bool(params.get('cursor') or params.get('page_size'))
+
+
 # =====================================================
 # OCCURRENCES
 # =====================================================
@@ -48,21 +168,33 @@ class OccurrenceDataView(APIView):
     occurrence_type   → technical_issues | call_drop | bathroom | etc
     start_date        → YYYY-MM-DD
     end_date          → YYYY-MM-DD
-    format            → json (default) | summary
+    format            → json (default) | summary | ndjson
+    page_size         → filas por página (máx. 5000); activa la paginación por cursor
+    cursor            → token ``next`` de la página anterior
 
     ─── Ejemplos ───
     /api/occurrences/
     /api/occurrences/?occurrence_type=call_drop
     /api/occurrences/?employee_id=3&start_date=2024-01-01&end_date=2024-12-31
+    /api/occurrences/?page_size=1000
+    /api/occurrences/?format=ndjson
 
 
     ─── Notas ───
     • Todos los tiempos están en SEGUNDOS
+    • summary responde con ETag/Last-Modified (304 si no hubo cambios)
+    • Con cursor y en ndjson el orden es (date, id) descendente
 
     """
 
     permission_classes = [AllowAny]
 
+    ROW_FIELDS = [
+        'id', 'employee', 'occurrence_type', 'date', 'start_time', 'end_time',
+        'duration', 'comment', 'created_at',
+        'employee__user__first_name', 'employee__user__last_name',
+    ]
+
     def get(self, request):
         try:
             qs = Occurrence.objects.select_related('employee')
@@ -73,14 +205,29 @@ class OccurrenceDataView(APIView):
             if otype := request.query_params.get('occurrence_type'):
                 qs = qs.filter(occurrence_type=otype)
 
+            start = end = None
             if sd := request.query_params.get('start_date'):
-                qs = qs.filter(date__gte=parse_date(sd, 'start_date'))
+                start = parse_date(sd, 'start_date')
+                qs = qs.filter(date__gte=start)
 
             if ed := request.query_params.get('end_date'):
-                qs = qs.filter(date__lte=parse_date(ed, 'end_date'))
+                end = parse_date(ed, 'end_date')
+                qs = qs.filter(date__lte=end)
+
+            fmt = request.query_params.get('format', 'json')
+
+            if fmt == 'summary':
+                return cached_analytics_response(
+                    request, 'occurrence', qs, 'created_at', lambda: self.summary(qs), start, end
+                )
+
+            if fmt == 'ndjson':
+                return ndjson_response(self.rows(qs), 'date', OccurrenceSerializer)
 
-            if request.query_params.get('format') == 'summary':
-                return Response(self.summary(qs))
+            if is_cursor_request(request.query_params):
+                return Response(cursor_data(
+                    self.rows(qs), 'date', OccurrenceSerializer, request.query_params, date.fromisoformat
+                ))
 
             return Response(self.json_data(qs))
 
@@ -90,6 +237,12 @@ class OccurrenceDataView(APIView):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def rows(self, qs):
+        """
+        Solo las columnas del serializer, con el usuario del empleado en el mismo JOIN.
+        """
+        return qs.select_related('employee__user').only(*self.ROW_FIELDS)
+
     def json_data(self, qs):
         """
         Retorna datos crudos de ocurrencias.
@@ -97,7 +250,7 @@ class OccurrenceDataView(APIView):
         return {
             'count': qs.count(),
             'data': OccurrenceSerializer(
-                qs.order_by('-date', '-start_time'), many=True
+                self.rows(qs).order_by('-date', '-start_time'), many=True
             ).data
         }
 
@@ -111,14 +264,14 @@ class OccurrenceDataView(APIView):
         )
 
         by_employee = qs.values(
-            'employee_id', 'employee__full_name'
+            'employee_id', 'employee__user__first_name', 'employee__user__last_name'
         ).annotate(
             count=Count('id'),
             duration=Sum('duration')
         ).order_by('-count')[:20]
 
         daily = qs.annotate(
-            day=TruncDate('date')
+            day=F('date')  # ya es DateField (TruncDate falla en SQLite)
         ).values('day').annotate(count=Count('id')).order_by('day')
 
         monthly = qs.annotate(
@@ -140,7 +293,7 @@ class OccurrenceDataView(APIView):
             'by_employee': [
                 {
                     'employee_id': x['employee_id'],
-                    'employee': x['employee__full_name'],
+                    'employee': employee_name(x),
                     'count': x['count'],
                     'duration_seconds': td_to_seconds(x['duration']),
                 } for x in by_employee
@@ -171,21 +324,33 @@ class WorkDayDataView(APIView):
     start_date     → YYYY-MM-DD
     end_date       → YYYY-MM-DD
     has_check_out  → true | false
-    format         → json (default) | summary | stats
+    format         → json (default) | summary | stats | ndjson
+    page_size      → filas por página (máx. 5000); activa la paginación por cursor
+    cursor         → token ``next`` de la página anterior
 
     ─── Ejemplos ───
     /api/workdays/
     /api/workdays/?employee_id=8
     /api/workdays/?has_check_out=false
     /api/workdays/?format=stats
+    /api/workdays/?page_size=1000&start_date=2024-01-01
+    /api/workdays/?format=ndjson
 
     ─── Notas ───
     • Todos los tiempos están en SEGUNDOS
+    • Con cursor y en ndjson el orden es (check_in, id) descendente, sin entrada al final
+    • summary y stats responden con ETag/Last-Modified (304 si no hubo cambios)
 
     """
 
     permission_classes = [AllowAny]
 
+    ROW_FIELDS = [
+        'id', 'employee', 'check_in', 'check_out',
+        'total_work_time', 'total_break_time', 'total_lunch_time',
+        'employee__user__first_name', 'employee__user__last_name',
+    ]
+
     def get(self, request):
         try:
             qs = WorkDay.objects.select_related('employee')
@@ -193,11 +358,14 @@ class WorkDayDataView(APIView):
             if eid := request.query_params.get('employee_id'):
                 qs = qs.filter(employee_id=eid)
 
+            start = end = None
             if sd := request.query_params.get('start_date'):
-                qs = qs.filter(check_in__date__gte=parse_date(sd, 'start_date'))
+                start = parse_date(sd, 'start_date')
+                qs = qs.filter(check_in__date__gte=start)
 
             if ed := request.query_params.get('end_date'):
-                qs = qs.filter(check_in__date__lte=parse_date(ed, 'end_date'))
+                end = parse_date(ed, 'end_date')
+                qs = qs.filter(check_in__date__lte=end)
 
             if hc := request.query_params.get('has_check_out'):
                 qs = qs.filter(check_out__isnull=hc.lower() == 'false')
@@ -205,10 +373,28 @@ class WorkDayDataView(APIView):
             fmt = request.query_params.get('format', 'json')
 
             if fmt == 'summary':
-                return Response(self.summary(qs))
+                return cached_analytics_response(
+                    request, 'workday', qs, 'updated_at', lambda: self.summary(qs), start, end
+                )
 
             if fmt == 'stats':
-                return Response(self.stats(qs))
+                # Sin filtro por empleado ni por salida, la historia sale de DailyAttendanceFact
+                if not request.query_params.get('employee_id') and not request.query_params.get('has_check_out'):
+                    return cached_analytics_response(
+                        request, 'workday', qs, 'updated_at', lambda: self.stats_from_facts(qs, start, end),
+                        start, end, extra=[facts_computed_at()],
+                    )
+                return cached_analytics_response(
+                    request, 'workday', qs, 'updated_at', lambda: self.stats(qs), start, end
+                )
+
+            if fmt == 'ndjson':
+                return ndjson_response(self.rows(qs), 'check_in', WorkDaySerializer)
+
+            if is_cursor_request(request.query_params):
+                return Response(cursor_data(
+                    self.rows(qs), 'check_in', WorkDaySerializer, request.query_params, datetime.fromisoformat
+                ))
 
             return Response(self.json_data(qs))
 
@@ -218,6 +404,12 @@ class WorkDayDataView(APIView):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def rows(self, qs):
+        """
+        Solo las columnas del serializer, con el usuario del empleado en el mismo JOIN.
+        """
+        return qs.select_related('employee__user').only(*self.ROW_FIELDS)
+
     def json_data(self, qs):
         """
         Retorna jornadas individuales.
@@ -225,7 +417,7 @@ class WorkDayDataView(APIView):
         return {
             'count': qs.count(),
             'data': WorkDaySerializer(
-                qs.order_by('-check_in'), many=True
+                self.rows(qs).order_by('-check_in'), many=True
             ).data
         }
 
@@ -234,7 +426,7 @@ class WorkDayDataView(APIView):
         Resumen agregado por empleado y tiempo.
         """
         by_employee = qs.values(
-            'employee_id', 'employee__full_name'
+            'employee_id', 'employee__user__first_name', 'employee__user__last_name'
         ).annotate(
             total_days=Count('id'),
             work=Sum('total_work_time'),
@@ -250,7 +442,7 @@ class WorkDayDataView(APIView):
             'by_employee': [
                 {
                     'employee_id': x['employee_id'],
-                    'employee': x['employee__full_name'],
+                    'employee': employee_name(x),
                     'total_days': x['total_days'],
                     'work_seconds': td_to_seconds(x['work']),
                     'break_seconds': td_to_seconds(x['breaks']),
@@ -286,3 +478,56 @@ class WorkDayDataView(APIView):
             'incomplete_days': qs.filter(check_out__isnull=True).count(),
             'total_unique_employees': qs.values('employee_id').distinct().count()
         }
+
+    def stats_from_facts(self, qs, start=None, end=None):
+        """
+        Mismas estadísticas que stats(), pero los días pasados ya calculados
+        se leen de DailyAttendanceFact y solo el resto (hoy y lo que falte
+        por calcular) se agrega desde WorkDay. Para la parte histórica las
+        fechas se comparan con WorkDay.date.
+        """
+        first, last = fact_coverage()
+        if not first:
+            return self.stats(qs)
+
+        yesterday = timezone.now().date() - timedelta(days=1)
+        history_start = max(first, start) if start else first
+        history_end = min(last, yesterday, end) if end else min(last, yesterday)
+        if history_start > history_end:
+            return self.stats(qs)
+
+        history = facts_totals(history_start, history_end)
+        complete = Q(check_out__isnull=False)
+        live = qs.exclude(date__range=(history_start, history_end)).aggregate(
+            total_days=Count('id', filter=complete),
+            total_work=Sum('total_work_time', filter=complete),
+            total_break=Sum('total_break_time', filter=complete),
+            total_lunch=Sum('total_lunch_time', filter=complete),
+            incomplete=Count('id', filter=Q(check_out__isnull=True)),
+        )
+
+        total_days = (history['completed'] or 0) + live['total_days']
+        total_work = (history['work'] or timedelta(0)) + (live['total_work'] or timedelta(0))
+        total_break = (history['breaks'] or timedelta(0)) + (live['total_break'] or timedelta(0))
+        total_lunch = (history['lunch'] or timedelta(0)) + (live['total_lunch'] or timedelta(0))
+
+        # Con filtro de fechas (check_in__date) las jornadas sin entrada no cuentan
+        if start or end:
+            history_incomplete = history['open'] or 0
+        else:
+            history_incomplete = (history['workdays'] or 0) - (history['completed'] or 0)
+
+        def average(total):
+            return total / total_days if total_days else None
+
+        return {
+            'general': {
+                'total_days': total_days,
+                'total_work_seconds': td_to_seconds(total_work),
+                'avg_work_seconds': td_to_seconds(average(total_work)),
+                'avg_break_seconds': td_to_seconds(average(total_break)),
+                'avg_lunch_seconds': td_to_seconds(average(total_lunch)),
+            },
+            'incomplete_days': history_incomplete + live['incomplete'],
+            'total_unique_employees': qs.values('employee_id').distinct().count()
+        }
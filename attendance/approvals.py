@@ -0,0 +1,99 @@
+# approvals.py
+"""
+Aprobación de WorkDay para nómina por lotes.
+
+``approve_all_workdays`` llamaba ``WorkDay.approve()`` por cada día, y cada
+save() volvía a calcular el pago (calculate_pay_with_dominican_law), la
+consulta de horas de la semana y las horas nocturnas: unos 15.000 saves
+para un período quincenal de 1.500 agentes. Aprobar no cambia el pago (se
+calcula al cerrar el día y en la conciliación), así que aquí un período, una
+campaña o el equipo de un supervisor se aprueba con:
+
+1. Un INSERT del lote de auditoría (WorkDayApprovalBatch)
+2. Un UPDATE de los WorkDay del alcance (is_approved, approved_by,
+   approved_at y approval_batch)
+3. Una lectura de los días afectados para guardarlos en el lote
+
+El UPDATE no pasa por las señales: se cambian aquí las versiones de
+cache_layer de esos días, sus empleados y campañas, las revisiones de los
+períodos que tocan las fechas y todos los meses de la API de análisis entre
+la primera y la última fecha.
+"""
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from core.utils.cache_layer import bump
+from core.utils.payroll_review import review_entities
+from .api_cache import changed_range
+from .models import WorkDay, WorkDayApprovalBatch
+
+
+def period_workdays(period, campaign=None, supervisor=None):
+    """WorkDay de empleados activos en el período, opcionalmente de una campaña o un equipo."""
+    workdays = WorkDay.objects.filter(
+        date__range=[period.start_date, period.end_date],
+        employee__is_active=True,
+    )
+    if campaign is not None:
+        workdays = workdays.filter(employee__current_campaign=campaign)
+    if supervisor is not None:
+        workdays = workdays.filter(employee__supervisor=supervisor)
+    return workdays
+
+
+def _apply(workdays, action, user, scope, period=None, campaign=None, supervisor=None, now=None):
+    now = now or timezone.now()
+    approve = action == 'approve'
+
+    with transaction.atomic():
+        batch = WorkDayApprovalBatch.objects.create(
+            action=action,
+            scope=scope,
+            period=period,
+            campaign=campaign,
+            supervisor=supervisor,
+            created_by=user,
+        )
+        updated = workdays.filter(is_approved=not approve).update(
+            is_approved=approve,
+            approved_by=user if approve else None,
+            approved_at=now if approve else None,
+            approval_batch=batch,
+            updated_at=now,
+        )
+        if not updated:
+            batch.delete()
+            return None
+
+        changed = WorkDay.objects.filter(approval_batch=batch)
+        rows = list(changed.order_by('id').values_list('id', 'employee_id', 'employee__current_campaign_id'))
+        batch.workday_ids = [workday_id for workday_id, _, _ in rows]
+        dates = changed.aggregate(first=Min('date'), last=Max('date'))
+        batch.workday_count = len(batch.workday_ids)
+        batch.date_from, batch.date_to = dates['first'], dates['last']
+        batch.save(update_fields=['workday_ids', 'workday_count', 'date_from', 'date_to'])
+
+        # Lo mismo que las señales de WorkDay por cada día; se escribe al hacer commit
+        bump(
+            *(('workday', workday_id) for workday_id in batch.workday_ids),
+            *(('employee', employee_id) for employee_id in {employee_id for _, employee_id, _ in rows}),
+            *(('campaign', campaign_id) for campaign_id in {campaign_id for _, _, campaign_id in rows}),
+            *review_entities(batch.date_from, batch.date_to),
+            *changed_range('workday', batch.date_from, batch.date_to),
+        )
+    return batch
+
+
+def approve_workdays(workdays, user, scope='period', period=None, campaign=None, supervisor=None, now=None):
+    """
+    Aprobar los días pendientes de ``workdays`` (queryset) en un UPDATE.
+
+    Devuelve el WorkDayApprovalBatch, o None si no había nada que aprobar.
+    """
+    return _apply(workdays, 'approve', user, scope, period, campaign, supervisor, now)
+
+
+def unapprove_workdays(workdays, user, scope='period', period=None, campaign=None, supervisor=None, now=None):
+    """Quitar la aprobación de ``workdays`` en un UPDATE (mismo lote de auditoría)."""
+    return _apply(workdays, 'unapprove', user, scope, period, campaign, supervisor, now)
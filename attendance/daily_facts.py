@@ -0,0 +1,231 @@
+# daily_facts.py
+"""
+Hechos diarios de asistencia (DailyAttendanceFact) y su lectura.
+
+Cálculo: por bloques de un mes, con tres consultas por bloque (WorkDay,
+días programados del índice ScheduledDay y los empleados involucrados). Cada
+empleado cae en una celda campaña × departamento × turno × activo por día;
+el turno es el de su horario vigente más reciente ese día.
+
+Lectura: los días pasados cubiertos por la tabla se leen de ella y el resto
+de la ventana (hoy, y lo que todavía no se haya calculado) se calcula en
+vivo, así que el costo de una tendencia larga no crece con los datos.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from core.models import Employee
+from workforce.models import EmployeeSchedule, ScheduledDay
+from .models import DailyAttendanceFact, WorkDay
+
+
+FACT_CHUNK_DAYS = 31
+FACT_BATCH_SIZE = 1000
+
+
+# =============================================================================
+# CÁLCULO
+# =============================================================================
+
+def _empty_fact(day, campaign_id, department_id, shift_id, is_active):
+    return DailyAttendanceFact(
+        date=day,
+        campaign_id=campaign_id,
+        department_id=department_id,
+        shift_id=shift_id,
+        employee_is_active=is_active,
+        productive_hours=Decimal('0'),
+        completed_work_time=timedelta(0),
+        completed_break_time=timedelta(0),
+        completed_lunch_time=timedelta(0),
+    )
+
+
+def _build_chunk(start, end):
+    """Hechos de [start, end] sin guardarlos."""
+    # Días programados del bloque (índice ScheduledDay), el horario más reciente primero
+    scheduled_days = ScheduledDay.objects.filter(date__range=(start, end)).order_by(
+        'date', 'employee_id', '-schedule__start_date'
+    ).values_list('date', 'employee_id', 'shift_id')
+
+    scheduled = defaultdict(int)  # (día, empleado) -> horarios
+    shift_of = {}  # (día, empleado) -> turno del primer horario
+    for day, employee_id, shift_id in scheduled_days:
+        scheduled[(day, employee_id)] += 1
+        shift_of.setdefault((day, employee_id), shift_id)
+
+    workdays = list(WorkDay.objects.filter(date__range=(start, end)).values_list(
+        'employee_id', 'date', 'check_in', 'check_out', 'productive_hours',
+        'total_work_time', 'total_break_time', 'total_lunch_time',
+    ))
+
+    employee_ids = {employee_id for _, employee_id in scheduled} | {row[0] for row in workdays}
+    employees = {
+        employee_id: (campaign_id, department_id, is_active)
+        for employee_id, campaign_id, department_id, is_active in Employee.objects.filter(
+            id__in=employee_ids
+        ).values_list('id', 'current_campaign_id', 'department_id', 'is_active')
+    }
+
+    facts = {}
+
+    def fact_for(day, employee_id):
+        key = (day, *employees[employee_id][:2], shift_of.get((day, employee_id)), employees[employee_id][2])
+        if key not in facts:
+            facts[key] = _empty_fact(*key)
+        return facts[key]
+
+    for employee_id, day, check_in, check_out, hours, work, breaks, lunch in workdays:
+        fact = fact_for(day, employee_id)
+        fact.workday_count += 1
+        fact.productive_hours += hours or 0
+        if check_in is not None:
+            fact.present_count += 1
+        if check_out is not None:
+            fact.completed_count += 1
+            fact.completed_work_time += work or timedelta(0)
+            fact.completed_break_time += breaks or timedelta(0)
+            fact.completed_lunch_time += lunch or timedelta(0)
+        elif check_in is not None:
+            fact.open_count += 1
+
+    for (day, employee_id), count in scheduled.items():
+        fact = fact_for(day, employee_id)
+        fact.scheduled_count += count
+        fact.scheduled_employees += 1
+
+    return list(facts.values())
+
+
+def compute_daily_facts(start, end):
+    """Recalcular (borrar e insertar) los hechos de [start, end]. Devuelve las filas creadas."""
+    created = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=FACT_CHUNK_DAYS - 1), end)
+        facts = _build_chunk(chunk_start, chunk_end)
+        with transaction.atomic():
+            DailyAttendanceFact.objects.filter(date__range=(chunk_start, chunk_end)).delete()
+            DailyAttendanceFact.objects.bulk_create(facts, batch_size=FACT_BATCH_SIZE)
+        created += len(facts)
+        chunk_start = chunk_end + timedelta(days=1)
+    return created
+
+
+def compute_facts_for_dates(dates):
+    """Recalcular fechas sueltas, agrupando las consecutivas en un solo rango."""
+    created = 0
+    dates = sorted(set(dates))
+    while dates:
+        start = end = dates.pop(0)
+        while dates and dates[0] == end + timedelta(days=1):
+            end = dates.pop(0)
+        created += compute_daily_facts(start, end)
+    return created
+
+
+def fact_coverage():
+    """(primera, última) fecha con hechos, o (None, None)."""
+    coverage = DailyAttendanceFact.objects.aggregate(first=Min('date'), last=Max('date'))
+    return coverage['first'], coverage['last']
+
+
+def facts_computed_at():
+    """Último cálculo de la tabla (invalida las respuestas cacheadas que la leen)."""
+    return DailyAttendanceFact.objects.aggregate(last=Max('computed_at'))['last']
+
+
+def changed_dates(since, before):
+    """
+    Fechas ya calculadas, anteriores a ``before``, cuyos datos cambiaron desde ``since``.
+
+    WorkDay modificados (updated_at) y los días de los horarios modificados.
+    Las fechas anteriores a la tabla no se agregan: se siguen calculando en
+    vivo hasta que se amplíe el backfill (si no, quedaría un hueco leído
+    como cero).
+    """
+    first, _ = fact_coverage()
+    if not first:
+        return set()
+    last = before - timedelta(days=1)
+
+    dates = set(WorkDay.objects.filter(
+        updated_at__gte=since,
+        date__range=(first, last),
+    ).values_list('date', flat=True).distinct())
+
+    schedules = EmployeeSchedule.objects.filter(
+        updated_at__gte=since,
+        start_date__lte=last,
+    ).values_list('start_date', 'end_date')
+    for schedule_start, schedule_end in schedules:
+        day = max(schedule_start, first)
+        while day <= min(schedule_end or last, last):
+            dates.add(day)
+            day += timedelta(days=1)
+
+    return dates
+
+
+# =============================================================================
+# LECTURA
+# =============================================================================
+
+def split_window(dates, today=None):
+    """
+    Separar ``dates`` en (días leídos de la tabla, días a calcular en vivo).
+
+    Se leen de la tabla los días anteriores a hoy dentro del rango calculado.
+    """
+    today = today or timezone.now().date()
+    first, last = fact_coverage()
+    if not first:
+        return [], list(dates)
+    stored = [day for day in dates if first <= day <= last and day < today]
+    live = [day for day in dates if not (first <= day <= last and day < today)]
+    return stored, live
+
+
+def facts_by_date(dates, campaign=None, active_only=False):
+    """
+    {date: totales del día} sumando las celdas de la tabla (una consulta).
+
+    ``dates`` es un rango continuo (ver split_window).
+    """
+    if not dates:
+        return {}
+    facts = DailyAttendanceFact.objects.filter(date__range=(dates[0], dates[-1]))
+    if campaign is not None:
+        facts = facts.filter(campaign=campaign)
+    if active_only:
+        facts = facts.filter(employee_is_active=True)
+
+    rows = facts.values('date').annotate(
+        workdays=Sum('workday_count'),
+        present=Sum('present_count'),
+        scheduled=Sum('scheduled_count'),
+        scheduled_employees=Sum('scheduled_employees'),
+    ).order_by()
+    return {row['date']: row for row in rows}
+
+
+def facts_totals(start=None, end=None):
+    """Totales de la tabla entre dos fechas (para /api/workdays/?format=stats)."""
+    facts = DailyAttendanceFact.objects.all()
+    if start:
+        facts = facts.filter(date__gte=start)
+    if end:
+        facts = facts.filter(date__lte=end)
+    return facts.aggregate(
+        workdays=Sum('workday_count'),
+        completed=Sum('completed_count'),
+        open=Sum('open_count'),
+        work=Sum('completed_work_time'),
+        breaks=Sum('completed_break_time'),
+        lunch=Sum('completed_lunch_time'),
+    )
@@ -0,0 +1,313 @@
+# excel_exports.py
+"""
+Reportes de asistencia en Excel con openpyxl en modo write-only.
+
+Antes cada export armaba el workbook completo en memoria, hacía
+``sessions.filter(...)`` tres veces por fila (ignorando el prefetch),
+recorría todas las celdas para ajustar el ancho y el reporte de equipo
+pasaba por un archivo temporal. Aquí:
+
+- Los WorkDay se leen por bloques (``iterator(chunk_size=...)``) con sus
+  sesiones precargadas y ordenadas: 2 consultas por bloque, nunca por fila
+- Las filas se escriben en una hoja write-only (openpyxl las vuelca a disco
+  a medida que se agregan)
+- Los anchos de columna son fijos
+- El archivo final queda en un SpooledTemporaryFile: en memoria si es
+  pequeño, en disco si crece, y se devuelve con FileResponse (streaming)
+  o como bytes para adjuntarlo a un email
+"""
+from datetime import timedelta
+from tempfile import SpooledTemporaryFile
+
+from django.db.models import Prefetch
+from django.http import FileResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font
+from openpyxl.utils import get_column_letter
+
+from .models import ActivitySession
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+EXPORT_CHUNK_SIZE = 1000
+SPOOL_MAX_SIZE = 10 * 1024 * 1024  # 10 MB en memoria antes de pasar a disco
+
+BOLD = Font(bold=True)
+TITLE = Font(bold=True, size=14)
+CENTER = Alignment(horizontal="center", vertical="center")
+
+
+# =============================================================================
+# PIPELINE
+# =============================================================================
+
+def iter_work_days(work_days, chunk_size=EXPORT_CHUNK_SIZE):
+    """WorkDay por bloques con las sesiones precargadas en orden de inicio."""
+    sessions = Prefetch('sessions', queryset=ActivitySession.objects.order_by('start_time'))
+    return work_days.prefetch_related(sessions).iterator(chunk_size=chunk_size)
+
+
+def sessions_by_type(work_day):
+    """{session_type: [sesiones]} desde las sesiones precargadas (sin consultas)."""
+    grouped = {'work': [], 'break': [], 'lunch': []}
+    for session in work_day.sessions.all():
+        grouped.setdefault(session.session_type, []).append(session)
+    return grouped
+
+
+def styled(ws, value, font=None, alignment=None, number_format=None):
+    """Celda con estilo para una hoja write-only."""
+    cell = WriteOnlyCell(ws, value=value)
+    if font:
+        cell.font = font
+    if alignment:
+        cell.alignment = alignment
+    if number_format:
+        cell.number_format = number_format
+    return cell
+
+
+def start_sheet(title, headers, widths, heading=()):
+    """
+    Workbook write-only con una hoja lista para recibir filas.
+
+    ``heading`` son las líneas de título, (texto, fuente) combinadas a lo
+    ancho de los encabezados, o None para una fila en blanco. Después va la
+    fila de encabezados en negrita.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+
+    for col_num, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = width
+
+    last_column = get_column_letter(len(headers))
+    for row_num, line in enumerate(heading, 1):
+        if line is None:
+            ws.append([])
+            continue
+        text, font = line
+        ws.append([styled(ws, text, font=font, alignment=CENTER)])
+        ws.merged_cells.add(f"A{row_num}:{last_column}{row_num}")
+
+    ws.append([styled(ws, header, font=BOLD, alignment=CENTER) for header in headers])
+    return wb, ws
+
+
+def workbook_file(wb):
+    """Guardar el workbook en un archivo temporal y dejarlo al inicio."""
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def workbook_bytes(wb):
+    """Contenido del .xlsx, para adjuntarlo a un email."""
+    with workbook_file(wb) as output:
+        return output.read()
+
+
+def xlsx_response(wb, filename):
+    """Descarga del workbook como respuesta en streaming."""
+    return FileResponse(
+        workbook_file(wb),
+        as_attachment=True,
+        filename=filename,
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+# =============================================================================
+# REPORTES
+# =============================================================================
+
+TEAM_REPORT_HEADERS = [
+    "Agent Name", "Date", "Attendance Status", "Week",
+    "Time In",
+    "Break 1-start", "Break 1-end", "Break1 Duration",
+    "Break 2-start", "Break 2-end", "Break2 Duration",
+    "Lunch start", "Lunch end", "Lunch Duration",
+    "Time Out",
+    "Total Hours",
+    "Notes",
+]
+TEAM_REPORT_WIDTHS = [28, 12, 19, 7, 9, 14, 13, 16, 14, 13, 16, 13, 11, 16, 10, 13, 40]
+
+
+def _hh_mm(t):
+    return t.strftime("%H:%M") if t else "-"
+
+
+def _mm_ss(session):
+    if not session or not session.start_time or not session.end_time:
+        return "-"
+    delta = session.end_time - session.start_time
+    minutes = delta.total_seconds() // 60
+    seconds = int(delta.total_seconds() % 60)
+    return f"{int(minutes):02d}:{seconds:02d}"
+
+
+def _hours(td):
+    if td is None:
+        return "0.00"
+    return f"{td.total_seconds() / 3600:.2f}"
+
+
+def team_report_workbook(supervisor, work_days):
+    """
+    Reporte de equipo: una fila por WorkDay con entrada, breaks, almuerzo y salida.
+
+    ``work_days`` es un queryset (sin prefetch; se hace aquí por bloques).
+    """
+    wb, ws = start_sheet(
+        "Team Report",
+        TEAM_REPORT_HEADERS,
+        TEAM_REPORT_WIDTHS,
+        heading=[
+            (f"Team Report - Supervisor: {supervisor.user.get_full_name()}", TITLE),
+            (f"Generated: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}", None),
+            None,
+        ],
+    )
+
+    for wd in iter_work_days(work_days.select_related("employee__user")):
+        sessions = sessions_by_type(wd)
+        work_sessions = sessions['work']
+        break_sessions = sessions['break']
+
+        time_in = work_sessions[0].start_time if work_sessions else None
+        time_out = work_sessions[-1].end_time if work_sessions else None
+        break1 = break_sessions[0] if len(break_sessions) >= 1 else None
+        break2 = break_sessions[1] if len(break_sessions) >= 2 else None
+        lunch = sessions['lunch'][0] if sessions['lunch'] else None
+
+        ws.append([
+            wd.employee.user.get_full_name(),
+            wd.date.strftime("%m/%d/%Y"),
+            wd.get_day_status(),
+            wd.date.isocalendar()[1],
+            _hh_mm(time_in),
+            _hh_mm(break1.start_time if break1 else None),
+            _hh_mm(break1.end_time if break1 else None),
+            _mm_ss(break1),
+            _hh_mm(break2.start_time if break2 else None),
+            _hh_mm(break2.end_time if break2 else None),
+            _mm_ss(break2),
+            _hh_mm(lunch.start_time if lunch else None),
+            _hh_mm(lunch.end_time if lunch else None),
+            _mm_ss(lunch),
+            _hh_mm(time_out),
+            _hours(wd.total_work_time),
+            wd.notes or "",
+        ])
+
+    return wb
+
+
+EMPLOYEE_REPORT_HEADERS = [
+    "Date", "Day", "Status", "Check In", "Check Out", "Total Work Time",
+    "Break1 Start", "Break1 End", "Break1 Duration",
+    "Break2 Start", "Break2 End", "Break2 Duration",
+    "Lunch Start", "Lunch End", "Lunch Duration",
+    "Work Sessions Count"
+]
+EMPLOYEE_REPORT_WIDTHS = [12, 11, 12, 10, 18, 17, 13, 12, 16, 13, 12, 16, 12, 11, 15, 20]
+
+
+def _am_pm(t):
+    return t.strftime("%I:%M %p") if t else "—"
+
+
+def _duration(session):
+    delta = session.end_time - session.start_time if session.start_time and session.end_time else None
+    return str(delta) if delta else "—"
+
+
+def employee_attendance_workbook(employee, work_days, date_from, date_to):
+    """Registros de un empleado con detalle de breaks y almuerzo, y total al final."""
+    wb, ws = start_sheet(
+        "Attendance Report",
+        EMPLOYEE_REPORT_HEADERS,
+        EMPLOYEE_REPORT_WIDTHS,
+        heading=[
+            (f"Attendance Report for {employee.user.get_full_name()}", TITLE),
+            (f"Date range: {date_from} to {date_to}", None),
+            (f"Generated at: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}", None),
+            None,
+        ],
+    )
+
+    total_seconds = 0
+    for wd in iter_work_days(work_days):
+        total_time = wd.total_work_time or timedelta()
+        total_seconds += total_time.total_seconds()
+
+        sessions = sessions_by_type(wd)
+        breaks = sessions['break'][:2]
+        lunch = sessions['lunch'][:1]
+
+        ws.append([
+            wd.date.strftime("%Y-%m-%d"),
+            wd.date.strftime("%A"),
+            wd.get_status_display(),
+            _am_pm(wd.check_in),
+            _am_pm(wd.check_out),
+            # Fracción de día con formato h:mm (numérico, no string)
+            styled(ws, total_time.total_seconds() / 86400, number_format="[h]:mm"),
+            _am_pm(breaks[0].start_time) if len(breaks) > 0 else "—",
+            _am_pm(breaks[0].end_time) if len(breaks) > 0 else "—",
+            _duration(breaks[0]) if len(breaks) > 0 else "—",
+            _am_pm(breaks[1].start_time) if len(breaks) > 1 else "—",
+            _am_pm(breaks[1].end_time) if len(breaks) > 1 else "—",
+            _duration(breaks[1]) if len(breaks) > 1 else "—",
+            _am_pm(lunch[0].start_time) if lunch else "—",
+            _am_pm(lunch[0].end_time) if lunch else "—",
+            _duration(lunch[0]) if lunch else "—",
+            len(sessions['work']),
+        ])
+
+    # --- Fila resumen ---
+    ws.append([])
+    ws.append([
+        "", "", "", "",
+        styled(ws, "TOTAL WORK TIME:", font=BOLD),
+        styled(ws, total_seconds / 86400, font=BOLD, number_format="[h]:mm"),
+    ])
+
+    return wb
+
+
+HISTORY_HEADERS = ['Date', 'Work Time', 'Break Time', 'Lunch Time', 'Total Sessions']
+
+
+def _h_m(duration):
+    """Formato: "8h 30m" (igual que format_duration_hours de las vistas)."""
+    if not duration:
+        return "0h 0m"
+    total_seconds = int(duration.total_seconds())
+    return f"{total_seconds // 3600}h {(total_seconds % 3600) // 60}m"
+
+
+def attendance_history_workbook(employee, work_days):
+    """Historial de asistencia del propio empleado."""
+    wb, ws = start_sheet(
+        "Attendance History",
+        HISTORY_HEADERS,
+        [18] * len(HISTORY_HEADERS),
+        heading=[(f"Attendance History - {employee.user.username}", TITLE)],
+    )
+
+    for work_day in iter_work_days(work_days):
+        ws.append([
+            work_day.date.strftime("%Y-%m-%d"),
+            _h_m(work_day.total_work_time),
+            _h_m(work_day.total_break_time),
+            _h_m(work_day.total_lunch_time),
+            len(work_day.sessions.all()),
+        ])
+
+    return wb
@@ -0,0 +1,236 @@
+# live_status.py
+"""
+Estado en vivo de los agentes para los tableros de supervisor y campaña.
+
+Antes cada tablero volvía a pedir la página completa (cada 30 segundos en
+campaign_detail) y se renderizaban todas las filas por cada espectador. Ahora
+cada cambio de estado publica un evento pequeño y los tableros lo reciben por
+Server-Sent Events (``live_status_stream``) y actualizan solo esa fila:
+
+    {"employee": 7, "campaign": 2, "supervisor": 3, "logged_in": true,
+     "session_type": "break", "start_time": "2026-10-18T10:02:00"}
+
+``session_type`` es None cuando el agente no tiene sesión abierta. El estado
+sale del registro de presencia (attendance/presence.py).
+
+Los eventos viven en la caché compartida (L2, ver core/utils/cache_layer.py)
+con un número de secuencia, así cualquier proceso publica y cualquier
+proceso los sirve, y un navegador que se reconecta (Last-Event-ID) recibe lo
+que se perdió.
+
+Cada conexión abierta ocupa un hilo del worker de gunicorn (gthread, ver
+Procfile) mientras dura. Por eso cada proceso sirve a lo más LIVE_MAX_STREAMS
+conexiones largas; las que llegan con el cupo lleno reciben lo pendiente en
+una sola lectura y EventSource vuelve en LIVE_POLL_RETRY_MS (sondeo corto).
+
+Se publica al guardar/borrar una ActivitySession (entrar,
+break, lunch, terminar el día, ediciones del supervisor) y en los cierres
+masivos (auto-logout, force logout), y también cuando la conciliación del
+registro de presencia corrige una entrada. Un evento solo se publica si el
+estado del agente cambió.
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.utils.cache_layer import shared_cache
+from .presence import OFFLINE, refresh_presence
+
+
+LIVE_EVENT_TIMEOUT = 60 * 10     # un navegador desconectado más tiempo recarga la tabla
+LIVE_STREAM_SECONDS = 25         # cada conexión se cierra antes del timeout del worker
+# Segundos entre lecturas de la secuencia; con la caché en la BD cada lectura es una consulta
+LIVE_POLL_INTERVAL = 1 if settings.REDIS_PUBLIC_URL else 3
+LIVE_KEEPALIVE_SECONDS = 15
+LIVE_RETRY_MS = 2000             # reconexión de EventSource
+LIVE_MAX_STREAMS = 8             # conexiones largas por proceso (la mitad de --threads)
+LIVE_POLL_RETRY_MS = 5000        # reconexión de las que llegan con el cupo lleno
+MAX_EVENTS_PER_READ = 500
+GAP_GRACE_POLLS = 2              # lecturas que se espera a un evento que otro proceso aún escribe
+
+
+def seq_key():
+    return 'live_status:seq'
+
+
+def event_key(seq):
+    return f'live_status:event:{seq}'
+
+
+# =============================================================================
+# PUBLICAR
+# =============================================================================
+
+def current_seq():
+    """Última secuencia publicada (0 si no hay ninguna)."""
+    return shared_cache().get(seq_key()) or 0
+
+
+def _next_seq(cache):
+    cache.add(seq_key(), 0, timeout=None)
+    try:
+        return cache.incr(seq_key())
+    except ValueError:  # desalojada entre add e incr
+        cache.add(seq_key(), 0, timeout=None)
+        return cache.incr(seq_key())
+
+
+def presence_event(entry):
+    """Evento de los tableros a partir de una entrada del registro de presencia."""
+    return {
+        'employee': entry.employee,
+        'campaign': entry.campaign,
+        'supervisor': entry.supervisor,
+        'session_type': None if entry.state == OFFLINE else entry.state,
+        'start_time': entry.start_time.isoformat() if entry.start_time else None,
+        'logged_in': entry.logged_in,
+    }
+
+
+def publish_events(entries):
+    """Agregar un evento por entrada de presencia. Devuelve los eventos publicados."""
+    cache = shared_cache()
+    published = 0
+    for entry in entries:
+        # add no pisa un evento ya escrito: si otro proceso tomó la misma
+        # secuencia (incr no es atómico en la caché de BD) se toma la siguiente
+        while not cache.add(event_key(_next_seq(cache)), presence_event(entry), LIVE_EVENT_TIMEOUT):
+            pass
+        published += 1
+    return published
+
+
+def publish_status(employee_ids):
+    """Refrescar la presencia de los empleados y publicar los que cambiaron."""
+    return publish_events(refresh_presence(employee_ids).values())
+
+
+def publish_status_on_commit(employee_ids):
+    """publish_status cuando termine la transacción actual (o ya, si no hay)."""
+    employee_ids = list(employee_ids)
+    transaction.on_commit(lambda: publish_status(employee_ids))
+
+
+# =============================================================================
+# LEER
+# =============================================================================
+
+def read_events(after, gap_polls=0):
+    """
+    (eventos [(seq, evento)], última secuencia leída, reiniciar, gap_polls).
+
+    Los eventos se entregan en orden y sin huecos: si falta uno (otro proceso
+    tomó la secuencia pero todavía no lo escribió) se espera GAP_GRACE_POLLS
+    lecturas; si sigue faltando, o el cliente se atrasó más de lo que se
+    guarda, ``reiniciar`` indica que debe recargar la tabla completa.
+    """
+    cache = shared_cache()
+    latest = cache.get(seq_key()) or 0
+    if latest <= after:
+        # Secuencia desalojada/reiniciada: el cliente quedó adelante
+        return [], latest, latest < after, 0
+    if latest - after > MAX_EVENTS_PER_READ:
+        return [], latest, True, 0
+
+    keys = [event_key(seq) for seq in range(after + 1, latest + 1)]
+    found = cache.get_many(keys)
+
+    events = []
+    last = after
+    for seq in range(after + 1, latest + 1):
+        event = found.get(event_key(seq))
+        if event is None:
+            if gap_polls < GAP_GRACE_POLLS:
+                return events, last, False, gap_polls + 1
+            # Expirado o perdido: el cliente recarga la tabla
+            return [], latest, True, 0
+        events.append((seq, event))
+        last = seq
+    return events, last, False, 0
+
+
+def sse_message(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    if data is not None:
+        lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_events(after, matches, seconds=None, retry_ms=LIVE_RETRY_MS):
+    """
+    Generador SSE: eventos posteriores a ``after`` que cumplen ``matches(evento)``.
+
+    Termina a los LIVE_STREAM_SECONDS (``seconds=0``: una sola lectura);
+    EventSource se reconecta solo con el último id recibido. Los eventos de
+    otros tableros solo avanzan el id.
+    """
+    deadline = time.monotonic() + (LIVE_STREAM_SECONDS if seconds is None else seconds)
+    last_sent = time.monotonic()
+    gap_polls = 0
+    yield f'retry: {retry_ms}\n\n'
+
+    while True:
+        events, last, reset, gap_polls = read_events(after, gap_polls)
+        if reset:
+            yield sse_message({'now': timezone.now().isoformat()}, event='reset', event_id=last)
+            last_sent = time.monotonic()
+        else:
+            sent_id = after
+            for seq, event in events:
+                if matches(event):
+                    yield sse_message(event, event_id=seq)
+                    sent_id = seq
+            if sent_id != last:
+                yield sse_message(None, event_id=last)
+            if last != after:
+                last_sent = time.monotonic()
+        after = last
+
+        if time.monotonic() >= deadline:
+            return
+        if time.monotonic() - last_sent >= LIVE_KEEPALIVE_SECONDS:
+            yield ': keepalive\n\n'
+            last_sent = time.monotonic()
+        time.sleep(LIVE_POLL_INTERVAL)
+
+
+_stream_slots = threading.BoundedSemaphore(LIVE_MAX_STREAMS)
+
+
+class _HeldStream:
+    """Iterador de stream_events que devuelve su cupo al cerrarse la respuesta."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.held = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.stream)
+
+    def close(self):
+        # Django cierra la respuesta al terminar o cuando el cliente se va
+        if self.held:
+            self.held = False
+            _stream_slots.release()
+        self.stream.close()
+
+
+def open_stream(after, matches):
+    """
+    stream_events si este proceso tiene cupo (LIVE_MAX_STREAMS); si no, una
+    sola lectura con reconexión a los LIVE_POLL_RETRY_MS.
+    """
+    if not _stream_slots.acquire(blocking=False):
+        return stream_events(after, matches, seconds=0, retry_ms=LIVE_POLL_RETRY_MS)
+    return _HeldStream(stream_events(after, matches))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:22
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_workday_night_pay_workday_night_rate_and_more'),
+        ('core', '0010_payrollrun_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyHoursSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iso_year', models.PositiveSmallIntegerField()),
+                ('iso_week', models.PositiveSmallIntegerField()),
+                ('week_start', models.DateField()),
+                ('productive_hours', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('total_work_time', models.DurationField(default=datetime.timedelta(0))),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_hours', to='core.employee')),
+            ],
+            options={
+                'verbose_name': 'Weekly Hours Summary',
+                'verbose_name_plural': 'Weekly Hours Summaries',
+                'ordering': ['-week_start', 'employee'],
+                'unique_together': {('employee', 'iso_year', 'iso_week')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:45
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0011_weeklyhourssummary'),
+        ('core', '0010_payrollrun_kind'),
+        ('workforce', '0003_alter_shift_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('employee_is_active', models.BooleanField(default=True)),
+                ('workday_count', models.PositiveIntegerField(default=0)),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('open_count', models.PositiveIntegerField(default=0)),
+                ('productive_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('completed_work_time', models.DurationField(default=datetime.timedelta(0))),
+                ('completed_break_time', models.DurationField(default=datetime.timedelta(0))),
+                ('completed_lunch_time', models.DurationField(default=datetime.timedelta(0))),
+                ('scheduled_count', models.PositiveIntegerField(default=0)),
+                ('scheduled_employees', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('campaign', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attendance_facts', to='core.campaign')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attendance_facts', to='core.department')),
+                ('shift', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attendance_facts', to='workforce.shift')),
+            ],
+            options={
+                'verbose_name': 'Daily Attendance Fact',
+                'verbose_name_plural': 'Daily Attendance Facts',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['campaign', 'date'], name='attendance__campaig_3d9f62_idx'), models.Index(fields=['computed_at'], name='attendance__compute_69f0f4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0012_dailyattendancefact'),
+        ('core', '0010_payrollrun_kind'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='occurrence',
+            index=models.Index(fields=['date', 'id'], name='attendance__date_00c77a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workday',
+            index=models.Index(fields=['check_in', 'id'], name='attendance__check_i_3ad89f_idx'),
+        ),
+    ]
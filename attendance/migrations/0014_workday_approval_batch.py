@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0013_keyset_indexes'),
+        ('core', '0011_create_cache_table'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkDayApprovalBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('approve', 'Approve'), ('unapprove', 'Unapprove')], default='approve', max_length=10)),
+                ('scope', models.CharField(choices=[('period', 'Pay period'), ('campaign', 'Campaign'), ('supervisor', 'Supervisor team'), ('workday', 'Single work day')], default='period', max_length=12)),
+                ('date_from', models.DateField(blank=True, null=True)),
+                ('date_to', models.DateField(blank=True, null=True)),
+                ('workday_count', models.PositiveIntegerField(default=0)),
+                ('workday_ids', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('campaign', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='approval_batches', to='core.campaign')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='workday_approval_batches', to=settings.AUTH_USER_MODEL)),
+                ('period', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='approval_batches', to='core.payperiod')),
+                ('supervisor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='approval_batches', to='core.employee')),
+            ],
+            options={
+                'verbose_name': 'Work Day Approval Batch',
+                'verbose_name_plural': 'Work Day Approval Batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='workday',
+            name='approval_batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='workdays', to='attendance.workdayapprovalbatch'),
+        ),
+    ]
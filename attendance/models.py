@@ -1,5 +1,6 @@
 # models.py
 from django.db import models
+from django.db.models import F, Func
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta, datetime
@@ -7,10 +8,41 @@ from decimal import Decimal, ROUND_HALF_UP
 import logging
 
 
-from core.models import Campaign, Employee
+from core.models import Campaign, Department, Employee, PayPeriod
+from attendance.night_hours import sessions_night_minutes
+from attendance import pay_rules
 
 logger = logging.getLogger(__name__)
 
+MICROSECONDS_PER_CENTIHOUR = 36_000_000
+
+
+def work_hours(duration):
+    """Horas decimales de un tiempo de trabajo, a centésimas (mitad hacia arriba)."""
+    micro = (duration or timedelta(0)) // timedelta(microseconds=1)
+    return (Decimal(micro) / (100 * MICROSECONDS_PER_CENTIHOUR)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class WorkHours(Func):
+    """``work_hours`` de una expresión de duración, calculado en la base dentro del UPDATE."""
+    output_field = models.DecimalField(max_digits=5, decimal_places=2)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # SQLite guarda la duración en microsegundos (entero): centésimas con división entera
+        return super().as_sql(
+            compiler, connection,
+            template=f'((%(expressions)s + {MICROSECONDS_PER_CENTIHOUR // 2}) / {MICROSECONDS_PER_CENTIHOUR}) / 100.0',
+            **extra_context,
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='ROUND(EXTRACT(EPOCH FROM %(expressions)s) / 3600, 2)',
+            **extra_context,
+        )
+
+
 class WorkDay(models.Model):
     STATUS_CHOICES = [
         ('active', 'Active'),
@@ -44,6 +76,8 @@ class WorkDay(models.Model):
     is_approved = models.BooleanField(default=False)
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_workdays')
     approved_at = models.DateTimeField(null=True, blank=True)
+    # Última aprobación/desaprobación por lote (auditoría, ver attendance.approvals)
+    approval_batch = models.ForeignKey('WorkDayApprovalBatch', on_delete=models.SET_NULL, null=True, blank=True, related_name='workdays')
     
     # Cálculos de pago
     regular_hours = models.DecimalField(max_digits=5, decimal_places=2, default=0)
@@ -100,6 +134,7 @@ class WorkDay(models.Model):
             models.Index(fields=['date', 'status']),
             models.Index(fields=['employee', 'date']),
             models.Index(fields=['is_approved', 'date']),  # Nuevo índice
+            models.Index(fields=['check_in', 'id']),  # Paginación por cursor de /api/workdays/
         ]
 
     def __str__(self):
@@ -109,24 +144,53 @@ class WorkDay(models.Model):
         """
         Calcula las horas totales trabajadas en la semana para determinar 
         si hay horas extras según la ley dominicana
+
+        Lee una sola fila de WeeklyHoursSummary (lunes a domingo, sin
+        ausencias ni licencias) en vez de los siete días.
         """
-        # Obtener la semana actual (Lunes a Domingo)
-        start_of_week = self.date - timedelta(days=self.date.weekday())
-        end_of_week = start_of_week + timedelta(days=6)
-        
-        # Obtener todos los WorkDays de esta semana para este empleado
-        weekly_workdays = WorkDay.objects.filter(
-            employee=self.employee,
-            date__range=[start_of_week, end_of_week]
-        ).exclude(
-            status__in=['absent', 'leave']
-        )
-        
-        total_weekly_hours = Decimal('0')
-        for wd in weekly_workdays:
-            total_weekly_hours += wd.productive_hours
-        
-        return total_weekly_hours
+        return WeeklyHoursSummary.for_week(self.employee_id, self.date).productive_hours
+
+    # Estados que no cuentan para las horas de la semana
+    WEEKLY_EXCLUDED_STATUSES = ('absent', 'leave')
+
+    def week_contribution(self):
+        """(employee_id, fecha, horas, tiempo de trabajo) que este día aporta a su semana."""
+        day = self.date.date() if isinstance(self.date, datetime) else self.date
+        if self.status in self.WEEKLY_EXCLUDED_STATUSES:
+            return (self.employee_id, day, Decimal('0.00'), timedelta(0))
+        hours = Decimal(str(self.productive_hours or 0)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return (self.employee_id, day, hours, self.total_work_time or timedelta(0))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Aporte guardado a la semana, para actualizar el resumen por diferencia
+        if {'employee_id', 'date', 'status', 'productive_hours', 'total_work_time'} <= set(field_names):
+            instance._stored_contribution = instance.week_contribution()
+        return instance
+
+    def stored_week_contribution(self):
+        """Aporte a la semana tal como está guardado en la base."""
+        return getattr(self, '_stored_contribution', None)
+
+    def _sync_weekly_summary(self):
+        """Aplicar al resumen semanal la diferencia entre lo guardado antes y ahora."""
+        new = self.week_contribution()
+        old = self.stored_week_contribution()
+        self._stored_contribution = new
+
+        if old is None:
+            # Día nuevo (o cargado sin esos campos): recalcular su semana
+            WeeklyHoursSummary.rebuild(new[0], new[1])
+            return
+        if old == new:
+            return
+
+        if (old[0], WeeklyHoursSummary.week_key(old[1])) == (new[0], WeeklyHoursSummary.week_key(new[1])):
+            WeeklyHoursSummary.apply_delta(new[0], new[1], new[2] - old[2], new[3] - old[3])
+        else:
+            WeeklyHoursSummary.apply_delta(old[0], old[1], -old[2], -old[3])
+            WeeklyHoursSummary.apply_delta(new[0], new[1], new[2], new[3])
     
     def is_night_hours(self, time_obj):
         """
@@ -140,32 +204,23 @@ class WorkDay(models.Model):
     def calculate_night_hours_from_sessions(self):
         """
         Calcula cuántas horas de trabajo fueron durante horario nocturno
+        (intersección de intervalos, ver attendance.night_hours)
         """
-        night_minutes = 0
-        sessions = self.sessions.filter(
-            session_type='work',
-            end_time__isnull=False
-        )
-        
-        for session in sessions:
-            current_time = session.start_time
-            end_time = session.end_time
-            
-            # Revisar cada minuto de la sesión
-            while current_time < end_time:
-                if self.is_night_hours(current_time):
-                    night_minutes += 1
-                current_time += timedelta(minutes=1)
-        
+        night_minutes = getattr(self, '_night_minutes', None)
+        if night_minutes is None:
+            sessions = self.sessions.filter(
+                session_type='work',
+                end_time__isnull=False
+            ).values_list('start_time', 'end_time')
+            night_minutes = sessions_night_minutes(sessions)
+
         return Decimal(str(night_minutes / 60))
     
     def calculate_overtime_breakdown(self):
         """
         Calcula el desglose de horas regulares, extras y nocturnas
-        según la ley dominicana
+        según la ley dominicana (reglas en attendance.pay_rules)
         """
-
-        
         # Total de horas trabajadas HOY
         daily_hours = self.productive_hours
         
@@ -175,51 +230,7 @@ class WorkDay(models.Model):
         # Horas nocturnas
         night_hours = self.calculate_night_hours_from_sessions()
         
-        # CÁLCULO DE HORAS EXTRAS SEMANALES
-        # Hasta 44 horas = regulares
-        # 44-68 horas = overtime 135%
-        # >68 horas = overtime 200%
-        
-        regular_hours = Decimal('0')
-        overtime_135 = Decimal('0')
-        overtime_200 = Decimal('0')
-        
-        if weekly_hours <= Decimal('44'):
-            # Todas las horas de hoy son regulares
-            regular_hours = daily_hours
-        elif weekly_hours <= Decimal('68'):
-            # Hay horas extras al 135%
-            # Determinar cuántas horas de HOY caen en overtime
-            hours_before_today = weekly_hours - daily_hours
-            
-            if hours_before_today >= Decimal('44'):
-                # Todas las horas de hoy son overtime 135%
-                overtime_135 = daily_hours
-            else:
-                # Parte son regulares, parte son overtime 135%
-                regular_hours = Decimal('44') - hours_before_today
-                overtime_135 = daily_hours - regular_hours
-        else:
-            # Hay horas extras al 200%
-            hours_before_today = weekly_hours - daily_hours
-            
-            if hours_before_today >= Decimal('68'):
-                # Todas las horas de hoy son overtime 200%
-                overtime_200 = daily_hours
-            elif hours_before_today >= Decimal('44'):
-                # Parte son overtime 135%, parte son overtime 200%
-                overtime_135 = Decimal('68') - hours_before_today
-                overtime_200 = daily_hours - overtime_135
-            else:
-                # Parte regulares, parte overtime 135%, parte overtime 200%
-                regular_hours = Decimal('44') - hours_before_today
-                remaining = daily_hours - regular_hours
-                
-                if remaining <= (Decimal('68') - Decimal('44')):
-                    overtime_135 = remaining
-                else:
-                    overtime_135 = Decimal('68') - Decimal('44')
-                    overtime_200 = remaining - overtime_135
+        regular_hours, overtime_135, overtime_200 = pay_rules.split_weekly_overtime(daily_hours, weekly_hours)
         
         return {
             'regular_hours': regular_hours,
@@ -238,74 +249,16 @@ class WorkDay(models.Model):
         - Overtime 200% (>68h semanales) = 100% extra
         - Horas nocturnas 115% (9PM-7AM) = 15% extra
         """
-        # Obtener tarifa base
-        if self.employee.fixed_rate and self.employee.custom_base_salary:
-            custom_salary = Decimal(str(self.employee.custom_base_salary))
-            daily_rate = custom_salary / Decimal('30')
-            self.regular_rate = daily_rate / Decimal('8')
-        elif self.employee.position and self.employee.position.hour_rate:
-            self.regular_rate = Decimal(str(self.employee.position.hour_rate))
-        elif self.employee.current_campaign and self.employee.current_campaign.hour_rate:
-            self.regular_rate = Decimal(str(self.employee.current_campaign.hour_rate))
-        else:
-            self.regular_rate = Decimal('0.00')
-
-        # Calcular tarifas según ley dominicana
-        self.overtime_rate_135 = self.regular_rate * Decimal('1.35')  # 35% extra
-        self.overtime_rate_200 = self.regular_rate * Decimal('2.00')  # 100% extra
-        self.night_rate = self.regular_rate * Decimal('1.15')  # 15% extra
-
-        # Convertir horas a Decimal
-        daily_hours = Decimal(str(self.productive_hours or 0))
-        night_hours = Decimal(str(self.calculate_night_hours_from_sessions() or 0))
-
-        # Calcular horas semanales
-        weekly_hours = Decimal(str(self.calculate_weekly_hours() or 0))
-
-        # Horas regulares vs overtime según ley dominicana
-        regular_hours = Decimal('0')
-        overtime_135 = Decimal('0')
-        overtime_200 = Decimal('0')
-
-        if weekly_hours <= Decimal('44'):
-            regular_hours = daily_hours
-        elif weekly_hours <= Decimal('68'):
-            hours_before_today = weekly_hours - daily_hours
-            if hours_before_today >= Decimal('44'):
-                overtime_135 = daily_hours
-            else:
-                regular_hours = Decimal('44') - hours_before_today
-                overtime_135 = daily_hours - regular_hours
-        else:
-            hours_before_today = weekly_hours - daily_hours
-            if hours_before_today >= Decimal('68'):
-                overtime_200 = daily_hours
-            elif hours_before_today >= Decimal('44'):
-                overtime_135 = Decimal('68') - hours_before_today
-                overtime_200 = daily_hours - overtime_135
-            else:
-                regular_hours = Decimal('44') - hours_before_today
-                remaining = daily_hours - regular_hours
-                if remaining <= (Decimal('68') - Decimal('44')):
-                    overtime_135 = remaining
-                else:
-                    overtime_135 = Decimal('68') - Decimal('44')
-                    overtime_200 = remaining - overtime_135
-
-        # Guardar horas calculadas
-        self.regular_hours = regular_hours
-        self.overtime_hours_135 = overtime_135
-        self.overtime_hours_200 = overtime_200
-        self.night_hours = night_hours
-
-        # Calcular pagos
-        self.regular_pay = regular_hours * self.regular_rate
-        self.overtime_pay_135 = overtime_135 * self.overtime_rate_135
-        self.overtime_pay_200 = overtime_200 * self.overtime_rate_200
-        self.night_pay = night_hours * self.night_rate
+        pay = pay_rules.day_pay(
+            pay_rules.hourly_rate(self.employee),
+            pay_rules.to_decimal(self.productive_hours),
+            pay_rules.to_decimal(self.calculate_weekly_hours()),
+            pay_rules.to_decimal(self.calculate_night_hours_from_sessions()),
+        )
 
-        # Total
-        self.total_pay = self.regular_pay + self.overtime_pay_135 + self.overtime_pay_200 + self.night_pay
+        # Guardar tarifas, horas y pagos calculados
+        for field in pay_rules.PAY_FIELDS:
+            setattr(self, field, pay[field])
 
         return {
             'regular_pay': float(self.regular_pay),
@@ -314,20 +267,23 @@ class WorkDay(models.Model):
             'night_pay': float(self.night_pay),
             'total_pay': float(self.total_pay),
             'breakdown': {
-                'regular_hours': float(regular_hours),
-                'overtime_135': float(overtime_135),
-                'overtime_200': float(overtime_200),
-                'night_hours': float(night_hours),
-                'daily_total': float(daily_hours),
-                'weekly_total': float(weekly_hours)
+                'regular_hours': float(pay['regular_hours']),
+                'overtime_135': float(pay['overtime_hours_135']),
+                'overtime_200': float(pay['overtime_hours_200']),
+                'night_hours': float(pay['night_hours']),
+                'daily_total': float(pay['daily_total']),
+                'weekly_total': float(pay['weekly_total'])
             }
         }
     
     def save(self, *args, **kwargs):
         # Calcular horas automáticamente antes de guardar
-        if self.productive_hours > 0:
+        # (con update_fields sin productive_hours los pagos no se escribirían)
+        update_fields = kwargs.get('update_fields')
+        if self.productive_hours > 0 and (update_fields is None or 'productive_hours' in update_fields):
             self.calculate_pay_with_dominican_law()
         super().save(*args, **kwargs)
+        self._sync_weekly_summary()
     
     # En models.py - método calculate_pay
     def calculate_pay(self):
@@ -340,21 +296,11 @@ class WorkDay(models.Model):
             # Si ya es Decimal o otro tipo
             productive_hours = Decimal(str(self.productive_hours))
         
-        # Determinar tarifas - convertir todo a Decimal
-        if self.employee.fixed_rate and self.employee.custom_base_salary:
-            # Convertir a Decimal
-            custom_salary = Decimal(str(self.employee.custom_base_salary))
-            daily_rate = custom_salary / Decimal('30')
-            self.regular_rate = daily_rate / Decimal('8') if productive_hours > Decimal('0') else Decimal('0')
-        
-        elif self.employee.position and self.employee.position.hour_rate:
-            self.regular_rate = Decimal(str(self.employee.position.hour_rate))
-        
-        elif self.employee.current_campaign and self.employee.current_campaign.hour_rate:
-            self.regular_rate = Decimal(str(self.employee.current_campaign.hour_rate))
-        
+        # Determinar tarifa (misma cadena que attendance.pay_rules.hourly_rate)
+        if self.employee.fixed_rate and self.employee.custom_base_salary and productive_hours <= Decimal('0'):
+            self.regular_rate = Decimal('0')
         else:
-            self.regular_rate = Decimal('0.00')
+            self.regular_rate = pay_rules.hourly_rate(self.employee)
         
         # Calcular horas regulares vs overtime
         if productive_hours <= Decimal('8'):
@@ -504,7 +450,7 @@ class WorkDay(models.Model):
         # Si es la primera sesión y es de trabajo, establecer check_in
         if session_type == 'work' and not self.check_in:
             self.check_in = timezone.now()
-            self.save()
+            self.save(update_fields=['check_in', 'updated_at'])
         
         return session
     
@@ -520,7 +466,105 @@ class WorkDay(models.Model):
     
     def get_active_session(self):
         """Obtener la sesión activa actual"""
+        # Precargada para un equipo completo (attendance.team_snapshot)
+        if hasattr(self, '_active_session'):
+            return self._active_session
         return self.sessions.filter(end_time__isnull=True).first()
+
+    # Total acumulado que corresponde a cada tipo de sesión
+    SESSION_TOTAL_FIELDS = {
+        'work': 'total_work_time',
+        'break': 'total_break_time',
+        'lunch': 'total_lunch_time',
+    }
+
+    def add_session_duration(self, session_type, duration):
+        """
+        Sumar la duración de una sesión cerrada a los totales con un solo UPDATE.
+
+        productive_hours sale del total_work_time ya acumulado en el mismo
+        UPDATE (no de sumar horas redondeadas por sesión), así coincide con
+        calculate_daily_totals. No recorre las sesiones ni recalcula pagos; el
+        recálculo completo queda para ajustes explícitos (calculate_daily_totals)
+        y la conciliación nocturna.
+        """
+        field = self.SESSION_TOTAL_FIELDS.get(session_type)
+        if not field or not duration:
+            return
+
+        updates = {field: F(field) + duration, 'updated_at': timezone.now()}
+        if session_type == 'work':
+            updates['productive_hours'] = WorkHours(F('total_work_time') + duration)
+        elif session_type == 'break':
+            updates['break_count'] = F('break_count') + 1
+
+        WorkDay.objects.filter(pk=self.pk).update(**updates)
+
+        previous_hours = Decimal(str(self.productive_hours or 0))
+        new_hours = work_hours((self.total_work_time or timedelta(0)) + duration)
+        hours_delta = new_hours - previous_hours if session_type == 'work' else Decimal('0.00')
+
+        stored = self.stored_week_contribution()
+        if self.status not in self.WEEKLY_EXCLUDED_STATUSES:
+            work_delta = duration if session_type == 'work' else timedelta(0)
+            if work_delta:
+                WeeklyHoursSummary.apply_delta(self.employee_id, self.date, hours_delta, work_delta)
+            if stored is not None:
+                self._stored_contribution = (
+                    stored[0], stored[1], stored[2] + hours_delta, stored[3] + work_delta
+                )
+
+        # Mantener la instancia en memoria al día sin otra consulta
+        setattr(self, field, (getattr(self, field) or timedelta(0)) + duration)
+        if session_type == 'work':
+            self.productive_hours = new_hours
+        elif session_type == 'break':
+            self.break_count = (self.break_count or 0) + 1
+
+    def apply_live_totals(self, sessions, now=None):
+        """
+        Calcular en memoria (sin guardar) los totales del día a partir de una
+        lista de sesiones ya cargada; la sesión abierta cuenta hasta ``now``.
+        """
+        now = now or timezone.now()
+        totals = {field: timedelta(0) for field in self.SESSION_TOTAL_FIELDS.values()}
+        break_count = 0
+
+        for session in sessions:
+            field = self.SESSION_TOTAL_FIELDS.get(session.session_type)
+            if not field or not session.start_time:
+                continue
+            totals[field] += (session.end_time or now) - session.start_time
+            if session.session_type == 'break':
+                break_count += 1
+
+        for field, value in totals.items():
+            setattr(self, field, value)
+        self.break_count = break_count
+        self.productive_hours = round(self.total_work_time.total_seconds() / 3600, 2)
+        return self
+
+    def include_active_session(self, now=None, active_session=None):
+        """
+        Sumar en memoria (sin guardar) el tiempo de la sesión abierta.
+
+        Los totales guardados solo cuentan sesiones cerradas; los dashboards
+        usan esto para mostrar el tiempo en curso.
+        """
+        if active_session is None:
+            active_session = self.get_active_session()
+        if not active_session or active_session.session_type not in self.SESSION_TOTAL_FIELDS:
+            return self
+
+        elapsed = (now or timezone.now()) - active_session.start_time
+        field = self.SESSION_TOTAL_FIELDS[active_session.session_type]
+        setattr(self, field, (getattr(self, field) or timedelta(0)) + elapsed)
+
+        if active_session.session_type == 'work':
+            self.productive_hours = round(self.total_work_time.total_seconds() / 3600, 2)
+        elif active_session.session_type == 'break':
+            self.break_count = (self.break_count or 0) + 1
+        return self
     
     def calculate_daily_totals(self):
         """Calcular totales del día - RENOMBRADO desde calculate_metrics para ser más claro"""
@@ -547,7 +591,7 @@ class WorkDay(models.Model):
         self.total_break_time = total_break
         self.total_lunch_time = total_lunch
         self.break_count = break_count
-        self.productive_hours = round(total_work.total_seconds() / 3600, 2)
+        self.productive_hours = work_hours(total_work)
         
         self.save()
         return self.productive_hours
@@ -577,10 +621,9 @@ class WorkDay(models.Model):
         self.check_out = timezone.now()
         self.status = 'completed'
         
-        # Calcular métricas finales
+        # Calcular métricas finales (recálculo completo, guarda check_out y status)
         self.calculate_daily_totals()
         
-        self.save()
         logger.info(f"🏁 Día laboral finalizado para {self.employee}")
 
     def get_formatted_session(self):
@@ -648,12 +691,39 @@ class ActivitySession(models.Model):
         # Calcular duración automáticamente
         if self.start_time and self.end_time:
             self.duration = self.end_time - self.start_time
-        
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'end_time' in update_fields and 'duration' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['duration']
+
+        loaded = getattr(self, '_loaded_times', None)
+        closing = self.end_time is not None and (loaded is None or loaded[1] is None)
+        adjusted = (
+            not closing and loaded is not None
+            and loaded != (self.start_time, self.end_time, self.session_type)
+        )
+
         super().save(*args, **kwargs)
-        
+        self._loaded_times = (self.start_time, self.end_time, self.session_type)
+
         # Actualizar métricas del WorkDay
-        if self.end_time:  # Solo cuando se cierra la sesión
-                self.work_day.calculate_daily_totals()
+        if closing:
+            # Cierre normal: sumar solo esta sesión
+            self.work_day.add_session_duration(self.session_type, self.duration)
+        elif adjusted:
+            # Ajuste de una sesión ya cerrada: recálculo completo
+            self.work_day.calculate_daily_totals()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Tiempos tal como están en la base, para saber si un save cierra o ajusta
+        instance._loaded_times = (
+            instance.__dict__.get('start_time'),
+            instance.__dict__.get('end_time'),
+            instance.__dict__.get('session_type'),
+        )
+        return instance
 
     def adjust_times(self, new_start_time, new_end_time, adjusted_by, notes=""):
         """Método para ajustar tiempos de sesión"""
@@ -725,6 +795,152 @@ class ActivitySession(models.Model):
         return int(current_duration - original_duration)
     
 
+class WeeklyHoursSummary(models.Model):
+    """
+    Horas de la semana ISO (lunes a domingo) por empleado.
+
+    Suma de productive_hours y total_work_time de los WorkDay de la semana,
+    sin ausencias ni licencias. Se mantiene por diferencia en cada cambio de
+    WorkDay; ``rebuild_weekly_hours`` lo reconstruye y verifica.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='weekly_hours')
+    iso_year = models.PositiveSmallIntegerField()
+    iso_week = models.PositiveSmallIntegerField()
+    week_start = models.DateField()
+
+    productive_hours = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    total_work_time = models.DurationField(default=timedelta(0))
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['employee', 'iso_year', 'iso_week']
+        ordering = ['-week_start', 'employee']
+        verbose_name = "Weekly Hours Summary"
+        verbose_name_plural = "Weekly Hours Summaries"
+
+    def __str__(self):
+        return f"{self.employee} - {self.iso_year}-W{self.iso_week:02d} ({self.productive_hours}h)"
+
+    @staticmethod
+    def week_key(day):
+        if isinstance(day, datetime):
+            day = day.date()
+        iso_year, iso_week, _ = day.isocalendar()
+        return iso_year, iso_week
+
+    @staticmethod
+    def week_bounds(day):
+        if isinstance(day, datetime):
+            day = day.date()
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+
+    @classmethod
+    def raw_totals(cls, employee_id, day):
+        """Totales de la semana leídos directamente de WorkDay."""
+        start, end = cls.week_bounds(day)
+        totals = WorkDay.objects.filter(
+            employee_id=employee_id,
+            date__range=[start, end],
+        ).exclude(
+            status__in=WorkDay.WEEKLY_EXCLUDED_STATUSES
+        ).aggregate(
+            hours=models.Sum('productive_hours'),
+            work=models.Sum('total_work_time'),
+        )
+        return {
+            'productive_hours': Decimal(str(totals['hours'] or 0)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+            'total_work_time': totals['work'] or timedelta(0),
+        }
+
+    @classmethod
+    def rebuild(cls, employee_id, day):
+        """Recalcular una semana desde WorkDay (upsert)."""
+        iso_year, iso_week = cls.week_key(day)
+        summary, _ = cls.objects.update_or_create(
+            employee_id=employee_id,
+            iso_year=iso_year,
+            iso_week=iso_week,
+            defaults={
+                'week_start': cls.week_bounds(day)[0],
+                **cls.raw_totals(employee_id, day),
+            },
+        )
+        return summary
+
+    @classmethod
+    def rebuild_weeks(cls, keys):
+        """
+        Recalcular varias semanas a la vez; ``keys`` son pares (employee_id, día).
+
+        Una consulta agrupada y un upsert por semana distinta, sin importar
+        cuántos empleados (para cambios hechos con bulk_update).
+        """
+        employees_by_week = {}
+        for employee_id, day in keys:
+            start, _ = cls.week_bounds(day)
+            employees_by_week.setdefault(start, set()).add(employee_id)
+
+        for start, employee_ids in employees_by_week.items():
+            iso_year, iso_week = cls.week_key(start)
+            rows = WorkDay.objects.filter(
+                employee_id__in=employee_ids,
+                date__range=[start, start + timedelta(days=6)],
+            ).exclude(
+                status__in=WorkDay.WEEKLY_EXCLUDED_STATUSES
+            ).values('employee_id').annotate(
+                hours=models.Sum('productive_hours'),
+                work=models.Sum('total_work_time'),
+            ).order_by()
+            totals = {row['employee_id']: row for row in rows}
+
+            summaries = []
+            for employee_id in employee_ids:
+                row = totals.get(employee_id, {})
+                summaries.append(cls(
+                    employee_id=employee_id,
+                    iso_year=iso_year,
+                    iso_week=iso_week,
+                    week_start=start,
+                    productive_hours=Decimal(str(row.get('hours') or 0)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+                    total_work_time=row.get('work') or timedelta(0),
+                ))
+            cls.objects.bulk_create(
+                summaries,
+                update_conflicts=True,
+                unique_fields=['employee', 'iso_year', 'iso_week'],
+                update_fields=['week_start', 'productive_hours', 'total_work_time', 'updated_at'],
+            )
+
+    @classmethod
+    def apply_delta(cls, employee_id, day, hours, work_time, rebuild_missing=True):
+        """Sumar una diferencia con un solo UPDATE; si la fila no existe se reconstruye."""
+        iso_year, iso_week = cls.week_key(day)
+        updated = cls.objects.filter(
+            employee_id=employee_id,
+            iso_year=iso_year,
+            iso_week=iso_week,
+        ).update(
+            productive_hours=models.F('productive_hours') + hours,
+            total_work_time=models.F('total_work_time') + work_time,
+            updated_at=timezone.now(),
+        )
+        if not updated and rebuild_missing:
+            cls.rebuild(employee_id, day)
+
+    @classmethod
+    def for_week(cls, employee_id, day):
+        """La fila de la semana de ``day`` (se crea desde WorkDay si falta)."""
+        iso_year, iso_week = cls.week_key(day)
+        summary = cls.objects.filter(
+            employee_id=employee_id,
+            iso_year=iso_year,
+            iso_week=iso_week,
+        ).first()
+        return summary or cls.rebuild(employee_id, day)
+
+
 class Occurrence(models.Model):
 
     OCCURRENCE_TYPES = [
@@ -743,6 +959,11 @@ class Occurrence(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id']),  # Paginación por cursor de /api/occurrences/
+        ]
+
     def __str__(self):
         return f"{self.employee.full_name}"
     
@@ -754,3 +975,94 @@ class Occurrence(models.Model):
                 - datetime.combine(datetime.today(), self.start_time)
             )
         super().save(*args, **kwargs)
+
+
+class DailyAttendanceFact(models.Model):
+    """
+    Asistencia de un día por campaña × departamento × turno (y activos/inactivos).
+
+    Lo llena cada noche ``attendance.tasks.refresh_daily_attendance_facts``
+    (solo las fechas cuyos WorkDay cambiaron) y ``backfill_attendance_facts``
+    para el histórico. Los dashboards leen aquí los días pasados y calculan
+    en vivo solo hoy (ver attendance.daily_facts). La campaña y el
+    departamento son los del empleado al momento del cálculo; el turno es el
+    de su horario vigente ese día.
+    """
+    date = models.DateField(db_index=True)
+    campaign = models.ForeignKey(Campaign, on_delete=models.SET_NULL, null=True, blank=True, related_name='attendance_facts')
+    department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, blank=True, related_name='attendance_facts')
+    shift = models.ForeignKey('workforce.Shift', on_delete=models.SET_NULL, null=True, blank=True, related_name='attendance_facts')
+    employee_is_active = models.BooleanField(default=True)
+
+    # WorkDay del día
+    workday_count = models.PositiveIntegerField(default=0)
+    present_count = models.PositiveIntegerField(default=0)  # con check_in
+    completed_count = models.PositiveIntegerField(default=0)  # con check_out
+    open_count = models.PositiveIntegerField(default=0)  # con check_in y sin check_out
+    productive_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    # Totales de los días completos (para promedios)
+    completed_work_time = models.DurationField(default=timedelta(0))
+    completed_break_time = models.DurationField(default=timedelta(0))
+    completed_lunch_time = models.DurationField(default=timedelta(0))
+
+    # Horarios vigentes ese día (filas de EmployeeSchedule y empleados distintos)
+    scheduled_count = models.PositiveIntegerField(default=0)
+    scheduled_employees = models.PositiveIntegerField(default=0)
+
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['campaign', 'date']),
+            models.Index(fields=['computed_at']),
+        ]
+        verbose_name = "Daily Attendance Fact"
+        verbose_name_plural = "Daily Attendance Facts"
+
+    def __str__(self):
+        return f"{self.date} - {self.campaign or 'No campaign'} / {self.department or 'No department'} / {self.shift or 'No shift'}"
+
+
+class WorkDayApprovalBatch(models.Model):
+    """
+    Auditoría de una aprobación (o desaprobación) de WorkDay por lote.
+
+    Cada "aprobar todos" del período, de una campaña o del equipo de un
+    supervisor, y cada cambio individual, es un solo UPDATE; aquí queda quién
+    lo hizo, cuándo, el alcance y los días afectados (que además apuntan a su
+    lote con WorkDay.approval_batch). Ver attendance.approvals.
+    """
+    ACTION_CHOICES = [
+        ('approve', 'Approve'),
+        ('unapprove', 'Unapprove'),
+    ]
+    SCOPE_CHOICES = [
+        ('period', 'Pay period'),
+        ('campaign', 'Campaign'),
+        ('supervisor', 'Supervisor team'),
+        ('workday', 'Single work day'),
+    ]
+
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, default='approve')
+    scope = models.CharField(max_length=12, choices=SCOPE_CHOICES, default='period')
+    period = models.ForeignKey(PayPeriod, on_delete=models.SET_NULL, null=True, blank=True, related_name='approval_batches')
+    campaign = models.ForeignKey(Campaign, on_delete=models.SET_NULL, null=True, blank=True, related_name='approval_batches')
+    supervisor = models.ForeignKey(Employee, on_delete=models.SET_NULL, null=True, blank=True, related_name='approval_batches')
+    date_from = models.DateField(null=True, blank=True)
+    date_to = models.DateField(null=True, blank=True)
+
+    workday_count = models.PositiveIntegerField(default=0)
+    workday_ids = models.JSONField(default=list, blank=True)
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='workday_approval_batches')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Work Day Approval Batch"
+        verbose_name_plural = "Work Day Approval Batches"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.workday_count} work days ({self.get_scope_display()}) - {self.created_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,125 @@
+# night_hours.py
+"""
+Horas nocturnas (9 PM - 7 AM) calculadas por intersección de intervalos.
+
+Antes se recorría cada sesión minuto a minuto (600 iteraciones para un turno
+de 10 horas). Aquí se cuenta en forma cerrada cuántos de esos pasos de un
+minuto caen dentro de cada franja nocturna, así que el resultado es
+exactamente el mismo que el del ciclo anterior:
+
+    current = start
+    while current < end:
+        if current.hour >= 21 or current.hour < 7:
+            minutes += 1
+        current += timedelta(minutes=1)
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+
+NIGHT_START = time(21, 0)
+NIGHT_END = time(7, 0)
+STEP = timedelta(minutes=1)
+ONE_DAY = timedelta(days=1)
+
+
+def _wall_clock(value):
+    # El ciclo anterior sumaba timedelta sobre la hora local, no sobre UTC
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+
+def _steps_before(delta):
+    """Number of one-minute steps k >= 0 with k * STEP < delta."""
+    return -((-delta) // STEP)
+
+
+def night_minutes(start, end):
+    """
+    Night minutes of one session, same count as the minute-by-minute loop.
+
+    Each night band runs from 21:00 of one day to 07:00 of the next; the
+    loop counts the steps start + k minutes that land inside a band.
+    """
+    if start is None or end is None:
+        return 0
+
+    start = _wall_clock(start)
+    end = _wall_clock(end)
+    if end <= start:
+        return 0
+
+    total_steps = _steps_before(end - start)
+    minutes = 0
+
+    day = start.date() - ONE_DAY
+    last_day = end.date()
+    while day <= last_day:
+        band_start = datetime.combine(day, NIGHT_START)
+        band_end = datetime.combine(day + ONE_DAY, NIGHT_END)
+
+        first = max(_steps_before(band_start - start), 0)
+        last = min(_steps_before(band_end - start), total_steps)
+        if last > first:
+            minutes += last - first
+
+        day += ONE_DAY
+
+    return minutes
+
+
+def sessions_night_minutes(sessions, now=None):
+    """
+    Total night minutes of (start, end) pairs.
+
+    Open sessions (end is None) count until ``now`` when given, otherwise
+    they are skipped.
+    """
+    total = 0
+    for start, end in sessions:
+        if end is None:
+            if now is None:
+                continue
+            end = now
+        total += night_minutes(start, end)
+    return total
+
+
+def night_minutes_by_workday(work_day_ids, now=None):
+    """
+    Batch variant: night minutes of the work sessions of many workdays.
+
+    One query for the whole set (e.g. every workday of a pay period).
+    Returns {work_day_id: minutes}; workdays without sessions are omitted.
+    """
+    from attendance.models import ActivitySession
+
+    sessions = ActivitySession.objects.filter(
+        work_day_id__in=work_day_ids,
+        session_type='work',
+    )
+    if now is None:
+        sessions = sessions.filter(end_time__isnull=False)
+
+    grouped = defaultdict(list)
+    for work_day_id, start, end in sessions.values_list('work_day_id', 'start_time', 'end_time'):
+        grouped[work_day_id].append((start, end))
+
+    return {
+        work_day_id: sessions_night_minutes(pairs, now=now)
+        for work_day_id, pairs in grouped.items()
+    }
+
+
+def prefetch_night_minutes(work_days):
+    """
+    Attach the night minutes of closed work sessions to each workday.
+
+    WorkDay.calculate_night_hours_from_sessions uses the attached value
+    instead of querying, so repricing a whole period costs one session query.
+    Only for short-lived instances whose sessions will not change.
+    """
+    work_days = list(work_days)
+    minutes = night_minutes_by_workday([wd.id for wd in work_days])
+    for work_day in work_days:
+        work_day._night_minutes = minutes.get(work_day.id, 0)
+    return work_days
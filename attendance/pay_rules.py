@@ -0,0 +1,222 @@
+# pay_rules.py
+"""
+Pago de un día según la ley laboral dominicana, en un solo lugar.
+
+- Horas regulares hasta 44 horas semanales
+- Overtime 135% entre 44 y 68 horas semanales
+- Overtime 200% por encima de 68 horas semanales
+- Horas nocturnas (9 PM - 7 AM) al 115%
+
+Antes estas reglas estaban copiadas en WorkDay (calculate_pay_with_dominican_law,
+calculate_overtime_breakdown, calculate_pay) y en attendance.views
+(calculate_pay_breakdown_manual). Los cálculos son Decimal sin redondeo
+intermedio, igual que aquellos métodos, para dar exactamente los mismos números.
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+
+REGULAR_WEEKLY_LIMIT = Decimal('44')
+OVERTIME_135_WEEKLY_LIMIT = Decimal('68')
+
+OVERTIME_135_MULTIPLIER = Decimal('1.35')  # 35% extra
+OVERTIME_200_MULTIPLIER = Decimal('2.00')  # 100% extra
+NIGHT_MULTIPLIER = Decimal('1.15')  # 15% extra
+
+ZERO = Decimal('0')
+
+
+def to_decimal(value):
+    return Decimal(str(value or 0))
+
+
+def hourly_rate(employee):
+    """
+    Tarifa por hora del empleado:
+    1. Salario fijo personalizado / 30 días / 8 horas
+    2. Tarifa de la posición
+    3. Tarifa de la campaña actual
+    """
+    if employee.fixed_rate and employee.custom_base_salary:
+        daily_rate = Decimal(str(employee.custom_base_salary)) / Decimal('30')
+        return daily_rate / Decimal('8')
+    if employee.position and employee.position.hour_rate:
+        return Decimal(str(employee.position.hour_rate))
+    if employee.current_campaign and employee.current_campaign.hour_rate:
+        return Decimal(str(employee.current_campaign.hour_rate))
+    return Decimal('0.00')
+
+
+def split_weekly_overtime(daily_hours, weekly_hours):
+    """
+    Repartir las horas del día entre regulares, overtime 135% y 200%.
+
+    ``weekly_hours`` es el total de la semana incluyendo este día; lo que
+    queda antes del día es ``weekly_hours - daily_hours``.
+    """
+    regular_hours = ZERO
+    overtime_135 = ZERO
+    overtime_200 = ZERO
+
+    if weekly_hours <= REGULAR_WEEKLY_LIMIT:
+        regular_hours = daily_hours
+    elif weekly_hours <= OVERTIME_135_WEEKLY_LIMIT:
+        hours_before_today = weekly_hours - daily_hours
+        if hours_before_today >= REGULAR_WEEKLY_LIMIT:
+            overtime_135 = daily_hours
+        else:
+            regular_hours = REGULAR_WEEKLY_LIMIT - hours_before_today
+            overtime_135 = daily_hours - regular_hours
+    else:
+        hours_before_today = weekly_hours - daily_hours
+        if hours_before_today >= OVERTIME_135_WEEKLY_LIMIT:
+            overtime_200 = daily_hours
+        elif hours_before_today >= REGULAR_WEEKLY_LIMIT:
+            overtime_135 = OVERTIME_135_WEEKLY_LIMIT - hours_before_today
+            overtime_200 = daily_hours - overtime_135
+        else:
+            regular_hours = REGULAR_WEEKLY_LIMIT - hours_before_today
+            remaining = daily_hours - regular_hours
+            if remaining <= (OVERTIME_135_WEEKLY_LIMIT - REGULAR_WEEKLY_LIMIT):
+                overtime_135 = remaining
+            else:
+                overtime_135 = OVERTIME_135_WEEKLY_LIMIT - REGULAR_WEEKLY_LIMIT
+                overtime_200 = remaining - overtime_135
+
+    return regular_hours, overtime_135, overtime_200
+
+
+def day_pay(rate, daily_hours, weekly_hours, night_hours, cap_night=False):
+    """
+    Horas, tarifas y pagos de un día (todo Decimal).
+
+    Con ``cap_night`` las horas nocturnas pagadas no pasan de las del día
+    (así lo hacía la vista del dashboard).
+    """
+    regular_hours, overtime_135, overtime_200 = split_weekly_overtime(daily_hours, weekly_hours)
+    if cap_night:
+        night_hours = min(night_hours, daily_hours)
+
+    overtime_rate_135 = rate * OVERTIME_135_MULTIPLIER
+    overtime_rate_200 = rate * OVERTIME_200_MULTIPLIER
+    night_rate = rate * NIGHT_MULTIPLIER
+
+    regular_pay = regular_hours * rate
+    overtime_pay_135 = overtime_135 * overtime_rate_135
+    overtime_pay_200 = overtime_200 * overtime_rate_200
+    night_pay = night_hours * night_rate
+
+    return {
+        'regular_rate': rate,
+        'overtime_rate_135': overtime_rate_135,
+        'overtime_rate_200': overtime_rate_200,
+        'night_rate': night_rate,
+        'regular_hours': regular_hours,
+        'overtime_hours_135': overtime_135,
+        'overtime_hours_200': overtime_200,
+        'night_hours': night_hours,
+        'regular_pay': regular_pay,
+        'overtime_pay_135': overtime_pay_135,
+        'overtime_pay_200': overtime_pay_200,
+        'night_pay': night_pay,
+        'total_pay': regular_pay + overtime_pay_135 + overtime_pay_200 + night_pay,
+        'daily_total': daily_hours,
+        'weekly_total': weekly_hours,
+    }
+
+
+def _week_key(employee_id, day):
+    if isinstance(day, datetime):
+        day = day.date()
+    iso_year, iso_week, _ = day.isocalendar()
+    return employee_id, iso_year, iso_week
+
+
+def calculate_pay_batch(rows, weekly_hours=None):
+    """
+    Pago de muchos días en una sola pasada.
+
+    ``rows`` son tuplas (employee, date, hours, night_hours). La tarifa se
+    calcula una vez por empleado. ``weekly_hours`` es un mapa
+    {(employee_id, iso_year, iso_week): horas}; las semanas que falten se
+    suman a partir de las mismas filas.
+
+    Devuelve una lista de dicts de ``day_pay`` en el orden de ``rows``.
+    """
+    rows = [
+        (employee, day, to_decimal(hours), to_decimal(night_hours))
+        for employee, day, hours, night_hours in rows
+    ]
+
+    weekly = dict(weekly_hours or {})
+    from_rows = defaultdict(Decimal)
+    for employee, day, hours, _ in rows:
+        from_rows[_week_key(employee.id, day)] += hours
+    for key, hours in from_rows.items():
+        weekly.setdefault(key, hours)
+
+    rates = {}
+    results = []
+    for employee, day, hours, night_hours in rows:
+        rate = rates.get(employee.id)
+        if rate is None:
+            rate = rates[employee.id] = hourly_rate(employee)
+        results.append(day_pay(rate, hours, to_decimal(weekly[_week_key(employee.id, day)]), night_hours))
+    return results
+
+
+def weekly_hours_for(work_days):
+    """Horas de las semanas de estos días desde WeeklyHoursSummary (una consulta)."""
+    from django.db.models import Q
+    from attendance.models import WeeklyHoursSummary
+
+    keys = {_week_key(wd.employee_id, wd.date) for wd in work_days}
+    if not keys:
+        return {}
+
+    # Una condición por semana distinta (normalmente una o dos), no por día
+    employees_by_week = defaultdict(set)
+    for employee_id, iso_year, iso_week in keys:
+        employees_by_week[(iso_year, iso_week)].add(employee_id)
+    condition = Q()
+    for (iso_year, iso_week), employee_ids in employees_by_week.items():
+        condition |= Q(iso_year=iso_year, iso_week=iso_week, employee_id__in=employee_ids)
+
+    weekly = {
+        (employee_id, iso_year, iso_week): hours
+        for employee_id, iso_year, iso_week, hours in WeeklyHoursSummary.objects.filter(condition)
+        .values_list('employee_id', 'iso_year', 'iso_week', 'productive_hours')
+    }
+    # Semanas sin resumen todavía: se crean desde WorkDay
+    for employee_id, iso_year, iso_week in keys - weekly.keys():
+        day = datetime.fromisocalendar(iso_year, iso_week, 1).date()
+        weekly[(employee_id, iso_year, iso_week)] = WeeklyHoursSummary.rebuild(employee_id, day).productive_hours
+    return weekly
+
+
+PAY_FIELDS = [
+    'regular_rate', 'overtime_rate_135', 'overtime_rate_200', 'night_rate',
+    'regular_hours', 'overtime_hours_135', 'overtime_hours_200', 'night_hours',
+    'regular_pay', 'overtime_pay_135', 'overtime_pay_200', 'night_pay', 'total_pay',
+]
+
+
+def price_workdays(work_days):
+    """
+    Aplicar el pago a una lista de WorkDay sin guardarlos.
+
+    Las horas semanales se leen en una consulta y las nocturnas de
+    ``_night_minutes`` (ver night_hours.prefetch_night_minutes) o de las
+    sesiones de cada día. Guardar con bulk_update(work_days, PAY_FIELDS).
+    """
+    work_days = list(work_days)
+    rows = [
+        (wd.employee, wd.date, wd.productive_hours, wd.calculate_night_hours_from_sessions())
+        for wd in work_days
+    ]
+    results = calculate_pay_batch(rows, weekly_hours=weekly_hours_for(work_days))
+    for work_day, result in zip(work_days, results):
+        for field in PAY_FIELDS:
+            setattr(work_day, field, result[field])
+    return work_days
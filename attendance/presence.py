@@ -0,0 +1,201 @@
+# presence.py
+"""
+Registro de presencia: estado actual de cada agente en la caché compartida.
+
+"¿Quién está en break/lunch/work ahora?" se calculaba en cada request con
+``ActivitySession.objects.filter(end_time__isnull=True)`` y
+``Employee.is_logged_in``, y cada vista lo hacía a su manera
+(get_active_session, current_status, get_formatted_session). Aquí cada
+empleado tiene una entrada compacta (``Presence``) en L2
+(core/utils/cache_layer.py) con su estado, el inicio de la sesión abierta,
+campaña, supervisor y si tiene sesión iniciada, y las lecturas por campaña,
+supervisor o estado son un solo get_many.
+
+Actualización:
+- Cada marcaje (ActivitySession guardada/borrada) y cada Employee guardado
+  refrescan al empleado vía live_status.publish_status (que además avisa a
+  los tableros en vivo)
+- Los cierres masivos (auto-logout, force logout) refrescan a los afectados
+- ``reconcile_presence`` (tarea cada 5 minutos) recalcula todo desde la BD y
+  corrige lo que se haya perdido (UPDATE sin señales, desalojos, carreras)
+
+Una entrada que falta al leer se calcula desde la BD en ese momento.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.models import Campaign, Employee
+from core.utils.cache_layer import shared_cache
+from .models import ActivitySession
+
+
+OFFLINE = 'offline'
+DEFAULT_BREAK_MINUTES = 15
+DEFAULT_LUNCH_MINUTES = 60
+
+Presence = namedtuple('Presence', 'employee campaign supervisor state start_time logged_in active')
+
+
+def presence_key(employee_id):
+    return f'presence:{employee_id}'
+
+
+def roster_key():
+    return 'presence:roster'
+
+
+# =============================================================================
+# DESDE LA BASE DE DATOS
+# =============================================================================
+
+def load_presence(employee_ids=None):
+    """{employee_id: Presence} calculado desde la BD en dos consultas (None = todos)."""
+    employees = Employee.objects.all()
+    sessions = ActivitySession.objects.filter(end_time__isnull=True)
+    if employee_ids is not None:
+        employees = employees.filter(id__in=employee_ids)
+        sessions = sessions.filter(work_day__employee_id__in=employee_ids)
+
+    # Sesión abierta más reciente de cada empleado (la última gana)
+    open_sessions = {}
+    rows = sessions.order_by('start_time').values_list('work_day__employee_id', 'session_type', 'start_time')
+    for employee_id, session_type, start_time in rows:
+        open_sessions[employee_id] = (session_type, start_time)
+
+    presence = {}
+    rows = employees.values_list('id', 'current_campaign_id', 'supervisor_id', 'is_logged_in', 'is_active')
+    for employee_id, campaign_id, supervisor_id, logged_in, active in rows:
+        state, start_time = open_sessions.get(employee_id, (OFFLINE, None))
+        presence[employee_id] = Presence(
+            employee_id, campaign_id, supervisor_id, state, start_time, logged_in, active,
+        )
+    return presence
+
+
+def _write(cache, changed, removed=()):
+    if changed:
+        cache.set_many({presence_key(employee_id): entry for employee_id, entry in changed.items()}, timeout=None)
+    if removed:
+        cache.delete_many([presence_key(employee_id) for employee_id in removed])
+
+
+def refresh_presence(employee_ids):
+    """
+    Recalcular las entradas de ``employee_ids``.
+
+    Devuelve {employee_id: Presence} solo de las que cambiaron (las nuevas
+    cuentan como cambio).
+    """
+    employee_ids = {employee_id for employee_id in employee_ids if employee_id}
+    if not employee_ids:
+        return {}
+
+    cache = shared_cache()
+    fresh = load_presence(employee_ids)
+    stored = cache.get_many([presence_key(employee_id) for employee_id in employee_ids])
+    changed = {
+        employee_id: entry for employee_id, entry in fresh.items()
+        if stored.get(presence_key(employee_id)) != entry
+    }
+    _write(cache, changed, removed=employee_ids - set(fresh))
+
+    roster = cache.get(roster_key())
+    if roster is not None and not set(fresh) <= set(roster):
+        cache.set(roster_key(), sorted(set(roster) | set(fresh)), timeout=None)
+    return changed
+
+
+def reconcile_presence():
+    """
+    Recalcular todo el registro desde la BD (dos consultas y un get_many).
+
+    Devuelve {employee_id: Presence} de las entradas corregidas.
+    """
+    cache = shared_cache()
+    fresh = load_presence()
+    roster = set(cache.get(roster_key()) or ())
+    stored = cache.get_many([presence_key(employee_id) for employee_id in set(fresh) | roster])
+    changed = {
+        employee_id: entry for employee_id, entry in fresh.items()
+        if stored.get(presence_key(employee_id)) != entry
+    }
+    _write(cache, changed, removed=roster - set(fresh))
+    cache.set(roster_key(), sorted(fresh), timeout=None)
+    return changed
+
+
+# =============================================================================
+# LECTURA
+# =============================================================================
+
+def read_presence(employee_ids=None):
+    """
+    {employee_id: Presence} desde el registro (None = todos los empleados).
+
+    Las entradas que faltan se calculan desde la BD y se guardan.
+    """
+    cache = shared_cache()
+    if employee_ids is None:
+        roster = cache.get(roster_key())
+        if roster is None:
+            reconcile_presence()
+            roster = cache.get(roster_key()) or []
+        employee_ids = roster
+
+    keys = {presence_key(employee_id): employee_id for employee_id in employee_ids}
+    presence = {keys[key]: entry for key, entry in cache.get_many(list(keys)).items()}
+    missing = set(keys.values()) - set(presence)
+    if missing:
+        refresh_presence(missing)
+        presence.update(load_presence(missing))
+    return presence
+
+
+def active_presence(employee_ids=None):
+    """Entradas de empleados activos."""
+    return [entry for entry in read_presence(employee_ids).values() if entry.active]
+
+
+def presence_by_campaign(campaign_id):
+    return [entry for entry in active_presence() if entry.campaign == campaign_id]
+
+
+def presence_by_supervisor(supervisor_id):
+    return [entry for entry in active_presence() if entry.supervisor == supervisor_id]
+
+
+def presence_by_state(*states):
+    """Empleados activos en alguno de ``states`` ('work', 'break', 'lunch', OFFLINE)."""
+    return [entry for entry in active_presence() if entry.state in states]
+
+
+def overdue_breaks(entries=None, now=None):
+    """
+    [(Presence, exceso)] de los agentes en break/lunch más tiempo del que da
+    su campaña (break_duraction / lunch, 15 y 60 minutos si no hay).
+    """
+    now = now or timezone.now()
+    entries = [
+        entry for entry in (presence_by_state('break', 'lunch') if entries is None else entries)
+        if entry.state in ('break', 'lunch') and entry.start_time
+    ]
+    if not entries:
+        return []
+
+    limits = {
+        campaign_id: (breaks, lunch)
+        for campaign_id, breaks, lunch in Campaign.objects.filter(
+            id__in={entry.campaign for entry in entries if entry.campaign}
+        ).values_list('id', 'break_duraction', 'lunch')
+    }
+
+    overdue = []
+    for entry in entries:
+        breaks, lunch = limits.get(entry.campaign, (None, None))
+        minutes = (breaks or DEFAULT_BREAK_MINUTES) if entry.state == 'break' else (lunch or DEFAULT_LUNCH_MINUTES)
+        excess = now - entry.start_time - timedelta(minutes=minutes)
+        if excess > timedelta(0):
+            overdue.append((entry, excess))
+    return sorted(overdue, key=lambda item: item[1], reverse=True)
@@ -0,0 +1,126 @@
+# team_snapshot.py
+"""
+Estado de hoy de un equipo completo con un número fijo de consultas.
+
+Los dashboards de supervisor y de campaña hacían, por cada miembro,
+``team_workdays.get(employee=member)``, ``get_active_session()`` y
+``calculate_daily_stats()`` (3+ consultas por agente, y la página de campaña
+se refresca cada 30 segundos). Aquí se cargan de una vez:
+
+1. WorkDay de hoy de todos los empleados
+2. Sus sesiones (para la sesión abierta, los totales en vivo y las horas nocturnas)
+3. WeeklyHoursSummary de la semana (horas de los otros días)
+
+y las estadísticas de cada miembro se arman en memoria.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.utils import timezone
+
+from attendance.models import ActivitySession, WorkDay, WeeklyHoursSummary
+
+
+def weekly_base_seconds_map(work_days):
+    """
+    {work_day_id: segundos trabajados en la semana sin contar ese día}.
+
+    Una consulta de WeeklyHoursSummary; las semanas que todavía no tienen
+    fila se reconstruyen juntas.
+    """
+    if not work_days:
+        return {}
+
+    keys = {(wd.employee_id, wd.date) for wd in work_days}
+    weeks = {(employee_id, WeeklyHoursSummary.week_key(day)) for employee_id, day in keys}
+
+    def load():
+        iso_weeks = {week for _, week in weeks}
+        summaries = WeeklyHoursSummary.objects.filter(
+            employee_id__in={employee_id for employee_id, _ in weeks},
+            iso_year__in={year for year, _ in iso_weeks},
+            iso_week__in={week for _, week in iso_weeks},
+        ).values_list('employee_id', 'iso_year', 'iso_week', 'total_work_time')
+        return {
+            (employee_id, (iso_year, iso_week)): work_time
+            for employee_id, iso_year, iso_week, work_time in summaries
+        }
+
+    totals = load()
+    if weeks - totals.keys():
+        WeeklyHoursSummary.rebuild_weeks(
+            (employee_id, day) for employee_id, day in keys
+            if (employee_id, WeeklyHoursSummary.week_key(day)) not in totals
+        )
+        totals = load()
+
+    base = {}
+    for work_day in work_days:
+        week_total = totals.get((work_day.employee_id, WeeklyHoursSummary.week_key(work_day.date)), timedelta(0))
+        stored = work_day.stored_week_contribution() or work_day.week_contribution()
+        base[work_day.id] = max((week_total - stored[3]).total_seconds(), 0)
+    return base
+
+
+def team_snapshot(employees, day=None, now=None):
+    """
+    Filas del dashboard para ``employees`` (lista o queryset, en ese orden).
+
+    Cada fila tiene employee, workday, current_session, formatted_session y
+    daily_stats (None si el empleado no tiene WorkDay ese día). Los totales
+    incluyen la sesión abierta hasta ``now``; no se guarda nada.
+    """
+    # Import local: attendance.views importa este módulo
+    from attendance.views import calculate_daily_stats
+
+    employees = list(employees)
+    now = now or timezone.now()
+    day = day or now.date()
+
+    work_days = {
+        wd.employee_id: wd
+        for wd in WorkDay.objects.filter(
+            employee_id__in=[employee.id for employee in employees],
+            date=day,
+        )
+    }
+
+    sessions_by_workday = defaultdict(list)
+    if work_days:
+        sessions = ActivitySession.objects.filter(
+            work_day_id__in=[wd.id for wd in work_days.values()]
+        ).order_by('start_time')
+        for session in sessions:
+            sessions_by_workday[session.work_day_id].append(session)
+
+    weekly_base = weekly_base_seconds_map(list(work_days.values()))
+
+    rows = []
+    for employee in employees:
+        work_day = work_days.get(employee.id)
+        current_session = None
+        daily_stats = None
+
+        if work_day:
+            work_day.employee = employee
+            sessions = sessions_by_workday.get(work_day.id, [])
+            current_session = next((s for s in sessions if s.end_time is None), None)
+            work_day._active_session = current_session
+
+            work_day.apply_live_totals(sessions, now=now)
+            daily_stats = calculate_daily_stats(
+                work_day, employee,
+                sessions=sessions,
+                now=now,
+                weekly_base=weekly_base.get(work_day.id, 0),
+            )
+
+        rows.append({
+            'employee': employee,
+            'workday': work_day,
+            'current_session': current_session,
+            'formatted_session': work_day.get_formatted_session() if work_day else None,
+            'daily_stats': daily_stats,
+        })
+
+    return rows
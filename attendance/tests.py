@@ -1,3 +1,642 @@
-from django.test import TestCase
+import hashlib
+import json
+import random
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count, F, Q, Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import DeviceToken
+from core.models import Campaign, Employee, Position
+from core.management.commands.benchmark_night_minutes import minute_loop_night_minutes
+from core.management.commands.rebuild_weekly_hours import rebuild_weekly_hours
+from core.tests import LOCMEM_CACHES, ScheduleFixtureMixin
+from workforce.models import EmployeeSchedule
+from core.utils.cache_layer import entity_versions
+from . import live_status
+from . import daily_facts
+from .api_views import keyset_page, ndjson_response
+from .approvals import approve_workdays
+from .daily_facts import compute_daily_facts, compute_facts_for_dates, facts_by_date
+from .live_status import event_key, publish_events, read_events
+from .models import ActivitySession, DailyAttendanceFact, Occurrence, WeeklyHoursSummary, WorkDay
+from .pay_rules import calculate_pay_batch, price_workdays
+from .night_hours import night_minutes, sessions_night_minutes
+from .presence import Presence
+from .serializers import WorkDaySerializer
+
+
+class NightMinutesTests(SimpleTestCase):
+    """night_minutes gives the same count as the old minute-by-minute loop."""
+
+    def assertSameAsLoop(self, start, end):
+        self.assertEqual(
+            night_minutes(start, end),
+            minute_loop_night_minutes(start, end),
+            f'{start} -> {end}',
+        )
+
+    def test_edges(self):
+        day = datetime(2026, 3, 2)
+        cases = [
+            (day.replace(hour=9), day.replace(hour=17)),                 # sin horas nocturnas
+            (day.replace(hour=16), day.replace(hour=23)),                # entra en la franja
+            (day.replace(hour=20, minute=59, second=30), day.replace(hour=21, minute=0, second=1)),
+            (day.replace(hour=22), day.replace(hour=22)),                # duración cero
+            (day.replace(hour=22), day.replace(hour=21)),                # fin antes del inicio
+            (day.replace(hour=5, second=59), day.replace(hour=7, second=1)),
+            (day.replace(hour=18), day + timedelta(days=2, hours=8)),    # varias noches
+        ]
+        for start, end in cases:
+            self.assertSameAsLoop(start, end)
+
+    def test_open_sessions(self):
+        self.assertEqual(night_minutes(None, datetime(2026, 3, 2, 23)), 0)
+        self.assertEqual(night_minutes(datetime(2026, 3, 2, 23), None), 0)
+
+        start = datetime(2026, 3, 2, 20)
+        now = datetime(2026, 3, 2, 23)
+        self.assertEqual(sessions_night_minutes([(start, None)]), 0)
+        self.assertEqual(sessions_night_minutes([(start, None)], now=now), 120)
+
+    def test_random_intervals_match_minute_loop(self):
+        rnd = random.Random(2026)
+        base = datetime(2026, 1, 1)
+        zone = ZoneInfo('America/Santo_Domingo')
+        for i in range(2000):
+            start = base + timedelta(
+                seconds=rnd.randrange(0, 365 * 86400),
+                microseconds=rnd.randrange(0, 10 ** 6) if i % 3 == 0 else 0,
+            )
+            end = start + timedelta(seconds=rnd.choice([
+                rnd.randrange(-120, 120),
+                rnd.randrange(0, 16 * 3600),
+                rnd.randrange(0, 3 * 86400),
+            ]))
+            if i % 5 == 0:
+                start, end = start.replace(tzinfo=zone), end.replace(tzinfo=zone)
+            self.assertSameAsLoop(start, end)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SessionTotalsTests(TestCase):
+    """Closing sessions one by one leaves the same totals as a full recompute."""
+
+    def setUp(self):
+        self.employee = Employee.objects.create(gender='M')
+        self.work_day = WorkDay.objects.create(employee=self.employee, date=date(2026, 3, 2))
+        self.start = datetime(2026, 3, 2, 8, 0)
+
+    def close_sessions(self, *lengths):
+        start = self.start
+        for length in lengths:
+            ActivitySession.objects.create(
+                work_day=self.work_day, session_type='work', start_time=start, end_time=start + length,
+            )
+            start += length + timedelta(minutes=5)
+
+    def assertMatchesRecompute(self, expected_hours):
+        incremental = WorkDay.objects.get(pk=self.work_day.pk)
+        self.assertEqual(incremental.productive_hours, expected_hours)
+        self.assertEqual(
+            WeeklyHoursSummary.for_week(self.employee.id, self.work_day.date).productive_hours,
+            expected_hours,
+        )
+
+        recomputed = WorkDay.objects.get(pk=self.work_day.pk)
+        recomputed.calculate_daily_totals()
+        self.assertEqual(recomputed.total_work_time, incremental.total_work_time)
+        self.assertEqual(WorkDay.objects.get(pk=self.work_day.pk).productive_hours, expected_hours)
+
+    def test_three_twenty_minute_sessions_make_one_hour(self):
+        self.close_sessions(*[timedelta(minutes=20)] * 3)
+        self.assertMatchesRecompute(Decimal('1.00'))
+
+    def test_rounding_uses_accumulated_time(self):
+        # 18 s = 0.005 h: cada pieza redondeada sola sumaría 0.03
+        self.close_sessions(*[timedelta(seconds=18)] * 3)
+        self.assertMatchesRecompute(Decimal('0.02'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TeamBoardQueryCountTests(TestCase):
+    """The supervisor and campaign boards run the same queries for 5 or 40 agents."""
+
+    def team(self, size):
+        now = timezone.now()
+        campaign = Campaign.objects.create(name=f'Campaign {size}', start_date=date(2026, 1, 1), hour_rate=Decimal('300'))
+        user = User.objects.create(username=f'supervisor{size}', is_staff=True)
+        supervisor = Employee.objects.create(user=user, is_supervisor=True, gender='M', current_campaign=campaign)
+
+        for i in range(size):
+            agent = Employee.objects.create(
+                user=User.objects.create(username=f'agent{size}_{i}'),
+                supervisor=supervisor, current_campaign=campaign, gender='M', is_logged_in=True,
+            )
+            if i % 4 == 3:
+                continue  # sin WorkDay hoy
+            work_day = WorkDay.objects.create(employee=agent, date=now.date(), check_in=now - timedelta(hours=3))
+            ActivitySession.objects.create(work_day=work_day, session_type='work',
+                                           start_time=now - timedelta(hours=3), end_time=now - timedelta(hours=1))
+            ActivitySession.objects.create(work_day=work_day, session_type='break',
+                                           start_time=now - timedelta(hours=1), end_time=now - timedelta(minutes=45))
+            if i % 2:
+                ActivitySession.objects.create(work_day=work_day, session_type='work',
+                                               start_time=now - timedelta(minutes=45))
+        return user, campaign
+
+    def client_for(self, user):
+        # accounts.middleware exige el dispositivo registrado
+        DeviceToken.objects.create(
+            user=user, token=f'token-{user.id}',
+            device_fingerprint=hashlib.sha256(b'-device').hexdigest(),
+        )
+        self.client.cookies['device_uuid'] = 'device'
+        self.client.force_login(user)
+        return self.client
+
+    def board_queries(self, size):
+        user, campaign = self.team(size)
+        client = self.client_for(user)
+        counts = {}
+        for board, url in (
+            ('supervisor', reverse('supervisor_dashboard')),
+            ('campaign', reverse('campaign_detail', args=[campaign.id])),
+        ):
+            client.get(url)  # presencia y semanas ya creadas
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200, board)
+            counts[board] = len(queries)
+        return counts
+
+    @mock.patch('django.utils.timezone.now', return_value=datetime(2026, 3, 2, 12, 0))
+    def test_board_queries_do_not_grow_with_team_size(self, _now):
+        # Hora fija: cerca de medianoche "hoy" cambiaba entre los dos equipos
+        self.assertEqual(self.board_queries(5), self.board_queries(40))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ApprovalCacheVersionTests(TestCase):
+    """A bulk approval bumps what the WorkDay signals would have bumped for each day."""
+
+    def test_every_month_employee_and_workday_are_bumped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            employee = Employee.objects.create(gender='M')
+            other = Employee.objects.create(gender='M')
+            first = WorkDay.objects.create(employee=employee, date=date(2026, 1, 30))
+            last = WorkDay.objects.create(employee=other, date=date(2026, 3, 2))
+        depends = [
+            ('workday_month', '2026-01'), ('workday_month', '2026-02'), ('workday_month', '2026-03'),
+            ('workday_month', 'all'), ('employee', employee.id), ('employee', other.id),
+            ('workday', first.id), ('workday', last.id),
+        ]
+        before = entity_versions(depends)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            approve_workdays(WorkDay.objects.all(), user=None)
+
+        after = entity_versions(depends)
+        unchanged = [entity for entity, old, new in zip(depends, before, after) if old == new]
+        self.assertEqual(unchanged, [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LiveStatusStreamTests(TestCase):
+    """Each board only receives its own agents' events and the stream resets on gaps."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.campaign = Campaign.objects.create(name='Sales', start_date=date(2026, 1, 1), hour_rate=Decimal('300'))
+        self.other_campaign = Campaign.objects.create(name='Support', start_date=date(2026, 1, 1), hour_rate=Decimal('300'))
+        self.supervisor_user = User.objects.create(username='supervisor')
+        self.supervisor = Employee.objects.create(user=self.supervisor_user, is_supervisor=True, gender='M')
+        # (empleado, campaña, supervisor): solo el primero es del equipo y de la campaña
+        publish_events([
+            Presence(101, self.campaign.id, self.supervisor.id, 'work', None, True, True),
+            Presence(102, self.other_campaign.id, None, 'break', None, True, True),
+            Presence(103, self.campaign.id, None, 'offline', None, False, False),
+        ])
+
+        patcher = mock.patch.object(live_status, 'LIVE_STREAM_SECONDS', 0)  # una sola lectura
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def client_for(self, user):
+        # accounts.middleware exige el dispositivo registrado
+        DeviceToken.objects.get_or_create(user=user, defaults={
+            'token': f'token-{user.id}',
+            'device_fingerprint': hashlib.sha256(b'-device').hexdigest(),
+        })
+        self.client.cookies['device_uuid'] = 'device'
+        self.client.force_login(user)
+        return self.client
+
+    def stream(self, user, query=''):
+        response = self.client_for(user).get(reverse('live_status_stream') + '?after=0' + query)
+        self.assertEqual(response.status_code, 200)
+        messages = b''.join(response.streaming_content).decode().split('\n\n')
+        employees = [json.loads(line[6:])['employee'] for message in messages
+                     for line in message.splitlines() if line.startswith('data: ')]
+        return messages, employees
+
+    def test_agents_are_forbidden(self):
+        agent = User.objects.create(username='agent')
+        Employee.objects.create(user=agent, gender='M')
+        self.assertEqual(self.client_for(agent).get(reverse('live_status_stream')).status_code, 403)
+
+    def test_supervisor_gets_their_team_and_the_last_id(self):
+        messages, employees = self.stream(self.supervisor_user)
+        self.assertEqual(messages[0], f'retry: {live_status.LIVE_RETRY_MS}')
+        self.assertEqual(employees, [101])
+        self.assertEqual(messages[-2], 'id: 3')  # los demás eventos solo avanzan el id
+
+    def test_campaign_board_gets_the_campaign(self):
+        staff = User.objects.create(username='staff', is_staff=True)
+        self.assertEqual(self.stream(staff, f'&campaign={self.campaign.id}')[1], [101, 103])
+        self.assertEqual(self.stream(staff, f'&campaign={self.other_campaign.id}')[1], [102])
+
+        client = self.client_for(staff)
+        self.assertEqual(client.get(reverse('live_status_stream') + '?campaign=x').status_code, 400)
+        self.assertEqual(client.get(reverse('live_status_stream')).status_code, 400)  # no es supervisor
+
+    def test_full_process_falls_back_to_one_read(self):
+        with mock.patch.object(live_status, '_stream_slots', threading.BoundedSemaphore(1)) as slots:
+            with mock.patch.object(live_status, 'LIVE_STREAM_SECONDS', 60):
+                slots.acquire()  # otro tablero ocupa el cupo
+                messages, employees = self.stream(self.supervisor_user)
+                slots.release()
+            self.assertEqual(messages[0], f'retry: {live_status.LIVE_POLL_RETRY_MS}')
+            self.assertEqual(employees, [101])
+
+            # Con cupo: la conexión larga lo devuelve al cerrarse la respuesta
+            self.stream(self.supervisor_user)
+            self.assertTrue(slots.acquire(blocking=False))
+
+    def test_read_events_waits_for_a_gap_then_resets(self):
+        self.assertEqual([seq for seq, _ in read_events(0)[0]], [1, 2, 3])
+
+        caches['default'].delete(event_key(2))  # tomada por otro proceso, aún sin escribir
+        events, last, reset, gap_polls = read_events(0)
+        self.assertEqual(([seq for seq, _ in events], last, reset, gap_polls), ([1], 1, False, 1))
+        self.assertEqual(read_events(last, gap_polls)[1:], (1, False, 2))
+        self.assertEqual(read_events(last, 2)[1:], (3, True, 0))
+
+    def test_read_events_resets_a_client_ahead_or_too_far_behind(self):
+        self.assertEqual(read_events(10)[1:], (3, True, 0))  # secuencia reiniciada
+        self.assertEqual(read_events(3)[1:], (3, False, 0))
+        with mock.patch.object(live_status, 'MAX_EVENTS_PER_READ', 2):
+            self.assertEqual(read_events(0), ([], 3, True, 0))
+
+
+class PayRulesBatchTests(TestCase):
+    """The batch path prices every weekly bracket and rate source to the known amounts."""
+
+    def setUp(self):
+        self.position = Position.objects.create(name='Agent', hour_rate=Decimal('350.00'))
+        campaign = Campaign.objects.create(name='Sales', start_date=date(2026, 1, 1), hour_rate=Decimal('300.00'))
+        self.agent = Employee.objects.create(gender='M', position=self.position, current_campaign=campaign)
+        # Salario fijo gana a la posición: 48000 / 30 / 8 = 200 por hora
+        self.fixed = Employee.objects.create(gender='M', position=self.position, fixed_rate=True,
+                                             custom_base_salary=Decimal('48000.00'))
+        self.campaign_only = Employee.objects.create(gender='M', current_campaign=campaign)
+
+    def split(self, result):
+        return tuple(result[field] for field in (
+            'regular_hours', 'overtime_hours_135', 'overtime_hours_200', 'night_hours', 'total_pay'
+        ))
+
+    def test_brackets_and_rate_sources(self):
+        # Un lunes por semana ISO; las horas de la semana vienen del mapa
+        mondays = [date(2026, 3, 2) + timedelta(weeks=i) for i in range(8)]
+        rows_and_weeks = [
+            ((self.agent, mondays[0], 8, 0), 40),                  # todo regular
+            ((self.agent, mondays[1], 8, 0), 50),                  # cruza 44
+            ((self.agent, mondays[2], 8, 0), 72),                  # cruza 68
+            ((self.agent, mondays[3], 8, 0), 80),                  # todo por encima de 68
+            ((self.agent, mondays[4], 30, 0), 70),                 # cruza 44 y 68
+            ((self.agent, mondays[5], '8', '2.5'), 40),            # nocturnas
+            ((self.fixed, mondays[6], 8, 0), 50),
+            ((self.campaign_only, mondays[7], 8, 0), 50),
+        ]
+        weekly = {(row[0].id, *row[1].isocalendar()[:2]): hours for row, hours in rows_and_weeks}
+        results = calculate_pay_batch([row for row, _ in rows_and_weeks], weekly_hours=weekly)
+
+        expected = [
+            ('8', '0', '0', '0', '2800'),
+            ('2', '6', '0', '0', '3535'),          # 2*350 + 6*472.5
+            ('0', '4', '4', '0', '4690'),          # 4*472.5 + 4*700
+            ('0', '0', '8', '0', '5600'),
+            ('4', '24', '2', '0', '14140'),        # 4*350 + 24*472.5 + 2*700
+            ('8', '0', '0', '2.5', '3806.25'),     # 8*350 + 2.5*402.5
+            ('2', '6', '0', '0', '2020'),          # 2*200 + 6*270
+            ('2', '6', '0', '0', '3030'),          # 2*300 + 6*405
+        ]
+        self.assertEqual([self.split(result) for result in results],
+                         [tuple(Decimal(value) for value in row) for row in expected])
+        self.assertEqual([result['regular_rate'] for result in results[-3:]],
+                         [Decimal('350'), Decimal('200'), Decimal('300')])
+
+    def test_missing_weeks_are_summed_from_the_rows(self):
+        monday = date(2026, 3, 2)
+        results = calculate_pay_batch([
+            (self.campaign_only, monday, 30, 0),
+            (self.campaign_only, datetime(2026, 3, 3, 8, 0), 20, 0),  # misma semana: 50 horas
+        ])
+        self.assertEqual([self.split(result) for result in results], [
+            (Decimal('24'), Decimal('6'), Decimal('0'), Decimal('0'), Decimal('9630')),  # 24*300 + 6*405
+            (Decimal('14'), Decimal('6'), Decimal('0'), Decimal('0'), Decimal('6630')),  # 14*300 + 6*405
+        ])
+
+    def test_price_workdays_matches_each_day_priced_alone(self):
+        monday = date(2026, 3, 2)
+        # Sin señales: la semana la crea weekly_hours_for desde WorkDay
+        days = WorkDay.objects.bulk_create([
+            WorkDay(employee=self.agent, date=monday + timedelta(days=i), productive_hours=Decimal('10.00'))
+            for i in range(5)
+        ])
+        friday = days[-1]
+        ActivitySession.objects.bulk_create([  # solo para las horas nocturnas
+            ActivitySession(work_day=friday, session_type='work', start_time=datetime(2026, 3, 6, 19, 0),
+                            end_time=datetime(2026, 3, 6, 23, 0), duration=timedelta(hours=4)),
+        ])
+
+        priced = price_workdays(WorkDay.objects.filter(employee=self.agent).select_related('employee__position').order_by('date'))
+
+        # Semana de 50 horas: 4 regulares y 6 al 135%; el viernes 2 nocturnas
+        self.assertEqual([work_day.total_pay for work_day in priced],
+                         [Decimal('4235')] * 4 + [Decimal('5040')])  # 4*350 + 6*472.5 (+ 2*402.5)
+        for work_day in priced:
+            alone = WorkDay.objects.get(id=work_day.id)
+            alone.calculate_pay_with_dominican_law()
+            self.assertEqual([getattr(alone, field) for field in ('regular_hours', 'overtime_hours_135', 'night_hours', 'total_pay')],
+                             [getattr(work_day, field) for field in ('regular_hours', 'overtime_hours_135', 'night_hours', 'total_pay')])
+
+
+class WeeklyHoursSummaryTests(TestCase):
+    """The weekly rollup kept by deltas always equals the WorkDay aggregate."""
+
+    def setUp(self):
+        self.employee = Employee.objects.create(gender='M')
+        self.monday = date(2026, 3, 2)
+        self.next_monday = date(2026, 3, 9)
+
+    def assert_weeks(self, first, second):
+        stored = [
+            WeeklyHoursSummary.objects.filter(employee=self.employee, week_start=day)
+            .values_list('productive_hours', 'total_work_time').first()
+            for day in (self.monday, self.next_monday)
+        ]
+        raw = [tuple(WeeklyHoursSummary.raw_totals(self.employee.id, day).values())
+               for day in (self.monday, self.next_monday)]
+        self.assertEqual(stored, raw)
+        self.assertEqual([hours for hours, _ in stored], [Decimal(first), Decimal(second)])
+        result = rebuild_weekly_hours(self.monday, self.next_monday, check_only=True)
+        self.assertEqual(result['mismatches'], [])
+
+    def test_save_move_delete_and_session_close(self):
+        monday = WorkDay.objects.create(employee=self.employee, date=self.monday)
+        monday.productive_hours = Decimal('6.00')
+        monday.total_work_time = timedelta(hours=6)
+        monday.save()
+        tuesday = WorkDay.objects.create(employee=self.employee, date=self.monday + timedelta(days=1))
+        WorkDay.objects.create(employee=self.employee, date=self.next_monday)  # la otra semana ya tiene fila
+        self.assert_weeks('6.00', '0.00')
+
+        # Cierre de sesión: un UPDATE y la diferencia en la semana
+        session = ActivitySession.objects.create(work_day=tuesday, session_type='work',
+                                                 start_time=datetime(2026, 3, 3, 8, 0))
+        session.end_time = datetime(2026, 3, 3, 12, 30)
+        session.save()
+        self.assert_weeks('10.50', '0.00')
+
+        # El supervisor mueve el día a la semana siguiente
+        tuesday = WorkDay.objects.get(id=tuesday.id)
+        tuesday.date = self.next_monday + timedelta(days=1)
+        tuesday.save()
+        self.assert_weeks('6.00', '4.50')
+
+        # Ausencia: deja de contar
+        tuesday.status = 'absent'
+        tuesday.save()
+        self.assert_weeks('6.00', '0.00')
+
+        WorkDay.objects.get(id=monday.id).delete()
+        self.assert_weeks('0.00', '0.00')
+
+
+class DailyFactsTests(ScheduleFixtureMixin, TestCase):
+    """DailyAttendanceFact sums to the per-day counts read straight from WorkDay and the schedules."""
+
+    def setUp(self):
+        self.build_schedules(seed=11)
+        self.days = [self.today - timedelta(days=offset) for offset in range(40, 0, -1)]
+        with mock.patch.object(daily_facts, 'FACT_CHUNK_DAYS', 7):  # varios bloques
+            compute_daily_facts(self.days[0], self.days[-1])
+
+    def old_day(self, day, employees):
+        workdays = WorkDay.objects.filter(employee__in=employees, date=day)
+        schedules = EmployeeSchedule.objects.filter(employee__in=employees)
+        return {
+            'workdays': workdays.count(),
+            'present': workdays.filter(check_in__isnull=False).count(),
+            'scheduled': self.old_scheduled(day, schedules),
+            'scheduled_employees': self.old_scheduled(day, schedules, distinct_employees=True),
+        }
+
+    def assert_days_match(self, days):
+        for campaign in [None] + self.campaigns:
+            for active_only in (False, True):
+                employees = Employee.objects.all()
+                if campaign is not None:
+                    employees = employees.filter(current_campaign=campaign)
+                if active_only:
+                    employees = employees.filter(is_active=True)
+                stored = facts_by_date(days, campaign, active_only)
+                for day in days:
+                    row = stored.get(day, {})
+                    totals = {key: row.get(key) or 0 for key in ('workdays', 'present', 'scheduled', 'scheduled_employees')}
+                    self.assertEqual(totals, self.old_day(day, employees), (day, campaign, active_only))
+
+    def test_totals_match_the_per_day_counts(self):
+        self.assert_days_match(self.days)
+
+        facts = {
+            row['date']: row for row in DailyAttendanceFact.objects.values('date').annotate(
+                completed=Sum('completed_count'), open=Sum('open_count'), hours=Sum('productive_hours'),
+            )
+        }
+        for day in self.days:
+            expected = WorkDay.objects.filter(date=day).aggregate(
+                completed=Count('id', filter=Q(check_out__isnull=False)),
+                open=Count('id', filter=Q(check_in__isnull=False, check_out__isnull=True)),
+                hours=Sum('productive_hours'),
+            )
+            row = facts.get(day, {})
+            self.assertEqual((row.get('completed', 0), row.get('open', 0), row.get('hours') or 0),
+                             (expected['completed'], expected['open'], expected['hours'] or 0), day)
+
+    def test_each_employee_falls_in_the_shift_of_their_latest_schedule(self):
+        expected = {}
+        for day in self.days:
+            for work_day in WorkDay.objects.filter(date=day):
+                latest = self.old_schedules(
+                    day, EmployeeSchedule.objects.filter(employee_id=work_day.employee_id)
+                ).order_by('-start_date').first()
+                key = (day, latest.shift_id if latest else None)
+                expected[key] = expected.get(key, 0) + 1
+
+        stored = {
+            (row['date'], row['shift']): row['workdays']
+            for row in DailyAttendanceFact.objects.values('date', 'shift').annotate(workdays=Sum('workday_count'))
+            if row['workdays']
+        }
+        self.assertEqual(stored, expected)
+
+    def test_recomputed_date_follows_an_edit(self):
+        day = self.days[10]
+        WorkDay.objects.filter(date=day).update(check_in=None, check_out=None)
+        compute_facts_for_dates([day, self.days[11]])
+        self.assert_days_match([day, self.days[11]])
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages and NDJSON walk every row once, through ties and NULL check-ins."""
+
+    def setUp(self):
+        employees = [Employee.objects.create(gender='M') for _ in range(5)]
+        tie = datetime(2026, 3, 2, 8, 0)
+        rows = []
+        for i, employee in enumerate(employees):
+            for day in range(5):
+                # Cada día los cinco entran a la misma hora; sin entrada los días 3 y 4
+                check_in = None if day >= 3 else tie + timedelta(days=day)
+                rows.append(WorkDay(employee=employee, date=date(2026, 3, 2 + day), check_in=check_in))
+        WorkDay.objects.bulk_create(rows)
+        self.expected = list(WorkDay.objects.order_by(F('check_in').desc(nulls_last=True), '-id').values_list('id', flat=True))
+
+    def walk(self, size):
+        ids, cursor, pages = [], None, 0
+        while True:
+            page, cursor = keyset_page(WorkDay.objects.all(), 'check_in', cursor, size)
+            ids.extend(work_day.id for work_day in page)
+            pages += 1
+            if cursor is None:
+                return ids, pages
+
+    def test_pages_of_every_size_cover_each_row_once(self):
+        for size in (1, 2, 4, 7, 10, 25, 30):
+            ids, pages = self.walk(size)
+            self.assertEqual(ids, self.expected, size)
+            self.assertEqual(pages, max(1, -(-len(self.expected) // size)), size)
+
+    def test_api_cursor_follows_next(self):
+        url = reverse('workday-data')
+        ids, params = [], {'page_size': 4}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.json()['data'])
+            if not response.json()['next']:
+                break
+            params = {'page_size': 4, 'cursor': response.json()['next']}
+        self.assertEqual(ids, self.expected)
+
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, 400)
+
+    def test_ndjson_streams_every_row_once(self):
+        response = ndjson_response(WorkDay.objects.select_related('employee'), 'check_in', WorkDaySerializer, chunk_size=3)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], self.expected)
+
+        response = self.client.get(reverse('workday-data'), {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), len(self.expected))
+
+    def test_occurrence_dates_tie_across_pages(self):
+        employee = Employee.objects.create(gender='M')
+        Occurrence.objects.bulk_create([
+            Occurrence(employee=employee, occurrence_type='call_drop', date=date(2026, 3, 2 + i // 4),
+                       start_time=datetime(2026, 3, 2, 9).time(), end_time=datetime(2026, 3, 2, 10).time())
+            for i in range(10)
+        ])
+        expected = list(Occurrence.objects.order_by('-date', '-id').values_list('id', flat=True))
+        ids, cursor = [], None
+        while True:
+            page, cursor = keyset_page(Occurrence.objects.all(), 'date', cursor, 3)
+            ids.extend(occurrence.id for occurrence in page)
+            if cursor is None:
+                break
+        self.assertEqual(ids, expected)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnalyticsETagTests(TestCase):
+    """Summaries answer 304 while nothing in their window changes and a new ETag after a write."""
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['local'].clear()
+        self.employee = Employee.objects.create(gender='M')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.work_day = WorkDay.objects.create(employee=self.employee, date=date(2026, 3, 2),
+                                                   check_in=datetime(2026, 3, 2, 8, 0))
+            self.occurrence = Occurrence.objects.create(
+                employee=self.employee, occurrence_type='call_drop', date=date(2026, 3, 2),
+                start_time=datetime(2026, 3, 2, 9).time(), end_time=datetime(2026, 3, 2, 10).time(),
+            )
+        self.march = {'format': 'summary', 'start_date': '2026-03-01', 'end_date': '2026-03-31'}
+
+    def etag(self, name, params, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        response = self.client.get(reverse(name), params, **headers)
+        self.assertIn(response.status_code, (200, 304))
+        return response.status_code, response['ETag']
+
+    def test_workday_summary(self):
+        status, etag = self.etag('workday-data', self.march)
+        self.assertEqual(status, 200)
+        self.assertEqual(self.etag('workday-data', self.march, etag), (304, etag))
+        # Mismos parámetros en otro orden y con uno vacío
+        reordered = {'end_date': '2026-03-31', 'employee_id': '', 'start_date': '2026-03-01', 'format': 'summary'}
+        self.assertEqual(self.etag('workday-data', reordered, etag), (304, etag))
+
+        # Otro mes no toca la ventana
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkDay.objects.create(employee=self.employee, date=date(2026, 1, 5))
+        self.assertEqual(self.etag('workday-data', self.march, etag), (304, etag))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.work_day.check_out = datetime(2026, 3, 2, 16, 0)
+            self.work_day.save()
+        status, changed = self.etag('workday-data', self.march, etag)
+        self.assertEqual(status, 200)
+        self.assertNotEqual(changed, etag)
+        self.assertEqual(self.etag('workday-data', self.march, changed), (304, changed))
+
+    def test_occurrence_edit_without_timestamp_changes_the_etag(self):
+        status, etag = self.etag('api-occurrence-data', self.march)
+        self.assertEqual(status, 200)
+        self.assertEqual(self.etag('api-occurrence-data', self.march, etag), (304, etag))
+
+        # Occurrence no tiene updated_at: solo cambia la versión del mes
+        with self.captureOnCommitCallbacks(execute=True):
+            self.occurrence.comment = 'Dropped twice'
+            self.occurrence.save()
+        status, changed = self.etag('api-occurrence-data', self.march, etag)
+        self.assertEqual(status, 200)
+        self.assertNotEqual(changed, etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.occurrence.delete()
+        self.assertNotEqual(self.etag('api-occurrence-data', self.march, changed)[1], changed)
@@ -18,6 +18,7 @@ urlpatterns = [
     path('profile/<int:employee_id>/edit/', views.edit_employee_profile, name='edit_employee_profile'),
 
     path('dashboard-supervisor/', views.supervisor_dashboard, name='supervisor_dashboard'),
+    path('live-status/stream/', views.live_status_stream, name='live_status_stream'),
     path('team/history/', views.team_attendance_history, name='team_attendance_history'),
     path('employee/<int:employee_id>/', views.employee_attendance_detail, name='employee_attendance_detail'),
     
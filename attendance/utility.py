@@ -219,4 +219,19 @@ def get_recent_daily_stats(employee, days=7):
             'work_sessions': work_sessions,
         })
     
-    return daily_stats
\ No newline at end of file
+    return daily_stats
+
+
+def weekly_base_seconds(work_day):
+    """
+    Segundos trabajados en la semana sin contar ``work_day``.
+
+    Sale de la fila de WeeklyHoursSummary menos lo guardado de este día, así
+    que los cierres de sesión incrementales la mantienen al día sin leer la
+    semana completa.
+    """
+    from attendance.models import WeeklyHoursSummary
+
+    summary = WeeklyHoursSummary.for_week(work_day.employee_id, work_day.date)
+    stored = work_day.stored_week_contribution() or work_day.week_contribution()
+    return max((summary.total_work_time - stored[3]).total_seconds(), 0)
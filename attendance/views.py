@@ -1,5 +1,5 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponseForbidden,HttpResponse
+from django.http import JsonResponse, HttpResponseForbidden,HttpResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import user_passes_test
@@ -21,28 +21,29 @@ from django.http import FileResponse
 from django.core.files.base import ContentFile
 
 
-import os
 import decimal
-import openpyxl
 import json
 
 from django.views.generic import DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
 
-
-from openpyxl.styles import Font, Alignment
-from openpyxl.utils import get_column_letter
-
-
-
 from core.models import Employee, Campaign
 from .forms import EmployeeProfileForm,ActivitySessionForm, OccurrenceForm
 from .models import WorkDay,ActivitySession, Occurrence
+from .excel_exports import (
+    attendance_history_workbook, employee_attendance_workbook, team_report_workbook, xlsx_response,
+)
+from .night_hours import sessions_night_minutes
+from . import pay_rules
 from .status_helpers import close_active_status
+from .team_snapshot import team_snapshot
+from .live_status import current_seq, open_stream
+from .presence import overdue_breaks, presence_by_supervisor
 from .utility import *
 from core.utils.payroll import get_effective_pay_rate
 from .tasks import generate_and_email_team_report
+from core.tasks import force_logout_all_users as core_force_logout_all_users
 # Create your views here.
 
 
@@ -90,57 +91,8 @@ def force_logout_all_users(request):
     """
     Deletes all active sessions and properly closes all work sessions.
     """
-    now = timezone.now()
-    
-    try:
-        with transaction.atomic():
-            # 1. ✅ Cerrar todas las ActivitySession activas
-            active_sessions = ActivitySession.objects.filter(end_time__isnull=True)
-            session_count = active_sessions.count()
-            
-            for session in active_sessions:
-                session.end_time = now
-                session.notes = f"{session.notes or ''}\nForcefully closed by system at {now}".strip()
-                session.save(update_fields=['end_time', 'notes'])
-            
-            # 2. ✅ Actualizar WorkDays activos
-            active_workdays = WorkDay.objects.filter(status='active')
-            workday_count = active_workdays.count()
-            
-            for workday in active_workdays:
-                workday.check_out = now
-                workday.status = 'completed'
-                workday.notes = f"{workday.notes or ''}\nForcefully closed by system at {now}".strip()
-                workday.calculate_daily_totals()  # Recalcular métricas
-                workday.save()
-            
-            # 3. ✅ Marcar todos los empleados como logout
-            employee_count = Employee.objects.filter(is_logged_in=True).update(
-                is_logged_in=False,
-                last_logout=now
-            )
-            
-            # 4. ✅ Eliminar sesiones de autenticación
-            session_auth_count = Session.objects.all().count()
-            Session.objects.all().delete()
-            
-            # Mensaje de confirmación
-            message = (
-                f"✅ Force logout completed at {now}:\n"
-                f"• {session_count} active work sessions closed\n"
-                f"• {workday_count} active workdays completed\n" 
-                f"• {employee_count} employees logged out\n"
-                f"• {session_auth_count} authentication sessions deleted"
-            )
-            
-            print(f"[{datetime.now()}] {message}")
-            
-            return HttpResponse(message)
-            
-    except Exception as e:
-        error_message = f"❌ Error during force logout: {str(e)}"
-        print(f"[{datetime.now()}] {error_message}")
-        return HttpResponse(error_message, status=500)
+    # Misma ruta por lote que la tarea de emergencia (core.tasks)
+    return core_force_logout_all_users(request)
 
 
 def is_supervisor(user):
@@ -157,21 +109,19 @@ def agent_dashboard(request):
     # 🔥 CRITICAL: Get or create active work day with auto-close logic
     work_day = get_or_create_active_work_day(employee)
     
-    # Get current active session
-    current_session = work_day.get_active_session()
-    
-    # Get all sessions for this work day (history)
-    history = work_day.sessions.all().order_by('start_time')
+    # Una sola consulta de sesiones: historial, sesión activa y totales en vivo
+    now = timezone.now()
+    history = list(work_day.sessions.all().order_by('start_time'))
+    current_session = next((s for s in history if s.end_time is None), None)
     
-    # Force calculate daily totals
-    calculate_daily_totals_manual(work_day)
-    work_day.refresh_from_db()
+    # Totales en memoria; un GET del dashboard no guarda nada
+    work_day.apply_live_totals(history, now=now)
     
     # Get campaign for break/lunch durations
     campaign = employee.current_campaign
     
     # Calculate all statistics
-    daily_stats = calculate_daily_stats(work_day, employee)
+    daily_stats = calculate_daily_stats(work_day, employee, sessions=history, now=now)
     
     context = {
         'employee': employee,
@@ -317,62 +267,24 @@ def auto_close_forgotten_workday(work_day):
 
 def calculate_daily_totals_manual(work_day):
     """
-    Manual calculation of daily totals to ensure it works
-    Includes ACTIVE sessions in calculation
-    
+    Full recalculation of daily totals (explicit adjustments / reconciliation)
+
     IMPORTANT: We track work, break, and lunch separately.
     - total_work_time = ONLY work sessions
     - total_break_time = ONLY break sessions  
     - total_lunch_time = ONLY lunch sessions
     - productive_hours = total_work_time (already excludes breaks/lunch)
+
+    Only CLOSED sessions are saved: closing a session adds its duration with
+    an F() update (ActivitySession.save), so the stored totals must never
+    include the running session. The active session is then added to the
+    in-memory work_day so the dashboards keep showing live time.
     """
-    # Get ALL sessions (including active ones)
-    all_sessions = work_day.sessions.all()
-    
-    total_work = timedelta(0)
-    total_break = timedelta(0)
-    total_lunch = timedelta(0)
-    break_count = 0
-    
-    now = timezone.now()
-    
-    for session in all_sessions:
-        # For active sessions (no end_time), calculate duration up to now
-        if session.end_time:
-            end_time = session.end_time
-        else:
-            # Active session - calculate duration up to current moment
-            end_time = now
-        
-        if session.start_time:
-            duration = end_time - session.start_time
-            
-            # Each session type is tracked separately
-            if session.session_type == 'work':
-                total_work += duration
-            elif session.session_type == 'break':
-                total_break += duration
-                break_count += 1
-            elif session.session_type == 'lunch':
-                total_lunch += duration
-    
-    # Update work_day fields
-    work_day.total_work_time = total_work
-    work_day.total_break_time = total_break
-    work_day.total_lunch_time = total_lunch
-    work_day.break_count = break_count
-    
-    # productive_hours = ONLY work time (breaks/lunch already excluded)
-    if total_work:
-        productive_hours = total_work.total_seconds() / 3600
-        work_day.productive_hours = round(productive_hours, 2)
-    else:
-        work_day.productive_hours = 0.0
-    
-    work_day.save()
+    work_day.calculate_daily_totals()
+    work_day.include_active_session()
 
 
-def calculate_daily_stats(work_day, employee):
+def calculate_daily_stats(work_day, employee, sessions=None, now=None, weekly_base=None):
     """
     Calculate all daily statistics for the dashboard
     
@@ -380,9 +292,19 @@ def calculate_daily_stats(work_day, employee):
     - total_work_time already EXCLUDES breaks/lunch (it's ONLY work sessions)
     - We DON'T need to subtract breaks/lunch again
     - Payable time = total_work_time (no subtraction needed!)
+    - Read only: nothing is saved. Pass the already loaded ``sessions`` to
+      avoid querying them again for night hours, and ``weekly_base`` (seconds
+      of the other days of the week) to skip the weekly summary lookup.
     """
     # Calculate night hours manually
-    night_hours = calculate_night_hours_manual(work_day)
+    if sessions is not None:
+        night_minutes = sessions_night_minutes(
+            [(s.start_time, s.end_time) for s in sessions if s.session_type == 'work'],
+            now=now or timezone.now(),
+        )
+        night_hours = round(night_minutes / 60, 2)
+    else:
+        night_hours = calculate_night_hours_manual(work_day)
     
     # 🔥 SAFE ACCESS: Check if fields exist and have values
     total_work_seconds = work_day.total_work_time.total_seconds() if work_day.total_work_time else 0
@@ -398,7 +320,7 @@ def calculate_daily_stats(work_day, employee):
     payable_hours_decimal = decimal.Decimal(str(payable_minutes / 60))
     
     # 📅 WEEKLY HOURS = Sum of PAYABLE hours for the entire week
-    weekly_hours = calculate_weekly_payable_hours(work_day)
+    weekly_hours = calculate_weekly_payable_hours(work_day, base_seconds=weekly_base)
     
     # Calculate pay breakdown based on PAYABLE TIME
     pay_breakdown = calculate_pay_breakdown_manual(
@@ -454,30 +376,19 @@ def calculate_daily_stats(work_day, employee):
     return stats
 
 
-def calculate_weekly_payable_hours(work_day):
-    """Calculate PAYABLE hours for the entire week"""
+def calculate_weekly_payable_hours(work_day, base_seconds=None):
+    """
+    Calculate PAYABLE hours for the entire week
+
+    Read only: the other days of the week (WeeklyHoursSummary, or
+    ``base_seconds`` when already loaded) plus the (possibly live,
+    in-memory) total of ``work_day`` itself.
+    """
     try:
-        date = work_day.date
-        start_of_week = date - timedelta(days=date.weekday())
-        end_of_week = start_of_week + timedelta(days=6)
-        
-        weekly_workdays = WorkDay.objects.filter(
-            employee=work_day.employee,
-            date__range=[start_of_week, end_of_week]
-        ).exclude(status__in=['absent', 'leave'])
-        
-        total_payable_hours = 0.0
-        
-        for wd in weekly_workdays:
-            if wd.id == work_day.id:
-                calculate_daily_totals_manual(wd)
-                wd.refresh_from_db()
-            
-            work_seconds = wd.total_work_time.total_seconds() if wd.total_work_time else 0
-            payable_hours = work_seconds / 3600
-            total_payable_hours += payable_hours
-        
-        return round(total_payable_hours, 2)
+        if base_seconds is None:
+            base_seconds = weekly_base_seconds(work_day)
+        work_seconds = work_day.total_work_time.total_seconds() if work_day.total_work_time else 0
+        return round((base_seconds + work_seconds) / 3600, 2)
         
     except Exception as e:
         print(f"Error calculating weekly payable hours: {e}")
@@ -486,20 +397,10 @@ def calculate_weekly_payable_hours(work_day):
 
 
 def calculate_night_hours_manual(work_day):
-    """Calculate night hours manually (9 PM - 7 AM)"""
+    """Calculate night hours manually (9 PM - 7 AM), open sessions count until now"""
     try:
-        night_minutes = 0
-        sessions = work_day.sessions.filter(session_type='work')
-        now = timezone.now()
-        
-        for session in sessions:
-            current_time = session.start_time
-            end_time = session.end_time if session.end_time else now
-            
-            while current_time < end_time:
-                if current_time.hour >= 21 or current_time.hour < 7:
-                    night_minutes += 1
-                current_time += timedelta(minutes=1)
+        sessions = work_day.sessions.filter(session_type='work').values_list('start_time', 'end_time')
+        night_minutes = sessions_night_minutes(sessions, now=timezone.now())
         
         return round(night_minutes / 60, 2)
     except Exception as e:
@@ -508,26 +409,12 @@ def calculate_night_hours_manual(work_day):
 
 
 def get_hourly_rate_manual(employee):
-    """Get hourly rate manually checking all possibilities"""
-    if (hasattr(employee, 'fixed_rate') and employee.fixed_rate and 
-        hasattr(employee, 'custom_base_salary') and employee.custom_base_salary):
-        custom_salary = decimal.Decimal(str(employee.custom_base_salary))
-        daily_rate = custom_salary / decimal.Decimal('30')
-        return daily_rate / decimal.Decimal('8')
-    
-    if (hasattr(employee, 'position') and employee.position and 
-        hasattr(employee.position, 'hour_rate') and employee.position.hour_rate):
-        return decimal.Decimal(str(employee.position.hour_rate))
-    
-    if (hasattr(employee, 'current_campaign') and employee.current_campaign and 
-        hasattr(employee.current_campaign, 'hour_rate') and employee.current_campaign.hour_rate):
-        return decimal.Decimal(str(employee.current_campaign.hour_rate))
-    
-    return decimal.Decimal('0.00')
+    """Get hourly rate (fixed salary, position, then campaign)"""
+    return pay_rules.hourly_rate(employee)
 
 
 def calculate_pay_breakdown_manual(work_day, employee, weekly_hours, night_hours, payable_hours_decimal=None):
-    """Calculate pay breakdown according to Dominican law"""
+    """Calculate pay breakdown according to Dominican law (attendance.pay_rules)"""
     try:
         hourly_rate = get_hourly_rate_manual(employee)
         
@@ -537,60 +424,24 @@ def calculate_pay_breakdown_manual(work_day, employee, weekly_hours, night_hours
             work_seconds = work_day.total_work_time.total_seconds() if work_day.total_work_time else 0
             daily_hours = decimal.Decimal(str(work_seconds / 3600))
         
-        weekly_hours_dec = decimal.Decimal(str(weekly_hours))
-        night_hours_dec = decimal.Decimal(str(night_hours))
-        
-        regular_hours = decimal.Decimal('0')
-        overtime_135_hours = decimal.Decimal('0')
-        overtime_200_hours = decimal.Decimal('0')
-        
-        if weekly_hours_dec <= decimal.Decimal('44'):
-            regular_hours = daily_hours
-        elif weekly_hours_dec <= decimal.Decimal('68'):
-            hours_before_today = weekly_hours_dec - daily_hours
-            if hours_before_today >= decimal.Decimal('44'):
-                overtime_135_hours = daily_hours
-            else:
-                regular_hours = decimal.Decimal('44') - hours_before_today
-                overtime_135_hours = daily_hours - regular_hours
-        else:
-            hours_before_today = weekly_hours_dec - daily_hours
-            if hours_before_today >= decimal.Decimal('68'):
-                overtime_200_hours = daily_hours
-            elif hours_before_today >= decimal.Decimal('44'):
-                overtime_135_hours = decimal.Decimal('68') - hours_before_today
-                overtime_200_hours = daily_hours - overtime_135_hours
-            else:
-                regular_hours = decimal.Decimal('44') - hours_before_today
-                remaining = daily_hours - regular_hours
-                if remaining <= (decimal.Decimal('68') - decimal.Decimal('44')):
-                    overtime_135_hours = remaining
-                else:
-                    overtime_135_hours = decimal.Decimal('68') - decimal.Decimal('44')
-                    overtime_200_hours = remaining - overtime_135_hours
-        
-        payable_night_hours = min(night_hours_dec, daily_hours)
-        
-        overtime_rate_135 = hourly_rate * decimal.Decimal('1.35')
-        overtime_rate_200 = hourly_rate * decimal.Decimal('2.00')
-        night_rate = hourly_rate * decimal.Decimal('1.15')
-        
-        regular_pay = regular_hours * hourly_rate
-        overtime_135_pay = overtime_135_hours * overtime_rate_135
-        overtime_200_pay = overtime_200_hours * overtime_rate_200
-        night_pay = payable_night_hours * night_rate
-        total_pay = regular_pay + overtime_135_pay + overtime_200_pay + night_pay
+        pay = pay_rules.day_pay(
+            hourly_rate,
+            daily_hours,
+            decimal.Decimal(str(weekly_hours)),
+            decimal.Decimal(str(night_hours)),
+            cap_night=True,
+        )
         
         return {
-            'regular_hours': float(regular_hours),
-            'overtime_135_hours': float(overtime_135_hours),
-            'overtime_200_hours': float(overtime_200_hours),
-            'night_hours': float(payable_night_hours),
-            'regular_pay': float(regular_pay),
-            'overtime_135_pay': float(overtime_135_pay),
-            'overtime_200_pay': float(overtime_200_pay),
-            'night_pay': float(night_pay),
-            'total_pay': float(total_pay),
+            'regular_hours': float(pay['regular_hours']),
+            'overtime_135_hours': float(pay['overtime_hours_135']),
+            'overtime_200_hours': float(pay['overtime_hours_200']),
+            'night_hours': float(pay['night_hours']),
+            'regular_pay': float(pay['regular_pay']),
+            'overtime_135_pay': float(pay['overtime_pay_135']),
+            'overtime_200_pay': float(pay['overtime_pay_200']),
+            'night_pay': float(pay['night_pay']),
+            'total_pay': float(pay['total_pay']),
             'payable_hours': float(daily_hours),
         }
     except Exception as e:
@@ -632,11 +483,11 @@ def start_activity(request):
                 return agent_dashboard(request)
 
             if active_session:
+                # Suma incremental a los totales del día (ActivitySession.save)
                 active_session.end_time = timezone.now()
                 active_session.save()
 
             session = _start_new_session(work_day=work_day, session_type=session_type, notes=notes)
-            calculate_daily_totals_manual(work_day)
 
             messages.success(request, f"Status changed to {session.get_session_type_display()}")
             return agent_dashboard(request)
@@ -675,14 +526,8 @@ def end_work_day(request):
     try:
         work_day = get_or_create_active_work_day(employee)
         
-        active_session = work_day.get_active_session()
-        if active_session:
-            active_session.end_time = timezone.now()
-            active_session.save()
-        
-        work_day.check_out = timezone.now()
-        work_day.status = 'completed'
-        calculate_daily_totals_manual(work_day)
+        # Cierra la sesión activa y hace un único recálculo completo del día
+        work_day.end_work_day()
         
         messages.success(request, "Work day ended successfully")
         return agent_dashboard(request)
@@ -760,50 +605,8 @@ def export_attendance_excel(request):
     if date_to:
         work_days = work_days.filter(date__lte=date_to)
 
-    # Crear workbook y hoja
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Attendance History"
-
-    # Título
-    ws.merge_cells("A1:E1")
-    title_cell = ws["A1"]
-    title_cell.value = f"Attendance History - {employee.user.username}"
-    title_cell.font = Font(size=14, bold=True)
-    title_cell.alignment = Alignment(horizontal="center", vertical="center")
-
-    # Encabezados
-    headers = ['Date', 'Work Time', 'Break Time', 'Lunch Time', 'Total Sessions']
-    ws.append(headers)
-
-    # Estilos para encabezados
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=2, column=col_num)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-        ws.column_dimensions[get_column_letter(col_num)].width = 18
-
-
-    # Agregar datos
-    for work_day in work_days:
-        sessions = work_day.sessions.all().order_by('start_time')
-        ws.append([
-            work_day.date.strftime("%Y-%m-%d"),
-            format_duration_simple(work_day.total_work_time),
-            format_duration_simple(work_day.total_break_time),
-            format_duration_simple(work_day.total_lunch_time),
-            sessions.count(),
-        ])
-
-    # Preparar respuesta HTTP
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
     filename = f"attendance_history_{employee.user.username}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    wb.save(response)
-    return response
+    return xlsx_response(attendance_history_workbook(employee, work_days), filename)
 
 
 
@@ -975,44 +778,24 @@ def supervisor_dashboard(request):
         'user', 'position', 'department', 'current_campaign'
     )
 
-    # Estadísticas del equipo
-    total_team_members = team_members.count()
-    logged_in_count = team_members.filter(is_logged_in=True).count()
-    active_in_campaign = team_members.filter(current_campaign__isnull=False).count()
+    # Estadísticas del equipo desde el registro de presencia
+    presence = presence_by_supervisor(supervisor.id)
+    total_team_members = len(presence)
+    logged_in_count = sum(1 for entry in presence if entry.logged_in)
+    active_in_campaign = sum(1 for entry in presence if entry.campaign)
 
     
-    # Obtener WorkDays de hoy para el equipo
+    # WorkDays, sesiones y estadísticas de hoy de todo el equipo (consultas fijas)
     today = timezone.now().date()
-    team_workdays = WorkDay.objects.filter(
-        employee__in=team_members,
-        date=today
-    ).select_related('employee')
-    
-    # Obtener información de sesiones (logins) más recientes
-    from django.contrib.sessions.models import Session
-    from django.contrib.auth import get_user_model
-    
-    User = get_user_model()
-    
-    # Preparar datos para cada miembro del equipo
-    team_data = []
-    for member in team_members:
-        try:
-            workday_today = team_workdays.get(employee=member)
-            current_session = workday_today.get_active_session()
-            daily_stats = calculate_daily_stats(workday_today)
-        except WorkDay.DoesNotExist:
-            workday_today = None
-            current_session = None
-            daily_stats = None
-        
-        team_data.append({
-            'employee': member,
-            'workday': workday_today,
-            'current_session': current_session,
-            'formatted_session': workday_today.get_formatted_session() if workday_today else None,
-            'daily_stats': daily_stats,
-        })
+    team_data = team_snapshot(team_members, day=today)
+
+    # Breaks/lunch pasados de tiempo
+    members_by_id = {data['employee'].id: data['employee'] for data in team_data}
+    overdue = [
+        {'employee': members_by_id[entry.employee], 'state': entry.state, 'overdue_minutes': int(excess.total_seconds() // 60)}
+        for entry, excess in overdue_breaks(presence)
+        if entry.employee in members_by_id
+    ]
             
     context = {
         'supervisor': supervisor,
@@ -1021,14 +804,54 @@ def supervisor_dashboard(request):
         'logged_in_count': logged_in_count,
         'active_in_campaign': active_in_campaign,
         'today': today,
+        'live_status_seq': current_seq(),
+        'overdue_breaks': overdue,
     }
     
     return render(request, 'supervisor/supervisor_dashboard.html', context)
 
 
-from tempfile import NamedTemporaryFile
+MANAGEMENT_POSITIONS = ['ceo', 'manager', 'director', 'executive']
+
+
+@login_required
+def live_status_stream(request):
+    """
+    Server-Sent Events con los cambios de estado de los agentes.
+
+    ?campaign=<id> para el tablero de campaña; sin parámetro, el equipo del
+    supervisor. ?after=<seq> (o Last-Event-ID al reconectar) indica desde
+    dónde enviar. Ver attendance/live_status.py.
+    """
+    viewer = Employee.objects.filter(user=request.user).select_related('position').first()
+    can_manage = request.user.is_staff or (viewer and (
+        viewer.is_supervisor
+        or (viewer.position and viewer.position.name.lower() in MANAGEMENT_POSITIONS)
+    ))
+    if not can_manage:
+        return HttpResponseForbidden("You don't have permission to view live status.")
+
+    campaign_id = request.GET.get('campaign')
+    if campaign_id:
+        if not campaign_id.isdigit():
+            return JsonResponse({'error': 'Invalid campaign'}, status=400)
+        campaign_id = int(campaign_id)
+        matches = lambda event: event['campaign'] == campaign_id
+    elif viewer and viewer.is_supervisor:
+        matches = lambda event: event['supervisor'] == viewer.id
+    else:
+        return JsonResponse({'error': 'campaign is required'}, status=400)
+
+    after = request.headers.get('Last-Event-ID') or request.GET.get('after') or ''
+    after = int(after) if after.isdigit() else current_seq()
+
+    response = StreamingHttpResponse(open_stream(after, matches), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
-login_required
+
+@login_required
 def export_team_report_excel(request):
     """
     Genera y descarga directamente el reporte de equipo en Excel (sin email).
@@ -1055,122 +878,12 @@ def export_team_report_excel(request):
 
     work_days = (
         WorkDay.objects.filter(employee__in=team_members, date__range=(date_from_dt, date_to_dt))
-        .select_related("employee", "employee__user")
-        .prefetch_related("sessions")
         .order_by("date", "employee__user__last_name")
     )
 
-    # Crear Excel
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Team Report"
-
-    bold = Font(bold=True)
-    center = Alignment(horizontal="center")
-
-    # Títulos
-    ws.merge_cells("A1:Q1")
-    ws["A1"] = f"Team Report - Supervisor: {supervisor.user.get_full_name()}"
-    ws["A1"].font = Font(bold=True, size=14)
-    ws["A1"].alignment = center
-
-    ws.merge_cells("A2:Q2")
-    ws["A2"] = f"Generated: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    ws["A2"].alignment = center
-
-    ws.append([])
-
-    headers = [
-        "Agent Name", "Date", "Attendance Status", "Week",
-        "Time In",
-        "Break 1-start", "Break 1-end", "Break1 Duration",
-        "Break 2-start", "Break 2-end", "Break2 Duration",
-        "Lunch start", "Lunch end", "Lunch Duration",
-        "Time Out",
-        "Total Hours",
-        "Notes",
-    ]
-    ws.append(headers)
-    for col in range(1, len(headers) + 1):
-        ws.cell(row=4, column=col).font = bold
-        ws.cell(row=4, column=col).alignment = center
-
-    # Helpers
-    def fmt_time(t):
-        return t.strftime("%H:%M") if t else "-"
-
-    def fmt_duration(s):
-        if not s or not s.start_time or not s.end_time:
-            return "-"
-        delta = s.end_time - s.start_time
-        minutes = delta.total_seconds() // 60
-        seconds = int(delta.total_seconds() % 60)
-        return f"{int(minutes):02d}:{seconds:02d}"
-
-    def fmt_total(td):
-        if td is None:
-            return "0.00"
-        return f"{td.total_seconds() / 3600:.2f}"
-
-    # Filas
-    for wd in work_days:
-        sessions = wd.sessions.all()
-        work_sessions = sessions.filter(session_type="work").order_by("start_time")
-        break_sessions = sessions.filter(session_type="break").order_by("start_time")
-        lunch_sessions = sessions.filter(session_type="lunch").order_by("start_time")
-
-        time_in = work_sessions.first().start_time if work_sessions else None
-        time_out = work_sessions.last().end_time if work_sessions else None
-        break1 = break_sessions[0] if len(break_sessions) >= 1 else None
-        break2 = break_sessions[1] if len(break_sessions) >= 2 else None
-        lunch = lunch_sessions[0] if lunch_sessions else None
-
-        ws.append([
-            wd.employee.user.get_full_name(),
-            wd.date.strftime("%m/%d/%Y"),
-            wd.get_day_status(),
-            wd.date.isocalendar()[1],
-            fmt_time(time_in),
-            fmt_time(break1.start_time if break1 else None),
-            fmt_time(break1.end_time if break1 else None),
-            fmt_duration(break1) if break1 else "-",
-            fmt_time(break2.start_time if break2 else None),
-            fmt_time(break2.end_time if break2 else None),
-            fmt_duration(break2) if break2 else "-",
-            fmt_time(lunch.start_time if lunch else None),
-            fmt_time(lunch.end_time if lunch else None),
-            fmt_duration(lunch) if lunch else "-",
-            fmt_time(time_out),
-            fmt_total(wd.total_work_time),
-            wd.notes or "",
-        ])
-
-    # Ajustar ancho columnas
-    for col_cells in ws.columns:
-        max_len = max(len(str(c.value)) if c.value else 0 for c in col_cells)
-        ws.column_dimensions[get_column_letter(col_cells[0].column)].width = max_len + 2
-
-    # Crear nombre del archivo
     filename = f"team_report_{supervisor.user.username}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    
-    # Guardar en archivo temporal
-    with NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-        wb.save(tmp_file.name)
-        temp_path = tmp_file.name
+    return xlsx_response(team_report_workbook(supervisor, work_days), filename)
 
-    try:
-        # Leer el archivo y devolverlo como respuesta HTTP
-        with open(temp_path, 'rb') as f:
-            response = HttpResponse(
-                f.read(),
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            return response
-    finally:
-        # Limpiar archivo temporal
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
 
 @login_required
 def team_attendance_history(request):
@@ -1264,7 +977,6 @@ def employee_attendance_detail(request, employee_id):
             
             # Forzar recalculo de totales
             calculate_daily_totals_manual(work_day)
-            work_day.refresh_from_db()
             
             # Obtener sesiones
             sessions = work_day.sessions.all().order_by('start_time')
@@ -1415,131 +1127,14 @@ def export_employee_attendance_excel(request, employee_id):
     work_days = WorkDay.objects.filter(
         employee=employee,
         date__range=(date_from_parsed, date_to_parsed)
-    ).prefetch_related('sessions').order_by('date')
-
-    # Crear workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Attendance Report"
-
-    bold_font = Font(bold=True)
-    center_align = Alignment(horizontal="center")
-
-    # Formateadores
-    def format_timedelta(td):
-        if not td:
-            return "00:00:00"
-        total_seconds = int(td.total_seconds())
-        hours, remainder = divmod(total_seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        return f"{hours:02}:{minutes:02}:{seconds:02}"
-
-    def format_duration(s):
-        if s.start_time and s.end_time:
-            return format_timedelta(s.end_time - s.start_time)
-        return "—"
-
-    # Encabezado principal
-    ws.merge_cells('A1:P1')
-    ws['A1'] = f"Attendance Report for {employee.user.get_full_name()}"
-    ws['A1'].font = Font(bold=True, size=14)
-    ws['A1'].alignment = center_align
-
-    ws.merge_cells('A2:P2')
-    ws['A2'] = f"Date range: {date_from} to {date_to}"
-    ws['A2'].alignment = center_align
-
-    ws.merge_cells('A3:P3')
-    ws['A3'] = f"Generated at: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    ws['A3'].alignment = center_align
-    ws.append([])
-
-    # Encabezados
-    headers = [
-        "Date", "Day", "Status", "Check In", "Check Out", "Total Work Time",
-        "Break1 Start", "Break1 End", "Break1 Duration",
-        "Break2 Start", "Break2 End", "Break2 Duration",
-        "Lunch Start", "Lunch End", "Lunch Duration",
-        "Work Sessions Count"
-    ]
-    ws.append(headers)
-
-    for col_num in range(1, len(headers) + 1):
-        cell = ws.cell(row=5, column=col_num)
-        cell.font = bold_font
-        cell.alignment = center_align
-
-    total_seconds = 0
+    ).order_by('date')
 
-    for wd in work_days:
-        total_time = wd.total_work_time or timedelta()
-        total_seconds += total_time.total_seconds()
-
-        check_in = wd.check_in.strftime("%I:%M %p") if wd.check_in else "—"
-        check_out = wd.check_out.strftime("%I:%M %p") if wd.check_out else "—"
-
-        breaks = [s for s in wd.sessions.all() if s.session_type == 'break'][:2]
-        lunch = [s for s in wd.sessions.all() if s.session_type == 'lunch'][:1]
-
-        def fmt_time(t): return t.strftime("%I:%M %p") if t else "—"
-        def fmt_duration(s): return s.end_time - s.start_time if s.start_time and s.end_time else None
-
-        break1 = fmt_duration(breaks[0]) if len(breaks) > 0 else None
-        break2 = fmt_duration(breaks[1]) if len(breaks) > 1 else None
-        lunch_d = fmt_duration(lunch[0]) if lunch else None
-
-        work_sessions_count = wd.sessions.filter(session_type='work').count()
-
-        # Convertir total_time a formato Excel (fracción de día)
-        excel_total_time = total_time.total_seconds() / 86400  # 1 día = 86400 s
-
-        row = [
-            wd.date.strftime("%Y-%m-%d"),
-            wd.date.strftime("%A"),
-            wd.get_status_display(),
-            check_in,
-            check_out,
-            excel_total_time,  # numérico, no string
-            fmt_time(breaks[0].start_time) if len(breaks) > 0 else "—",
-            fmt_time(breaks[0].end_time) if len(breaks) > 0 else "—",
-            str(break1) if break1 else "—",
-            fmt_time(breaks[1].start_time) if len(breaks) > 1 else "—",
-            fmt_time(breaks[1].end_time) if len(breaks) > 1 else "—",
-            str(break2) if break2 else "—",
-            fmt_time(lunch[0].start_time) if lunch else "—",
-            fmt_time(lunch[0].end_time) if lunch else "—",
-            str(lunch_d) if lunch_d else "—",
-            work_sessions_count
-        ]
-        ws.append(row)
-
-        # Aplica formato h:mm a la columna "Total Work Time" (columna 6)
-        ws.cell(row=ws.max_row, column=6).number_format = "[h]:mm"
-
-    # --- Fila resumen ---
-    ws.append([])
-    total_time_final = timedelta(seconds=total_seconds)
-    excel_total_final = total_time_final.total_seconds() / 86400
-    ws.append(["", "", "", "", "TOTAL WORK TIME:", excel_total_final])
-    ws.cell(row=ws.max_row, column=5).font = bold_font
-    ws.cell(row=ws.max_row, column=6).font = bold_font
-    ws.cell(row=ws.max_row, column=6).number_format = "[h]:mm"
-
-    # Ajustar anchos
-    for i, column_cells in enumerate(ws.columns, 1):
-        length = max(len(str(cell.value)) if cell.value else 0 for cell in column_cells)
-        ws.column_dimensions[get_column_letter(i)].width = length + 2
-
-    # Crear respuesta
     safe_name = f"{employee.user.first_name}_{employee.user.last_name}".replace(" ", "_")
     filename = f"attendance_{safe_name}_{timezone.now().strftime('%Y%m%d')}.xlsx"
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return xlsx_response(
+        employee_attendance_workbook(employee, work_days, date_from, date_to),
+        filename,
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    wb.save(response)
-    return response
 
 
 @login_required
@@ -1592,7 +1187,6 @@ def supervisor_day_detail(request, employee_id, date_str):
         
         # 🔥 IMPORTANTE: Forzar recalculo usando las funciones centralizadas
         calculate_daily_totals_manual(work_day)
-        work_day.refresh_from_db()
         
         # Obtener sesiones
         sessions = work_day.sessions.all().order_by('start_time')
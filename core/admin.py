@@ -3,8 +3,8 @@ from django import forms
 
 from .models import (
     Department, Position, Employee,
-    PaymentConcept, PayPeriod,Payment,
-    Campaign,BulkInvitation
+    PaymentConcept, PayPeriod,Payment, PayrollRun,
+    Campaign,BulkInvitation, TaxTable, TaxBracket
 )
 
 
@@ -196,6 +196,18 @@ class PayPeriodAdmin(admin.ModelAdmin):
 
 
 
+class TaxBracketInline(admin.TabularInline):
+    model = TaxBracket
+    extra = 0
+
+
+@admin.register(TaxTable)
+class TaxTableAdmin(admin.ModelAdmin):
+    list_display = ("name", "effective_from", "afp_rate", "sfs_rate", "updated_at")
+    ordering = ("-effective_from",)
+    inlines = [TaxBracketInline]
+
+
 @admin.register(Payment)
 class PayrollRecordAdmin(admin.ModelAdmin):
     list_display = ("employee", "period", "pay_date", "gross_salary", "net_salary", "status")
@@ -204,3 +216,10 @@ class PayrollRecordAdmin(admin.ModelAdmin):
     ordering = ("-pay_date",)
     date_hierarchy = "pay_date"
 
+
+@admin.register(PayrollRun)
+class PayrollRunAdmin(admin.ModelAdmin):
+    list_display = ("period", "kind", "status", "chunks_done", "processed_employees", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("employee_ids", "errors")
+    ordering = ("-created_at",)
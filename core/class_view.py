@@ -4,14 +4,15 @@ from django.views.generic import TemplateView
 
 from attendance.models import WorkDay
 from django.utils import timezone
-from datetime import timedelta
 from django.db.models import (
     Count, Sum, Avg, Prefetch, Q, FloatField
 )
 from django.db.models.functions import Coalesce
 
 from .models import Employee, Payment, Department, Position, Campaign
+from .utils.trends import attendance_trends, schedule_compliance_trends
 from workforce.models import Shift, EmployeeSchedule
+from workforce.scheduled_days import scheduled_count_by, scheduled_on, shift_coverage
 
 class ManagementDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
     template_name = 'management/dashboard.html'
@@ -84,17 +85,7 @@ class ManagementDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateV
     # ------------------------------------------------------------
     def get_scheduled_employees_count(self, date):
         """Count employees scheduled to work on a specific date"""
-        weekday = date.weekday()
-        day_fields = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-        day_filter = {day_fields[weekday]: True}
-        
-        return EmployeeSchedule.objects.filter(
-            status__in=['published', 'active'],
-            start_date__lte=date,
-            **day_filter
-        ).filter(
-            Q(end_date__gte=date) | Q(end_date__isnull=True)
-        ).count()
+        return scheduled_on(date).count()
     
     def get_actual_attendance_count(self, date):
         """Count employees who actually checked in"""
@@ -115,103 +106,12 @@ class ManagementDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateV
     def get_shift_coverage_today(self):
         """Get coverage statistics for each shift today"""
         today = timezone.now().date()
-        weekday = today.weekday()
-        day_fields = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-        day_filter = {day_fields[weekday]: True}
-        
-        shifts = Shift.objects.filter(is_active=True).annotate(
-            scheduled_count=Count(
-                'scheduled_employees',
-                filter=Q(
-                    scheduled_employees__status__in=['published', 'active'],
-                    scheduled_employees__start_date__lte=today,
-                    **{f'scheduled_employees__{day_fields[weekday]}': True}
-                ) & (
-                    Q(scheduled_employees__end_date__gte=today) | 
-                    Q(scheduled_employees__end_date__isnull=True)
-                )
-            )
-        )
-        
-        data = []
-        for shift in shifts:
-            # Get employees scheduled for this shift who checked in today
-            scheduled_employees = Employee.objects.filter(
-                schedules__shift=shift,
-                schedules__status__in=['published', 'active'],
-                schedules__start_date__lte=today,
-                **{f'schedules__{day_fields[weekday]}': True}
-            ).filter(
-                Q(schedules__end_date__gte=today) | Q(schedules__end_date__isnull=True)
-            ).distinct()
-            
-            checked_in = WorkDay.objects.filter(
-                date=today,
-                employee__in=scheduled_employees,
-                check_in__isnull=False
-            ).count()
-            
-            scheduled = shift.scheduled_count or 0
-            coverage_rate = (checked_in / scheduled * 100) if scheduled > 0 else 0
-            
-            data.append({
-                'shift': shift,
-                'scheduled_count': scheduled,
-                'checked_in_count': checked_in,
-                'coverage_rate': round(coverage_rate, 1),
-                'is_understaffed': coverage_rate < 80,
-            })
-        
-        return sorted(data, key=lambda x: x['shift'].start_time)
+        shifts = Shift.objects.filter(is_active=True).order_by('start_time')
+        return shift_coverage(shifts, today)
     
     def get_schedule_compliance_trends(self, period='7days'):
         """Track schedule compliance over time"""
-        today = timezone.now().date()
-        trends = []
-        
-        # Determine date range
-        if period == '30days':
-            days_range = 30
-        elif period == '90days':
-            days_range = 90
-        elif period == 'current_month':
-            start_date = today.replace(day=1)
-            days_range = (today - start_date).days + 1
-        elif period == 'previous_month':
-            first_day_current = today.replace(day=1)
-            last_day_prev = first_day_current - timedelta(days=1)
-            start_date = last_day_prev.replace(day=1)
-            days_range = (last_day_prev - start_date).days + 1
-        else:
-            days_range = 7
-        
-        for i in range(days_range):
-            if period == 'current_month':
-                date = today.replace(day=1) + timedelta(days=i)
-                if date > today:
-                    break
-            elif period == 'previous_month':
-                last_day_prev = today.replace(day=1) - timedelta(days=1)
-                start_date = last_day_prev.replace(day=1)
-                date = start_date + timedelta(days=i)
-                if date > last_day_prev:
-                    break
-            else:
-                date = today - timedelta(days=(days_range - 1 - i))
-            
-            scheduled = self.get_scheduled_employees_count(date)
-            actual = self.get_actual_attendance_count(date)
-            compliance = (actual / scheduled * 100) if scheduled > 0 else 0
-            
-            trends.append({
-                'date': date,
-                'scheduled_count': scheduled,
-                'actual_count': actual,
-                'compliance_rate': round(compliance, 1),
-                'is_today': (date == today),
-            })
-        
-        return trends
+        return schedule_compliance_trends(period)
 
     # ------------------------------------------------------------
     # ENHANCED CAMPAIGNS DATA (with shift info)
@@ -229,6 +129,8 @@ class ManagementDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateV
             avg_productivity=Avg('active_employees__work_days__productive_hours', output_field=FloatField()),
         )
         
+        scheduled_by_campaign = scheduled_count_by(today, 'employee__current_campaign')
+        
         data = []
         for c in campaigns:
             logged = c.active_employees.filter(is_logged_in=True).count()
@@ -236,7 +138,7 @@ class ManagementDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateV
             att_rate = (logged / emp_count * 100) if emp_count > 0 else 0
             
             # NEW: Get scheduled count for today for this campaign
-            scheduled_today = self.get_campaign_scheduled_count(c, today)
+            scheduled_today = scheduled_by_campaign.get(c.id, 0)
             
             data.append({
                 'campaign': c,
@@ -254,18 +156,7 @@ class ManagementDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateV
     
     def get_campaign_scheduled_count(self, campaign, date):
         """Get count of employees scheduled for a campaign on a specific date"""
-        weekday = date.weekday()
-        day_fields = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-        day_filter = {day_fields[weekday]: True}
-        
-        return EmployeeSchedule.objects.filter(
-            employee__current_campaign=campaign,
-            status__in=['published', 'active'],
-            start_date__lte=date,
-            **day_filter
-        ).filter(
-            Q(end_date__gte=date) | Q(end_date__isnull=True)
-        ).count()
+        return scheduled_on(date).filter(employee__current_campaign=campaign).count()
 
     # ------------------------------------------------------------
     # ENHANCED DEPARTMENT STATS (with shift info)
@@ -279,6 +170,8 @@ class ManagementDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateV
             avg_productivity=Avg('employee__work_days__productive_hours', output_field=FloatField()),
         )
         
+        scheduled_by_department = scheduled_count_by(today, 'employee__department')
+        
         data = []
         for d in departments:
             emp = d.employee_count or 0
@@ -286,7 +179,7 @@ class ManagementDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateV
             rate = (logged / emp * 100) if emp > 0 else 0
             
             # NEW: Get scheduled count for today for this department
-            scheduled_today = self.get_department_scheduled_count(d, today)
+            scheduled_today = scheduled_by_department.get(d.id, 0)
             
             data.append({
                 'department': d,
@@ -302,77 +195,13 @@ class ManagementDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateV
     
     def get_department_scheduled_count(self, department, date):
         """Get count of employees scheduled for a department on a specific date"""
-        weekday = date.weekday()
-        day_fields = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-        day_filter = {day_fields[weekday]: True}
-        
-        return EmployeeSchedule.objects.filter(
-            employee__department=department,
-            status__in=['published', 'active'],
-            start_date__lte=date,
-            **day_filter
-        ).filter(
-            Q(end_date__gte=date) | Q(end_date__isnull=True)
-        ).count()
+        return scheduled_on(date).filter(employee__department=department).count()
 
     # ------------------------------------------------------------
     # ATTENDANCE TRENDS (unchanged)
     # ------------------------------------------------------------
     def get_attendance_trends(self, period='7days'):
-        today = timezone.now().date()
-        trends = []
-        
-        if period == '30days':
-            days_range = 30
-        elif period == '90days':
-            days_range = 90
-        elif period == 'current_month':
-            start_date = today.replace(day=1)
-            days_range = (today - start_date).days + 1
-        elif period == 'previous_month':
-            first_day_current = today.replace(day=1)
-            last_day_prev = first_day_current - timedelta(days=1)
-            start_date = last_day_prev.replace(day=1)
-            days_range = (last_day_prev - start_date).days + 1
-        else:
-            days_range = 7
-
-        for i in range(days_range):
-            if period == 'current_month':
-                date = today.replace(day=1) + timedelta(days=i)
-                if date > today:
-                    break
-            elif period == 'previous_month':
-                last_day_prev = today.replace(day=1) - timedelta(days=1)
-                start_date = last_day_prev.replace(day=1)
-                date = start_date + timedelta(days=i)
-                if date > last_day_prev:
-                    break
-            else:
-                date = today - timedelta(days=(days_range - 1 - i))
-
-            wd_count = WorkDay.objects.filter(date=date).count()
-            present = WorkDay.objects.filter(date=date, check_in__isnull=False).count()
-            rate = (present / wd_count * 100) if wd_count > 0 else 0
-            
-            direction = "stable"
-            if trends:
-                prev = trends[-1]["present_count"]
-                if present > prev:
-                    direction = "up"
-                elif present < prev:
-                    direction = "down"
-
-            trends.append({
-                'date': date,
-                'workdays_count': wd_count,
-                'present_count': present,
-                'attendance_rate': round(rate, 1),
-                'trend_direction': direction,
-                'is_today': (date == today),
-            })
-        
-        return trends
+        return attendance_trends(period)
 
     # ------------------------------------------------------------
     # CAMPAIGN ALERTS (unchanged)
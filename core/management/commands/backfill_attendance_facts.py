@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from attendance.daily_facts import compute_daily_facts
+from attendance.models import WorkDay
+
+
+#python manage.py backfill_attendance_facts
+#python manage.py backfill_attendance_facts --start 2025-01-01 --end 2025-06-30
+
+
+class Command(BaseCommand):
+    help = "Computes DailyAttendanceFact for a date range (default: from the first WorkDay until yesterday)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day (YYYY-MM-DD). Default: first WorkDay.")
+        parser.add_argument('--end', help="Last day (YYYY-MM-DD). Default: yesterday.")
+
+    def handle(self, *args, **options):
+        yesterday = timezone.now().date() - timedelta(days=1)
+        start = self._parse_date(options['start']) or WorkDay.objects.aggregate(first=Min('date'))['first']
+        end = self._parse_date(options['end']) or yesterday
+        if start is None:
+            self.stdout.write(self.style.WARNING("No workdays to backfill."))
+            return
+        if start > end:
+            raise CommandError("--start must be before --end")
+
+        created = compute_daily_facts(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f"{(end - start).days + 1} days computed ({start} to {end}), {created} fact rows written"
+        ))
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date: {value} (expected YYYY-MM-DD)")
@@ -0,0 +1,45 @@
+import timeit
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from attendance.night_hours import night_minutes
+
+
+#python manage.py benchmark_night_minutes
+#python manage.py benchmark_night_minutes --hours 16 --number 500
+
+
+class Command(BaseCommand):
+    help = "Times night_minutes against the old minute-by-minute loop for one shift that crosses 9 PM."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=10, help="Shift length, starting at 4 PM.")
+        parser.add_argument('--number', type=int, default=200, help="Calls per timing run.")
+
+    def handle(self, *args, **options):
+        for line in benchmark_night_minutes(options['hours'], options['number']):
+            self.stdout.write(line)
+
+
+def minute_loop_night_minutes(start, end):
+    """Ciclo minuto a minuto que night_minutes reemplazó (referencia)."""
+    minutes = 0
+    current = start
+    while current < end:
+        if current.hour >= 21 or current.hour < 7:
+            minutes += 1
+        current += timedelta(minutes=1)
+    return minutes
+
+
+def benchmark_night_minutes(hours, number):
+    """Líneas de resultado (mejor de 3 corridas)."""
+    start = datetime(2026, 3, 2, 16, 0)
+    end = start + timedelta(hours=hours)
+    yield f"{hours}h shift: {night_minutes(start, end)} night minutes"
+
+    loop = min(timeit.repeat(lambda: minute_loop_night_minutes(start, end), number=number, repeat=3))
+    closed = min(timeit.repeat(lambda: night_minutes(start, end), number=number, repeat=3))
+    yield f"Minute loop: {loop / number * 1e6:.1f}us per call"
+    yield f"night_minutes: {closed / number * 1e6:.1f}us per call ({loop / closed:.0f}x)"
@@ -0,0 +1,86 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.sessions import delete_user_sessions
+from core.management.commands.index_user_sessions import index_user_sessions
+
+
+#python manage.py benchmark_session_logout
+#python manage.py benchmark_session_logout --sessions 50000 --users 300 --skip-legacy
+
+
+class Command(BaseCommand):
+    help = (
+        "Times logging users out through the UserSession index against the old decode-every-session scan. "
+        "Creates throwaway users and sessions inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=50000)
+        parser.add_argument('--users', type=int, default=300)
+        parser.add_argument('--skip-legacy', action='store_true',
+                            help="Do not time the old full-table scan (slow on large tables).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for line in benchmark_session_logout(options['sessions'], options['users'], options['skip_legacy']):
+                self.stdout.write(line)
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Rolled back, nothing was saved"))
+
+
+def legacy_delete_user_sessions(user):
+    """El borrado anterior: decodificar todas las sesiones de django_session."""
+    deleted = 0
+    for session in Session.objects.all():
+        if session.get_decoded().get('_auth_user_id') == str(user.id):
+            session.delete()
+            deleted += 1
+    return deleted
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark_session_logout(session_count, user_count, skip_legacy=False):
+    """Líneas de resultado; se llama dentro de una transacción que se revierte."""
+    User.objects.bulk_create([
+        User(username=f'bench_session_{i}') for i in range(user_count)
+    ])
+    users = list(User.objects.filter(username__startswith='bench_session_').order_by('id'))
+
+    encode = SessionStore().encode
+    expire_date = timezone.now() + timedelta(days=1)
+    Session.objects.bulk_create([
+        Session(
+            session_key=f'bench{i:035d}',
+            session_data=encode({'_auth_user_id': str(users[i % len(users)].id)}),
+            expire_date=expire_date,
+        )
+        for i in range(session_count)
+    ], batch_size=2000)
+
+    result, seconds = _timed(index_user_sessions)
+    yield f"{session_count} sessions for {len(users)} users; index: {result} in {seconds:.2f}s"
+
+    if not skip_legacy:
+        deleted, seconds = _timed(legacy_delete_user_sessions, users[0])
+        yield f"Old scan, one user: {deleted} sessions deleted in {seconds:.2f}s"
+
+    with CaptureQueriesContext(connection) as queries:
+        deleted, seconds = _timed(delete_user_sessions, users[1])
+    yield f"Index, one user: {deleted} sessions deleted in {seconds * 1000:.1f}ms ({len(queries)} queries)"
+
+    deleted, seconds = _timed(delete_user_sessions, *users[2:])
+    yield f"Index, {len(users) - 2} users at once: {deleted} sessions deleted in {seconds:.2f}s"
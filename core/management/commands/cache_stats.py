@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.utils.cache_layer import cache_stats, reset_stats
+
+
+#python manage.py cache_stats
+#python manage.py cache_stats --reset
+
+
+class Command(BaseCommand):
+    help = "Shows the shared cache hit/miss counters summed by every process."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help="Clear the counters after showing them.",
+        )
+
+    def handle(self, *args, **options):
+        stats = cache_stats()['shared']
+        if not stats:
+            self.stdout.write("No cache activity recorded yet")
+        for namespace, counts in stats.items():
+            self.stdout.write(
+                f"{namespace}: L1 {counts['l1_hits']} · L2 {counts['l2_hits']} · "
+                f"miss {counts['misses']} · hit rate {counts['hit_rate']}%"
+            )
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters cleared"))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+import logging
+
+from accounts.models import UserSession
+
+logger = logging.getLogger(__name__)
+
+
+#python manage.py index_user_sessions
+
+
+class Command(BaseCommand):
+    help = "Indexes existing authentication sessions by user (accounts.UserSession). Run once after deploying the index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        result = index_user_sessions(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(result))
+
+
+def _save_batch(pending):
+    # Sesiones de usuarios ya borrados no se indexan
+    existing = set(User.objects.filter(id__in={s.user_id for s in pending}).values_list('id', flat=True))
+    rows = [s for s in pending if s.user_id in existing]
+    UserSession.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+def index_user_sessions(batch_size=2000):
+    """Decode the unexpired sessions once and index the authenticated ones."""
+    sessions = Session.objects.filter(
+        expire_date__gt=timezone.now(),
+        user_index__isnull=True,
+    ).iterator(chunk_size=batch_size)
+
+    pending = []
+    indexed = 0
+    for session in sessions:
+        try:
+            user_id = session.get_decoded().get('_auth_user_id')
+        except Exception as e:
+            logger.debug(f"Could not decode session: {e}")
+            continue
+        if not user_id:
+            continue
+
+        pending.append(UserSession(session_id=session.session_key, user_id=int(user_id)))
+        if len(pending) >= batch_size:
+            indexed += _save_batch(pending)
+            pending = []
+
+    if pending:
+        indexed += _save_batch(pending)
+
+    return f"{indexed} sessions indexed"
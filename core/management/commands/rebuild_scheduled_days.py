@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from workforce.models import EmployeeSchedule
+from workforce.scheduled_days import extend_scheduled_days, sync_schedules
+
+
+#python manage.py rebuild_scheduled_days
+#python manage.py rebuild_scheduled_days --missing-only
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the ScheduledDay calendar index from EmployeeSchedule."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing-only',
+            action='store_true',
+            help="Only append missing days (same as the nightly task) instead of rebuilding every schedule.",
+        )
+
+    def handle(self, *args, **options):
+        if options['missing_only']:
+            created = extend_scheduled_days()
+        else:
+            created = sync_schedules(EmployeeSchedule.objects.all())
+        self.stdout.write(self.style.SUCCESS(f"{created} scheduled days written"))
@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from attendance.models import WorkDay, WeeklyHoursSummary
+
+logger = logging.getLogger(__name__)
+
+
+#python manage.py rebuild_weekly_hours --start 2025-01-01 --end 2025-03-31
+#python manage.py rebuild_weekly_hours --check
+
+
+class Command(BaseCommand):
+    help = "Rebuilds WeeklyHoursSummary from WorkDay for a date range (or only reports differences with --check)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day (YYYY-MM-DD). Default: 8 weeks ago.")
+        parser.add_argument('--end', help="Last day (YYYY-MM-DD). Default: today.")
+        parser.add_argument('--employee', type=int, action='append', dest='employees',
+                            help="Employee id (can be repeated).")
+        parser.add_argument('--check', action='store_true',
+                            help="Only compare against WorkDay, do not write.")
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        start = self._parse_date(options['start']) or today - timedelta(weeks=8)
+        end = self._parse_date(options['end']) or today
+        if start > end:
+            raise CommandError("--start must be before --end")
+
+        result = rebuild_weekly_hours(
+            start, end,
+            employee_ids=options['employees'],
+            check_only=options['check'],
+        )
+
+        for row in result['mismatches']:
+            self.stdout.write(self.style.WARNING(
+                f"Employee {row['employee_id']} {row['iso_year']}-W{row['iso_week']:02d}: "
+                f"summary {row['stored']} vs workdays {row['expected']}"
+            ))
+
+        summary = (
+            f"{result['weeks']} weeks checked, {len(result['mismatches'])} mismatches, "
+            f"{result['written']} rows written, {result['deleted']} rows deleted"
+        )
+        if options['check'] and result['mismatches']:
+            self.stdout.write(self.style.ERROR(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date: {value} (expected YYYY-MM-DD)")
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def rebuild_weekly_hours(start, end, employee_ids=None, check_only=False):
+    """
+    Compare (and fix) the weekly rollup against WorkDay for whole ISO weeks.
+
+    The range is widened to Monday-Sunday. Raw totals come from one grouped
+    query; stored rows from another; the differences are upserted in bulk
+    and leftover rows of weeks without workdays are deleted.
+    """
+    start = start - timedelta(days=start.weekday())
+    end = end + timedelta(days=6 - end.weekday())
+
+    workdays = WorkDay.objects.filter(date__range=[start, end]).exclude(
+        status__in=WorkDay.WEEKLY_EXCLUDED_STATUSES
+    )
+    summaries = WeeklyHoursSummary.objects.filter(week_start__range=[start, end])
+    if employee_ids:
+        workdays = workdays.filter(employee_id__in=employee_ids)
+        summaries = summaries.filter(employee_id__in=employee_ids)
+
+    expected = {}
+    rows = workdays.annotate(week=TruncWeek('date')).values('employee_id', 'week').annotate(
+        hours=Sum('productive_hours'),
+        work=Sum('total_work_time'),
+    ).order_by()
+    for row in rows:
+        week_start = _as_date(row['week'])
+        iso_year, iso_week = WeeklyHoursSummary.week_key(week_start)
+        expected[(row['employee_id'], iso_year, iso_week)] = WeeklyHoursSummary(
+            employee_id=row['employee_id'],
+            iso_year=iso_year,
+            iso_week=iso_week,
+            week_start=week_start,
+            productive_hours=Decimal(str(row['hours'] or 0)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+            total_work_time=row['work'] or timedelta(0),
+        )
+
+    stored = {(s.employee_id, s.iso_year, s.iso_week): s for s in summaries}
+
+    mismatches = []
+    to_write = []
+    for key, summary in expected.items():
+        current = stored.get(key)
+        if (
+            current is None
+            or current.productive_hours != summary.productive_hours
+            or current.total_work_time != summary.total_work_time
+        ):
+            to_write.append(summary)
+            mismatches.append({
+                'employee_id': key[0], 'iso_year': key[1], 'iso_week': key[2],
+                'stored': current.productive_hours if current else None,
+                'expected': summary.productive_hours,
+            })
+
+    # Semanas sin días que cuenten: la fila solo sobra si quedó con horas
+    to_delete = []
+    for key in stored.keys() - expected.keys():
+        current = stored[key]
+        if current.productive_hours or current.total_work_time:
+            to_delete.append(current.id)
+            mismatches.append({
+                'employee_id': key[0], 'iso_year': key[1], 'iso_week': key[2],
+                'stored': current.productive_hours,
+                'expected': Decimal('0.00'),
+            })
+
+    written = deleted = 0
+    if not check_only:
+        with transaction.atomic():
+            if to_write:
+                WeeklyHoursSummary.objects.bulk_create(
+                    to_write,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['employee', 'iso_year', 'iso_week'],
+                    update_fields=['week_start', 'productive_hours', 'total_work_time', 'updated_at'],
+                )
+                written = len(to_write)
+            if to_delete:
+                deleted, _ = WeeklyHoursSummary.objects.filter(id__in=to_delete).delete()
+
+    if mismatches:
+        logger.warning(f"Weekly hours rollup: {len(mismatches)} mismatches between {start} and {end}")
+
+    return {
+        'weeks': len(expected.keys() | stored.keys()),
+        'mismatches': mismatches,
+        'written': written,
+        'deleted': deleted,
+    }
@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
 from django_q.models import Schedule
+from django.utils import timezone
+from datetime import timedelta
 
 class Command(BaseCommand):
     help = 'Setup scheduled tasks for Django Q'
@@ -19,3 +21,68 @@ class Command(BaseCommand):
             }
         )
         self.stdout.write(self.style.SUCCESS(f"✅ Django Q schedule '{schedule_name}' registered successfully."))
+
+        # Reanudar ejecuciones de nómina cuyo worker fue reciclado
+        schedule_name = "Resume Stale Payroll Runs"
+        Schedule.objects.update_or_create(
+            name=schedule_name,
+            defaults={
+                "func": "payment.tasks.resume_stale_payroll_runs",
+                "schedule_type": Schedule.MINUTES,
+                "minutes": 10,
+                "repeats": -1,
+            }
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Django Q schedule '{schedule_name}' registered successfully."))
+
+        # Conciliación del registro de presencia (attendance.presence)
+        schedule_name = "Reconcile Presence Registry"
+        Schedule.objects.update_or_create(
+            name=schedule_name,
+            defaults={
+                "func": "attendance.tasks.reconcile_presence_registry",
+                "schedule_type": Schedule.MINUTES,
+                "minutes": 5,
+                "repeats": -1,
+            }
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Django Q schedule '{schedule_name}' registered successfully."))
+
+        # Conciliación nocturna de totales diarios (recálculo completo)
+        schedule_name = "Reconcile Daily Totals"
+        Schedule.objects.update_or_create(
+            name=schedule_name,
+            defaults={
+                "func": "attendance.tasks.reconcile_daily_totals",
+                "schedule_type": Schedule.DAILY,
+                "next_run": timezone.now().replace(hour=3, minute=0, second=0, microsecond=0) + timedelta(days=1),
+                "repeats": -1,
+            }
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Django Q schedule '{schedule_name}' registered successfully."))
+
+        # Hechos diarios de asistencia para los dashboards (después de la conciliación)
+        schedule_name = "Refresh Daily Attendance Facts"
+        Schedule.objects.update_or_create(
+            name=schedule_name,
+            defaults={
+                "func": "attendance.tasks.refresh_daily_attendance_facts",
+                "schedule_type": Schedule.DAILY,
+                "next_run": timezone.now().replace(hour=3, minute=30, second=0, microsecond=0) + timedelta(days=1),
+                "repeats": -1,
+            }
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Django Q schedule '{schedule_name}' registered successfully."))
+
+        # Extender el índice de días programados (horarios indefinidos)
+        schedule_name = "Extend Scheduled Days"
+        Schedule.objects.update_or_create(
+            name=schedule_name,
+            defaults={
+                "func": "workforce.tasks.extend_scheduled_days_horizon",
+                "schedule_type": Schedule.DAILY,
+                "next_run": timezone.now().replace(hour=2, minute=30, second=0, microsecond=0) + timedelta(days=1),
+                "repeats": -1,
+            }
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Django Q schedule '{schedule_name}' registered successfully."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_payrollrun'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payrollrun',
+            name='kind',
+            field=models.CharField(choices=[('generate', 'Generate Payroll'), ('recalculate', 'Recalculate Payments')], default='generate', max_length=20),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:11
+
+import datetime
+from decimal import Decimal
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_2024_table(apps, schema_editor):
+    # La escala que estaba en Payment.calculate_monthly_isr y las tasas de
+    # calculate_totals_signal; lo anual por debajo del primer tramo es exento
+    TaxTable = apps.get_model('core', 'TaxTable')
+    TaxBracket = apps.get_model('core', 'TaxBracket')
+
+    table, created = TaxTable.objects.get_or_create(
+        effective_from=datetime.date(2024, 1, 1),
+        defaults={
+            'name': 'ISR 2024',
+            'afp_rate': Decimal('0.0287'),
+            'sfs_rate': Decimal('0.0304'),
+        },
+    )
+    if created:
+        TaxBracket.objects.bulk_create([
+            TaxBracket(table=table, annual_from=Decimal('416220.00'), rate=Decimal('0.15')),
+            TaxBracket(table=table, annual_from=Decimal('624329.00'), rate=Decimal('0.20')),
+            TaxBracket(table=table, annual_from=Decimal('867123.00'), rate=Decimal('0.25')),
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_create_cache_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxTable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('effective_from', models.DateField(unique=True)),
+                ('afp_rate', models.DecimalField(decimal_places=4, help_text='AFP employee rate, e.g. 0.0287', max_digits=6)),
+                ('sfs_rate', models.DecimalField(decimal_places=4, help_text='SFS employee rate, e.g. 0.0304', max_digits=6)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Tax Table',
+                'verbose_name_plural': 'Tax Tables',
+                'ordering': ['-effective_from'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaxBracket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annual_from', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(0)])),
+                ('rate', models.DecimalField(decimal_places=4, help_text='Rate on the annual excess, e.g. 0.15', max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)])),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='brackets', to='core.taxtable')),
+            ],
+            options={
+                'verbose_name': 'Tax Bracket',
+                'verbose_name_plural': 'Tax Brackets',
+                'ordering': ['table', 'annual_from'],
+                'unique_together': {('table', 'annual_from')},
+            },
+        ),
+        migrations.RunPython(seed_2024_table, migrations.RunPython.noop),
+    ]
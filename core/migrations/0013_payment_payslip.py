@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_tax_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='payslip',
+            field=models.FileField(blank=True, null=True, upload_to='payslips/'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='payslip_generated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:47
+
+import core.utils.private_files
+from django.core.files.storage import storages
+from django.db import migrations, models
+
+
+def delete_public_payslips(apps, schema_editor):
+    # Los volantes ya publicados estaban en MEDIA_ROOT con nombres predecibles;
+    # el enlace se conserva y la descarga los vuelve a generar
+    public = storages['default']
+    Payment = apps.get_model('core', 'Payment')
+    for name in Payment.objects.exclude(payslip='').exclude(payslip__isnull=True).values_list('payslip', flat=True):
+        if public.exists(name):
+            public.delete(name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_payment_payslip'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='payslip',
+            field=models.FileField(blank=True, null=True, storage=core.utils.private_files.private_storage, upload_to='payslips/'),
+        ),
+        migrations.RunPython(delete_public_payslips, migrations.RunPython.noop),
+    ]
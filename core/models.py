@@ -8,6 +8,7 @@ from django.dispatch import receiver
 from decimal import Decimal
 from django.utils import timezone
 import uuid
+from .utils.private_files import private_storage
 
 
 class Campaign(models.Model):
@@ -327,6 +328,49 @@ class PayPeriod(models.Model):
         ordering = ['-start_date']
 
 
+class TaxTable(models.Model):
+    """
+    Escala de ISR (anual) y tasas de AFP/SFS vigentes desde ``effective_from``.
+
+    Los cálculos usan la tabla compilada de core/utils/tax_tables.py.
+    """
+    name = models.CharField(max_length=100)
+    effective_from = models.DateField(unique=True)
+    afp_rate = models.DecimalField(max_digits=6, decimal_places=4, help_text="AFP employee rate, e.g. 0.0287")
+    sfs_rate = models.DecimalField(max_digits=6, decimal_places=4, help_text="SFS employee rate, e.g. 0.0304")
+    notes = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} (from {self.effective_from})"
+
+    class Meta:
+        verbose_name = "Tax Table"
+        verbose_name_plural = "Tax Tables"
+        ordering = ['-effective_from']
+
+
+class TaxBracket(models.Model):
+    """Tramo de ISR: ``rate`` sobre el excedente anual de ``annual_from``."""
+    table = models.ForeignKey(TaxTable, on_delete=models.CASCADE, related_name='brackets')
+    annual_from = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
+    rate = models.DecimalField(
+        max_digits=5, decimal_places=4,
+        validators=[MinValueValidator(0), MaxValueValidator(1)],
+        help_text="Rate on the annual excess, e.g. 0.15",
+    )
+
+    def __str__(self):
+        return f"{self.rate:%} over {self.annual_from}"
+
+    class Meta:
+        verbose_name = "Tax Bracket"
+        verbose_name_plural = "Tax Brackets"
+        ordering = ['table', 'annual_from']
+        unique_together = ['table', 'annual_from']
+
+
 
 class Payment(models.Model):
     STATUS_CHOICES = [
@@ -391,7 +435,12 @@ class Payment(models.Model):
     # Payment proof
     payment_reference = models.CharField(max_length=100, blank=True, null=True)
     payment_proof = models.FileField(upload_to='payment_proofs/', blank=True, null=True)
-        
+
+    # Volante de pago en PDF (payment/payslips.py); se borra el enlace cuando cambian los montos.
+    # Storage privado: se descarga por nomina:payment_payslip
+    payslip = models.FileField(upload_to='payslips/', storage=private_storage, blank=True, null=True)
+    payslip_generated_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         return f"Payment {self.period} - {self.employee}"
 
@@ -408,13 +457,10 @@ class Payment(models.Model):
         if not self.gross_salary:
             return
         
-        # Constants
-        AFP_RATE = Decimal('0.0287')
-        SFS_RATE = Decimal('0.0304')
-        
-        # Calculate mandatory deductions
-        self.afp = self.gross_salary * AFP_RATE
-        self.sfs = self.gross_salary * SFS_RATE
+        # Calculate mandatory deductions (tasas de la TaxTable vigente)
+        tax_table = self.tax_table()
+        self.afp = tax_table.afp(self.gross_salary)
+        self.sfs = tax_table.sfs(self.gross_salary)
         
         # Calculate ISR
         self.isr = self.calculate_isr_for_period()
@@ -481,62 +527,14 @@ class Payment(models.Model):
             self.isr_to_apply = monthly_isr
             return monthly_isr
     
+    def tax_table(self):
+        """Compiled TaxTable in force at the start of the period"""
+        from core.utils.tax_tables import tax_table_for
+        return tax_table_for(self.period.start_date)
+
     def calculate_monthly_isr(self, monthly_gross):
-        """Calculate ISR for a monthly gross salary"""
-        from decimal import Decimal
-        
-        # Convertir a Decimal si es necesario
-        if isinstance(monthly_gross, (int, float)):
-            gross = Decimal(str(monthly_gross))
-        else:
-            gross = monthly_gross
-        
-        # Escala de ISR 2024 RD (actualiza según año)
-        # Hasta RD$416,220.00 anual -> 0%
-        # De RD$416,220.01 a RD$624,329.00 anual -> 15% del excedente
-        # De RD$624,329.01 a RD$867,123.00 anual -> RD$31,216.00 + 20% del excedente
-        # Más de RD$867,123.01 anual -> RD$79,776.00 + 25% del excedente
-        
-        # Convertir a ANUAL para cálculo (asumiendo salario mensual)
-        annual_gross = gross * Decimal('12')
-        
-        # Límites ANUALES
-        LIMITE_EXENTO = Decimal('416220.00')
-        LIMITE_15 = Decimal('624329.00')
-        LIMITE_20 = Decimal('867123.00')
-        
-        if annual_gross <= LIMITE_EXENTO:
-            return Decimal('0.00')
-        
-        elif annual_gross <= LIMITE_15:
-            excedente = annual_gross - LIMITE_EXENTO
-            isr_anual = excedente * Decimal('0.15')
-            
-        elif annual_gross <= LIMITE_20:
-            excedente_15 = LIMITE_15 - LIMITE_EXENTO
-            isr_15 = excedente_15 * Decimal('0.15')
-            
-            excedente_20 = annual_gross - LIMITE_15
-            isr_20 = excedente_20 * Decimal('0.20')
-            
-            isr_anual = isr_15 + isr_20
-            
-        else:
-            excedente_15 = LIMITE_15 - LIMITE_EXENTO
-            isr_15 = excedente_15 * Decimal('0.15')
-            
-            excedente_20 = LIMITE_20 - LIMITE_15
-            isr_20 = excedente_20 * Decimal('0.20')
-            
-            excedente_25 = annual_gross - LIMITE_20
-            isr_25 = excedente_25 * Decimal('0.25')
-            
-            isr_anual = isr_15 + isr_20 + isr_25
-        
-        # Convertir a mensual
-        isr_mensual = isr_anual / Decimal('12')
-        
-        return isr_mensual.quantize(Decimal('0.01'))
+        """Calculate ISR for a monthly gross salary (escala anual de la TaxTable)"""
+        return self.tax_table().monthly_isr(monthly_gross)
     
     def approve_by_employee(self):
         """Employee approves their payment"""
@@ -581,18 +579,101 @@ class PaymentDetail(models.Model):
         verbose_name_plural = "Payment Details"
 
 
+class PayrollRun(models.Model):
+    """Ejecución en segundo plano de la nómina de un período, por bloques de empleados"""
+    KIND_CHOICES = [
+        ('generate', 'Generate Payroll'),
+        ('recalculate', 'Recalculate Payments'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('completed_with_errors', 'Completed with Errors'),
+        ('failed', 'Failed'),
+    ]
+
+    period = models.ForeignKey(PayPeriod, on_delete=models.CASCADE, related_name='runs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='generate')
+    status = models.CharField(max_length=25, choices=STATUS_CHOICES, default='pending')
+
+    # Empleados congelados al iniciar, para que los bloques no cambien al reanudar
+    employee_ids = models.JSONField(default=list)
+    chunk_size = models.PositiveIntegerField(default=200)
+    chunks_done = models.PositiveIntegerField(default=0)
+    processed_employees = models.PositiveIntegerField(default=0)
+    payments_created = models.PositiveIntegerField(default=0)
+    total_gross = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    errors = models.JSONField(default=list, blank=True)
+
+    started_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    ACTIVE_STATUSES = ('pending', 'running')
+
+    class Meta:
+        verbose_name = "Payroll Run"
+        verbose_name_plural = "Payroll Runs"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.period.name} ({self.get_status_display()})"
+
+    @property
+    def total_employees(self):
+        return len(self.employee_ids)
+
+    @property
+    def total_chunks(self):
+        if not self.employee_ids:
+            return 0
+        return (len(self.employee_ids) + self.chunk_size - 1) // self.chunk_size
+
+    @property
+    def percent(self):
+        if not self.total_chunks:
+            return 100 if self.status not in self.ACTIVE_STATUSES else 0
+        return round(self.chunks_done * 100 / self.total_chunks)
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    def chunk_employee_ids(self, index):
+        start = index * self.chunk_size
+        return self.employee_ids[start:start + self.chunk_size]
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'period_id': self.period_id,
+            'kind': self.kind,
+            'status': self.status,
+            'status_display': self.get_status_display(),
+            'percent': self.percent,
+            'chunks_done': self.chunks_done,
+            'total_chunks': self.total_chunks,
+            'processed_employees': self.processed_employees,
+            'total_employees': self.total_employees,
+            'payments_created': self.payments_created,
+            'total_gross': float(self.total_gross),
+            'errors': self.errors,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
 @receiver(pre_save, sender=Payment)
 def calculate_totals_signal(sender, instance, **kwargs):
     if not instance.gross_salary:
         return
 
-    # Constants
-    AFP_RATE = Decimal('0.0287')  # 2.87%
-    SFS_RATE = Decimal('0.0304')  # 3.04%
-
-    # Calculate mandatory deductions
-    instance.afp = instance.gross_salary * AFP_RATE
-    instance.sfs = instance.gross_salary * SFS_RATE
+    # Calculate mandatory deductions (tasas de la TaxTable vigente)
+    tax_table = instance.tax_table()
+    instance.afp = tax_table.afp(instance.gross_salary)
+    instance.sfs = tax_table.sfs(instance.gross_salary)
 
     # Calculate ISR based on period type
     instance.isr = instance.calculate_isr_for_period()
@@ -1,13 +1,21 @@
 # signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.contrib.sessions.models import Session
+from django.db import transaction
 
-from .models import Employee
-from attendance.models import WorkDay
+from .models import Employee, Payment, TaxBracket, TaxTable
+from .utils.cache_layer import bump
+from .utils.payroll_engine import reconcile_second_half
+from .utils.payroll_review import review_entities
+from .utils.tax_tables import VERSION_ENTITY as TAX_TABLE_VERSION, clear_compiled
+from attendance.models import ActivitySession, WorkDay, WeeklyHoursSummary, Occurrence
+from workforce.models import EmployeeSchedule
+from attendance.api_cache import changed_windows
+from attendance.live_status import publish_status_on_commit
 
 @receiver(user_logged_in)
 def set_user_logged_in(sender, request, user, **kwargs):
@@ -35,4 +43,94 @@ def set_user_logged_out(sender, request, user, **kwargs):
         employee.is_logged_in = False
         employee.save()
     except Employee.DoesNotExist:
-        pass
\ No newline at end of file
+        pass
+
+
+# Versiones de la caché compartida (core/utils/cache_layer.py): cada save o
+# delete hace un solo bump con todo lo que cambia, escrito al hacer commit
+
+def _employee_campaign_id(instance):
+    if type(instance).employee.is_cached(instance):
+        return instance.employee.current_campaign_id
+    return Employee.objects.filter(pk=instance.employee_id).values_list('current_campaign_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=WorkDay)
+def bump_cache_on_workday_change(sender, instance, **kwargs):
+    bump(
+        ('workday', instance.pk),
+        ('employee', instance.employee_id),
+        ('campaign', _employee_campaign_id(instance)),
+        # Revisión de nómina de los períodos de ese día
+        *review_entities(instance.date),
+        # La API de análisis filtra por check_in__date: también el mes de la entrada
+        *changed_windows('workday', instance.date, instance.check_in and instance.check_in.date()),
+    )
+
+
+def _session_employee_id(instance):
+    if ActivitySession.work_day.is_cached(instance):
+        return instance.work_day.employee_id
+    return WorkDay.objects.filter(pk=instance.work_day_id).values_list('employee_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=ActivitySession)
+def bump_cache_on_session_change(sender, instance, **kwargs):
+    bump(('workday', instance.work_day_id), ('employee', _session_employee_id(instance)))
+
+
+@receiver([post_save, post_delete], sender=ActivitySession)
+def publish_live_status_on_session_change(sender, instance, **kwargs):
+    # Entrar, break/lunch, terminar el día y ediciones: evento a los tableros en vivo
+    publish_status_on_commit([_session_employee_id(instance)])
+
+
+@receiver([post_save, post_delete], sender=Employee)
+def bump_cache_on_employee_change(sender, instance, **kwargs):
+    bump(('employee', instance.pk), ('campaign', instance.current_campaign_id))
+
+
+@receiver([post_save, post_delete], sender=Employee)
+def publish_live_status_on_employee_change(sender, instance, **kwargs):
+    # Login/logout, campaña o supervisor: registro de presencia y tableros
+    publish_status_on_commit([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=EmployeeSchedule)
+def bump_cache_on_schedule_change(sender, instance, **kwargs):
+    bump(('employee', instance.employee_id))
+
+
+@receiver([post_save, post_delete], sender=Occurrence)
+def invalidate_analytics_on_occurrence_change(sender, instance, **kwargs):
+    bump(*changed_windows('occurrence', instance.date))
+
+
+@receiver(post_delete, sender=WorkDay)
+def subtract_deleted_workday_from_week(sender, instance, **kwargs):
+    # Sin reconstruir: en un borrado en cascada la fila de la semana también se va
+    stored = instance.stored_week_contribution() or instance.week_contribution()
+    employee_id, day, hours, work_time = stored
+    WeeklyHoursSummary.apply_delta(employee_id, day, -hours, -work_time, rebuild_missing=False)
+
+
+@receiver([post_save, post_delete], sender=Payment)
+def invalidate_review_on_payment_change(sender, instance, **kwargs):
+    bump(('period', instance.period_id), ('employee', instance.employee_id))
+
+
+@receiver([post_save, post_delete], sender=Payment)
+def reconcile_second_half_on_first_half_change(sender, instance, **kwargs):
+    # Un pago de primera quincena corregido cambia el ISR de la segunda
+    period = instance.period
+    if period.is_first_half():
+        employee_ids = [instance.employee_id]
+        transaction.on_commit(lambda: reconcile_second_half(period.month, period.year, employee_ids=employee_ids))
+
+
+@receiver([post_save, post_delete], sender=TaxTable)
+@receiver([post_save, post_delete], sender=TaxBracket)
+def recompile_tax_tables(sender, instance, **kwargs):
+    # Los demás procesos recompilan al ver la nueva versión (core/utils/tax_tables.py)
+    bump(TAX_TABLE_VERSION)
+    transaction.on_commit(clear_compiled)
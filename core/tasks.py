@@ -5,7 +5,8 @@ from django.db import transaction
 import logging
 
 from core.models import Campaign, Employee
-from attendance.models import ActivitySession, WorkDay
+from core.utils.bulk_logout import bulk_logout, close_active_workdays, close_open_sessions
+from attendance.live_status import publish_status_on_commit
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +40,8 @@ def auto_logout_by_campaign(request=None):
     - Management command
     """
     now = timezone.now()
-    current_time = timezone.localtime(now).time()
+    # USE_TZ = False: now ya es hora local (localtime() falla con fechas naive)
+    current_time = (timezone.localtime(now) if timezone.is_aware(now) else now).time()
     
     logger.info(f"🕒 Running auto_logout_by_campaign at {current_time}")
 
@@ -61,20 +63,26 @@ def auto_logout_by_campaign(request=None):
             continue
 
         campaigns_processed += 1
+        # Quién sigue conectado sale de la base de datos: el registro de
+        # presencia (caché) es solo para los tableros y puede estar atrasado
         employees = Employee.objects.filter(current_campaign=campaign, is_logged_in=True)
-        campaign_logged_out = 0
-        
-        logger.info(f"👥 Found {employees.count()} logged-in employees in '{campaign.name}'")
-
-        for employee in employees:
-            try:
-                with transaction.atomic():
-                    if _logout_employee_comprehensive(employee, now, "Campaign shutdown"):
-                        total_logged_out += 1
-                        campaign_logged_out += 1
-                        logger.info(f"✅ {employee} logged out automatically from campaign '{campaign.name}'")
-            except Exception as e:
-                logger.error(f"❌ Error logging out {employee} from campaign '{campaign.name}': {e}")
+
+        # Toda la campaña con sentencias por lote (core.utils.bulk_logout)
+        try:
+            result = bulk_logout(employees, now, "Campaign shutdown")
+        except Exception as e:
+            logger.error(f"❌ Error logging out campaign '{campaign.name}': {e}", exc_info=True)
+            continue
+
+        campaign_logged_out = result['employees']
+        if not campaign_logged_out:
+            logger.debug(f"✅ Nobody logged in on '{campaign.name}'.")
+            continue
+        total_logged_out += campaign_logged_out
+        logger.info(
+            f"✅ {campaign_logged_out} employees logged out automatically from campaign '{campaign.name}' "
+            f"({result['sessions']} sessions, {result['workdays']} workdays closed)"
+        )
 
         detailed_results.append(f"Campaign '{campaign.name}': {campaign_logged_out} employees logged out")
 
@@ -101,31 +109,22 @@ def force_logout_all_users(request=None):
     
     try:
         with transaction.atomic():
-            # 1. ✅ Cerrar todas las ActivitySession activas
-            active_sessions = ActivitySession.objects.filter(end_time__isnull=True)
-            session_count = active_sessions.count()
-            
-            for session in active_sessions:
-                session.end_time = now
-                session.notes = f"{session.notes or ''}\nForcefully closed by system at {now}".strip()
-                session.save(update_fields=['end_time', 'notes'])
-            
-            # 2. ✅ Actualizar WorkDays activos
-            active_workdays = WorkDay.objects.filter(status='active')
-            workday_count = active_workdays.count()
+            note = f"Forcefully closed by system at {now}"
+
+            # 1. ✅ Cerrar todas las ActivitySession activas (un UPDATE)
+            session_count, work_day_ids = close_open_sessions(None, now, note)
             
-            for workday in active_workdays:
-                workday.check_out = now
-                workday.status = 'completed'
-                workday.notes = f"{workday.notes or ''}\nForcefully closed by system at {now}".strip()
-                workday.calculate_daily_totals()
-                workday.save()
+            # 2. ✅ Completar WorkDays abiertos (totales y pago por lote)
+            workday_count = close_active_workdays(None, now, note, work_day_ids)
             
             # 3. ✅ Marcar todos los empleados como logout
-            employee_count = Employee.objects.filter(is_logged_in=True).update(
+            logged_in = Employee.objects.filter(is_logged_in=True)
+            employee_ids = list(logged_in.values_list('id', flat=True))
+            employee_count = logged_in.update(
                 is_logged_in=False,
                 last_logout=now
             )
+            publish_status_on_commit(employee_ids)
             
             # 4. ✅ Eliminar sesiones de autenticación
             session_auth_count = Session.objects.all().count()
@@ -148,69 +147,6 @@ def force_logout_all_users(request=None):
         return _return_result(error_message, request, is_error=True)
 
 
-def _logout_employee_comprehensive(employee, now, reason="System"):
-    """
-    Comprehensive employee logout - safely closes all active sessions.
-    """
-    try:
-        with transaction.atomic():
-            # 1. Cerrar ActivitySessions activas del empleado
-            active_sessions = ActivitySession.objects.filter(
-                work_day__employee=employee,
-                end_time__isnull=True
-            )
-            
-            for session in active_sessions:
-                session.end_time = now
-                session.notes = f"{session.notes or ''}\nAuto-logout: {reason} at {now}".strip()
-                session.save(update_fields=['end_time', 'notes'])
-            
-            # 2. Cerrar WorkDays activos del empleado
-            active_workdays = WorkDay.objects.filter(
-                employee=employee,
-                status='active'
-            )
-            
-            for workday in active_workdays:
-                workday.check_out = now
-                workday.status = 'completed'
-                workday.notes = f"{workday.notes or ''}\nAuto-logout: {reason} at {now}".strip()
-                workday.calculate_daily_totals()
-                workday.save()
-            
-            # 3. Eliminar sesiones de autenticación del usuario
-            _delete_user_sessions_comprehensive(employee.user)
-            
-            # 4. Actualizar estado del empleado
-            employee.is_logged_in = False
-            employee.last_logout = now
-            employee.save(update_fields=['is_logged_in', 'last_logout', 'updated_at'])
-            
-            logger.debug(f"✅ Comprehensive logout completed for {employee}")
-            return True
-            
-    except Exception as e:
-        logger.error(f"❌ Comprehensive logout failed for {employee}: {e}")
-        return False
-
-
-def _delete_user_sessions_comprehensive(user):
-    """Delete all sessions for a specific user."""
-    deleted = 0
-    for session in Session.objects.all():
-        try:
-            data = session.get_decoded()
-            if data.get('_auth_user_id') == str(user.id):
-                session.delete()
-                deleted += 1
-        except Exception as e:
-            logger.debug(f"Could not decode session: {e}")
-            continue
-    
-    logger.debug(f"🗑️ {deleted} auth sessions deleted for {user.username}")
-    return deleted
-
-
 def _return_result(message, request=None, is_error=False):
     """
     Helper to return appropriate response based on context.
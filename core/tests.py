@@ -1,3 +1,550 @@
-from django.test import TestCase
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from attendance.daily_facts import compute_daily_facts
+from attendance.models import ActivitySession, WeeklyHoursSummary, WorkDay
+from attendance.presence import presence_by_campaign
+from core.models import Campaign, Employee, Payment, PayPeriod, Position, TaxBracket, TaxTable
+from core.tasks import auto_logout_by_campaign
+from core.utils import cache_layer, tax_tables
+from core.utils.bulk_logout import bulk_logout
+from core.utils.cache_layer import entity_versions
+from core.utils.payroll_engine import (
+    create_period_payments, generate_period_payroll, reconcile_second_half, refresh_period_payments,
+)
+from core.utils.payroll_review import build_period_review
+from core.utils.tax_tables import clear_compiled, isr_for, tax_table_for
+from core.utils.trends import attendance_trends, period_dates, schedule_compliance_trends
+from workforce.models import EmployeeSchedule, Shift
+from workforce.scheduled_days import SCHEDULED_STATUSES, WEEKDAY_FIELDS
+
+
+# Caché en memoria: las consultas contadas son solo las de la nómina
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-l2'},
+    'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-l1'},
+}
+
+
+class PayrollFixtureMixin:
+    """Primera quincena de marzo 2026 y empleados con días pagados."""
+
+    def setUp(self):
+        self.period = PayPeriod.objects.create(
+            name='March 2026 - 1st half',
+            start_date=date(2026, 3, 1),
+            end_date=date(2026, 3, 15),
+            pay_date=date(2026, 3, 16),
+            frequency='biweekly',
+            period_type='first_half',
+            month=3,
+            year=2026,
+        )
+        clear_compiled()
+        tax_table_for(self.period.start_date)  # tabla compilada fuera de la medición
+
+    def add_employees(self, count):
+        """``count`` empleados con días pagados, aprobados o no; uno de cada 5 con salario fijo."""
+        employees = [
+            Employee.objects.create(
+                gender='M',
+                fixed_rate=(i % 5 == 0),
+                custom_base_salary=Decimal('45000.00') if i % 5 == 0 else None,
+            )
+            for i in range(count)
+        ]
+        WorkDay.objects.bulk_create([
+            WorkDay(
+                employee=employee,
+                date=date(2026, 3, day),
+                productive_hours=Decimal('8.00'),
+                total_pay=Decimal('2800.00'),
+                is_approved=(day % 2 == 0),
+            )
+            for employee in employees
+            for day in range(2, 14)
+        ])
+        return employees
+
+
+class ScheduleFixtureMixin:
+    """Horarios, empleados y días de trabajo al azar (semilla fija) alrededor de ``today``."""
+
+    today = date(2026, 3, 18)
+
+    def build_schedules(self, seed=7, employees=12):
+        rng = random.Random(seed)
+        self.campaigns = [
+            Campaign.objects.create(name=f'Campaign {i}', start_date=date(2025, 1, 1), hour_rate=Decimal('300'))
+            for i in range(2)
+        ]
+        self.shifts = [
+            Shift.objects.create(campaign=self.campaigns[i % 2], shift_type='morning',
+                                 start_time=time(8 + i), end_time=time(16 + i))
+            for i in range(3)
+        ]
+        self.employees = [
+            Employee.objects.create(
+                gender='M',
+                current_campaign=rng.choice(self.campaigns + [None]),
+                is_active=rng.random() > 0.2,
+            )
+            for _ in range(employees)
+        ]
+
+        # Algunos se solapan, otros no están publicados o no tienen fin; el
+        # inicio no se repite por empleado (el más reciente define el turno)
+        for employee in self.employees:
+            for offset in rng.sample(range(151), rng.randint(0, 2)):
+                start = self.today - timedelta(days=offset)
+                EmployeeSchedule.objects.create(
+                    employee=employee,
+                    shift=rng.choice(self.shifts),
+                    start_date=start,
+                    end_date=None if rng.random() < 0.3 else start + timedelta(days=rng.randint(5, 120)),
+                    status=rng.choice(['published', 'active', 'active', 'draft', 'cancelled']),
+                    **{field: rng.random() < 0.7 for field in WEEKDAY_FIELDS},
+                )
+
+        workdays = []
+        for employee in self.employees:
+            for offset in range(100):
+                if rng.random() < 0.6:
+                    day = self.today - timedelta(days=offset)
+                    check_in = None if rng.random() < 0.2 else datetime.combine(day, time(8))
+                    closed = check_in is not None and rng.random() < 0.8
+                    workdays.append(WorkDay(
+                        employee=employee, date=day, check_in=check_in,
+                        check_out=datetime.combine(day, time(16)) if closed else None,
+                        productive_hours=Decimal('7.50') if closed else Decimal('0'),
+                        total_work_time=timedelta(hours=7, minutes=30) if closed else timedelta(0),
+                        total_break_time=timedelta(minutes=30) if closed else timedelta(0),
+                    ))
+        WorkDay.objects.bulk_create(workdays)
+
+    def old_schedules(self, day, schedules=None):
+        """Horarios vigentes ese día filtrando EmployeeSchedule, como antes del índice."""
+        schedules = EmployeeSchedule.objects.all() if schedules is None else schedules
+        return schedules.filter(
+            status__in=SCHEDULED_STATUSES,
+            start_date__lte=day,
+            **{WEEKDAY_FIELDS[day.weekday()]: True}
+        ).filter(Q(end_date__gte=day) | Q(end_date__isnull=True))
+
+    def old_scheduled(self, day, schedules=None, distinct_employees=False):
+        """Conteo por día directo de EmployeeSchedule."""
+        schedules = self.old_schedules(day, schedules)
+        if distinct_employees:
+            return schedules.values('employee').distinct().count()
+        return schedules.count()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PayrollEngineQueryCountTests(PayrollFixtureMixin, TestCase):
+    """create_period_payments / generate_period_payroll run a fixed number of queries."""
+
+    def queries_for(self, headcount, run):
+        # Hasta 35 pagos: SQLite parte el INSERT en lotes de 999 parámetros
+        self.add_employees(headcount)
+        Payment.objects.filter(period=self.period).delete()
+        with CaptureQueriesContext(connection) as queries:
+            result = run(self.period)
+        return len(queries), result
+
+    def test_create_period_payments_queries_do_not_grow_with_headcount(self):
+        small, small_result = self.queries_for(5, create_period_payments)
+        large, large_result = self.queries_for(30, create_period_payments)
+
+        self.assertEqual(small_result['payments'], 5)
+        self.assertEqual(large_result['payments'], 35)
+        self.assertEqual(small, large)
+
+    def test_generate_period_payroll_queries_do_not_grow_with_headcount(self):
+        small, small_result = self.queries_for(5, generate_period_payroll)
+        large, large_result = self.queries_for(30, generate_period_payroll)
+
+        self.assertEqual(small_result['payments'], 5)
+        self.assertEqual(large_result['payments'], 35)
+        self.assertEqual(small, large)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PeriodReviewOutdatedTests(PayrollFixtureMixin, TestCase):
+    """The review only flags payments whose gross differs from what the engine would compute."""
+
+    def outdated(self):
+        return build_period_review(self.period)['stats']['outdated_payments']
+
+    def test_created_payments_are_current(self):
+        self.add_employees(10)
+        create_period_payments(self.period)
+        self.assertEqual(self.outdated(), 0)
+
+    def test_generated_payments_are_current(self):
+        self.add_employees(10)
+        generate_period_payroll(self.period)
+        self.assertEqual(self.outdated(), 0)
+
+    def test_changed_approved_workday_flags_payment(self):
+        employee = self.add_employees(2)[1]  # sin salario fijo
+        generate_period_payroll(self.period)
+        WorkDay.objects.filter(employee=employee, is_approved=True).update(total_pay=Decimal('3000.00'))
+        self.assertEqual(self.outdated(), 1)
+
+    def test_refresh_clears_outdated_and_leaves_paid_payments(self):
+        fixed, calculated, paid, draft = self.add_employees(4)  # el primero con salario fijo
+        create_period_payments(self.period, employee_ids=[fixed.id])
+        generate_period_payroll(self.period, employee_ids=[calculated.id, paid.id])
+        Payment.objects.filter(employee=paid).update(status='paid')
+        paid_before = Payment.objects.values().get(employee=paid)
+
+        WorkDay.objects.filter(employee__in=[fixed, calculated, paid, draft]).update(total_pay=Decimal('3000.00'))
+        self.assertEqual(self.outdated(), 2)  # calculado y sin pago; ni el fijo ni el pagado
+
+        refresh_period_payments(self.period)
+
+        self.assertEqual(self.outdated(), 0)
+        self.assertEqual(Payment.objects.values().get(employee=paid), paid_before)
+        gross = dict(Payment.objects.values_list('employee_id', 'gross_salary'))
+        self.assertEqual(gross[fixed.id], Decimal('45000.00'))        # pending_employee: salario fijo
+        self.assertEqual(gross[calculated.id], Decimal('18000.00'))   # calculated: 6 días aprobados
+        self.assertEqual(gross[draft.id], Decimal('36000.00'))        # borrador: los 12 días
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MonthlyIsrReconcileTests(PayrollFixtureMixin, TestCase):
+    """The second half is settled against the first half in one batch, and only for the employees asked."""
+
+    def setUp(self):
+        super().setUp()
+        self.second_half = PayPeriod.objects.create(
+            name='March 2026 - 2nd half',
+            start_date=date(2026, 3, 16),
+            end_date=date(2026, 3, 31),
+            pay_date=date(2026, 3, 31),
+            frequency='biweekly',
+            period_type='second_half',
+            month=3,
+            year=2026,
+        )
+
+    def add_both_halves(self, count):
+        employees = self.add_employees(count)
+        ids = [employee.id for employee in employees]
+        create_period_payments(self.period, employee_ids=ids)
+        for employee in employees:
+            Payment.objects.create(
+                employee=employee, period=self.second_half, gross_salary=Decimal('40000.00'),
+                pay_date=self.second_half.pay_date, status='calculated',
+            )
+        return ids
+
+    def reconcile_queries(self, count):
+        ids = self.add_both_halves(count)
+        # Corrección de la primera quincena sin pasar por save()
+        Payment.objects.filter(period=self.period, employee_id__in=ids).update(gross_salary=Decimal('50000.00'))
+        with CaptureQueriesContext(connection) as queries:
+            result = reconcile_second_half(3, 2026, employee_ids=ids)
+        return len(queries), result, ids
+
+    def test_first_half_lookup_is_batched(self):
+        small, small_result, _ = self.reconcile_queries(3)
+        large, large_result, ids = self.reconcile_queries(20)
+
+        self.assertEqual((small_result['updated'], large_result['updated']), (3, 20))
+        self.assertEqual(small, large)
+        for payment in Payment.objects.filter(period=self.second_half, employee_id__in=ids):
+            self.assertEqual(payment.monthly_gross_accumulated, Decimal('90000.00'))
+
+    def test_corrected_first_half_only_touches_affected_employees(self):
+        fixed, corrected, *others = self.add_both_halves(4)  # el primero con salario fijo
+        others.append(fixed)
+        untouched = list(Payment.objects.filter(period=self.second_half, employee_id__in=others).values())
+        before = Payment.objects.get(period=self.second_half, employee_id=corrected).monthly_gross_accumulated
+
+        # Más pago en la primera quincena de un solo empleado: se recalcula y reconcilia ese
+        WorkDay.objects.filter(employee_id=corrected, date__day=2).update(total_pay=Decimal('9800.00'))
+        create_period_payments(self.period, employee_ids=[corrected])
+
+        first = Payment.objects.get(period=self.period, employee_id=corrected)
+        second = Payment.objects.get(period=self.second_half, employee_id=corrected)
+        self.assertEqual(second.monthly_gross_accumulated, first.gross_salary + second.gross_salary)
+        self.assertEqual(second.monthly_gross_accumulated - before, Decimal('7000.00'))
+        self.assertEqual(
+            list(Payment.objects.filter(period=self.second_half, employee_id__in=others).values()), untouched
+        )
+        self.assertEqual(reconcile_second_half(3, 2026), {'payments': 4, 'updated': 0})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BulkLogoutTests(TestCase):
+    """bulk_logout leaves the same totals, pay and weekly hours as closing each session."""
+
+    def setUp(self):
+        self.position = Position.objects.create(name='Agent', hour_rate=Decimal('350.00'))
+        self.now = datetime(2026, 3, 2, 15, 0)
+
+    def working_employee(self, **workday):
+        employee = Employee.objects.create(gender='M', position=self.position, is_logged_in=True)
+        work_day = WorkDay.objects.create(
+            employee=employee, date=self.now.date(), check_in=self.now - timedelta(hours=3), **workday
+        )
+        return employee, work_day
+
+    def test_open_day_is_priced_and_completed(self):
+        employee, work_day = self.working_employee()  # status 'regular_hours', como attendance.views
+        ActivitySession.objects.create(work_day=work_day, session_type='work', start_time=self.now - timedelta(hours=3))
+
+        result = bulk_logout(Employee.objects.filter(pk=employee.pk), self.now, "Campaign shutdown")
+
+        work_day.refresh_from_db()
+        self.assertEqual((result['sessions'], result['workdays']), (1, 1))
+        self.assertEqual(work_day.total_work_time, timedelta(hours=3))
+        self.assertEqual(work_day.productive_hours, Decimal('3.00'))
+        self.assertEqual(work_day.total_pay, Decimal('1050.00'))
+        self.assertEqual((work_day.check_out, work_day.status), (self.now, 'completed'))
+        self.assertEqual(WeeklyHoursSummary.for_week(employee.id, self.now.date()).productive_hours, Decimal('3.00'))
+        self.assertFalse(Employee.objects.get(pk=employee.pk).is_logged_in)
+
+    def test_checked_out_day_keeps_its_check_out(self):
+        check_out = self.now - timedelta(hours=1)
+        employee, work_day = self.working_employee(check_out=check_out, status='completed')
+        ActivitySession.objects.bulk_create([
+            ActivitySession(work_day=work_day, session_type='work', start_time=self.now - timedelta(hours=3),
+                            end_time=check_out, duration=timedelta(hours=2)),
+            ActivitySession(work_day=work_day, session_type='break', start_time=check_out),
+        ])
+
+        bulk_logout(Employee.objects.filter(pk=employee.pk), self.now, "Campaign shutdown")
+
+        work_day.refresh_from_db()
+        self.assertEqual(work_day.check_out, check_out)
+        self.assertEqual(work_day.total_break_time, timedelta(hours=1))
+        self.assertEqual((work_day.productive_hours, work_day.break_count), (Decimal('2.00'), 1))
+        self.assertEqual(work_day.total_pay, Decimal('700.00'))
+
+    def test_campaign_shutdown_does_not_trust_a_stale_presence_entry(self):
+        campaign = Campaign.objects.create(
+            name='Night', start_date=date(2026, 1, 1), hour_rate=Decimal('300'), shutdown_time=time(0, 0),
+        )
+        employee = Employee.objects.create(gender='M', position=self.position, current_campaign=campaign)
+        self.assertFalse([entry.logged_in for entry in presence_by_campaign(campaign.id)][0])
+        Employee.objects.filter(pk=employee.pk).update(is_logged_in=True)  # sin señales: registro atrasado
+
+        auto_logout_by_campaign()
+
+        self.assertFalse(Employee.objects.get(pk=employee.pk).is_logged_in)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CacheLayerVersionTests(TransactionTestCase):
+    """Version bumps are written once per committed transaction and L1 hits skip L2."""
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['local'].clear()
+        self.shared = cache_layer.shared_cache()
+
+    def version(self, pk):
+        return self.shared.get(cache_layer.version_key('employee', pk))
+
+    def test_autocommit_writes_at_once(self):
+        cache_layer.bump(('employee', 1), ('employee', None))
+        self.assertIsNotNone(self.version(1))
+
+    def test_nested_atomics_write_once_on_commit(self):
+        with mock.patch.object(self.shared, 'set_many', wraps=self.shared.set_many) as set_many:
+            with transaction.atomic():
+                cache_layer.bump(('employee', 1))
+                with transaction.atomic():
+                    cache_layer.bump(('employee', 2))
+                cache_layer.bump(('employee', 3))
+                self.assertIsNone(self.version(1))
+        self.assertEqual(set_many.call_count, 1)
+        self.assertEqual(len({self.version(pk) for pk in (1, 2, 3)}), 1)
+        self.assertIsNotNone(self.version(1))
+
+    def test_savepoint_rollback_keeps_the_outer_bumps(self):
+        with transaction.atomic():
+            cache_layer.bump(('employee', 1))
+            try:
+                with transaction.atomic():
+                    cache_layer.bump(('employee', 2))
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertIsNotNone(self.version(1))
+
+        # El bump es lo único del savepoint: su callback se descarta con él
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    cache_layer.bump(('employee', 3))
+                    raise ValueError
+            except ValueError:
+                pass
+            cache_layer.bump(('employee', 4))
+        self.assertIsNotNone(self.version(4))
+
+    def test_rollback_writes_nothing(self):
+        try:
+            with transaction.atomic():
+                cache_layer.bump(('employee', 1))
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertIsNone(self.version(1))
+
+    def test_l1_hit_does_not_read_versions_from_l2(self):
+        depends = [('employee', 1)]
+        build = mock.Mock(side_effect=['first', 'second'])
+        self.assertEqual(cache_layer.get_or_set('board', build, depends=depends), 'first')
+
+        with mock.patch.object(self.shared, 'get_many', wraps=self.shared.get_many) as get_many:
+            self.assertEqual(cache_layer.get_or_set('board', build, depends=depends), 'first')
+        self.assertFalse(get_many.called)
+
+        # El bump de este proceso se ve enseguida
+        cache_layer.bump(('employee', 1))
+        self.assertEqual(cache_layer.get_or_set('board', build, depends=depends), 'second')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TaxTableTests(TestCase):
+    """ISR at each bracket edge of the seeded 2024 scale, and recompiling after an edit."""
+
+    def setUp(self):
+        clear_compiled()
+        self.day = date(2026, 3, 1)
+        self.table = tax_table_for(self.day)
+
+    def test_annual_isr_at_each_bracket_boundary(self):
+        cases = [
+            ('416219.99', '0'),
+            ('416220.00', '0'),
+            ('416220.01', '0.0015'),
+            ('624329.00', '31216.35'),        # 208109 * 15%
+            ('624330.00', '31216.55'),
+            ('867123.00', '79775.15'),        # + 242794 * 20%
+            ('867124.00', '79775.40'),
+        ]
+        for annual, expected in cases:
+            self.assertEqual(self.table.annual_isr(Decimal(annual)), Decimal(expected), annual)
+
+    def test_monthly_isr_rounds_half_up(self):
+        self.assertEqual(self.table.monthly_isr(Decimal('34685.00')), Decimal('0.00'))
+        # 3.60 anuales * 15% / 12 = 0.045: ROUND_HALF_EVEN daría 0.04
+        self.assertEqual(self.table.monthly_isr(Decimal('34685.30')), Decimal('0.05'))
+        self.assertEqual(
+            isr_for([Decimal('60000.00'), Decimal('100000.00'), 20000], day=self.day),
+            [Decimal('4195.88'), Decimal('13582.87'), Decimal('0.00')],
+        )
+
+    def test_saving_a_bracket_bumps_the_version_and_recompiles(self):
+        bracket = TaxBracket.objects.get(table_id=self.table.table_id, annual_from=Decimal('867123.00'))
+        before = entity_versions([tax_tables.VERSION_ENTITY])
+
+        # Otro proceso: no le llega el clear_compiled del commit, solo la versión
+        with mock.patch('core.signals.clear_compiled'), self.captureOnCommitCallbacks(execute=True):
+            bracket.rate = Decimal('0.30')
+            bracket.save()
+        self.assertNotEqual(entity_versions([tax_tables.VERSION_ENTITY]), before)
+        self.assertIs(tax_table_for(self.day), self.table)  # aún dentro de L1_TIMEOUT
+
+        with mock.patch.dict(tax_tables._version, checked_at=-tax_tables.L1_TIMEOUT):
+            recompiled = tax_table_for(self.day)
+        self.assertIsNot(recompiled, self.table)
+        self.assertEqual(recompiled.annual_isr(Decimal('867124.00')), Decimal('79775.45'))
+
+    def test_new_table_applies_from_its_date(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            table = TaxTable.objects.create(name='ISR 2026 H2', effective_from=date(2026, 7, 1),
+                                            afp_rate=Decimal('0.0287'), sfs_rate=Decimal('0.0304'))
+            TaxBracket.objects.create(table=table, annual_from=Decimal('500000.00'), rate=Decimal('0.15'))
+        self.assertEqual(tax_table_for(date(2026, 6, 30)).table_id, self.table.table_id)
+        self.assertEqual(tax_table_for(date(2026, 7, 1)).table_id, table.id)
+        self.assertEqual(isr_for([Decimal('34685.30')], day=date(2026, 7, 1)), [Decimal('0.00')])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TrendsEquivalenceTests(ScheduleFixtureMixin, TestCase):
+    """Grouped trends give the rows the old per-day COUNT loops gave, live or from the facts table."""
+
+    PERIODS = ['7days', '30days', '90days', 'current_month', 'previous_month']
+
+    def setUp(self):
+        self.build_schedules()
+
+    def old_attendance_trends(self, period, workdays):
+        trends = []
+        for day in period_dates(period, self.today):
+            wd_count = workdays.filter(date=day).count()
+            present = workdays.filter(date=day, check_in__isnull=False).count()
+            direction = "stable"
+            if trends:
+                previous = trends[-1]['present_count']
+                direction = "up" if present > previous else "down" if present < previous else "stable"
+            trends.append({
+                'date': day,
+                'workdays_count': wd_count,
+                'present_count': present,
+                'attendance_rate': round((present / wd_count * 100) if wd_count > 0 else 0, 1),
+                'trend_direction': direction,
+                'is_today': day == self.today,
+            })
+        return trends
+
+    def old_compliance_trends(self, period, employees, distinct_employees):
+        trends = []
+        for day in period_dates(period, self.today):
+            scheduled = self.old_scheduled(day, EmployeeSchedule.objects.filter(employee__in=employees), distinct_employees)
+            actual = WorkDay.objects.filter(employee__in=employees, date=day, check_in__isnull=False).count()
+            compliance = round((actual / scheduled * 100) if scheduled > 0 else 0, 1)
+            direction = "stable"
+            if trends:
+                previous = trends[-1]['actual_count']
+                direction = "up" if actual > previous else "down" if actual < previous else "stable"
+            trends.append({
+                'date': day,
+                'scheduled_count': scheduled,
+                'actual_count': actual,
+                'compliance_rate': compliance,
+                'attendance_rate': compliance,
+                'present_count': actual,
+                'workdays_count': scheduled,
+                'trend_direction': direction,
+                'is_today': day == self.today,
+            })
+        return trends
+
+    def assert_same_trends(self):
+        campaign = self.campaigns[0]
+        campaign_active = Employee.objects.filter(current_campaign=campaign, is_active=True)
+        for period in self.PERIODS:
+            with self.subTest(period=period):
+                self.assertEqual(attendance_trends(period, today=self.today),
+                                 self.old_attendance_trends(period, WorkDay.objects.all()))
+                self.assertEqual(attendance_trends(period, campaign=campaign, today=self.today),
+                                 self.old_attendance_trends(period, WorkDay.objects.filter(employee__current_campaign=campaign)))
+                self.assertEqual(schedule_compliance_trends(period, today=self.today),
+                                 self.old_compliance_trends(period, Employee.objects.all(), False))
+                self.assertEqual(
+                    schedule_compliance_trends(period, campaign=campaign, active_only=True,
+                                               distinct_employees=True, today=self.today),
+                    self.old_compliance_trends(period, campaign_active, True),
+                )
+
+    def test_live_window(self):
+        self.assert_same_trends()
+
+    def test_window_partly_read_from_the_facts_table(self):
+        compute_daily_facts(self.today - timedelta(days=60), self.today - timedelta(days=3))
+        self.assert_same_trends()
@@ -0,0 +1,179 @@
+"""
+Set-based logout for campaign shutdown and emergency force logout.
+
+The old path logged out one employee at a time: save() per open session,
+calculate_daily_totals() + full pay calculation per workday and a decode
+of the whole django_session table per user. Here a whole group of
+employees is closed with a fixed number of statements:
+
+1. One UPDATE closes every open ActivitySession (end_time, duration, notes)
+2. One grouped aggregate re-sums the closed sessions of the workdays whose
+   sessions were just closed (any status) and of the 'active' ones
+3. Pay is computed in one pass (attendance.pay_rules) and written with
+   bulk_update, together with the totals; days still open also get
+   check_out and status
+4. One UPDATE flips Employee.is_logged_in
+5. One indexed DELETE removes the auth sessions (accounts.UserSession)
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, DateTimeField, DurationField, ExpressionWrapper, F, Q, Sum, TextField, Value, When
+from django.db.models.functions import Concat
+
+from core.models import Employee
+from core.utils.cache_layer import bump
+from core.utils.payroll_review import invalidate_reviews_for_dates
+from accounts.sessions import delete_user_sessions
+from attendance.live_status import publish_status_on_commit
+from attendance.models import ActivitySession, WorkDay, WeeklyHoursSummary, work_hours
+from attendance.night_hours import prefetch_night_minutes
+from attendance.pay_rules import PAY_FIELDS, price_workdays
+
+
+BULK_BATCH_SIZE = 500
+
+WORKDAY_CLOSE_FIELDS = [
+    'check_out', 'status', 'notes',
+    'total_work_time', 'total_break_time', 'total_lunch_time',
+    'productive_hours', 'break_count', 'updated_at',
+]
+
+
+def _append_note(note):
+    """Expression that appends a line to ``notes`` (same text as the old strip())."""
+    return Case(
+        When(Q(notes__isnull=True) | Q(notes=''), then=Value(note)),
+        default=Concat(F('notes'), Value(f"\n{note}"), output_field=TextField()),
+        output_field=TextField(),
+    )
+
+
+def close_open_sessions(employee_ids, now, note):
+    """
+    Close every open ActivitySession of the employees (all if None) with one UPDATE.
+
+    Returns (sessions closed, ids of their workdays); the UPDATE skips
+    ActivitySession.save, so those workdays go to close_active_workdays.
+    """
+    sessions = ActivitySession.objects.filter(end_time__isnull=True)
+    if employee_ids is not None:
+        sessions = sessions.filter(work_day__employee_id__in=employee_ids)
+    open_days = set(sessions.values_list('work_day_id', 'work_day__employee_id'))
+    # El UPDATE no pasa por las señales: los tableros en vivo se avisan aquí
+    publish_status_on_commit({employee_id for _, employee_id in open_days})
+    closed = sessions.update(
+        end_time=now,
+        duration=ExpressionWrapper(
+            Value(now, output_field=DateTimeField()) - F('start_time'),
+            output_field=DurationField(),
+        ),
+        notes=_append_note(note),
+    )
+    return closed, {work_day_id for work_day_id, _ in open_days}
+
+
+def close_active_workdays(employee_ids, now, note, work_day_ids=()):
+    """
+    Recompute the workdays in ``work_day_ids`` and the 'active' ones of the
+    employees (all if None).
+
+    Same result as calculate_daily_totals() + save() per workday: totals from
+    the closed sessions, pay from attendance.pay_rules and the weekly rollup.
+    Days without check_out are completed too (check_out/status), like
+    end_work_day.
+    """
+    work_days = WorkDay.objects.filter(Q(status='active') | Q(id__in=list(work_day_ids))).select_related(
+        'employee__position', 'employee__current_campaign'
+    )
+    if employee_ids is not None:
+        work_days = work_days.filter(employee_id__in=employee_ids)
+    work_days = list(work_days)
+    if not work_days:
+        return 0
+
+    totals = defaultdict(dict)
+    rows = ActivitySession.objects.filter(
+        work_day_id__in=[wd.id for wd in work_days],
+        end_time__isnull=False,
+    ).values('work_day_id', 'session_type').annotate(
+        total=Sum('duration'),
+        count=Count('id'),
+    ).order_by()
+    for row in rows:
+        totals[row['work_day_id']][row['session_type']] = row
+
+    for work_day in work_days:
+        by_type = totals.get(work_day.id, {})
+        work = (by_type.get('work') or {}).get('total') or timedelta(0)
+
+        if work_day.status == 'active' or work_day.check_out is None:
+            work_day.check_out = now
+            work_day.status = 'completed'
+            work_day.notes = f"{work_day.notes or ''}\n{note}".strip()
+        work_day.total_work_time = work
+        work_day.total_break_time = (by_type.get('break') or {}).get('total') or timedelta(0)
+        work_day.total_lunch_time = (by_type.get('lunch') or {}).get('total') or timedelta(0)
+        work_day.break_count = (by_type.get('break') or {}).get('count') or 0
+        work_day.productive_hours = work_hours(work)
+        work_day.updated_at = now
+
+    WorkDay.objects.bulk_update(work_days, WORKDAY_CLOSE_FIELDS, batch_size=BULK_BATCH_SIZE)
+    # bulk_update no pasa por WorkDay.save: semanas y revisión se actualizan aquí
+    WeeklyHoursSummary.rebuild_weeks({(wd.employee_id, wd.date) for wd in work_days})
+
+    priced = [wd for wd in work_days if wd.productive_hours > 0]
+    if priced:
+        price_workdays(prefetch_night_minutes(priced))
+        WorkDay.objects.bulk_update(priced, PAY_FIELDS, batch_size=BULK_BATCH_SIZE)
+
+    dates = [wd.date for wd in work_days]
+    invalidate_reviews_for_dates(min(dates), max(dates))
+    bump(*{
+        entity
+        for wd in work_days
+        for entity in (('workday', wd.id), ('employee', wd.employee_id), ('campaign', wd.employee.current_campaign_id))
+    })
+    return len(work_days)
+
+
+def bulk_logout(employees, now, reason="System", note=None):
+    """
+    Log out a group of employees (queryset or list) in a fixed number of queries.
+
+    Returns a dict with the counts of each step.
+    """
+    note = note or f"Auto-logout: {reason} at {now}"
+    employees = list(employees.values_list('id', 'user_id') if hasattr(employees, 'values_list')
+                     else [(e.id, e.user_id) for e in employees])
+    if not employees:
+        return {'employees': 0, 'sessions': 0, 'workdays': 0, 'auth_sessions': 0}
+
+    employee_ids = [employee_id for employee_id, _ in employees]
+    user_ids = [user_id for _, user_id in employees if user_id]
+
+    with transaction.atomic():
+        sessions, work_day_ids = close_open_sessions(employee_ids, now, note)
+        workdays = close_active_workdays(employee_ids, now, note, work_day_ids)
+        logged_out = Employee.objects.filter(id__in=employee_ids).update(
+            is_logged_in=False,
+            last_logout=now,
+        )
+        auth_sessions = delete_user_sessions(*user_ids)
+
+    # Los UPDATE no pasan por las señales: versiones de la caché compartida y
+    # registro de presencia (is_logged_in) aquí
+    publish_status_on_commit(employee_ids)
+    campaign_ids = Employee.objects.filter(id__in=employee_ids).values_list('current_campaign_id', flat=True).distinct()
+    bump(
+        *(('employee', employee_id) for employee_id in employee_ids),
+        *(('campaign', campaign_id) for campaign_id in campaign_ids),
+    )
+
+    return {
+        'employees': logged_out,
+        'sessions': sessions,
+        'workdays': workdays,
+        'auth_sessions': auth_sessions,
+    }
@@ -0,0 +1,283 @@
+"""
+Shared two-tier cache for dashboards, the API and the payroll review.
+
+- L1: ``caches['local']``, in-process memory with a short TTL
+- L2: ``caches['default']``, shared by every web/worker process (Redis when
+  REDIS_PUBLIC_URL is set, otherwise the database cache table)
+
+Entries declare the entities they were built from, e.g.
+``depends=[('employee', 7), ('period', 3)]``. Each entity has a version
+token kept in L2 and the versions are part of the final key, so when any
+process bumps a version every L1/L2 copy built from the old data stops being
+read (within L1_TIMEOUT, see below), without having to know or delete the
+keys.
+
+core.signals bumps the versions when WorkDay, ActivitySession, Employee,
+Payment or EmployeeSchedule rows are saved or deleted, plus the monthly
+windows of the analytics API (``('workday_month', 'YYYY-MM')``, see
+attendance/api_cache.py). Bulk
+``QuerySet.update()`` skips the signals: call ``bump`` afterwards.
+
+Inside a transaction ``bump`` only collects the keys (per thread and
+database alias); they are written together (one ``set_many``) when it
+commits. Bumping before the commit would let another process rebuild an
+entry from the old rows under the new version and keep it for the whole
+TTL. Keys bumped in a block that is rolled back stay pending and go out with
+the next commit of the thread: at worst an extra invalidation.
+
+Each process keeps the versions it read in L1 for L1_TIMEOUT, so an L1 hit
+costs no L2 round trip; its own bumps update L1 at once, other processes'
+bumps are seen within L1_TIMEOUT (the same staleness L1 entries already have).
+
+``build`` must not write to the entities it depends on (the write would
+bump the version and the entry would never be read again).
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import partial
+
+from django.core.cache import caches
+from django.db import transaction
+
+
+ENTITIES = (
+    'employee', 'workday', 'campaign', 'period', 'tax_table',
+    'workday_month', 'occurrence_month',
+)
+
+DEFAULT_TIMEOUT = 60 * 5
+L1_TIMEOUT = 15  # lo que un proceso puede servir sin volver a mirar L2
+STATS_FLUSH_EVERY = 100  # eventos por proceso antes de sumarlos en L2
+
+_MISSING = object()
+
+
+def local_cache():
+    return caches['local']
+
+
+def shared_cache():
+    return caches['default']
+
+
+# =============================================================================
+# VERSIONES POR ENTIDAD
+# =============================================================================
+
+def version_key(kind, pk):
+    return f'cache_layer:version:{kind}:{pk}'
+
+
+# Claves pendientes de la transacción en curso, por hilo y alias de base de datos
+_pending = threading.local()
+
+
+def _pending_keys(using):
+    if not hasattr(_pending, 'keys'):
+        _pending.keys = {}
+    return _pending.keys.setdefault(using, set())
+
+
+def _write_versions(keys):
+    token = time.time_ns()
+    versions = {key: token for key in keys}
+    shared_cache().set_many(versions, timeout=None)
+    local_cache().set_many(versions, L1_TIMEOUT)
+
+
+def _flush_pending(using):
+    # Cada bump registra este callback: el primero escribe todo, el resto no hace nada
+    pending = _pending_keys(using)
+    if pending:
+        keys = set(pending)
+        pending.clear()
+        _write_versions(keys)
+
+
+def bump(*entities):
+    """
+    Nueva versión para cada (tipo, id); los ids vacíos se ignoran.
+
+    Dentro de una transacción se escribe al hacer commit, junto con los demás
+    ``bump`` de la misma transacción.
+    """
+    keys = {version_key(kind, pk) for kind, pk in entities if pk is not None}
+    if not keys:
+        return
+
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _write_versions(keys)
+        return
+
+    _pending_keys(connection.alias).update(keys)
+    transaction.on_commit(partial(_flush_pending, connection.alias))
+
+
+def entity_versions(depends):
+    """
+    Versiones actuales de ``depends``: de L1 si este proceso las leyó hace
+    menos de L1_TIMEOUT, si no de L2 (una lectura).
+
+    Una versión que no está (nunca escrita o desalojada) se crea nueva, así
+    nunca coincide con una entrada construida antes del desalojo.
+    """
+    keys = [version_key(kind, pk) for kind, pk in depends]
+    local = local_cache()
+    versions = local.get_many(keys)
+    unknown = [key for key in keys if key not in versions]
+    if unknown:
+        shared = shared_cache()
+        found = shared.get_many(unknown)
+        missing = [key for key in unknown if key not in found]
+        if missing:
+            token = time.time_ns()
+            for key in missing:
+                shared.add(key, token, timeout=None)
+            found.update(shared.get_many(missing))
+        local.set_many(found, L1_TIMEOUT)
+        versions.update(found)
+    return [versions.get(key) for key in keys]
+
+
+# =============================================================================
+# LECTURA
+# =============================================================================
+
+def cache_key(name, depends=()):
+    if not depends:
+        return f'cache_layer:{name}'
+    versions = list(zip(depends, entity_versions(depends)))
+    digest = hashlib.sha1(repr(versions).encode()).hexdigest()[:20]
+    return f'cache_layer:{name}:{digest}'
+
+
+def get_or_set(name, build, timeout=DEFAULT_TIMEOUT, depends=()):
+    """
+    Valor de ``name`` desde L1, L2 o ``build()``, en ese orden.
+
+    ``name`` identifica el resultado (incluye sus parámetros, p.ej.
+    ``'payroll_review:3'``); la parte antes del primer ``:`` agrupa los
+    contadores. ``depends`` es la lista de (tipo, id) que lo invalidan.
+    """
+    namespace = name.split(':', 1)[0]
+    key = cache_key(name, depends)
+    local = local_cache()
+
+    value = local.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(namespace, 'l1_hits')
+        return value
+
+    value = shared_cache().get(key, _MISSING)
+    if value is not _MISSING:
+        _count(namespace, 'l2_hits')
+    else:
+        _count(namespace, 'misses')
+        value = build()
+        shared_cache().set(key, value, timeout)
+
+    local.set(key, value, min(L1_TIMEOUT, timeout))
+    return value
+
+
+# =============================================================================
+# CONTADORES
+# =============================================================================
+
+EVENTS = ('l1_hits', 'l2_hits', 'misses')
+
+_lock = threading.Lock()
+_process_stats = Counter()
+_pending_stats = Counter()
+
+
+def stats_key(namespace, event):
+    return f'cache_layer:stats:{namespace}:{event}'
+
+
+def stats_index_key():
+    return 'cache_layer:stats:namespaces'
+
+
+def _count(namespace, event):
+    with _lock:
+        _process_stats[(namespace, event)] += 1
+        _pending_stats[(namespace, event)] += 1
+        flush = sum(_pending_stats.values()) >= STATS_FLUSH_EVERY
+    if flush:
+        flush_stats()
+
+
+def flush_stats():
+    """Sumar en L2 los contadores pendientes de este proceso."""
+    with _lock:
+        pending = dict(_pending_stats)
+        _pending_stats.clear()
+    if not pending:
+        return
+
+    shared = shared_cache()
+    namespaces = set(shared.get(stats_index_key()) or ())
+    for (namespace, event), count in pending.items():
+        namespaces.add(namespace)
+        key = stats_key(namespace, event)
+        if not shared.add(key, count, timeout=None):
+            try:
+                shared.incr(key, count)
+            except ValueError:  # desalojada entre add e incr
+                shared.set(key, count, timeout=None)
+    shared.set(stats_index_key(), sorted(namespaces), timeout=None)
+
+
+def _with_ratio(counts):
+    total = sum(counts.get(event, 0) for event in EVENTS)
+    hits = counts.get('l1_hits', 0) + counts.get('l2_hits', 0)
+    return {
+        **{event: counts.get(event, 0) for event in EVENTS},
+        'hit_rate': round(hits / total * 100, 1) if total else 0,
+    }
+
+
+def cache_stats():
+    """
+    {'process': {namespace: contadores}, 'shared': {namespace: contadores}}
+
+    ``process`` son los eventos de este proceso desde que arrancó; ``shared``
+    los totales que todos los procesos ya sumaron en L2 (cada
+    STATS_FLUSH_EVERY eventos).
+    """
+    with _lock:
+        process = Counter(_process_stats)
+
+    by_namespace = {}
+    for (namespace, event), count in process.items():
+        by_namespace.setdefault(namespace, {})[event] = count
+
+    shared = shared_cache()
+    namespaces = shared.get(stats_index_key()) or []
+    keys = {stats_key(namespace, event): (namespace, event) for namespace in namespaces for event in EVENTS}
+    shared_by_namespace = {namespace: {} for namespace in namespaces}
+    for key, count in shared.get_many(list(keys)).items():
+        namespace, event = keys[key]
+        shared_by_namespace[namespace][event] = count
+
+    return {
+        'process': {namespace: _with_ratio(counts) for namespace, counts in sorted(by_namespace.items())},
+        'shared': {namespace: _with_ratio(counts) for namespace, counts in sorted(shared_by_namespace.items())},
+    }
+
+
+def reset_stats():
+    """Borrar los contadores compartidos y los de este proceso."""
+    shared = shared_cache()
+    namespaces = shared.get(stats_index_key()) or []
+    shared.delete_many(
+        [stats_key(namespace, event) for namespace in namespaces for event in EVENTS]
+        + [stats_index_key()]
+    )
+    with _lock:
+        _process_stats.clear()
+        _pending_stats.clear()
@@ -0,0 +1,463 @@
+"""
+Batch payroll engine.
+
+Builds the Payment rows of a PayPeriod with a fixed number of queries,
+independent of headcount:
+
+1. Active employees (one query)
+2. Gross pay per employee, grouped aggregate over WorkDay (one query)
+3. First-half payments of the month, only for second-half periods (one query)
+4. Existing payments of the period (one query)
+5. bulk_create(update_conflicts=True) on (employee, period) (one query per batch)
+
+Deductions are computed here in a single pass instead of the per-row
+``calculate_totals_signal`` pre_save handler. bulk_create does not fire
+signals, so the results must match that handler exactly; both take the
+rates and the ISR scale from the same compiled TaxTable
+(core/utils/tax_tables.py).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import Employee, Payment
+from core.utils.cache_layer import bump
+from core.utils.payroll_review import SETTLED_STATUSES, invalidate_period_review, status_gross
+from core.utils.tax_tables import tax_table_for, to_cents
+from attendance.models import WorkDay
+from attendance.night_hours import prefetch_night_minutes
+from attendance.pay_rules import PAY_FIELDS, price_workdays
+
+
+ZERO = Decimal('0.00')
+
+BULK_BATCH_SIZE = 500
+
+# Se vacían al reescribir los montos: el volante publicado ya no corresponde
+PAYSLIP_FIELDS = ['payslip', 'payslip_generated_at']
+
+# Columns rewritten when a payment already exists for (employee, period)
+PAYMENT_UPDATE_FIELDS = [
+    'gross_salary', 'pay_date', 'status',
+    'afp', 'sfs', 'isr', 'total_earnings', 'total_deductions', 'net_salary',
+    'monthly_gross_accumulated', 'monthly_isr_calculated', 'isr_to_apply',
+] + PAYSLIP_FIELDS
+
+# Recalculating from the review screen keeps the status of each payment
+REFRESH_UPDATE_FIELDS = [
+    field for field in PAYMENT_UPDATE_FIELDS if field not in ('status', 'pay_date')
+]
+
+# Re-running the second-half ISR settlement keeps the saved gross
+ISR_UPDATE_FIELDS = [field for field in REFRESH_UPDATE_FIELDS if field != 'gross_salary']
+
+# Columnas de WorkDay que se reescriben al calcular el pago de días sin pago
+REPRICE_UPDATE_FIELDS = PAY_FIELDS + ['overtime_hours', 'overtime_rate', 'overtime_pay', 'updated_at']
+
+
+def reprice_unpriced_workdays(period, employee_ids=None):
+    """
+    Recalculate only the workdays that have hours but no pay yet.
+
+    The old per-employee loop did this check on every workday; here the
+    stale rows are selected in one query and usually there are none.
+    """
+    stale = WorkDay.objects.filter(
+        date__range=[period.start_date, period.end_date],
+        employee__is_active=True,
+        total_pay=0,
+        productive_hours__gt=0,
+    ).select_related('employee__position', 'employee__current_campaign')
+
+    if employee_ids is not None:
+        stale = stale.filter(employee_id__in=employee_ids)
+
+    # Horas nocturnas de todo el lote en una consulta de sesiones y horas
+    # semanales en otra; el pago se calcula en una sola pasada
+    work_days = prefetch_night_minutes(stale)
+    if not work_days:
+        return 0
+
+    for workday in work_days:
+        workday.calculate_pay()  # columnas diarias overtime_hours/overtime_rate/overtime_pay
+    price_workdays(work_days)
+
+    now = timezone.now()
+    for workday in work_days:
+        workday.updated_at = now
+
+    WorkDay.objects.bulk_update(
+        work_days, REPRICE_UPDATE_FIELDS, batch_size=BULK_BATCH_SIZE
+    )
+    # bulk_update no dispara post_save
+    invalidate_period_review(period.id)
+    return len(work_days)
+
+
+def gross_by_employee(period, approved_only=False, employee_ids=None):
+    """
+    Sum WorkDay.total_pay per employee for the period in one grouped query.
+
+    Returns {employee_id: {'gross': Decimal, 'workdays': int}}.
+    """
+    workdays = WorkDay.objects.filter(
+        date__range=[period.start_date, period.end_date],
+        employee__is_active=True,
+    )
+    if approved_only:
+        workdays = workdays.filter(is_approved=True)
+    if employee_ids is not None:
+        workdays = workdays.filter(employee_id__in=employee_ids)
+
+    rows = workdays.values('employee_id').annotate(
+        gross=Coalesce(Sum('total_pay'), ZERO),
+        workdays=Count('id'),
+    ).order_by()
+
+    return {
+        row['employee_id']: {'gross': to_cents(Decimal(row['gross'])), 'workdays': row['workdays']}
+        for row in rows
+    }
+
+
+def first_half_payments(period, employee_ids=None):
+    """
+    First-half payments of the same month, keyed by employee.
+
+    Only second-half periods need them (ISR is settled on the monthly total).
+    """
+    if not period.is_second_half():
+        return {}
+    return month_first_half_payments(period.month, period.year, employee_ids)
+
+
+def month_first_half_payments(month, year, employee_ids=None):
+    """{employee_id: {'gross_salary', 'isr_to_apply'}} of the month's first half, in one query."""
+    payments = Payment.objects.filter(
+        period__month=month,
+        period__year=year,
+        period__period_type='first_half',
+    )
+    if employee_ids is not None:
+        payments = payments.filter(employee_id__in=employee_ids)
+
+    result = {}
+    # Mismo orden que Payment.calculate_isr_for_period (.first() usa Meta.ordering)
+    for row in payments.order_by('-created_at').values('employee_id', 'gross_salary', 'isr_to_apply'):
+        result.setdefault(row['employee_id'], row)
+    return result
+
+
+def apply_deductions(payments, period, first_half=None):
+    """
+    Fill AFP/SFS/ISR and totals for a list of unsaved Payment instances.
+
+    Mirrors ``calculate_totals_signal``: AFP and SFS are a flat rate of gross,
+    ISR depends on the period type and the first-half payment, and
+    ``total_earnings`` stays at zero. The monthly ISR of the whole list is
+    priced in one ``isr_for`` call on the period's TaxTable.
+    """
+    first_half = first_half or {}
+    tax_table = tax_table_for(period.start_date)
+    is_first_half = period.is_first_half()
+    is_second_half = period.is_second_half()
+
+    # Primera pasada: bruto mensual e ISR ya retenido de cada pago con bruto
+    priced = []
+    for payment in payments:
+        gross = payment.gross_salary or ZERO
+        if not gross:
+            payment.afp = payment.sfs = payment.isr = ZERO
+            payment.total_earnings = payment.total_deductions = payment.net_salary = ZERO
+            payment.monthly_gross_accumulated = payment.monthly_isr_calculated = ZERO
+            payment.isr_to_apply = ZERO
+            continue
+
+        if is_second_half:
+            previous = first_half.get(payment.employee_id)
+            previous_gross = previous['gross_salary'] if previous else ZERO
+            previous_isr = previous['isr_to_apply'] if previous else ZERO
+            monthly_total = previous_gross + gross
+        else:
+            monthly_total = gross
+            previous_isr = ZERO
+        priced.append((payment, gross, monthly_total, previous_isr))
+
+    # Primera quincena: no se retiene ISR, solo se acumula
+    if is_first_half:
+        month_isrs = [ZERO] * len(priced)
+    else:
+        month_isrs = tax_table.isr_for([monthly_total for _, _, monthly_total, _ in priced])
+
+    for (payment, gross, monthly_total, previous_isr), month_isr in zip(priced, month_isrs):
+        isr = max(month_isr - previous_isr, ZERO)
+        afp = tax_table.afp(gross)
+        sfs = tax_table.sfs(gross)
+        total_deductions = afp + sfs + isr
+
+        payment.afp = to_cents(afp)
+        payment.sfs = to_cents(sfs)
+        payment.isr = to_cents(isr)
+        payment.total_earnings = ZERO
+        payment.total_deductions = to_cents(total_deductions)
+        payment.net_salary = to_cents(gross - total_deductions)
+        payment.monthly_gross_accumulated = to_cents(monthly_total)
+        payment.monthly_isr_calculated = month_isr
+        payment.isr_to_apply = to_cents(isr)
+
+    return payments
+
+
+def _build_period_payments(period, *, approved_only, status, use_fixed_salary,
+                           skip_zero_gross, employee_ids=None):
+    """Assemble unsaved Payment instances for the active employees of a period."""
+    employees = Employee.objects.filter(is_active=True).only(
+        'id', 'fixed_rate', 'custom_base_salary'
+    ).order_by('id')
+    if employee_ids is not None:
+        employees = employees.filter(id__in=employee_ids)
+
+    gross_map = gross_by_employee(period, approved_only=approved_only, employee_ids=employee_ids)
+
+    payments = []
+    for employee in employees:
+        worked = gross_map.get(employee.id)
+        gross = worked['gross'] if worked else ZERO
+        has_fixed_salary = bool(employee.fixed_rate and employee.custom_base_salary)
+
+        if use_fixed_salary:
+            # Solo se crea pago si hay días trabajados o salario fijo
+            if not worked and not has_fixed_salary:
+                continue
+            if has_fixed_salary:
+                gross = employee.custom_base_salary
+
+        if skip_zero_gross and gross <= ZERO:
+            continue
+
+        payments.append(Payment(
+            employee_id=employee.id,
+            period=period,
+            gross_salary=gross,
+            pay_date=period.pay_date,
+            status=status,
+        ))
+
+    first_half = first_half_payments(
+        period, employee_ids=[p.employee_id for p in payments] if employee_ids is not None else None
+    )
+    return apply_deductions(payments, period, first_half)
+
+
+def save_period_payments(period, payments, update_fields=None):
+    """
+    Upsert payments on the (employee, period) unique key.
+
+    When a first-half payment changes, the second half of the same month is
+    reconciled for those employees (``reconcile_second_half``).
+
+    Returns the number of rows that did not exist before.
+    """
+    if not payments:
+        return 0
+
+    existing = {
+        employee_id: (gross, isr_to_apply)
+        for employee_id, gross, isr_to_apply in Payment.objects.filter(
+            period=period,
+            employee_id__in=[p.employee_id for p in payments],
+        ).values_list('employee_id', 'gross_salary', 'isr_to_apply')
+    }
+
+    Payment.objects.bulk_create(
+        payments,
+        batch_size=BULK_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['employee', 'period'],
+        update_fields=update_fields or PAYMENT_UPDATE_FIELDS,
+    )
+    # bulk_create no dispara post_save
+    invalidate_period_review(period.id)
+
+    if period.is_first_half():
+        changed = [
+            p.employee_id for p in payments
+            if existing.get(p.employee_id) != (p.gross_salary, p.isr_to_apply)
+        ]
+        if changed:
+            reconcile_second_half(period.month, period.year, employee_ids=changed)
+
+    return sum(1 for p in payments if p.employee_id not in existing)
+
+
+def _isr_values(payment):
+    return [getattr(payment, field) for field in ISR_UPDATE_FIELDS if field not in PAYSLIP_FIELDS]
+
+
+def reconcile_second_half(month, year, employee_ids=None):
+    """
+    Re-run the monthly ISR settlement of the month's second-half payments.
+
+    For when first-half payments change after the second half was
+    calculated. The saved gross is kept; AFP/SFS, the monthly accumulation,
+    the ISR to apply and the totals are recomputed in one batch against the
+    current first-half payments. Paid and canceled payments are left alone.
+
+    Queries: second-half payments, first-half payments, and one bulk_update
+    per batch of rows that actually changed.
+
+    Returns {'payments': checked, 'updated': changed}.
+    """
+    payments = Payment.objects.filter(
+        period__month=month,
+        period__year=year,
+        period__period_type='second_half',
+    ).exclude(status__in=SETTLED_STATUSES).select_related('period')
+    if employee_ids is not None:
+        payments = payments.filter(employee_id__in=employee_ids)
+
+    payments = list(payments)
+    if not payments:
+        return {'payments': 0, 'updated': 0}
+
+    first_half = month_first_half_payments(
+        month, year, employee_ids=[p.employee_id for p in payments]
+    )
+
+    by_period = defaultdict(list)
+    for payment in payments:
+        by_period[payment.period_id].append(payment)
+
+    changed = []
+    for period_payments in by_period.values():
+        before = [_isr_values(payment) for payment in period_payments]
+        apply_deductions(period_payments, period_payments[0].period, first_half)
+        changed.extend(
+            payment for payment, values in zip(period_payments, before)
+            if _isr_values(payment) != values
+        )
+
+    if changed:
+        for payment in changed:
+            payment.payslip = None
+            payment.payslip_generated_at = None
+        Payment.objects.bulk_update(changed, ISR_UPDATE_FIELDS, batch_size=BULK_BATCH_SIZE)
+        # bulk_update no dispara post_save
+        invalidate_period_review(*{payment.period_id for payment in changed})
+        bump(*[('employee', payment.employee_id) for payment in changed])
+
+    return {'payments': len(payments), 'updated': len(changed)}
+
+
+def create_period_payments(period, employee_ids=None):
+    """
+    Payments created together with a new period (pending employee review).
+
+    Includes every active employee with workdays in the range or a fixed
+    salary; fixed-salary employees get their custom base salary as gross.
+    """
+    reprice_unpriced_workdays(period, employee_ids=employee_ids)
+
+    payments = _build_period_payments(
+        period,
+        approved_only=False,
+        status='pending_employee',
+        use_fixed_salary=True,
+        skip_zero_gross=False,
+        employee_ids=employee_ids,
+    )
+    created = save_period_payments(period, payments)
+
+    return {
+        'payments': len(payments),
+        'created': created,
+        'total_gross': sum((p.gross_salary for p in payments), ZERO),
+    }
+
+
+def generate_period_payroll(period, employee_ids=None):
+    """
+    Final payroll from approved workdays only.
+
+    Employees without approved pay in the period are skipped, same as the
+    old update_or_create loop.
+    """
+    payments = _build_period_payments(
+        period,
+        approved_only=True,
+        status='calculated',
+        use_fixed_salary=False,
+        skip_zero_gross=True,
+        employee_ids=employee_ids,
+    )
+    created = save_period_payments(period, payments)
+
+    return {
+        'payments': len(payments),
+        'created': created,
+        'total_gross': sum((p.gross_salary for p in payments), ZERO),
+    }
+
+
+def _refresh_payments(period, employee_ids=None):
+    """Unsaved payments of the active employees, with the gross their status implies."""
+    employees = Employee.objects.filter(is_active=True).only(
+        'id', 'fixed_rate', 'custom_base_salary'
+    ).order_by('id')
+    statuses = Payment.objects.filter(period=period)
+    if employee_ids is not None:
+        employees = employees.filter(id__in=employee_ids)
+        statuses = statuses.filter(employee_id__in=employee_ids)
+    statuses = dict(statuses.values_list('employee_id', 'status'))
+
+    worked = gross_by_employee(period, employee_ids=employee_ids)
+    approved = gross_by_employee(period, approved_only=True, employee_ids=employee_ids)
+
+    payments = []
+    for employee in employees:
+        status = statuses.get(employee.id, 'draft')
+        if status in SETTLED_STATUSES:
+            continue
+        gross = status_gross(
+            status,
+            employee,
+            worked[employee.id]['gross'] if employee.id in worked else ZERO,
+            approved[employee.id]['gross'] if employee.id in approved else ZERO,
+        )
+        payments.append(Payment(
+            employee_id=employee.id,
+            period=period,
+            gross_salary=gross,
+            pay_date=period.pay_date,
+            status=status,
+        ))
+
+    first_half = first_half_payments(
+        period, employee_ids=[p.employee_id for p in payments] if employee_ids is not None else None
+    )
+    return apply_deductions(payments, period, first_half)
+
+
+def refresh_period_payments(period, employee_ids=None):
+    """
+    Recalculate the payments shown on the review screen.
+
+    Every active employee gets a payment. Existing payments keep their status
+    and get the gross that status implies (same rule as the review's
+    outdated flag, ``payroll_review.status_gross``): approved days for
+    calculated payments, the fixed salary for payments pending employee
+    review, every workday for drafts. Paid and canceled payments are left alone.
+    """
+    reprice_unpriced_workdays(period, employee_ids=employee_ids)
+
+    payments = _refresh_payments(period, employee_ids=employee_ids)
+    created = save_period_payments(period, payments, update_fields=REFRESH_UPDATE_FIELDS)
+
+    return {
+        'payments': len(payments),
+        'created': created,
+        'total_gross': sum((p.gross_salary for p in payments), ZERO),
+    }
@@ -0,0 +1,208 @@
+"""
+Read-only data for the pay period review screen.
+
+The old view did get_or_create + save() per employee and 3-4 WorkDay
+queries per employee on every GET. Here the whole screen is built from a
+handful of queries and cached per period in the shared cache layer;
+WorkDay/Payment changes in the period bump the period version (see
+core.signals), which every process sees.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from core.models import Campaign, Employee, Payment, PayPeriod
+from attendance.models import WorkDay
+from .cache_layer import bump, get_or_set
+
+
+REVIEW_CACHE_TIMEOUT = 60 * 5
+ZERO = Decimal('0.00')
+
+WORKDAY_REVIEW_FIELDS = (
+    'id', 'employee_id', 'date', 'productive_hours',
+    'regular_pay', 'overtime_pay', 'total_pay', 'is_approved',
+)
+
+
+# Bruto con el que cada paso del motor (core/utils/payroll_engine.py) deja el pago:
+# generate_period_payroll solo suma días aprobados y create_period_payments usa
+# el salario fijo; refresh_period_payments aplica la misma regla según el estado
+# (los borradores suman todos los días) y no toca los pagos liquidados
+APPROVED_ONLY_STATUSES = ('calculated', 'pending_payment', 'paid')
+FIXED_SALARY_STATUSES = ('pending_employee', 'approved_by_employee', 'rejected_by_employee')
+SETTLED_STATUSES = ('paid', 'canceled')
+
+
+def review_cache_key(period_id):
+    return f'payroll_review:{period_id}'
+
+
+def invalidate_period_review(*period_ids):
+    bump(*(('period', period_id) for period_id in period_ids))
+
+
+def review_entities(start_date, end_date=None):
+    """cache_layer entities of every period whose range overlaps the given dates."""
+    end_date = end_date or start_date
+    period_ids = PayPeriod.objects.filter(
+        start_date__lte=end_date,
+        end_date__gte=start_date,
+    ).values_list('id', flat=True)
+    return [('period', period_id) for period_id in period_ids]
+
+
+def invalidate_reviews_for_dates(start_date, end_date=None):
+    """Invalidate every period whose range overlaps the given dates."""
+    bump(*review_entities(start_date, end_date))
+
+
+def status_gross(status, employee, worked_gross, approved_gross):
+    """Bruto de un pago en ``status``: días aprobados, salario fijo o todos los días."""
+    if status in APPROVED_ONLY_STATUSES:
+        return approved_gross
+    if status in FIXED_SALARY_STATUSES and employee.fixed_rate and employee.custom_base_salary:
+        return employee.custom_base_salary
+    return worked_gross
+
+
+def engine_gross(payment, employee, workdays):
+    """Bruto que el motor calcularía hoy para ``payment`` según su estado."""
+    return status_gross(
+        payment.status,
+        employee,
+        sum((w.total_pay for w in workdays), ZERO),
+        sum((w.total_pay for w in workdays if w.is_approved), ZERO),
+    )
+
+
+def payment_outdated(payment, employee, workdays):
+    """El pago guardado no refleja los días actuales (hay que recalcular)."""
+    if payment is None:
+        # Cualquier paso del motor crearía el pago si hay días aprobados con pago
+        return any(w.is_approved and w.total_pay for w in workdays)
+    if payment.status in SETTLED_STATUSES:
+        # Pagado o cancelado: recalcular ya no lo cambia
+        return False
+    return payment.gross_salary != engine_gross(payment, employee, workdays)
+
+
+def build_period_review(period):
+    """
+    Employee rows, campaign groups and stats for one period.
+
+    Queries: employees, payments, first-half payments (second half only),
+    workdays of the period and campaigns. Nothing is written.
+    """
+    first_half_period = None
+    if period.is_second_half():
+        first_half_period = PayPeriod.objects.filter(
+            month=period.month,
+            year=period.year,
+            period_type='first_half'
+        ).first()
+
+    employees = list(
+        Employee.objects.filter(is_active=True)
+        .select_related('user', 'current_campaign', 'position')
+        .order_by('id')
+    )
+
+    payments = {p.employee_id: p for p in Payment.objects.filter(period=period)}
+
+    first_half_payments = {}
+    if first_half_period:
+        first_half_payments = {
+            p.employee_id: p for p in Payment.objects.filter(period=first_half_period)
+        }
+
+    workdays_by_employee = defaultdict(list)
+    workdays = WorkDay.objects.filter(
+        date__range=[period.start_date, period.end_date],
+        employee__is_active=True,
+    ).only(*WORKDAY_REVIEW_FIELDS).order_by('employee_id', 'date')
+    for workday in workdays:
+        workdays_by_employee[workday.employee_id].append(workday)
+
+    employees_data = []
+    total_gross = ZERO
+    total_net = ZERO
+    total_isr = ZERO
+    monthly_gross = ZERO
+    total_workdays = 0
+    approved_workdays = 0
+
+    for employee in employees:
+        employee_workdays = workdays_by_employee.get(employee.id, [])
+        payment = payments.get(employee.id)
+
+        gross_total = sum((w.total_pay for w in employee_workdays), ZERO)
+        approved_count = sum(1 for w in employee_workdays if w.is_approved)
+        net = payment.net_salary if payment else ZERO
+        isr_to_apply = payment.isr_to_apply if payment else ZERO
+        employee_monthly_gross = payment.monthly_gross_accumulated if payment else ZERO
+
+        employees_data.append({
+            'employee': employee,
+            'payment': payment,
+            'first_half_payment': first_half_payments.get(employee.id),
+            'workdays': employee_workdays,
+            'workdays_count': len(employee_workdays),
+            'approved_count': approved_count,
+            'total_gross': float(gross_total),
+            'total_net': float(net),
+            'monthly_gross': float(employee_monthly_gross),
+            'monthly_isr': float(payment.monthly_isr_calculated) if payment else 0.0,
+            'isr_to_apply': float(isr_to_apply),
+            'fully_approved': approved_count == len(employee_workdays),
+            'has_workdays': bool(employee_workdays),
+            'payment_outdated': payment_outdated(payment, employee, employee_workdays),
+        })
+
+        total_gross += gross_total
+        total_net += net
+        total_isr += isr_to_apply
+        monthly_gross += employee_monthly_gross
+        total_workdays += len(employee_workdays)
+        approved_workdays += approved_count
+
+    # Group employees by campaign
+    grouped_employees = {}
+    for emp_data in employees_data:
+        employee = emp_data['employee']
+        campaign_name = (
+            employee.current_campaign.name
+            if employee.current_campaign
+            else "No Campaign"
+        )
+        grouped_employees.setdefault(campaign_name, []).append(emp_data)
+
+    stats = {
+        'total_employees': len(employees),
+        'employees_with_workdays': sum(1 for ed in employees_data if ed['has_workdays']),
+        'total_workdays': total_workdays,
+        'approved_workdays': approved_workdays,
+        'total_gross': float(total_gross),
+        'total_net': float(total_net),
+        'total_isr': float(total_isr),
+        'monthly_gross': float(monthly_gross),
+        'all_approved': all(ed['fully_approved'] for ed in employees_data if ed['has_workdays']),
+        'outdated_payments': sum(1 for ed in employees_data if ed['payment_outdated']),
+    }
+
+    return {
+        'first_half_period': first_half_period,
+        'stats': stats,
+        'campaigns': list(Campaign.objects.all()),
+        'grouped_employees': grouped_employees,
+        'employees_data': employees_data,
+    }
+
+
+def get_period_review(period):
+    """Cached build_period_review."""
+    return get_or_set(
+        review_cache_key(period.id),
+        lambda: build_period_review(period),
+        REVIEW_CACHE_TIMEOUT,
+        depends=[('period', period.id)],
+    )
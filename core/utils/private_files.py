@@ -0,0 +1,46 @@
+# private_files.py
+"""
+Archivos generados con datos personales (volantes de pago, carnets).
+
+No van a MEDIA_ROOT, que se sirve sin autenticación: se guardan en el
+storage 'private' (settings.STORAGES) con nombres que no se pueden adivinar
+y solo se descargan por vistas que revisan quién los pide.
+
+'private' es un bucket S3 cuando PRIVATE_STORAGE_BUCKET está configurado,
+compartido por el servicio web y el worker. Sin él es una carpeta local
+fuera de MEDIA_ROOT, y la web no ve lo que escribió el worker en otro
+contenedor: ``private_file_response`` vuelve a generar el archivo en ese caso.
+"""
+from io import BytesIO
+
+from django.core.files.storage import storages
+from django.http import FileResponse
+from django.utils.crypto import salted_hmac
+
+
+def private_storage():
+    """Storage 'private' de settings.STORAGES (callable para FileField.storage)."""
+    return storages['private']
+
+
+def private_name(prefix, key, extension='pdf'):
+    """
+    Nombre estable para ``key`` que no se deduce del id sin SECRET_KEY.
+
+    Estable para que volver a generar el archivo lo reemplace en lugar de
+    dejar el anterior huérfano.
+    """
+    token = salted_hmac(f'private_files.{prefix}', str(key)).hexdigest()[:32]
+    return f'{prefix}/{key}_{token}.{extension}'
+
+
+def private_file_response(field, filename, render):
+    """
+    FileResponse del PDF guardado en ``field``, o de ``render()`` (bytes) si
+    este proceso no lo encuentra en el storage.
+    """
+    if field and field.storage.exists(field.name):
+        content = field.storage.open(field.name, 'rb')
+    else:
+        content = BytesIO(render())
+    return FileResponse(content, filename=filename, content_type='application/pdf')
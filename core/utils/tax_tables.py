@@ -0,0 +1,181 @@
+"""
+ISR / AFP / SFS tables loaded from core.models.TaxTable.
+
+The 2024 scale and the 2.87% / 3.04% rates used to be hard-coded in
+``Payment.calculate_monthly_isr``, ``calculate_totals_signal``, the payroll
+engine and ``payment.views.calculate_isr`` (the last one with different
+brackets). Now they are rows edited in the admin, and every path asks this
+module for the table in force on a date.
+
+Each year's tables are compiled once per process into sorted arrays:
+
+- ``limits``: annual amount where each bracket starts
+- ``rates``: rate on the excess over that amount
+- ``bases``: ISR already owed at the start of the bracket
+
+so the annual ISR is one ``bisect`` plus one multiplication, and
+``isr_for`` prices a whole list of monthly grosses (the payroll engine
+passes the whole period at once).
+
+Saving or deleting a TaxTable/TaxBracket bumps the ``('tax_table', 'all')``
+version in the shared cache (core.signals). A process looks at that version
+at most every L1_TIMEOUT seconds and recompiles when it changed; the
+process that saved recompiles right away.
+"""
+import threading
+import time
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.utils import timezone
+
+from .cache_layer import L1_TIMEOUT, entity_versions
+
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+MONTHS = Decimal('12')
+
+VERSION_ENTITY = ('tax_table', 'all')
+
+
+def to_cents(value):
+    """Round a Decimal to cents the way the numeric(12, 2) columns do."""
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class CompiledTaxTable:
+    """Una TaxTable lista para calcular: tramos ordenados y bases acumuladas."""
+
+    __slots__ = ('table_id', 'name', 'effective_from', 'afp_rate', 'sfs_rate', 'limits', 'rates', 'bases')
+
+    def __init__(self, table_id, name, effective_from, afp_rate, sfs_rate, brackets):
+        self.table_id = table_id
+        self.name = name
+        self.effective_from = effective_from
+        self.afp_rate = Decimal(afp_rate)
+        self.sfs_rate = Decimal(sfs_rate)
+
+        self.limits, self.rates, self.bases = [], [], []
+        base = ZERO
+        for annual_from, rate in sorted(brackets):
+            if self.limits:
+                base += (annual_from - self.limits[-1]) * self.rates[-1]
+            self.limits.append(Decimal(annual_from))
+            self.rates.append(Decimal(rate))
+            self.bases.append(base)
+
+    def __repr__(self):
+        return f'<CompiledTaxTable {self.name} from {self.effective_from}>'
+
+    def annual_isr(self, annual_gross):
+        """ISR anual sin redondear; lo que está debajo del primer tramo es exento."""
+        index = bisect_right(self.limits, annual_gross) - 1
+        if index < 0:
+            return ZERO
+        return self.bases[index] + (annual_gross - self.limits[index]) * self.rates[index]
+
+    def monthly_isr(self, monthly_gross):
+        """ISR de un bruto mensual (anualizado x12), redondeado a centavos."""
+        if not isinstance(monthly_gross, Decimal):
+            monthly_gross = Decimal(str(monthly_gross))
+        return to_cents(self.annual_isr(monthly_gross * MONTHS) / MONTHS)
+
+    def isr_for(self, monthly_grosses):
+        """``monthly_isr`` de cada bruto mensual de la lista, en el mismo orden."""
+        return [self.monthly_isr(gross) for gross in monthly_grosses]
+
+    def afp(self, gross):
+        return gross * self.afp_rate
+
+    def sfs(self, gross):
+        return gross * self.sfs_rate
+
+
+def compile_table(table):
+    """CompiledTaxTable de una TaxTable (usa ``brackets`` prefetcheados si los hay)."""
+    return CompiledTaxTable(
+        table.id,
+        table.name,
+        table.effective_from,
+        table.afp_rate,
+        table.sfs_rate,
+        [(bracket.annual_from, bracket.rate) for bracket in table.brackets.all()],
+    )
+
+
+# =============================================================================
+# CACHÉ POR AÑO
+# =============================================================================
+
+_lock = threading.Lock()
+_compiled = {}  # {año: (versión, [CompiledTaxTable por effective_from])}
+_version = {'value': None, 'checked_at': 0.0}
+
+
+def _current_version():
+    """Versión de las tablas en L2, leída como mucho cada L1_TIMEOUT segundos."""
+    now = time.monotonic()
+    with _lock:
+        if _version['value'] is not None and now - _version['checked_at'] < L1_TIMEOUT:
+            return _version['value']
+    value = entity_versions([VERSION_ENTITY])[0]
+    with _lock:
+        _version['value'], _version['checked_at'] = value, now
+    return value
+
+
+def _load_year(year):
+    """La tabla vigente el 1 de enero más las que empiezan durante el año."""
+    from core.models import TaxTable
+
+    tables = TaxTable.objects.prefetch_related('brackets')
+    first = tables.filter(effective_from__lte=date(year, 1, 1)).order_by('-effective_from').first()
+    during = list(tables.filter(
+        effective_from__gt=date(year, 1, 1),
+        effective_from__lte=date(year, 12, 31),
+    ).order_by('effective_from'))
+
+    year_tables = ([first] if first else []) + during
+    if not year_tables:
+        # Años anteriores a la primera tabla: se usa la más antigua
+        earliest = tables.order_by('effective_from').first()
+        if earliest is None:
+            raise TaxTable.DoesNotExist("No tax table configured (admin > Tax Tables)")
+        year_tables = [earliest]
+    return [compile_table(table) for table in year_tables]
+
+
+def tables_for_year(year):
+    """Tablas compiladas del año; se recompilan si cambió la versión en L2."""
+    version = _current_version()
+    with _lock:
+        cached = _compiled.get(year)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    tables = _load_year(year)
+    with _lock:
+        _compiled[year] = (version, tables)
+    return tables
+
+
+def tax_table_for(day=None):
+    """CompiledTaxTable vigente en ``day`` (hoy si no se indica)."""
+    day = day or timezone.now().date()
+    tables = tables_for_year(day.year)
+    index = bisect_right([table.effective_from for table in tables], day) - 1
+    return tables[max(index, 0)]
+
+
+def isr_for(monthly_grosses, day=None):
+    """ISR mensual de cada bruto de la lista con la tabla vigente en ``day``."""
+    return tax_table_for(day).isr_for(monthly_grosses)
+
+
+def clear_compiled():
+    """Olvidar las tablas compiladas de este proceso."""
+    with _lock:
+        _compiled.clear()
+        _version['value'] = None
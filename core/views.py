@@ -3,6 +3,7 @@ from django.contrib.sessions.models import Session
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect, HttpResponse
+from django.db import transaction
 from django.utils import timezone
 from django.utils.timezone import now
 from django.db.models import (
@@ -20,64 +21,18 @@ from django.db.models import Prefetch
 
 from .models import Employee, Payment, Department, Position, Campaign
 from attendance.models import WorkDay
+from attendance.team_snapshot import team_snapshot
+from attendance.live_status import current_seq, publish_status_on_commit
+from attendance.presence import overdue_breaks, presence_by_campaign
+from .utils.trends import attendance_trends, schedule_compliance_trends
 from .forms import EmployeeForm, UploadCSVForm
-from workforce.models import Shift, EmployeeSchedule
+from workforce.models import Shift, ScheduledDay
+from workforce.scheduled_days import scheduled_on, shift_coverage
 
 
 def info_payment(request):
     return render(request,'info_payments.html')
 
-def calculate_daily_stats(work_day):
-    """
-    Calcular estadísticas diarias - versión simple
-    """
-    employee = work_day.employee
-    current_campaign = employee.current_campaign
-    
-    # Tiempos
-    total_work_time = work_day.total_work_time or timedelta(0)
-    total_break_time = work_day.total_break_time or timedelta(0)
-    total_lunch_time = work_day.total_lunch_time or timedelta(0)
-    total_time = total_work_time + total_break_time + total_lunch_time
-    
-    def format_duration(duration):
-        """Formatear timedelta a formato legible: 1h 30m"""
-        if not duration:
-            return "0h 00m"
-        
-        total_seconds = int(duration.total_seconds())
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        
-        if hours > 0:
-            return f"{hours}h {minutes:02d}m"
-        else:
-            return f"{minutes}m"
-    
-    # Cálculo simple de ganancias
-    payable_hours = total_work_time.total_seconds() / 3600
-    
-    # Tomar el pay rate de la campaña o usar default
-    if current_campaign and current_campaign.hour_rate:
-        hourly_rate = float(current_campaign.hour_rate)
-    else:
-        hourly_rate = 1.00  # Default
-    
-    estimated_earnings = payable_hours * hourly_rate
-    
-    return {
-        'total': format_duration(total_time),
-        'payable': format_duration(total_work_time),
-        'break': format_duration(total_break_time),
-        'lunch': format_duration(total_lunch_time),
-        'payable_hours': round(payable_hours, 2),
-        'money': f"${estimated_earnings:.2f}",
-        'break_count': work_day.break_count or 0,
-        'hourly_rate': hourly_rate,
-    }
-
-
-
 @login_required(login_url='account_login')
 def home_view(request):
     """Panel principal del empleado con resumen de pagos."""
@@ -167,14 +122,19 @@ def logout_all_users(request):
     Solo accesible para superusers
     """
     try:
-        # 1. Eliminar todas las sesiones activas
-        sessions_deleted = Session.objects.all().delete()
-        
-        # 2. Actualizar estado de empleados
-        employees_updated = Employee.objects.filter(is_logged_in=True).update(
-            is_logged_in=False,
-            last_logout=timezone.now()
-        )
+        with transaction.atomic():
+            # 1. Eliminar todas las sesiones activas
+            sessions_deleted = Session.objects.all().delete()
+
+            # 2. Actualizar estado de empleados; el registro de presencia se
+            # publica al hacer commit, cuando ya leen is_logged_in=False
+            logged_in = Employee.objects.filter(is_logged_in=True)
+            employee_ids = list(logged_in.values_list('id', flat=True))
+            employees_updated = logged_in.update(
+                is_logged_in=False,
+                last_logout=timezone.now()
+            )
+            publish_status_on_commit(employee_ids)
         
         # 3. Mensaje de éxito
         messages.success(
@@ -212,29 +172,20 @@ def campaign_detail_dashboard(request, campaign_id):
     # Obtener período seleccionado
     selected_period = request.GET.get('period', '7days')
     today = timezone.now().date()
-    weekday = today.weekday()
-    day_fields = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
     
     # Obtener empleados activos en esta campaña
     campaign_employees = Employee.objects.filter(
         current_campaign=campaign,
         is_active=True
-    ).select_related('user', 'position', 'department', 'supervisor')
+    ).select_related('user', 'position', 'department', 'supervisor', 'current_campaign')
     
     # Estadísticas básicas
     total_employees = campaign_employees.count()
     logged_in_count = campaign_employees.filter(is_logged_in=True).count()
     
     # NEW: Scheduled employees for today
-    day_filter = {day_fields[weekday]: True}
-    scheduled_today = EmployeeSchedule.objects.filter(
-        employee__in=campaign_employees,
-        status__in=['published', 'active'],
-        start_date__lte=today,
-        **day_filter
-    ).filter(
-        Q(end_date__gte=today) | Q(end_date__isnull=True)
-    ).values('employee').distinct().count()
+    campaign_scheduled_days = ScheduledDay.objects.filter(employee__in=campaign_employees)
+    scheduled_today = scheduled_on(today, campaign_scheduled_days).values('employee').distinct().count()
     
     # NEW: Actual attendance today (checked in)
     actual_attendance_today = WorkDay.objects.filter(
@@ -256,101 +207,32 @@ def campaign_detail_dashboard(request, campaign_id):
     campaign_metrics['actual_attendance_today'] = actual_attendance_today
     campaign_metrics['schedule_compliance_rate'] = schedule_compliance_rate
     
-    # NEW: Get shift information for this campaign
+    # NEW: Shift coverage for this campaign (índice de días programados: 2 consultas)
     campaign_shifts = Shift.objects.filter(
         campaign=campaign,
         is_active=True
-    ).annotate(
-        scheduled_count=Count(
-            'scheduled_employees',
-            filter=Q(
-                scheduled_employees__employee__in=campaign_employees,
-                scheduled_employees__status__in=['published', 'active'],
-                scheduled_employees__start_date__lte=today,
-                **{f'scheduled_employees__{day_fields[weekday]}': True}
-            ) & (
-                Q(scheduled_employees__end_date__gte=today) | 
-                Q(scheduled_employees__end_date__isnull=True)
-            )
-        )
     ).order_by('start_time')
+    shift_coverage_data = shift_coverage(campaign_shifts, today, campaign_scheduled_days)
     
-    # NEW: Calculate shift coverage for each shift
-    shift_coverage_data = []
-    for shift in campaign_shifts:
-        # Get employees scheduled for this shift who checked in today
-        scheduled_employees_ids = EmployeeSchedule.objects.filter(
-            shift=shift,
-            employee__in=campaign_employees,
-            status__in=['published', 'active'],
-            start_date__lte=today,
-            **day_filter
-        ).filter(
-            Q(end_date__gte=today) | Q(end_date__isnull=True)
-        ).values_list('employee_id', flat=True)
-        
-        checked_in = WorkDay.objects.filter(
-            date=today,
-            employee_id__in=scheduled_employees_ids,
-            check_in__isnull=False
-        ).count()
-        
-        scheduled = shift.scheduled_count or 0
-        coverage_rate = (checked_in / scheduled * 100) if scheduled > 0 else 0
-        
-        shift_coverage_data.append({
-            'shift': shift,
-            'scheduled_count': scheduled,
-            'checked_in_count': checked_in,
-            'coverage_rate': round(coverage_rate, 1),
-            'is_understaffed': coverage_rate < 80,
-        })
-    
-    # Obtener WorkDays de hoy para los empleados de la campaña
-    campaign_workdays = WorkDay.objects.filter(
-        employee__in=campaign_employees,
-        date=today
-    ).select_related('employee')
-    
-    # Preparar datos para cada empleado en la campaña
+    # WorkDays, sesiones y estadísticas de hoy de toda la campaña (consultas fijas)
+    # Horario de hoy de cada empleado: el más reciente (mismo orden que EmployeeSchedule)
+    schedules_today = {}
+    for scheduled_day in scheduled_on(today, campaign_scheduled_days).select_related(
+        'schedule__shift'
+    ).order_by('-schedule__start_date'):
+        schedules_today.setdefault(scheduled_day.employee_id, scheduled_day.schedule)
+
     employee_data = []
-    for employee in campaign_employees:
-        try:
-            workday_today = campaign_workdays.get(employee=employee)
-            current_session = workday_today.get_active_session()
-            daily_stats = calculate_daily_stats(workday_today)
-        except WorkDay.DoesNotExist:
-            workday_today = None
-            current_session = None
-            daily_stats = None
+    for row in team_snapshot(campaign_employees, day=today):
+        employee = row['employee']
         
         # NEW: Get employee's schedule for today
-        employee_schedule = None
-        scheduled_shift = None
-        is_scheduled_today = False
-        
-        try:
-            employee_schedule = EmployeeSchedule.objects.filter(
-                employee=employee,
-                status__in=['published', 'active'],
-                start_date__lte=today,
-                **day_filter
-            ).filter(
-                Q(end_date__gte=today) | Q(end_date__isnull=True)
-            ).select_related('shift').first()
-            
-            if employee_schedule:
-                is_scheduled_today = True
-                scheduled_shift = employee_schedule.shift
-        except EmployeeSchedule.DoesNotExist:
-            pass
+        employee_schedule = schedules_today.get(employee.id)
+        scheduled_shift = employee_schedule.shift if employee_schedule else None
+        is_scheduled_today = employee_schedule is not None
         
         employee_data.append({
-            'employee': employee,
-            'workday': workday_today,
-            'current_session': current_session,
-            'formatted_session': workday_today.get_formatted_session() if workday_today else None,
-            'daily_stats': daily_stats,
+            **row,
             # NEW: Scheduling data
             'is_scheduled_today': is_scheduled_today,
             'scheduled_shift': scheduled_shift,
@@ -369,6 +251,7 @@ def campaign_detail_dashboard(request, campaign_id):
         'attendance_trends': attendance_trends,
         'today': today,
         'selected_period': selected_period,
+        'live_status_seq': current_seq(),
         # NEW: Scheduling data
         'scheduled_today': scheduled_today,
         'actual_attendance_today': actual_attendance_today,
@@ -382,92 +265,14 @@ def campaign_detail_dashboard(request, campaign_id):
 def get_campaign_schedule_compliance_trends(campaign, period='7days'):
     """
     Track schedule compliance over time for a specific campaign
+    (active employees; scheduled = distinct employees)
     """
-    today = timezone.now().date()
-    trends = []
-    
-    # Determine date range
-    if period == '30days':
-        days_range = 30
-    elif period == '90days':
-        days_range = 90
-    elif period == 'current_month':
-        start_date = today.replace(day=1)
-        days_range = (today - start_date).days + 1
-    elif period == 'previous_month':
-        first_day_current = today.replace(day=1)
-        last_day_prev = first_day_current - timedelta(days=1)
-        start_date = last_day_prev.replace(day=1)
-        days_range = (last_day_prev - start_date).days + 1
-    else:
-        days_range = 7
-    
-    # Get campaign employees
-    campaign_employees = Employee.objects.filter(
-        current_campaign=campaign,
-        is_active=True
+    return schedule_compliance_trends(
+        period,
+        campaign=campaign,
+        active_only=True,
+        distinct_employees=True,
     )
-    
-    for i in range(days_range):
-        if period == 'current_month':
-            date = today.replace(day=1) + timedelta(days=i)
-            if date > today:
-                break
-        elif period == 'previous_month':
-            last_day_prev = today.replace(day=1) - timedelta(days=1)
-            start_date = last_day_prev.replace(day=1)
-            date = start_date + timedelta(days=i)
-            if date > last_day_prev:
-                break
-        else:
-            date = today - timedelta(days=(days_range - 1 - i))
-        
-        # Get scheduled count for this date
-        weekday = date.weekday()
-        day_fields = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-        day_filter = {day_fields[weekday]: True}
-        
-        scheduled = EmployeeSchedule.objects.filter(
-            employee__in=campaign_employees,
-            status__in=['published', 'active'],
-            start_date__lte=date,
-            **day_filter
-        ).filter(
-            Q(end_date__gte=date) | Q(end_date__isnull=True)
-        ).values('employee').distinct().count()
-        
-        # Get actual attendance for this date
-        actual = WorkDay.objects.filter(
-            employee__in=campaign_employees,
-            date=date,
-            check_in__isnull=False
-        ).count()
-        
-        # Calculate compliance
-        compliance = (actual / scheduled * 100) if scheduled > 0 else 0
-        
-        # Determine trend direction
-        direction = "stable"
-        if trends:
-            prev = trends[-1]["actual_count"]
-            if actual > prev:
-                direction = "up"
-            elif actual < prev:
-                direction = "down"
-        
-        trends.append({
-            'date': date,
-            'scheduled_count': scheduled,
-            'actual_count': actual,
-            'compliance_rate': round(compliance, 1),
-            'attendance_rate': round(compliance, 1),  # For template compatibility
-            'present_count': actual,  # For template compatibility
-            'workdays_count': scheduled,  # For template compatibility
-            'trend_direction': direction,
-            'is_today': (date == today),
-        })
-    
-    return trends
 
 
 def calculate_campaign_productivity_metrics(campaign):
@@ -594,41 +399,27 @@ def campaign_detail_dashboard(request, campaign_id):
     campaign_employees = Employee.objects.filter(
         current_campaign=campaign,
         is_active=True
-    ).select_related('user', 'position', 'department', 'supervisor')
+    ).select_related('user', 'position', 'department', 'supervisor', 'current_campaign')
     
-    # Estadísticas de la campaña
-    total_employees = campaign_employees.count()
-    logged_in_count = campaign_employees.filter(is_logged_in=True).count()
+    # Estadísticas de la campaña desde el registro de presencia
+    presence = presence_by_campaign(campaign.id)
+    total_employees = len(presence)
+    logged_in_count = sum(1 for entry in presence if entry.logged_in)
     
     # Métricas de productividad de la campaña
     campaign_metrics = calculate_campaign_productivity_metrics(campaign)
     
-    # Obtener WorkDays de hoy para los empleados de la campaña
+    # WorkDays, sesiones y estadísticas de hoy de toda la campaña (consultas fijas)
     today = timezone.now().date()
-    campaign_workdays = WorkDay.objects.filter(
-        employee__in=campaign_employees,
-        date=today
-    ).select_related('employee')
+    employee_data = team_snapshot(campaign_employees, day=today)
     
-    # Preparar datos para cada empleado en la campaña
-    employee_data = []
-    for employee in campaign_employees:
-        try:
-            workday_today = campaign_workdays.get(employee=employee)
-            current_session = workday_today.get_active_session()
-            daily_stats = calculate_daily_stats(workday_today)
-        except WorkDay.DoesNotExist:
-            workday_today = None
-            current_session = None
-            daily_stats = None
-        
-        employee_data.append({
-            'employee': employee,
-            'workday': workday_today,
-            'current_session': current_session,
-            'formatted_session': workday_today.get_formatted_session() if workday_today else None,
-            'daily_stats': daily_stats,
-        })
+    # Breaks/lunch pasados de tiempo
+    employees_by_id = {data['employee'].id: data['employee'] for data in employee_data}
+    overdue = [
+        {'employee': employees_by_id[entry.employee], 'state': entry.state, 'overdue_minutes': int(excess.total_seconds() // 60)}
+        for entry, excess in overdue_breaks(presence)
+        if entry.employee in employees_by_id
+    ]
     
     # Tendencias de asistencia de la campaña con filtro de período
     attendance_trends = get_campaign_attendance_trends_with_period(campaign, selected_period)
@@ -642,6 +433,8 @@ def campaign_detail_dashboard(request, campaign_id):
         'attendance_trends': attendance_trends,
         'today': today,
         'selected_period': selected_period,
+        'live_status_seq': current_seq(),
+        'overdue_breaks': overdue,
     }
     
     return render(request, 'management/campaign_detail.html', context)
@@ -691,74 +484,7 @@ def calculate_campaign_productivity_metrics(campaign):
 
 def get_campaign_attendance_trends_with_period(campaign, period='7days'):
     """Obtener tendencias de asistencia para la campaña con filtro de período"""
-    today = timezone.now().date()
-    trends = []
-    
-    # Definir rango de fechas según el período
-    if period == '30days':
-        days_range = 30
-    elif period == '90days':
-        days_range = 90
-    elif period == 'current_month':
-        # Primer día del mes actual hasta hoy
-        start_date = today.replace(day=1)
-        days_range = (today - start_date).days + 1
-    elif period == 'previous_month':
-        # Mes completo anterior
-        first_day_current = today.replace(day=1)
-        last_day_previous = first_day_current - timedelta(days=1)
-        start_date = last_day_previous.replace(day=1)
-        days_range = (last_day_previous - start_date).days + 1
-    else:  # '7days' por defecto
-        days_range = 7
-    
-    # Generar tendencias
-    for i in range(days_range):
-        if period == 'current_month':
-            date = today.replace(day=1) + timedelta(days=i)
-            if date > today:
-                break
-        elif period == 'previous_month':
-            first_day_current = today.replace(day=1)
-            last_day_previous = first_day_current - timedelta(days=1)
-            start_date = last_day_previous.replace(day=1)
-            date = start_date + timedelta(days=i)
-            if date > last_day_previous:
-                break
-        else:
-            date = today - timedelta(days=(days_range - 1 - i))
-        
-        # Contar workdays para empleados de esta campaña
-        workdays_count = WorkDay.objects.filter(
-            employee__current_campaign=campaign,
-            date=date
-        ).count()
-        
-        present_count = WorkDay.objects.filter(
-            employee__current_campaign=campaign,
-            date=date,
-            check_in__isnull=False
-        ).count()
-        
-        # Calcular tendencia
-        trend_direction = 'stable'
-        if len(trends) > 0:
-            prev_trend = trends[-1]
-            if present_count > prev_trend['present_count']:
-                trend_direction = 'up'
-            elif present_count < prev_trend['present_count']:
-                trend_direction = 'down'
-        
-        trends.append({
-            'date': date,
-            'workdays_count': workdays_count,
-            'present_count': present_count,
-            'attendance_rate': round((present_count / workdays_count * 100) if workdays_count > 0 else 0, 1),
-            'trend_direction': trend_direction,
-            'is_today': date == today,
-        })
-    
-    return trends
+    return attendance_trends(period, campaign=campaign)
 
 
 def calculate_campaign_metrics(campaign):
@@ -803,30 +529,8 @@ def calculate_campaign_metrics(campaign):
     }
 
 def get_campaign_attendance_trends(campaign):
-    """Obtener tendencias de asistencia para la campaña"""
-    trends = []
-    for i in range(7):
-        date = timezone.now().date() - timedelta(days=i)
-        
-        workdays_count = WorkDay.objects.filter(
-            employee__current_campaign=campaign,
-            date=date
-        ).count()
-        
-        present_count = WorkDay.objects.filter(
-            employee__current_campaign=campaign,
-            date=date,
-            check_in__isnull=False
-        ).count()
-        
-        trends.append({
-            'date': date,
-            'workdays_count': workdays_count,
-            'present_count': present_count,
-            'attendance_rate': round((present_count / workdays_count * 100) if workdays_count > 0 else 0, 1),
-        })
-    
-    return list(reversed(trends))
+    """Obtener tendencias de asistencia para la campaña (últimos 7 días)"""
+    return get_campaign_attendance_trends_with_period(campaign, '7days')
 
 def calculate_headcount_utilization(campaign):
     """Calcular utilización de headcount para la campaña"""
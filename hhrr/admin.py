@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import IdCardBatch
+
+
+@admin.register(IdCardBatch)
+class IdCardBatchAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "card_count", "sheet_count", "created_by", "created_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = ("employee_ids", "filters", "error")
+    ordering = ("-created_at",)
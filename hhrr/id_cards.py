@@ -0,0 +1,276 @@
+# id_cards.py
+"""
+Hojas de carnets (CR80) en PDF para imprimir.
+
+La lista de carnets (employee_id_cards_list) generaba el PDF en el navegador:
+html2canvas capturaba cada carnet como imagen y jsPDF lo pegaba en una hoja
+A4, un carnet por página. Para una ola de ingreso de 200+ personas eso tarda
+minutos y bloquea la pestaña. Aquí la tarea ``hhrr.tasks.render_id_card_batch``
+dibuja los carnets con reportlab directamente en hojas A4 de
+CARDS_PER_ROW x CARDS_PER_COLUMN, el frente en una hoja y el reverso en la
+siguiente con las columnas invertidas (dúplex por el borde largo).
+
+El logo se decodifica y las fuentes se registran una sola vez por proceso
+(``card_assets``); cada carnet después es solo texto y rectángulos.
+
+Fuentes: ID_CARD_FONTS = {'regular': ruta.ttf, 'bold': ruta.ttf} en settings;
+sin eso se usan Helvetica / Helvetica-Bold.
+"""
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+from reportlab.lib.colors import HexColor, white
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from core.models import Employee
+
+
+CARD_WIDTH = 85.6 * mm    # CR80
+CARD_HEIGHT = 53.98 * mm
+CARDS_PER_ROW = 2
+CARDS_PER_COLUMN = 5
+CARDS_PER_SHEET = CARDS_PER_ROW * CARDS_PER_COLUMN
+GAP_X = 6 * mm
+GAP_Y = 3 * mm
+
+LOGO_PATH = 'img/company_logo.png'
+COMPANY_NAME = getattr(settings, 'ID_CARD_COMPANY', 'HELIUM HEALTH')
+BACK_TEXT = getattr(settings, 'ID_CARD_BACK_TEXT', (
+    'There is a time for everything, and a season for every activity under the heavens: '
+    'a time to be born and a time to die, a time to plant and a time to uproot what is planted.'
+))
+BACK_REFERENCE = getattr(settings, 'ID_CARD_BACK_REFERENCE', 'Ecclesiastes 3:1-2')
+
+TEAL = HexColor('#1E7F86')
+DARK = HexColor('#333333')
+CUT_LINE = HexColor('#CCCCCC')
+
+
+Card = namedtuple('Card', 'first_name last_name title department code initials')
+Assets = namedtuple('Assets', 'logo logo_ratio regular bold')
+
+
+# =============================================================================
+# RECURSOS (una vez por proceso)
+# =============================================================================
+
+def _register_font(name, path):
+    if name not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(name, path))
+    return name
+
+
+@lru_cache(maxsize=1)
+def card_assets():
+    """Logo ya decodificado y fuentes registradas; se reutilizan en todos los lotes."""
+    logo, ratio = None, 1
+    path = finders.find(LOGO_PATH)
+    if path:
+        logo = ImageReader(path)
+        logo.getRGBData()  # decodificar ahora y no en cada hoja
+        width, height = logo.getSize()
+        ratio = width / height
+
+    fonts = getattr(settings, 'ID_CARD_FONTS', {})
+    regular = _register_font('IdCard', fonts['regular']) if fonts.get('regular') else 'Helvetica'
+    bold = _register_font('IdCard-Bold', fonts['bold']) if fonts.get('bold') else 'Helvetica-Bold'
+    return Assets(logo, ratio, regular, bold)
+
+
+# =============================================================================
+# SELECCIÓN
+# =============================================================================
+
+def card_employees(employee_ids=None, department=None, campaign=None, position=None):
+    """Empleados activos por ids o por filtros (departamento, campaña, cargo)."""
+    employees = Employee.objects.filter(is_active=True).select_related('user', 'position', 'department')
+    if employee_ids is not None:
+        employees = employees.filter(id__in=employee_ids)
+    if department:
+        employees = employees.filter(department_id=department)
+    if campaign:
+        employees = employees.filter(current_campaign_id=campaign)
+    if position:
+        employees = employees.filter(position_id=position)
+    return employees.order_by('user__last_name', 'user__first_name', 'id')
+
+
+def render_batch(employee_ids):
+    """(pdf, tarjetas, hojas) de los empleados activos de ``employee_ids``."""
+    cards = [card_for(employee) for employee in card_employees(employee_ids)]
+    pdf, sheets = render_sheets(cards)
+    return pdf, len(cards), sheets
+
+
+def card_for(employee):
+    user = employee.user
+    first_name = (user.first_name if user else '') or ''
+    last_name = (user.last_name if user else '') or ''
+    initials = (first_name[:1] + last_name[:1]) or (user.username[:1] if user else '')
+    return Card(
+        first_name=first_name.upper(),
+        last_name=last_name.upper(),
+        title=employee.position.name.upper() if employee.position else 'EMPLOYEE',
+        department=employee.department.name.upper() if employee.department else 'DEPARTMENT',
+        code=employee.employee_code or '',
+        initials=initials.upper(),
+    )
+
+
+# =============================================================================
+# DIBUJO
+# =============================================================================
+
+def _fit(text, font, size, width, minimum=5):
+    """Tamaño de fuente más grande (hasta ``size``) con el que ``text`` cabe en ``width``."""
+    while size > minimum and pdfmetrics.stringWidth(text, font, size) > width:
+        size -= 0.5
+    return size
+
+
+def _draw_text(pdf, x, y, text, font, size, width, color=DARK):
+    size = _fit(text, font, size, width)
+    pdf.setFillColor(color)
+    pdf.setFont(font, size)
+    pdf.drawString(x, y, text)
+
+
+def _draw_front(pdf, x, y, card, assets, year):
+    pad = 3 * mm
+
+    # Logo, empresa y año
+    top = y + CARD_HEIGHT - pad
+    logo_height = 8 * mm
+    if assets.logo:
+        pdf.drawImage(assets.logo, x + pad, top - logo_height,
+                      width=logo_height * assets.logo_ratio, height=logo_height, mask='auto')
+    _draw_text(pdf, x + pad + logo_height * assets.logo_ratio + 2 * mm, top - 5.5 * mm,
+               COMPANY_NAME, assets.bold, 8, 40 * mm)
+
+    year_width, year_height = 14 * mm, 7 * mm
+    pdf.setStrokeColor(DARK)
+    pdf.setLineWidth(1)
+    pdf.rect(x + CARD_WIDTH - pad - year_width, top - year_height, year_width, year_height)
+    pdf.setFont(assets.bold, 12)
+    pdf.setFillColor(DARK)
+    pdf.drawCentredString(x + CARD_WIDTH - pad - year_width / 2, top - year_height + 2 * mm, str(year))
+
+    # Banda con nombre, cargo y departamento; foto/iniciales a la derecha
+    band_x, band_y = x + pad, y + pad
+    band_width, band_height = CARD_WIDTH - 2 * pad, CARD_HEIGHT - 2 * pad - logo_height - 2 * mm
+    left_width = band_width * 0.6
+
+    pdf.setFillColor(TEAL)
+    pdf.rect(band_x, band_y, left_width, band_height, stroke=0, fill=1)
+    pdf.setStrokeColor(CUT_LINE)
+    pdf.setLineWidth(0.5)
+    pdf.rect(band_x, band_y, band_width, band_height, stroke=1, fill=0)
+
+    text_x = band_x + 2.5 * mm
+    text_width = left_width - 5 * mm
+    line = band_y + band_height - 6 * mm
+    _draw_text(pdf, text_x, line, card.first_name, assets.bold, 8, text_width, white)
+    _draw_text(pdf, text_x, line - 6.5 * mm, card.last_name, assets.bold, 15, text_width, white)
+    _draw_text(pdf, text_x, line - 11.5 * mm, card.title, assets.regular, 7, text_width, white)
+    _draw_text(pdf, text_x, band_y + 3 * mm, card.department, assets.bold, 11, text_width, white)
+
+    photo_x = band_x + left_width
+    pdf.setStrokeColor(DARK)
+    pdf.setLineWidth(1)
+    pdf.line(photo_x, band_y, photo_x, band_y + band_height)
+    pdf.setFillColor(TEAL)
+    pdf.setFont(assets.bold, 22)
+    pdf.drawCentredString(photo_x + (band_width - left_width) / 2, band_y + band_height / 2 - 3 * mm, card.initials)
+
+
+def _draw_back(pdf, x, y, card, assets, back_lines):
+    center = x + CARD_WIDTH / 2
+    top = y + CARD_HEIGHT - 4 * mm
+
+    logo_height = 11 * mm
+    if assets.logo:
+        logo_width = logo_height * assets.logo_ratio
+        pdf.drawImage(assets.logo, center - logo_width / 2, top - logo_height,
+                      width=logo_width, height=logo_height, mask='auto')
+
+    pdf.setFillColor(DARK)
+    pdf.setFont(assets.regular, 6.5)
+    line_y = top - logo_height - 4 * mm
+    for line in back_lines:
+        pdf.drawCentredString(center, line_y, line)
+        line_y -= 3 * mm
+
+    pdf.setFont(assets.bold, 7.5)
+    pdf.drawCentredString(center, line_y - 1.5 * mm, BACK_REFERENCE)
+    if card.code:
+        pdf.setFont(assets.regular, 6)
+        pdf.drawCentredString(center, y + 2.5 * mm, card.code)
+
+
+def _slots():
+    """Esquina inferior izquierda de cada carnet de la hoja (fila por fila, desde arriba)."""
+    page_width, page_height = A4
+    margin_x = (page_width - CARDS_PER_ROW * CARD_WIDTH - (CARDS_PER_ROW - 1) * GAP_X) / 2
+    margin_y = (page_height - CARDS_PER_COLUMN * CARD_HEIGHT - (CARDS_PER_COLUMN - 1) * GAP_Y) / 2
+    return [
+        [
+            (margin_x + column * (CARD_WIDTH + GAP_X), page_height - margin_y - (row + 1) * CARD_HEIGHT - row * GAP_Y)
+            for column in range(CARDS_PER_ROW)
+        ]
+        for row in range(CARDS_PER_COLUMN)
+    ]
+
+
+def _cut_line(pdf, x, y):
+    pdf.setStrokeColor(CUT_LINE)
+    pdf.setLineWidth(0.3)
+    pdf.roundRect(x, y, CARD_WIDTH, CARD_HEIGHT, 3 * mm, stroke=1, fill=0)
+
+
+def render_sheets(cards, year=None):
+    """
+    PDF (bytes) con ``cards`` de CARDS_PER_SHEET por hoja.
+
+    Devuelve (pdf, hojas); cada hoja es una página de frentes seguida de una
+    de reversos.
+    """
+    assets = card_assets()
+    year = year or date.today().year
+    back_lines = simpleSplit(BACK_TEXT, assets.regular, 6.5, CARD_WIDTH - 10 * mm)
+    slots = _slots()
+
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    pdf.setTitle(f'ID cards {year}')
+
+    sheets = 0
+    for start in range(0, len(cards), CARDS_PER_SHEET):
+        sheet = cards[start:start + CARDS_PER_SHEET]
+        sheets += 1
+
+        for index, card in enumerate(sheet):
+            x, y = slots[index // CARDS_PER_ROW][index % CARDS_PER_ROW]
+            _cut_line(pdf, x, y)
+            _draw_front(pdf, x, y, card, assets, year)
+        pdf.showPage()
+
+        # Reverso: misma fila, columna espejo, para que al voltear coincida
+        for index, card in enumerate(sheet):
+            row = slots[index // CARDS_PER_ROW]
+            x, y = row[CARDS_PER_ROW - 1 - index % CARDS_PER_ROW]
+            _cut_line(pdf, x, y)
+            _draw_back(pdf, x, y, card, assets, back_lines)
+        pdf.showPage()
+
+    pdf.save()
+    return buffer.getvalue(), sheets
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:50
+
+import core.utils.private_files
+from django.core.files.storage import storages
+from django.db import migrations, models
+
+
+def delete_public_id_cards(apps, schema_editor):
+    # Los PDF ya generados estaban en MEDIA_ROOT; la descarga los vuelve a generar
+    public = storages['default']
+    IdCardBatch = apps.get_model('hhrr', 'IdCardBatch')
+    for name in IdCardBatch.objects.exclude(file='').exclude(file__isnull=True).values_list('file', flat=True):
+        if public.exists(name):
+            public.delete(name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hhrr', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='idcardbatch',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=core.utils.private_files.private_storage, upload_to='id_cards/'),
+        ),
+        migrations.RunPython(delete_public_id_cards, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,57 @@
+from django.contrib.auth.models import User
 from django.db import models
+from django.urls import reverse
 
-# Create your models here.
+from core.utils.private_files import private_storage
+
+
+class IdCardBatch(models.Model):
+    """Hojas de carnets en PDF generadas en segundo plano (hhrr/id_cards.py)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    # Selección congelada al pedir la impresión
+    employee_ids = models.JSONField(default=list)
+    filters = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    card_count = models.PositiveIntegerField(default=0)
+    sheet_count = models.PositiveIntegerField(default=0)
+    # Storage privado: se descarga por id_card_batch_file
+    file = models.FileField(upload_to='id_cards/', storage=private_storage, blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    ACTIVE_STATUSES = ('pending', 'running')
+
+    class Meta:
+        verbose_name = "ID Card Batch"
+        verbose_name_plural = "ID Card Batches"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"ID cards ({len(self.employee_ids)}) - {self.get_status_display()}"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'status_display': self.get_status_display(),
+            'employees': len(self.employee_ids),
+            'card_count': self.card_count,
+            'sheet_count': self.sheet_count,
+            'url': reverse('id_card_batch_file', args=[self.id]) if self.file else None,
+            'error': self.error,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,58 @@
+import logging
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from django_q.tasks import async_task
+
+from core.utils.private_files import private_name
+from .id_cards import render_batch
+from .models import IdCardBatch
+
+logger = logging.getLogger(__name__)
+
+
+def start_id_card_batch(employee_ids, filters=None, user=None):
+    """Create an IdCardBatch for the employees and queue its rendering."""
+    batch = IdCardBatch.objects.create(
+        employee_ids=list(employee_ids),
+        filters=filters or {},
+        created_by=user,
+    )
+    transaction.on_commit(lambda: async_task(
+        'hhrr.tasks.render_id_card_batch',
+        batch.id,
+        group='id_cards',
+    ))
+    return batch
+
+
+def render_id_card_batch(batch_id):
+    """Render the card sheets of a batch (see hhrr.id_cards) and attach the PDF."""
+    try:
+        batch = IdCardBatch.objects.get(id=batch_id)
+    except IdCardBatch.DoesNotExist:
+        return {'status': 'missing', 'id': batch_id}
+
+    if not batch.is_active:
+        return batch.to_dict()
+
+    batch.status = 'running'
+    batch.save(update_fields=['status'])
+
+    try:
+        pdf, batch.card_count, batch.sheet_count = render_batch(batch.employee_ids)
+        storage = IdCardBatch._meta.get_field('file').storage
+        name = private_name('id_cards', batch.id)
+        if storage.exists(name):
+            storage.delete(name)
+        batch.file = storage.save(name, ContentFile(pdf))
+        batch.status = 'completed'
+    except Exception as e:
+        logger.error(f"ID card batch {batch.id} failed: {e}", exc_info=True)
+        batch.status = 'failed'
+        batch.error = str(e)
+
+    batch.finished_at = timezone.now()
+    batch.save()
+    return batch.to_dict()
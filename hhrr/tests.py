@@ -1,3 +1,79 @@
-from django.test import TestCase
+import hashlib
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import DeviceToken
+from core.models import Department, Employee
+from core.tests import LOCMEM_CACHES
+from .models import IdCardBatch
+from .tasks import render_id_card_batch
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IdCardBatchTests(TestCase):
+    """ID card filters are validated and the PDF is only served to whoever may print cards."""
+
+    def setUp(self):
+        # El storage del campo se resuelve al importar el modelo: carpeta temporal
+        location = tempfile.mkdtemp(prefix='id-cards-tests-')
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.storage = FileSystemStorage(location=location, base_url=None)
+        patcher = mock.patch.object(IdCardBatch._meta.get_field('file'), 'storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.requester = User.objects.create(username='requester', first_name='Ana', last_name='Diaz')
+        self.department = Department.objects.create(name='Operations')
+        self.employee = Employee.objects.create(user=self.requester, gender='F', department=self.department)
+
+    def client_for(self, user):
+        # accounts.middleware exige el dispositivo registrado
+        DeviceToken.objects.get_or_create(user=user, defaults={
+            'token': f'token-{user.id}',
+            'device_fingerprint': hashlib.sha256(b'-device').hexdigest(),
+        })
+        self.client.cookies['device_uuid'] = 'device'
+        self.client.force_login(user)
+        return self.client
+
+    def test_filter_ids_must_be_integers(self):
+        client = self.client_for(self.requester)
+        url = reverse('generate_id_cards')
+
+        response = client.post(url, {'mode': 'filter', 'department': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(IdCardBatch.objects.count(), 0)
+
+        response = client.post(url, {'mode': 'filter', 'department': str(self.department.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(IdCardBatch.objects.get().filters, {'department': self.department.id})
+
+    def test_pdf_is_private_and_only_for_the_requester_staff_or_hr(self):
+        batch = IdCardBatch.objects.create(employee_ids=[self.employee.id], created_by=self.requester)
+        render_id_card_batch(batch.id)
+        batch.refresh_from_db()
+
+        self.assertEqual(batch.status, 'completed')
+        self.assertTrue(self.storage.exists(batch.file.name))
+        self.assertRegex(batch.file.name, r'^id_cards/\d+_[0-9a-f]{32}\.pdf$')
+        url = batch.to_dict()['url']
+        self.assertEqual(url, reverse('id_card_batch_file', args=[batch.id]))
+
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.assertEqual(self.client_for(User.objects.create(username='agent')).get(url).status_code, 404)
+
+        for user in (self.requester, User.objects.create(username='staff', is_staff=True)):
+            response = self.client_for(user).get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+
+        # El worker lo guardó en otro contenedor: se vuelve a generar
+        self.storage.delete(batch.file.name)
+        response = self.client_for(self.requester).get(url)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
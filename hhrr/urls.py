@@ -6,5 +6,8 @@ urlpatterns = [
     path('hhrr/id-cards/', views.employee_id_cards_list, name='employee_id_cards_list'),
     path('hhrr/id-cards/toggle/<int:employee_id>/', views.toggle_employee_selection, name='toggle_employee_selection'),
     path('hhrr/id-cards/clear/', views.clear_selection, name='clear_id_cards_selection'),
+    path('hhrr/id-cards/generate/', views.generate_id_cards, name='generate_id_cards'),
+    path('hhrr/id-cards/batch/<int:batch_id>/', views.id_card_batch_status, name='id_card_batch_status'),
+    path('hhrr/id-cards/batch/<int:batch_id>/pdf/', views.id_card_batch_file, name='id_card_batch_file'),
 
 ]
\ No newline at end of file
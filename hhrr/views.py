@@ -3,8 +3,10 @@ from django.db.models import Q
 from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404,redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse
 from django.template.loader import render_to_string
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 
 import tempfile
 import os
@@ -12,6 +14,10 @@ import os
 
 
 from core.models import Employee, Position, Campaign, Department
+from core.utils.private_files import private_file_response
+from .id_cards import card_employees, render_batch
+from .models import IdCardBatch
+from .tasks import start_id_card_batch
 
 def is_hr_user(user):
     """Check if user is HR staff or superuser"""
@@ -115,4 +121,66 @@ def clear_selection(request):
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
             return JsonResponse({'success': True, 'selected_count': 0})
         return redirect('employee_id_cards_list')
-    return JsonResponse({'success': False})
\ No newline at end of file
+    return JsonResponse({'success': False})
+
+
+@login_required
+@require_POST
+def generate_id_cards(request):
+    """
+    Queue the card sheets PDF (hhrr.tasks.render_id_card_batch).
+
+    mode=selection: posted employee_ids plus the session selection.
+    mode=filter: every active employee of the posted department/campaign/position.
+    """
+    mode = request.POST.get('mode', 'selection')
+    filters = {}
+
+    if mode == 'filter':
+        for key in ('department', 'campaign', 'position'):
+            value = request.POST.get(key)
+            if not value:
+                continue
+            try:
+                filters[key] = int(value)
+            except ValueError:
+                return JsonResponse({'success': False, 'error': f'Invalid {key}'}, status=400)
+        employee_ids = list(card_employees(**filters).values_list('id', flat=True))
+    else:
+        selected = request.session.get('selected_employees', []) + request.POST.getlist('employee_ids')
+        employee_ids = list(
+            card_employees(employee_ids={int(x) for x in selected if str(x).isdigit()})
+            .values_list('id', flat=True)
+        )
+
+    if not employee_ids:
+        return JsonResponse({'success': False, 'error': 'No employees selected'}, status=400)
+
+    batch = start_id_card_batch(employee_ids, filters=filters, user=request.user)
+    return JsonResponse({
+        'success': True,
+        'batch': batch.to_dict(),
+        'status_url': reverse('id_card_batch_status', args=[batch.id]),
+    })
+
+
+@login_required
+def id_card_batch_status(request, batch_id):
+    """JSON progress of an ID card batch (polled by the ID cards page)"""
+    batch = get_object_or_404(IdCardBatch, id=batch_id)
+    return JsonResponse({'batch': batch.to_dict()})
+
+
+@login_required
+def id_card_batch_file(request, batch_id):
+    """Download the PDF of a batch: whoever requested it, staff or HR (see core.utils.private_files)"""
+    batch = get_object_or_404(IdCardBatch, id=batch_id, status='completed', file__gt='')
+    user = request.user
+    if not (batch.created_by_id == user.id or user.is_staff or is_hr_user(user)):
+        raise Http404("ID card batch not found")
+
+    return private_file_response(
+        batch.file,
+        f'id_cards_{batch.id}.pdf',
+        lambda: render_batch(batch.employee_ids)[0],
+    )
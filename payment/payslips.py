@@ -0,0 +1,388 @@
+# payslips.py
+"""
+Volantes de pago (payslips) en PDF, uno por Payment.
+
+El empleado veía su pago en PaymentDetailView, que vuelve a consultar los
+WorkDay del período en cada visita. Ahora, al terminar la generación de la
+nómina, la tarea ``payment.tasks.publish_period_payslips`` publica un PDF por
+pago en el storage privado (core/utils/private_files.py) y lo enlaza en
+``Payment.payslip``; el empleado (o staff) lo descarga por
+``nomina:payment_payslip``, que lo vuelve a renderizar si la web no ve el
+archivo del worker.
+
+Por lote de PAYSLIP_BATCH_SIZE pagos:
+
+1. ``payslip_rows``: tres consultas (pagos con empleado/período, líneas
+   PaymentDetail y días trabajados) y diccionarios planos, sin ORM
+2. ``render_payslip``: reportlab, sin base de datos, en un pool de procesos
+   (uno por núcleo, PAYSLIP_PROCESSES lo limita)
+3. Guardar los archivos y un bulk_update de ``payslip``/``payslip_generated_at``
+
+El pool necesita que los workers de django-q no sean daemon
+(Q_CLUSTER['daemonize_workers'] = False); dentro de un proceso daemon se
+renderiza en serie. Las conexiones a la base de datos se cierran antes de
+crear los procesos para que no compartan el socket del padre.
+"""
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.utils import timezone
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from core.models import Payment, PaymentDetail
+from core.utils.private_files import private_name
+from core.utils.tax_tables import tax_table_for
+from attendance.models import WorkDay
+
+
+PAYSLIP_BATCH_SIZE = 200
+PAYSLIP_PROCESSES = getattr(settings, 'PAYSLIP_PROCESSES', None)  # None = os.cpu_count()
+PAYSLIP_TITLE = getattr(settings, 'PAYSLIP_TITLE', 'Payslip')
+
+# Pagos sin volante
+SKIPPED_STATUSES = ('canceled',)
+
+WORKDAY_FIELDS = (
+    'employee_id', 'date', 'productive_hours', 'regular_hours',
+    'overtime_hours_135', 'overtime_hours_200', 'night_hours',
+    'regular_pay', 'overtime_pay_135', 'overtime_pay_200', 'night_pay', 'total_pay',
+)
+
+ZERO = Decimal('0.00')
+
+
+def payslip_name(period_id, payment_id):
+    return private_name(f'payslips/{period_id}', payment_id)
+
+
+# =============================================================================
+# DATOS
+# =============================================================================
+
+def _masked(account):
+    return f'****{account[-4:]}' if account else ''
+
+
+def payslip_rows(payment_ids):
+    """
+    [dict] con todo lo que lleva el volante de cada pago, en tres consultas.
+
+    Solo tipos simples (str, Decimal, date) para pasarlos a otros procesos.
+    """
+    payments = list(
+        Payment.objects.filter(id__in=payment_ids)
+        .select_related('employee__user', 'employee__position', 'employee__department',
+                        'employee__current_campaign', 'period')
+        .order_by('id')
+    )
+    if not payments:
+        return []
+
+    details = defaultdict(lambda: {'earning': [], 'deduction': []})
+    for payment_id, concept, concept_type, quantity, amount, comments in (
+        PaymentDetail.objects.filter(payment_id__in=[p.id for p in payments])
+        .order_by('payment_id', 'id')
+        .values_list('payment_id', 'concept__name', 'concept__type', 'quantity', 'amount', 'comments')
+    ):
+        details[payment_id][concept_type].append({
+            'name': concept, 'quantity': quantity, 'amount': amount, 'comments': comments or '',
+        })
+
+    # Todos los pagos de un lote suelen ser del mismo período: una consulta por rango
+    workdays = defaultdict(list)
+    periods = {p.period_id: p.period for p in payments}
+    for period in periods.values():
+        employee_ids = [p.employee_id for p in payments if p.period_id == period.id]
+        for row in (
+            WorkDay.objects.filter(employee_id__in=employee_ids,
+                                   date__range=[period.start_date, period.end_date])
+            .order_by('employee_id', 'date')
+            .values(*WORKDAY_FIELDS)
+        ):
+            workdays[(period.id, row['employee_id'])].append(row)
+
+    rows = []
+    for payment in payments:
+        employee = payment.employee
+        period = payment.period
+        tax_table = tax_table_for(period.start_date)
+        rows.append({
+            'payment_id': payment.id,
+            'period_id': period.id,
+            'employee': {
+                'name': employee.full_name,
+                'code': employee.employee_code or '',
+                'identification': employee.identification or '',
+                'position': employee.position.name if employee.position else '',
+                'department': employee.department.name if employee.department else '',
+                'campaign': employee.current_campaign.name if employee.current_campaign else '',
+                'bank': employee.bank_name or '',
+                'account': _masked(employee.bank_account),
+            },
+            'period': {
+                'name': period.name,
+                'start_date': period.start_date,
+                'end_date': period.end_date,
+                'pay_date': payment.pay_date or period.pay_date,
+                'second_half': period.is_second_half(),
+            },
+            'amounts': {
+                field: getattr(payment, field) for field in (
+                    'gross_salary', 'afp', 'sfs', 'isr', 'total_deductions', 'net_salary',
+                    'monthly_gross_accumulated', 'monthly_isr_calculated',
+                )
+            },
+            'afp_rate': tax_table.afp_rate,
+            'sfs_rate': tax_table.sfs_rate,
+            'earnings': details[payment.id]['earning'],
+            'deductions': details[payment.id]['deduction'],
+            'workdays': workdays[(period.id, payment.employee_id)],
+            'status': payment.get_status_display(),
+        })
+    return rows
+
+
+# =============================================================================
+# PDF
+# =============================================================================
+
+def _money(value):
+    return f'${value:,.2f}'
+
+
+def _hours(value):
+    return f'{value:,.2f}'
+
+
+def _percent(rate):
+    return f'{rate * 100:.2f}%'
+
+
+def _table(data, widths, money_columns=(), total_row=False, header_color=colors.HexColor('#343a40')):
+    table = Table(data, colWidths=widths, repeatRows=1)
+    style = [
+        ('BACKGROUND', (0, 0), (-1, 0), header_color),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#ced4da')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ]
+    for column in money_columns:
+        style.append(('ALIGN', (column, 1), (column, -1), 'RIGHT'))
+    if total_row:
+        style += [
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f1f3f5')),
+        ]
+    table.setStyle(TableStyle(style))
+    return table
+
+
+def render_payslip(row):
+    """PDF (bytes) del volante de ``row`` (ver payslip_rows). No usa la base de datos."""
+    styles = getSampleStyleSheet()
+    employee, period, amounts = row['employee'], row['period'], row['amounts']
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=letter,
+        leftMargin=0.6 * inch, rightMargin=0.6 * inch, topMargin=0.6 * inch, bottomMargin=0.6 * inch,
+        title=f"{PAYSLIP_TITLE} {employee['name']} {period['name']}",
+    )
+    story = [
+        Paragraph(PAYSLIP_TITLE, styles['Title']),
+        Paragraph(
+            f"{escape(period['name'])} &bull; {period['start_date']:%b %d} - {period['end_date']:%b %d, %Y} "
+            f"&bull; Pay date {period['pay_date']:%b %d, %Y}",
+            styles['Normal'],
+        ),
+        Spacer(1, 10),
+    ]
+
+    info = [
+        ['Employee', employee['name'], 'Code', employee['code']],
+        ['Identification', employee['identification'], 'Position', employee['position']],
+        ['Department', employee['department'], 'Campaign', employee['campaign']],
+        ['Bank', employee['bank'], 'Account', employee['account']],
+    ]
+    info_table = Table(info, colWidths=[1.1 * inch, 2.4 * inch, 1.0 * inch, 2.4 * inch])
+    info_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]))
+    story += [info_table, Spacer(1, 12)]
+
+    # Ingresos y deducciones
+    earnings = [['Earnings', 'Qty', 'Amount'], ['Base salary', '', _money(amounts['gross_salary'])]]
+    earnings += [[line['name'], _hours(line['quantity']), _money(line['amount'])] for line in row['earnings']]
+    deductions = [
+        ['Deductions', 'Rate', 'Amount'],
+        ['AFP', _percent(row['afp_rate']), _money(amounts['afp'])],
+        ['SFS', _percent(row['sfs_rate']), _money(amounts['sfs'])],
+        ['ISR', '', _money(amounts['isr'])],
+    ]
+    deductions += [[line['name'], _hours(line['quantity']), _money(line['amount'])] for line in row['deductions']]
+    side_by_side = Table(
+        [[_table(earnings, [1.8 * inch, 0.5 * inch, 1.0 * inch], money_columns=(1, 2)),
+          _table(deductions, [1.8 * inch, 0.5 * inch, 1.0 * inch], money_columns=(1, 2))]],
+        colWidths=[3.45 * inch, 3.45 * inch],
+    )
+    side_by_side.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP'), ('LEFTPADDING', (0, 0), (-1, -1), 0)]))
+    story += [side_by_side, Spacer(1, 10)]
+
+    totals = [
+        ['Gross', 'Total deductions', 'Net pay'],
+        [_money(amounts['gross_salary']), _money(amounts['total_deductions']), _money(amounts['net_salary'])],
+    ]
+    totals_table = _table(totals, [2.3 * inch] * 3, header_color=colors.HexColor('#0d6efd'))
+    totals_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 1), (-1, 1), 11),
+    ]))
+    story += [totals_table, Spacer(1, 6)]
+
+    if period['second_half']:
+        story.append(Paragraph(
+            f"Monthly gross {_money(amounts['monthly_gross_accumulated'])} &bull; "
+            f"monthly ISR {_money(amounts['monthly_isr_calculated'])} "
+            f"(ISR is settled on the second half of the month)",
+            styles['Italic'],
+        ))
+    story.append(Spacer(1, 12))
+
+    # Horas trabajadas
+    story.append(Paragraph('Worked hours', styles['Heading3']))
+    hours = [['Date', 'Hours', 'Regular', 'OT 35%', 'OT 100%', 'Night', 'Pay']]
+    totals_by_field = defaultdict(lambda: ZERO)
+    for workday in row['workdays']:
+        hours.append([
+            f"{workday['date']:%a %b %d}",
+            _hours(workday['productive_hours']),
+            _hours(workday['regular_hours']),
+            _hours(workday['overtime_hours_135']),
+            _hours(workday['overtime_hours_200']),
+            _hours(workday['night_hours']),
+            _money(workday['total_pay']),
+        ])
+        for field in WORKDAY_FIELDS[2:]:
+            totals_by_field[field] += workday[field] or ZERO
+    if row['workdays']:
+        hours.append([
+            'Total',
+            _hours(totals_by_field['productive_hours']),
+            _hours(totals_by_field['regular_hours']),
+            _hours(totals_by_field['overtime_hours_135']),
+            _hours(totals_by_field['overtime_hours_200']),
+            _hours(totals_by_field['night_hours']),
+            _money(totals_by_field['total_pay']),
+        ])
+        story.append(_table(hours, [1.3 * inch] + [0.9 * inch] * 5 + [1.1 * inch],
+                            money_columns=range(1, 7), total_row=True))
+        story += [
+            Spacer(1, 4),
+            Paragraph(
+                f"Regular {_money(totals_by_field['regular_pay'])} &bull; "
+                f"OT 35% {_money(totals_by_field['overtime_pay_135'])} &bull; "
+                f"OT 100% {_money(totals_by_field['overtime_pay_200'])} &bull; "
+                f"Night {_money(totals_by_field['night_pay'])}",
+                styles['Normal'],
+            ),
+        ]
+    else:
+        story.append(Paragraph('No work days in this period.', styles['Normal']))
+
+    story += [
+        Spacer(1, 16),
+        Paragraph(f"Status: {row['status']}", styles['Normal']),
+    ]
+    doc.build(story)
+    return buffer.getvalue()
+
+
+# =============================================================================
+# PUBLICAR
+# =============================================================================
+
+def _can_fork():
+    # Un proceso daemon (worker de django-q por defecto) no puede tener hijos
+    return not multiprocessing.current_process().daemon
+
+
+def _save(row, pdf):
+    storage = Payment._meta.get_field('payslip').storage
+    name = payslip_name(row['period_id'], row['payment_id'])
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(pdf))
+
+
+def payslip_pdf(payment_id):
+    """PDF del volante de un pago, sin guardarlo (descarga cuando el archivo no está)."""
+    return render_payslip(payslip_rows([payment_id])[0])
+
+
+def publish_payslips(period, payment_ids=None, processes=None):
+    """
+    Generar y enlazar el volante de cada pago del período (o de ``payment_ids``).
+
+    Devuelve {'payslips': generados, 'processes': procesos usados}.
+    """
+    payments = Payment.objects.filter(period=period).exclude(status__in=SKIPPED_STATUSES)
+    if payment_ids is not None:
+        payments = payments.filter(id__in=payment_ids)
+    ids = list(payments.order_by('id').values_list('id', flat=True))
+    if not ids:
+        return {'payslips': 0, 'processes': 0}
+
+    processes = processes or PAYSLIP_PROCESSES or os.cpu_count() or 1
+    processes = min(processes, len(ids)) if _can_fork() else 1
+    # fork: los hijos heredan Django ya configurado y las tablas de reportlab
+    executor = ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context('fork'),
+    ) if processes > 1 else None
+
+    published = 0
+    try:
+        for start in range(0, len(ids), PAYSLIP_BATCH_SIZE):
+            rows = payslip_rows(ids[start:start + PAYSLIP_BATCH_SIZE])
+            if executor:
+                if not start:
+                    # fork ocurre en el primer map (después de payslip_rows): los
+                    # hijos no usan la base de datos ni heredan la conexión abierta
+                    connections.close_all()
+                chunksize = max(1, len(rows) // (processes * 4))
+                pdfs = executor.map(render_payslip, rows, chunksize=chunksize)
+            else:
+                pdfs = map(render_payslip, rows)
+
+            now = timezone.now()
+            updated = []
+            for row, pdf in zip(rows, pdfs):
+                payment = Payment(id=row['payment_id'], payslip=_save(row, pdf), payslip_generated_at=now)
+                updated.append(payment)
+            Payment.objects.bulk_update(updated, ['payslip', 'payslip_generated_at'])
+            published += len(updated)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    return {'payslips': published, 'processes': processes}
@@ -0,0 +1,168 @@
+from datetime import timedelta
+from decimal import Decimal
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django_q.tasks import async_task
+
+from core.models import Employee, PayPeriod, PayrollRun
+from core.utils.payroll_engine import generate_period_payroll, refresh_period_payments
+from .payslips import publish_payslips
+
+logger = logging.getLogger(__name__)
+
+
+RUNNERS = {
+    'generate': generate_period_payroll,
+    'recalculate': refresh_period_payments,
+}
+
+# Si un bloque no avanza en este tiempo el worker murió o fue reciclado:
+# django-q reentrega la tarea después de Q_CLUSTER['retry'] segundos
+STALE_AFTER = timedelta(seconds=settings.Q_CLUSTER.get('retry', 620))
+
+
+def _enqueue(run):
+    """Queue the next chunk once the current transaction commits."""
+    transaction.on_commit(lambda: async_task(
+        'payment.tasks.process_payroll_run',
+        run.id,
+        group=f'payroll_run_{run.period_id}',
+    ))
+
+
+def start_payroll_run(period, kind='generate', user=None):
+    """
+    Start a background payroll run for the period.
+
+    If the period already has an active run of the same kind it is returned
+    instead of starting another one (re-queued if its worker went away).
+    The period row is locked while checking, so a double submit cannot
+    start two runs over the same employees.
+    """
+    with transaction.atomic():
+        PayPeriod.objects.select_for_update().only('id').get(id=period.id)
+
+        active = PayrollRun.objects.filter(
+            period=period, kind=kind, status__in=PayrollRun.ACTIVE_STATUSES
+        ).first()
+        if active:
+            if active.updated_at < timezone.now() - STALE_AFTER:
+                _enqueue(active)
+            return active
+
+        employee_ids = list(
+            Employee.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)
+        )
+        run = PayrollRun.objects.create(
+            period=period,
+            kind=kind,
+            employee_ids=employee_ids,
+            started_by=user,
+        )
+        _enqueue(run)
+    return run
+
+
+def _finish(run):
+    failed_chunks = len(run.errors)
+    if not failed_chunks:
+        run.status = 'completed'
+    elif failed_chunks >= run.total_chunks:
+        run.status = 'failed'
+    else:
+        run.status = 'completed_with_errors'
+    run.finished_at = timezone.now()
+
+
+def process_payroll_run(run_id):
+    """
+    Process the next pending chunk of a payroll run and queue the following one.
+
+    Each chunk commits its payments and the run progress in the same
+    transaction, so a worker killed mid-chunk (timeout or recycle) leaves
+    the run at the last finished chunk and the retried task resumes there.
+    """
+    with transaction.atomic():
+        try:
+            run = PayrollRun.objects.select_for_update().select_related('period').get(id=run_id)
+        except PayrollRun.DoesNotExist:
+            return {'status': 'missing', 'id': run_id}
+
+        if not run.is_active:
+            return run.to_dict()
+
+        index = run.chunks_done
+        if index < run.total_chunks:
+            employee_ids = run.chunk_employee_ids(index)
+            run.status = 'running'
+
+            try:
+                with transaction.atomic():
+                    result = RUNNERS[run.kind](run.period, employee_ids=employee_ids)
+                run.payments_created += result['created']
+                run.total_gross += Decimal(result['total_gross'])
+            except Exception as e:
+                logger.error(f"Payroll run {run.id} chunk {index} failed: {e}", exc_info=True)
+                run.errors = run.errors + [{
+                    'chunk': index,
+                    'employees': len(employee_ids),
+                    'error': str(e),
+                }]
+
+            run.chunks_done = index + 1
+            run.processed_employees += len(employee_ids)
+
+        if run.chunks_done >= run.total_chunks:
+            _finish(run)
+            if run.kind == 'generate' and run.status != 'failed':
+                enqueue_payslips(run.period_id)
+
+        run.save()
+
+        if run.is_active:
+            _enqueue(run)
+
+    return run.to_dict()
+
+
+def resume_stale_payroll_runs():
+    """
+    Re-queue active runs whose last chunk is older than STALE_AFTER.
+
+    Safety net for tasks lost by the broker; can be registered as a schedule.
+    """
+    stale = PayrollRun.objects.filter(
+        status__in=PayrollRun.ACTIVE_STATUSES,
+        updated_at__lt=timezone.now() - STALE_AFTER,
+    )
+    resumed = 0
+    for run in stale:
+        _enqueue(run)
+        resumed += 1
+    return f"Resumed {resumed} payroll runs"
+
+
+def enqueue_payslips(period_id, payment_ids=None):
+    """Queue publish_period_payslips once the current transaction commits."""
+    transaction.on_commit(lambda: async_task(
+        'payment.tasks.publish_period_payslips',
+        period_id,
+        payment_ids,
+        group=f'payslips_{period_id}',
+    ))
+
+
+def publish_period_payslips(period_id, payment_ids=None):
+    """Render and link the payslip PDF of every payment of the period (see payment.payslips)"""
+    try:
+        period = PayPeriod.objects.get(id=period_id)
+    except PayPeriod.DoesNotExist:
+        return {'status': 'missing', 'id': period_id}
+
+    result = publish_payslips(period, payment_ids=payment_ids)
+    logger.info(f"Published {result['payslips']} payslips for period {period_id} "
+                f"with {result['processes']} processes")
+    return result
@@ -1,3 +1,175 @@
-from django.test import TestCase
+import hashlib
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import DeviceToken
+from core.models import Employee, Payment, PayPeriod, PayrollRun
+from core.tests import LOCMEM_CACHES, PayrollFixtureMixin
+from core.utils.payroll_engine import generate_period_payroll
+from payment.payslips import publish_payslips
+from payment.tasks import process_payroll_run, start_payroll_run
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PayslipDownloadTests(TestCase):
+    """Payslips live in the private storage and only their employee or staff can download them."""
+
+    def setUp(self):
+        # El storage del campo se resuelve al importar el modelo: carpeta temporal
+        location = tempfile.mkdtemp(prefix='payslips-tests-')
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.storage = FileSystemStorage(location=location, base_url=None)
+        patcher = mock.patch.object(Payment._meta.get_field('payslip'), 'storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        period = PayPeriod.objects.create(
+            name='March 2026 - 1st half',
+            start_date=date(2026, 3, 1),
+            end_date=date(2026, 3, 15),
+            pay_date=date(2026, 3, 16),
+            frequency='biweekly',
+            period_type='first_half',
+            month=3,
+            year=2026,
+        )
+        self.owner = User.objects.create(username='owner')
+        employee = Employee.objects.create(user=self.owner, gender='M')
+        self.payment = Payment.objects.create(
+            employee=employee, period=period, gross_salary=Decimal('20000.00'), pay_date=period.pay_date,
+        )
+        publish_payslips(period, processes=1)
+        self.payment.refresh_from_db()
+        self.url = reverse('nomina:payment_payslip', args=[self.payment.id])
+
+    def client_for(self, user):
+        # accounts.middleware exige el dispositivo registrado
+        DeviceToken.objects.create(
+            user=user, token=f'token-{user.id}',
+            device_fingerprint=hashlib.sha256(b'-device').hexdigest(),
+        )
+        self.client.cookies['device_uuid'] = 'device'
+        self.client.force_login(user)
+        return self.client
+
+    def test_name_is_not_derived_from_the_ids(self):
+        name = self.payment.payslip.name
+        self.assertTrue(self.storage.exists(name))
+        self.assertRegex(name, r'^payslips/\d+/\d+_[0-9a-f]{32}\.pdf$')
+
+    def test_only_the_employee_or_staff_can_download(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+        other = User.objects.create(username='other')
+        Employee.objects.create(user=other, gender='M')
+        self.assertEqual(self.client_for(other).get(self.url).status_code, 404)
+
+        for user in (self.owner, User.objects.create(username='staff', is_staff=True)):
+            response = self.client_for(user).get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_renders_when_the_file_is_not_in_this_storage(self):
+        # El worker lo guardó en otro contenedor
+        self.storage.delete(self.payment.payslip.name)
+        response = self.client_for(self.owner).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecalculateMonthlyIsrViewTests(TestCase):
+    """Re-running the monthly ISR settlement rewrites payments: POST and staff only."""
+
+    def setUp(self):
+        self.period = PayPeriod.objects.create(
+            name='March 2026 - 2nd half',
+            start_date=date(2026, 3, 16),
+            end_date=date(2026, 3, 31),
+            pay_date=date(2026, 3, 31),
+            frequency='biweekly',
+            period_type='second_half',
+            month=3,
+            year=2026,
+        )
+        self.url = reverse('nomina:recalculate_monthly_isr', args=[self.period.id])
+
+    def client_for(self, user):
+        # accounts.middleware exige el dispositivo registrado
+        DeviceToken.objects.create(
+            user=user, token=f'token-{user.id}',
+            device_fingerprint=hashlib.sha256(b'-device').hexdigest(),
+        )
+        self.client.cookies['device_uuid'] = 'device'
+        self.client.force_login(user)
+        return self.client
+
+    def test_only_staff_can_post(self):
+        with mock.patch('payment.views.reconcile_second_half', return_value={'payments': 0, 'updated': 0}) as reconcile:
+            agent = self.client_for(User.objects.create(username='agent'))
+            self.assertEqual(agent.post(self.url).status_code, 302)  # al login
+            self.assertFalse(reconcile.called)
+
+            staff = self.client_for(User.objects.create(username='staff', is_staff=True))
+            self.assertEqual(staff.get(self.url).status_code, 405)
+            self.assertFalse(reconcile.called)
+
+            response = staff.post(self.url)
+            self.assertRedirects(response, reverse('nomina:review_period', args=[self.period.id]),
+                                 fetch_redirect_response=False)
+            reconcile.assert_called_once_with(3, 2026)
+
+
+class WorkerKilled(BaseException):
+    """Simula el worker reciclado a mitad de un bloque (no lo atrapa ``except Exception``)."""
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PayrollRunResumeTests(PayrollFixtureMixin, TestCase):
+    """A payroll run resumes from its last finished chunk after the worker goes away."""
+
+    def test_double_start_returns_the_active_run(self):
+        self.add_employees(3)
+        run = start_payroll_run(self.period)
+        self.assertEqual(start_payroll_run(self.period), run)
+        self.assertEqual(PayrollRun.objects.count(), 1)
+
+    def test_killed_chunk_is_redone_on_retry(self):
+        self.add_employees(5)
+        run = start_payroll_run(self.period)
+        PayrollRun.objects.filter(id=run.id).update(chunk_size=2)
+
+        process_payroll_run(run.id)  # bloque 0
+
+        calls = []
+
+        def killed(period, employee_ids):
+            calls.append(employee_ids)
+            generate_period_payroll(period, employee_ids=employee_ids)
+            raise WorkerKilled
+
+        with mock.patch.dict('payment.tasks.RUNNERS', {'generate': killed}):
+            with self.assertRaises(WorkerKilled):
+                process_payroll_run(run.id)  # bloque 1, sin commit
+
+        run.refresh_from_db()
+        self.assertEqual((run.chunks_done, run.status), (1, 'running'))
+        self.assertEqual(Payment.objects.filter(period=self.period).count(), 2)
+
+        # django-q reentrega la tarea: retoma en el bloque 1
+        process_payroll_run(run.id)
+        self.assertEqual(PayrollRun.objects.get(id=run.id).chunk_employee_ids(1), calls[0])
+        process_payroll_run(run.id)
+
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.chunks_done, run.processed_employees), ('completed', 3, 5))
+        self.assertEqual(run.payments_created, 5)
+        self.assertEqual(Payment.objects.filter(period=self.period).count(), 5)
@@ -1,21 +1,28 @@
 # payroll/views.py
 from django.db.models import Sum, Q, Count
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.shortcuts import redirect, render, get_object_or_404, HttpResponse
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 from django.db import IntegrityError
 from datetime import datetime
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from collections import defaultdict
 from django.views.generic import ListView, DetailView, UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.decorators.http import require_POST
 
-from core.models import Employee, Payment, PaymentConcept,PaymentDetail, PayPeriod, Campaign
+from core.models import Employee, Payment, PaymentConcept,PaymentDetail, PayPeriod, Campaign, PayrollRun
+from core.utils.payroll_engine import create_period_payments, reconcile_second_half
+from core.utils.tax_tables import tax_table_for
+from core.utils.payroll_review import get_period_review
+from core.utils.private_files import private_file_response
+from payment.payslips import payslip_pdf
+from payment.tasks import enqueue_payslips, start_payroll_run
 from attendance.models import WorkDay
+from attendance.approvals import approve_workdays, period_workdays, unapprove_workdays
 
 from decimal import Decimal, InvalidOperation
 
@@ -136,50 +143,12 @@ def create_pay_period(request):
                 frequency=frequency
             )
 
-            # Get active employees
+            # Create payment records in bulk (see core.utils.payroll_engine)
+            result = create_period_payments(period)
+            payments_created = result['created']
+
             active_employees = Employee.objects.filter(is_active=True)
             active_count = active_employees.count()
-            payments_created = 0
-
-            # Create payment records for each employee
-            for employee in active_employees:
-                # Calculate total from workdays
-                workdays = WorkDay.objects.filter(
-                    employee=employee,
-                    date__range=[start_date, end_date]
-                )
-                
-                total_gross = Decimal('0.00')
-                for workday in workdays:
-                    if workday.total_pay == 0 and workday.productive_hours > 0:
-                        workday.calculate_pay()
-                        workday.save()
-                    total_gross += Decimal(str(workday.total_pay))
-                
-                # Only create payment if there are workdays OR if employee has fixed salary
-                if workdays.exists() or (employee.fixed_rate and employee.custom_base_salary):
-                    if employee.fixed_rate and employee.custom_base_salary:
-                        # Use fixed salary if employee has fixed rate
-                        total_gross = employee.custom_base_salary
-                    
-                    # Calculate net salary
-                    employee_net = calculate_employee_net_salary(employee, total_gross)
-                    
-                    # Create payment record with status 'pending_employee'
-                    payment = Payment.objects.create(
-                        employee=employee,
-                        period=period,
-                        gross_salary=total_gross,
-                        net_salary=employee_net,
-                        pay_date=pay_date,
-                        status='pending_employee'  # IMPORTANTE: para que el empleado lo vea
-                    )
-                    
-                    # Calculate and update deductions
-                    payment.calculate_totals()
-                    payment.save()
-                    
-                    payments_created += 1
 
             # Find existing workdays in this range
             workdays_count = WorkDay.objects.filter(
@@ -194,7 +163,7 @@ def create_pay_period(request):
                 f"Found {workdays_count} work days for {active_count} active employees."
             )
 
-            return redirect('nomina:review_pay_period', period_id=period.id)
+            return redirect('nomina:review_period', period_id=period.id)
 
         except IntegrityError:
             messages.error(request, "A pay period with similar dates already exists.")
@@ -256,136 +225,74 @@ def unlock_isr(request, payment_id):
 
 @login_required
 def review_pay_period(request, period_id):
-    """Review and manage a complete pay period"""
+    """Review and manage a complete pay period (read only, see core.utils.payroll_review)"""
     period = get_object_or_404(PayPeriod, id=period_id)
-    
-    # Verificar si hay período de primera quincena correspondiente
-    first_half_period = None
-    if period.is_second_half():
-        first_half_period = PayPeriod.objects.filter(
-            month=period.month,
-            year=period.year,
-            period_type='first_half'
-        ).first()
-    
-    # Get or create payments for employees
-    active_employees = Employee.objects.filter(is_active=True)
-    
-    employees_data = []
-    total_gross = Decimal('0.00')
-    total_net = Decimal('0.00')
-    total_isr = Decimal('0.00')
-    monthly_gross = Decimal('0.00')
-    
-    for employee in active_employees:
-        # Get or create payment for current period
-        payment, created = Payment.objects.get_or_create(
-            employee=employee,
-            period=period,
-            defaults={'gross_salary': Decimal('0.00')}
-        )
-        
-        # Get workdays
-        workdays = WorkDay.objects.filter(
-            employee=employee,
-            date__range=[period.start_date, period.end_date]
-        ).order_by('date')
-        
-        # Calculate gross from workdays
-        gross_total = Decimal('0.00')
-        for workday in workdays:
-            if workday.total_pay == 0 and workday.productive_hours > 0:
-                workday.calculate_pay()
-                workday.save()
-            gross_total += Decimal(str(workday.total_pay))
-        
-        # Update payment
-        payment.gross_salary = gross_total
-        payment.save()  # Esto disparará el cálculo automático
-        
-        # Get first half payment if exists
-        first_half_payment = None
-        if period.is_second_half() and first_half_period:
-            first_half_payment = Payment.objects.filter(
-                employee=employee,
-                period=first_half_period
-            ).first()
-        
-        # Prepare employee data
-        employee_gross = float(gross_total)
-        employee_net = float(payment.net_salary)
-        employee_isr = float(payment.isr_to_apply)
-        
-        employees_data.append({
-            'employee': employee,
-            'payment': payment,
-            'first_half_payment': first_half_payment,
-            'workdays': list(workdays),
-            'workdays_count': workdays.count(),
-            'approved_count': workdays.filter(is_approved=True).count(),
-            'total_gross': employee_gross,
-            'total_net': employee_net,
-            'monthly_gross': float(payment.monthly_gross_accumulated),
-            'monthly_isr': float(payment.monthly_isr_calculated),
-            'isr_to_apply': employee_isr,
-            'fully_approved': all(w.is_approved for w in workdays),
-            'has_workdays': workdays.exists(),
-        })
-        
-        total_gross += Decimal(str(employee_gross))
-        total_net += Decimal(str(employee_net))
-        total_isr += Decimal(str(employee_isr))
-        monthly_gross += payment.monthly_gross_accumulated
-    
-    # Group employees by campaign
-    grouped_employees = {}
-    for emp_data in employees_data:
-        employee = emp_data["employee"]
-        campaign_name = (
-            employee.current_campaign.name
-            if employee.current_campaign
-            else "No Campaign"
-        )
-        
-        if campaign_name not in grouped_employees:
-            grouped_employees[campaign_name] = []
-        
-        grouped_employees[campaign_name].append(emp_data)
-    
-    # Get all campaigns for the tabs
-    campaigns = Campaign.objects.all()
-    
-    # All workdays in period
-    all_workdays = WorkDay.objects.filter(
-        date__range=[period.start_date, period.end_date],
-        employee__is_active=True
-    )
-    
-    stats = {
-        'total_employees': active_employees.count(),
-        'employees_with_workdays': sum(1 for ed in employees_data if ed['has_workdays']),
-        'total_workdays': all_workdays.count(),
-        'approved_workdays': all_workdays.filter(is_approved=True).count(),
-        'total_gross': float(total_gross),
-        'total_net': float(total_net),
-        'total_isr': float(total_isr),
-        'monthly_gross': float(monthly_gross),
-        'all_approved': all(ed['fully_approved'] for ed in employees_data if ed['has_workdays']),
-    }
-    
+
     context = {
         'period': period,
-        'first_half_period': first_half_period,
-        'stats': stats,
-        'campaigns': campaigns,
-        'grouped_employees': grouped_employees,
-        'employees_data': employees_data,
+        'payroll_run': PayrollRun.objects.filter(period=period).first(),
+        **get_period_review(period),
     }
-    
+
     return render(request, 'nomina/period_review.html', context)
 
-def calculate_employee_net_salary(employee, gross_salary):
-    """Calculate net salary with deductions"""
+
+@login_required
+@require_POST
+def recalculate_period_payments(request, period_id):
+    """Recalculate the period payments from its workdays in the background"""
+    period = get_object_or_404(PayPeriod, id=period_id)
+
+    run = start_payroll_run(period, kind='recalculate', user=request.user)
+
+    messages.info(request, f"Recalculating payments for {run.total_employees} employees.")
+    return redirect('nomina:review_period', period_id=period_id)
+
+@login_required
+@require_POST
+def publish_period_payslips(request, period_id):
+    """Render the payslip PDFs of the period in the background (see payment.payslips)"""
+    period = get_object_or_404(PayPeriod, id=period_id)
+
+    enqueue_payslips(period.id)
+
+    messages.info(request, "Payslips are being generated; they will be linked from each payment.")
+    return redirect('nomina:review_period', period_id=period_id)
+
+@login_required
+def payment_payslip(request, payment_id):
+    """Download the payslip PDF of a payment: its employee or staff only (see core.utils.private_files)"""
+    payment = get_object_or_404(Payment.objects.select_related('employee'), id=payment_id, payslip__gt='')
+    if not (request.user.is_staff or payment.employee.user_id == request.user.id):
+        raise Http404("Payslip not found")
+
+    return private_file_response(
+        payment.payslip,
+        f'payslip_{payment.period_id}_{payment.id}.pdf',
+        lambda: payslip_pdf(payment.id),
+    )
+
+@login_required
+@require_POST
+@user_passes_test(lambda user: user.is_staff)
+def recalculate_monthly_isr(request, period_id):
+    """Re-run the monthly ISR settlement of a second-half period against its first half"""
+    period = get_object_or_404(PayPeriod, id=period_id)
+
+    if not period.is_second_half():
+        messages.warning(request, "Monthly ISR is only settled on second-half periods.")
+        return redirect('nomina:review_period', period_id=period_id)
+
+    result = reconcile_second_half(period.month, period.year)
+
+    messages.success(request,
+        f"Monthly ISR reconciled for {result['payments']} payments "
+        f"({result['updated']} updated)."
+    )
+    return redirect('nomina:review_period', period_id=period_id)
+
+def calculate_employee_net_salary(employee, gross_salary, day=None):
+    """Calculate net salary of a monthly gross with the TaxTable in force on ``day``"""
     from decimal import Decimal
     
     # Convertir gross_salary a Decimal si es necesario
@@ -397,52 +304,41 @@ def calculate_employee_net_salary(employee, gross_salary):
     if gross == Decimal('0.00'):
         return Decimal('0.00')
     
-    # Usar Decimal para todos los cálculos
-    afp = gross * Decimal('0.0287')  # AFP (2.87%)
-    sfs = gross * Decimal('0.0304')  # SFS (3.04%)
-    isr = calculate_isr(gross)       # ISR
-    
-    total_deductions = afp + sfs + isr
+    tax_table = tax_table_for(day)
+    total_deductions = tax_table.afp(gross) + tax_table.sfs(gross) + tax_table.monthly_isr(gross)
     return gross - total_deductions
 
-def calculate_isr(gross_salary):
-    """Simplified ISR calculation with Decimal"""
-    from decimal import Decimal
-    
-    # Convertir a Decimal si es necesario
-    if isinstance(gross_salary, Decimal):
-        gross = gross_salary
-    else:
-        gross = Decimal(str(gross_salary))
-    
-    # Límites en Decimal
-    exemption_limit = Decimal('416220.00')
-    bracket_limit = Decimal('624329.00')
-    
-    if gross <= exemption_limit:
-        return Decimal('0.00')
-    elif gross <= bracket_limit:
-        return (gross - exemption_limit) * Decimal('0.15')
-    else:
-        excess = gross - bracket_limit
-        base_bracket = bracket_limit - exemption_limit
-        return (base_bracket * Decimal('0.15')) + (excess * Decimal('0.20'))
+def calculate_isr(gross_salary, day=None):
+    """Monthly ISR of a gross salary (same scale as Payment.calculate_monthly_isr)"""
+    return tax_table_for(day).monthly_isr(gross_salary)
 
 @login_required
 def approve_all_workdays(request, period_id):
-    """Approve all workdays in the period"""
+    """
+    Approve all workdays in the period in one UPDATE (attendance.approvals).
+
+    ?campaign=<id> or ?supervisor=<id> narrow it to a campaign or a team.
+    """
     period = get_object_or_404(PayPeriod, id=period_id)
-    
-    workdays = WorkDay.objects.filter(
-        date__range=[period.start_date, period.end_date],
-        employee__is_active=True,
-        is_approved=False
+
+    campaign = supervisor = None
+    scope = 'period'
+    if request.GET.get('campaign'):
+        campaign = get_object_or_404(Campaign, id=request.GET['campaign'])
+        scope = 'campaign'
+    elif request.GET.get('supervisor'):
+        supervisor = get_object_or_404(Employee, id=request.GET['supervisor'], is_supervisor=True)
+        scope = 'supervisor'
+
+    batch = approve_workdays(
+        period_workdays(period, campaign=campaign, supervisor=supervisor),
+        request.user,
+        scope=scope,
+        period=period,
+        campaign=campaign,
+        supervisor=supervisor,
     )
-    
-    approved_count = 0
-    for workday in workdays:
-        workday.approve(request.user)
-        approved_count += 1
+    approved_count = batch.workday_count if batch else 0
     
     messages.success(request, f"{approved_count} work days approved.")
     return redirect('nomina:review_period', period_id=period_id)
@@ -466,73 +362,47 @@ def generate_payroll(request, period_id):
         )
         return redirect('nomina:review_period', period_id=period_id)
     
-    # Generate payments for each employee
-    created_count = 0
-    active_employees = Employee.objects.filter(is_active=True)
-    
-    for employee in active_employees:
-        workdays = WorkDay.objects.filter(
-            employee=employee,
-            date__range=[period.start_date, period.end_date],
-            is_approved=True
-        )
-        
-        # Use Decimal for calculation
-        total_gross = Decimal('0.00')
-        for workday in workdays:
-            total_gross += Decimal(str(workday.total_pay))
-        
-        if total_gross > Decimal('0.00'):
-            # Create or update payment
-            payment, created = Payment.objects.update_or_create(
-                employee=employee,
-                period=period,
-                defaults={
-                    'gross_salary': total_gross,
-                    'pay_date': period.pay_date,
-                    'status': 'calculated'
-                }
-            )
-            
-            if created:
-                created_count += 1
-    
-    # Calculate total using aggregation
-    from django.db.models import Sum
-    total_period_result = Payment.objects.filter(period=period).aggregate(
-        total=Sum('gross_salary')
-    )
-    total_period = total_period_result['total'] or Decimal('0.00')
-    
-    messages.success(request, 
-        f"Payroll generated successfully for {created_count} employees. "
-        f"Period total: ${float(total_period):,.2f}"  # Convert to float for display
+    # La generación corre en django-q por bloques (ver payment.tasks)
+    run = start_payroll_run(period, kind='generate', user=request.user)
+
+    messages.info(request,
+        f"Payroll generation started for {run.total_employees} employees. "
+        f"Progress is shown on this page."
     )
-    
+
     return redirect('nomina:review_period', period_id=period_id)
 
+
+@login_required
+def payroll_run_status(request, period_id):
+    """JSON progress of the latest payroll run of the period (polled by the review page)"""
+    run = PayrollRun.objects.filter(period_id=period_id).first()
+    if run is None:
+        return JsonResponse({'run': None})
+    return JsonResponse({'run': run.to_dict()})
+
 @login_required
 def toggle_workday_approval(request, workday_id):
-    """Aprobar/desaprobar workday individual"""
-    workday = get_object_or_404(WorkDay, id=workday_id)
+    """Aprobar/desaprobar workday individual (un UPDATE, sin recalcular el pago)"""
+    workday = get_object_or_404(WorkDay.objects.select_related('employee__user'), id=workday_id)
     
     if workday.is_approved:
-        workday.unapprove()
+        unapprove_workdays(WorkDay.objects.filter(pk=workday.pk), request.user, scope='workday')
         action = "desaprobado"
     else:
-        workday.approve(request.user)
+        approve_workdays(WorkDay.objects.filter(pk=workday.pk), request.user, scope='workday')
         action = "aprobado"
     
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({
             'success': True,
             'action': action,
-            'is_approved': workday.is_approved,
+            'is_approved': action == "aprobado",
             'workday_id': workday_id
         })
     
     messages.success(request, f"Día {action} para {workday.employee.full_name}.")
-    return redirect('review_pay_period', period_id=request.GET.get('period_id'))
+    return redirect('nomina:review_period', period_id=request.GET.get('period_id'))
 
 
 
@@ -574,7 +444,7 @@ class PaymentDetailView(LoginRequiredMixin, DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        payment = self.get_object()
+        payment = self.object
 
         employee = payment.employee
         
@@ -603,15 +473,16 @@ class PaymentDetailView(LoginRequiredMixin, DetailView):
         return earnings
     
     def get_deductions_breakdown(self, payment):
-        """Deductions breakdown"""
+        """Deductions breakdown (rates of the period's TaxTable)"""
+        tax_table = payment.tax_table()
         deductions = [
             {
-                'name': 'AFP (2.87%)',
+                'name': f'AFP ({tax_table.afp_rate * 100:.2f}%)',
                 'amount': payment.afp,
                 'type': 'afp'
             },
             {
-                'name': 'SFS (3.04%)',
+                'name': f'SFS ({tax_table.sfs_rate * 100:.2f}%)',
                 'amount': payment.sfs,
                 'type': 'sfs'
             },
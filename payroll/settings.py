@@ -98,6 +98,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 1000,  
+    # ?format= lo usan las vistas de la API (json | summary | stats), no la negociación de DRF
+    'URL_FORMAT_OVERRIDE': None,
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
@@ -147,6 +149,31 @@ DATABASES = {
 
 ## Redus Configuration
 REDIS_PUBLIC_URL = os.getenv("REDIS_PUBLIC_URL")
+
+## Cache: L2 compartida entre procesos (Redis si está configurado, si no una
+## tabla en la BD, creada por la migración core.0011) y L1 en memoria por proceso.
+## Ver core/utils/cache_layer.py
+if REDIS_PUBLIC_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_PUBLIC_URL,
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    }
+
+CACHES = {
+    'default': {**SHARED_CACHE, 'TIMEOUT': 300},
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'payroll-l1',
+        'TIMEOUT': 15,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
@@ -160,6 +187,8 @@ Q_CLUSTER = {
     'bulk': 10,
     'orm': 'default',
     'catch_up': False, 
+    # Los volantes de pago se renderizan en un pool de procesos (payment/payslips.py)
+    'daemonize_workers': False,
 }
 
 
@@ -294,7 +323,38 @@ MEDIA_URL = '/media/'
 
 STATIC_URL = "/static/"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+
+## Volantes de pago y carnets: storage 'private', fuera de MEDIA_ROOT y solo
+## por vistas con permisos (core/utils/private_files.py). Con un bucket S3 lo
+## comparten web y worker; sin él se usa una carpeta local.
+PRIVATE_STORAGE_BUCKET = os.getenv("PRIVATE_STORAGE_BUCKET")
+if PRIVATE_STORAGE_BUCKET:
+    PRIVATE_STORAGE = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': PRIVATE_STORAGE_BUCKET,
+            'endpoint_url': os.getenv("PRIVATE_STORAGE_ENDPOINT_URL"),
+            'region_name': os.getenv("PRIVATE_STORAGE_REGION"),
+            'default_acl': 'private',
+            'querystring_auth': True,
+            'file_overwrite': True,
+        },
+    }
+else:
+    PRIVATE_STORAGE = {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {
+            'location': os.getenv("PRIVATE_MEDIA_ROOT", os.path.join(BASE_DIR, "private_media")),
+            'base_url': None,
+        },
+    }
+
+# STATICFILES_STORAGE ya no se lee desde Django 5.1: staticfiles sigue con el storage por defecto
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'private': PRIVATE_STORAGE,
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
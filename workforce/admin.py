@@ -2,7 +2,7 @@
 from django.contrib import admin
 from django.contrib import messages
 from django.core.exceptions import ValidationError
-from .models import Shift, EmployeeSchedule, TimeOffRequest, BreakSchedule
+from .models import Shift, EmployeeSchedule, ScheduledDay, TimeOffRequest, BreakSchedule
 
 
 @admin.register(Shift)
@@ -91,6 +91,15 @@ class EmployeeScheduleAdmin(admin.ModelAdmin):
             # Cualquier otro error
             messages.error(request, f'Error saving schedule: {str(e)}')
             
+@admin.register(ScheduledDay)
+class ScheduledDayAdmin(admin.ModelAdmin):
+    list_display = ['employee', 'date', 'shift', 'start_time', 'end_time', 'break_count', 'lunch_time']
+    list_filter = ['shift', 'date']
+    search_fields = ['employee__full_name', 'employee__employee_id']
+    date_hierarchy = 'date'
+    raw_id_fields = ['schedule', 'employee']
+
+
 @admin.register(TimeOffRequest)
 class TimeOffRequestAdmin(admin.ModelAdmin):
     list_display = ['employee', 'request_type', 'start_date', 'end_date', 
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_payrollrun_kind'),
+        ('workforce', '0003_alter_shift_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('break_count', models.IntegerField(default=0)),
+                ('break_duration_minutes', models.IntegerField(default=0)),
+                ('lunch_duration_minutes', models.IntegerField(default=0)),
+                ('first_break_time', models.TimeField(blank=True, null=True)),
+                ('second_break_time', models.TimeField(blank=True, null=True)),
+                ('lunch_time', models.TimeField(blank=True, null=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_days', to='core.employee')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_days', to='workforce.employeeschedule')),
+                ('shift', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='scheduled_days', to='workforce.shift')),
+            ],
+            options={
+                'ordering': ['date', 'start_time'],
+                'indexes': [models.Index(fields=['date', 'shift'], name='workforce_s_date_814b44_idx'), models.Index(fields=['employee', 'date'], name='workforce_s_employe_967248_idx')],
+                'unique_together': {('schedule', 'date')},
+            },
+        ),
+    ]
@@ -450,7 +450,46 @@ class EmployeeSchedule(models.Model):
             'notes': self.notes,
             'status': self.status,
         }
-    
+
+
+class ScheduledDay(models.Model):
+    """
+    One row per employee per scheduled working day (calendar index)
+
+    Materialized from published/active EmployeeSchedule rows by
+    workforce.scheduled_days: rebuilt when a schedule or its shift is saved,
+    removed when the schedule is cancelled or deleted. Indefinite schedules
+    are expanded up to a rolling horizon that a nightly task extends.
+    Times and break plan are the effective ones (custom or shift defaults).
+    """
+    schedule = models.ForeignKey(EmployeeSchedule, on_delete=models.CASCADE, related_name='scheduled_days')
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='scheduled_days')
+    shift = models.ForeignKey(Shift, on_delete=models.PROTECT, related_name='scheduled_days')
+    date = models.DateField()
+
+    # Effective times
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    # Effective break plan
+    break_count = models.IntegerField(default=0)
+    break_duration_minutes = models.IntegerField(default=0)
+    lunch_duration_minutes = models.IntegerField(default=0)
+    first_break_time = models.TimeField(null=True, blank=True)
+    second_break_time = models.TimeField(null=True, blank=True)
+    lunch_time = models.TimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['date', 'start_time']
+        unique_together = ['schedule', 'date']
+        indexes = [
+            models.Index(fields=['date', 'shift']),
+            models.Index(fields=['employee', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - {self.date} ({self.start_time.strftime('%H:%M')} - {self.end_time.strftime('%H:%M')})"
+
 
 class TimeOffRequest(models.Model):
     """
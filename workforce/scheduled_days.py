@@ -0,0 +1,178 @@
+# scheduled_days.py
+"""
+Calendar index of scheduled days (ScheduledDay).
+
+Answering "who works on date D" from EmployeeSchedule means filtering on
+status, the validity range and a weekday column picked at runtime, and the
+dashboards did it once per shift / campaign / department. Here every
+published/active schedule is expanded into one row per working day, so
+coverage for any date or range is a single indexed query that can join
+WorkDay directly.
+
+Sync:
+- Saving a schedule rebuilds its rows (cancelling or drafting removes them)
+- Saving a shift rebuilds the rows of its schedules (effective times)
+- Deleting a schedule removes its rows (CASCADE)
+- Indefinite schedules are expanded up to SCHEDULE_HORIZON_DAYS ahead;
+  ``extend_scheduled_days`` (nightly task) pushes the horizon forward and
+  also fills schedules that have no rows yet (initial backfill)
+
+Bulk ``QuerySet.update()`` on EmployeeSchedule skips the signals: call
+``sync_schedules`` afterwards.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+from attendance.models import WorkDay
+from .models import EmployeeSchedule, ScheduledDay
+
+
+SCHEDULED_STATUSES = ['published', 'active']
+WEEKDAY_FIELDS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+SCHEDULE_HORIZON_DAYS = 180  # same window list_schedule_employee used to expand
+INDEX_BATCH_SIZE = 1000
+
+
+# =============================================================================
+# SYNC
+# =============================================================================
+
+def horizon_end(schedule, today=None):
+    """Last day to materialize: end_date, capped at the rolling horizon."""
+    today = today or timezone.now().date()
+    horizon = max(schedule.start_date, today) + timedelta(days=SCHEDULE_HORIZON_DAYS)
+    return min(schedule.end_date, horizon) if schedule.end_date else horizon
+
+
+def expand_schedule(schedule, start=None, end=None):
+    """Unsaved ScheduledDay rows of ``schedule`` between start and end (inclusive)."""
+    day = max(start or schedule.start_date, schedule.start_date)
+    end = end or horizon_end(schedule)
+    weekdays = [getattr(schedule, field) for field in WEEKDAY_FIELDS]
+
+    plan = {
+        'start_time': schedule.get_effective_start_time(),
+        'end_time': schedule.get_effective_end_time(),
+        'break_count': schedule.get_effective_break_count(),
+        'break_duration_minutes': schedule.get_effective_break_duration(),
+        'lunch_duration_minutes': schedule.get_effective_lunch_duration(),
+        'first_break_time': schedule.get_effective_first_break_time(),
+        'second_break_time': schedule.get_effective_second_break_time(),
+        'lunch_time': schedule.get_effective_lunch_time(),
+    }
+
+    rows = []
+    while day <= end:
+        if weekdays[day.weekday()]:
+            rows.append(ScheduledDay(
+                schedule=schedule,
+                employee_id=schedule.employee_id,
+                shift_id=schedule.shift_id,
+                date=day,
+                **plan
+            ))
+        day += timedelta(days=1)
+    return rows
+
+
+def sync_schedules(schedules, today=None):
+    """
+    Rebuild the index rows of ``schedules`` (EmployeeSchedule queryset).
+
+    Schedules that are not published/active end up with no rows.
+    Returns the number of rows written.
+    """
+    schedules = list(schedules.select_related('shift'))
+    rows = []
+    for schedule in schedules:
+        if schedule.status in SCHEDULED_STATUSES:
+            rows.extend(expand_schedule(schedule, end=horizon_end(schedule, today)))
+
+    with transaction.atomic():
+        ScheduledDay.objects.filter(schedule_id__in=[s.id for s in schedules]).delete()
+        ScheduledDay.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE)
+    return len(rows)
+
+
+def extend_scheduled_days(today=None):
+    """
+    Materialize the days missing up to each schedule's horizon.
+
+    Only appends after the last stored day, so it is cheap to run every
+    night; schedules without rows are expanded from their start date.
+    Returns the number of rows written.
+    """
+    schedules = EmployeeSchedule.objects.filter(
+        status__in=SCHEDULED_STATUSES,
+    ).select_related('shift').annotate(last_day=Max('scheduled_days__date')).order_by()
+
+    created = 0
+    rows = []
+    for schedule in schedules.iterator(chunk_size=INDEX_BATCH_SIZE):
+        start = schedule.last_day + timedelta(days=1) if schedule.last_day else schedule.start_date
+        rows.extend(expand_schedule(schedule, start=start, end=horizon_end(schedule, today)))
+        if len(rows) >= INDEX_BATCH_SIZE:
+            ScheduledDay.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE)
+            created += len(rows)
+            rows = []
+
+    ScheduledDay.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE)
+    return created + len(rows)
+
+
+# =============================================================================
+# QUERIES
+# =============================================================================
+
+def scheduled_on(day, scheduled_days=None):
+    """ScheduledDay rows of ``day`` (optionally narrowed by a ScheduledDay queryset)."""
+    scheduled_days = ScheduledDay.objects.all() if scheduled_days is None else scheduled_days
+    return scheduled_days.filter(date=day)
+
+
+def scheduled_count_by(day, field, scheduled_days=None):
+    """{value of ``field``: scheduled rows} for ``day`` in one GROUP BY query."""
+    rows = scheduled_on(day, scheduled_days).values(field).annotate(total=Count('id')).order_by()
+    return {row[field]: row['total'] for row in rows}
+
+
+def coverage_by_shift(day, scheduled_days=None):
+    """
+    {shift_id: (scheduled, checked_in)} for ``day`` in one query.
+
+    ``scheduled`` counts schedule rows (as the dashboards always did) and
+    ``checked_in`` the distinct scheduled employees with a WorkDay check-in
+    that day.
+    """
+    checked_in = WorkDay.objects.filter(
+        employee_id=OuterRef('employee_id'),
+        date=day,
+        check_in__isnull=False,
+    )
+    rows = scheduled_on(day, scheduled_days).values('shift').annotate(
+        scheduled=Count('id'),
+        checked_in=Count('employee', distinct=True, filter=Q(Exists(checked_in))),
+    ).order_by()
+    return {row['shift']: (row['scheduled'], row['checked_in']) for row in rows}
+
+
+def shift_coverage(shifts, day, scheduled_days=None):
+    """Coverage rows for ``shifts`` (in their order) on ``day``: two queries in total."""
+    coverage = coverage_by_shift(day, scheduled_days)
+
+    data = []
+    for shift in shifts:
+        scheduled, checked_in = coverage.get(shift.id, (0, 0))
+        coverage_rate = (checked_in / scheduled * 100) if scheduled > 0 else 0
+        data.append({
+            'shift': shift,
+            'scheduled_count': scheduled,
+            'checked_in_count': checked_in,
+            'coverage_rate': round(coverage_rate, 1),
+            'is_understaffed': coverage_rate < 80,
+        })
+    return data
@@ -0,0 +1,19 @@
+# signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import EmployeeSchedule, Shift
+from .scheduled_days import sync_schedules
+
+
+@receiver(post_save, sender=EmployeeSchedule)
+def sync_scheduled_days_on_schedule_save(sender, instance, **kwargs):
+    # Creado, editado o cancelado: se reconstruyen sus días (el borrado va en cascada)
+    sync_schedules(EmployeeSchedule.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Shift)
+def sync_scheduled_days_on_shift_save(sender, instance, created, **kwargs):
+    # Las horas y breaks efectivos de los horarios salen del turno
+    if not created:
+        sync_schedules(instance.scheduled_employees.all())
@@ -0,0 +1,14 @@
+# workforce/tasks.py
+from .scheduled_days import extend_scheduled_days
+
+
+def extend_scheduled_days_horizon():
+    """
+    Extensión nocturna del índice ScheduledDay.
+
+    Agrega los días que entran en el horizonte de los horarios indefinidos
+    (y los horarios que todavía no tienen filas). La reconstrucción completa
+    se hace con ``python manage.py rebuild_scheduled_days``.
+    """
+    created = extend_scheduled_days()
+    return f"Extended scheduled days index ({created} rows)"
@@ -1,3 +1,77 @@
+from collections import Counter
+from datetime import time, timedelta
+
 from django.test import TestCase
 
-# Create your tests here.
+from attendance.models import WorkDay
+from core.tests import ScheduleFixtureMixin
+from .models import EmployeeSchedule, ScheduledDay
+from .scheduled_days import SCHEDULED_STATUSES, coverage_by_shift, scheduled_count_by, scheduled_on
+
+
+class ScheduledDayIndexTests(ScheduleFixtureMixin, TestCase):
+    """The calendar index answers who works when exactly like filtering EmployeeSchedule did."""
+
+    def setUp(self):
+        self.build_schedules(seed=3, employees=15)
+        self.days = [self.today + timedelta(days=offset) for offset in range(-150, 31)]
+
+    def assert_index_matches(self):
+        for day in self.days:
+            old = list(self.old_schedules(day).select_related('employee'))
+            self.assertEqual(sorted(scheduled_on(day).values_list('schedule_id', flat=True)),
+                             sorted(schedule.id for schedule in old), day)
+
+            # Conteos agrupados contra los de un filtro por campaña y por turno
+            self.assertEqual(scheduled_count_by(day, 'employee__current_campaign'),
+                             dict(Counter(schedule.employee.current_campaign_id for schedule in old)), day)
+            checked_in = set(WorkDay.objects.filter(date=day, check_in__isnull=False).values_list('employee_id', flat=True))
+            expected = {}
+            for shift_id in {schedule.shift_id for schedule in old}:
+                employees = {schedule.employee_id for schedule in old if schedule.shift_id == shift_id}
+                scheduled = sum(1 for schedule in old if schedule.shift_id == shift_id)
+                expected[shift_id] = (scheduled, len(employees & checked_in))
+            self.assertEqual(coverage_by_shift(day), expected, day)
+
+    def test_index_matches_the_schedule_filter(self):
+        self.assert_index_matches()
+
+    def test_each_schedule_has_the_dates_it_used_to_expand(self):
+        for schedule in EmployeeSchedule.objects.select_related('shift'):
+            dates = list(schedule.scheduled_days.order_by('date').values_list('date', flat=True))
+            if schedule.status not in SCHEDULED_STATUSES:
+                self.assertEqual(dates, [], schedule.id)
+                continue
+            old = schedule.get_schedule_for_date_range()
+            if schedule.end_date:
+                self.assertEqual(dates, old, schedule.id)
+            else:
+                # Sin fin: el índice llega hasta hoy + 180 días, antes inicio + 180
+                self.assertEqual(dates[:len(old)], old, schedule.id)
+            self.assertEqual(set(schedule.scheduled_days.values_list('start_time', flat=True)) - {schedule.get_effective_start_time()},
+                             set(), schedule.id)
+
+    def test_edits_cancellations_shift_changes_and_deletes(self):
+        schedules = list(EmployeeSchedule.objects.filter(status__in=SCHEDULED_STATUSES).order_by('id'))
+        cancelled, edited, deleted = schedules[:3]
+
+        cancelled.status = 'cancelled'
+        cancelled.save()
+
+        edited.end_date = self.today + timedelta(days=10)
+        edited.saturday = not edited.saturday
+        edited.save()
+
+        deleted.delete()
+
+        shift = self.shifts[0]
+        shift.start_time = time(6)
+        shift.save()
+
+        self.assert_index_matches()
+        self.assertFalse(ScheduledDay.objects.filter(schedule_id__in=[cancelled.id, deleted.id]).exists())
+        self.assertEqual(
+            set(ScheduledDay.objects.filter(shift=shift, schedule__custom_start_time__isnull=True)
+                .values_list('start_time', flat=True)),
+            {time(6)},
+        )
@@ -1,6 +1,7 @@
 import io
 import csv
 import json
+from collections import defaultdict
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404,get_list_or_404
@@ -14,7 +15,7 @@ from datetime import datetime, timedelta
 from django.views.generic import CreateView
 from django.views.decorators.http import require_GET
 
-from .models import Employee, Shift, EmployeeSchedule
+from .models import Employee, Shift, EmployeeSchedule, ScheduledDay
 from .forms import EmployeeScheduleForm
 from django.forms import modelformset_factory
 
@@ -241,11 +242,18 @@ def list_schedule_employee(request):
         status__in=['published', 'active']
     ).select_related('shift').order_by('-start_date')
     
+    # Active dates of every schedule from the calendar index (one query)
+    active_dates_by_schedule = defaultdict(list)
+    for schedule_id, day in ScheduledDay.objects.filter(
+        employee=employee,
+    ).order_by('date').values_list('schedule_id', 'date'):
+        active_dates_by_schedule[schedule_id].append(day)
+    
     # Prepare JSON-serializable data with all custom overrides
     schedules_data = []
     for schedule in schedules:
         # Get active dates
-        active_dates = schedule.get_schedule_for_date_range()
+        active_dates = active_dates_by_schedule[schedule.id]
         
         # Calculate break times based on custom overrides or shift defaults
         break_details = schedule.get_break_schedule_details()